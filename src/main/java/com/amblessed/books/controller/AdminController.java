@@ -0,0 +1,40 @@
+package com.amblessed.books.controller;
+
+
+
+/*
+ * @Project Name: books
+ * @Author: Okechukwu Bright Onwumere
+ * @Created: 18-Oct-26
+ */
+
+import io.swagger.v3.oas.annotations.Operation;
+import io.swagger.v3.oas.annotations.tags.Tag;
+import lombok.RequiredArgsConstructor;
+import org.springframework.boot.autoconfigure.condition.ConditionalOnProperty;
+import org.springframework.http.HttpStatus;
+import org.springframework.http.ResponseEntity;
+import org.springframework.web.bind.annotation.PostMapping;
+import org.springframework.web.bind.annotation.RequestMapping;
+import org.springframework.web.bind.annotation.RestController;
+
+import java.util.Map;
+
+@Tag(name = "Admin", description = "Test support endpoints, only enabled with books.admin.reset-enabled=true")
+@RestController
+@RequestMapping("/api/v1/admin")
+@RequiredArgsConstructor
+@ConditionalOnProperty(name = "books.admin.reset-enabled", havingValue = "true")
+public class AdminController {
+
+    private final BookController bookController;
+
+    @Operation(summary = "Reset Books", description = "Restore the seeded catalog")
+    @PostMapping("/reset")
+    public ResponseEntity<Map<String, String>> resetBooks() {
+        bookController.resetBooks();
+        return ResponseEntity
+                .status(HttpStatus.OK)
+                .body(Map.of("message", "Books reset successfully"));
+    }
+}
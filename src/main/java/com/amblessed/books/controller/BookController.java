@@ -40,6 +40,11 @@ public class BookController {
     }
 
 
+    public void resetBooks() {
+        books.clear();
+        initBooks();
+    }
+
     private void initBooks() {
         books.add(new Book(1, "To Kill a Mockingbird", "Harper Lee", "Fiction", 5));
         books.add(new Book(2, "1984", "George Orwell", "Fiction", 4));
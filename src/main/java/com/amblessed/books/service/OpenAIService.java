@@ -22,8 +22,15 @@ import java.util.List;
 @Service
 public class OpenAIService {
 
+    private static final String DEFAULT_BASE_URL = "https://api.openai.com/v1";
+    private static final String DEFAULT_MODEL = "gpt-4";
+
     OkHttpClient client = new OkHttpClient();
 
+    // OPENAI_BASE_URL points the service at a compatible stand-in, e.g. src/test/python/openai_stub.py
+    private final String baseUrl = System.getenv().getOrDefault("OPENAI_BASE_URL", DEFAULT_BASE_URL);
+    private final String model = System.getenv().getOrDefault("OPENAI_MODEL", DEFAULT_MODEL);
+
     public List<String> getRecommendations(String prompt)  {
         String apiKey = System.getenv("OPENAI_API_KEY");
         if (apiKey != null)
@@ -36,7 +43,7 @@ public class OpenAIService {
         
         // Create JSON body
         JSONObject jsonBody = new JSONObject();
-        jsonBody.put("model", "gpt-4");
+        jsonBody.put("model", model);
         jsonBody.put("messages", new JSONObject[]
                 {
                 new JSONObject()
@@ -49,7 +56,7 @@ public class OpenAIService {
         // Create request
         RequestBody body = RequestBody.create(jsonBody.toString(), MediaType.parse("application/json"));
         Request request = new Request.Builder()
-                .url("https://api.openai.com/v1/chat/completions")
+                .url(baseUrl + "/chat/completions")
                 .addHeader("Content-Type", "application/json")
                 .addHeader("Authorization", "Bearer " + apiKey)
                 .post(body)
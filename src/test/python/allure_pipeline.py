@@ -0,0 +1,296 @@
+"""
+Allure housekeeping off the test run's critical path: rotation, pruning and report generation.
+
+Local sessions used to delete ``allure-results`` before the first test and wait
+for ``allure generate`` after the last one. Now:
+
+- ``rotate_results`` renames the previous session's results to
+  ``allure-results-archive/<timestamp>``. This is one rename however many files
+  there are. A detached ``prune`` worker deletes the archives beyond ``--keep``.
+- ``start_report`` hands the finished session to a detached ``report`` worker
+  and returns, so pytest exits straight away.
+- The worker hard-links the results into a staging directory and carries over
+  the previous report's ``history`` (Allure's trend graphs). It generates the
+  report next to the current one and swaps it in, so an open report is never
+  half-written. Workers take turns on a lock.
+- A partial run (``-k``, ``-m``, ``--lf``, or test paths that leave out part of
+  the suite) is incremental. The report keeps the previous result of every test
+  that did not run, so rerunning one test does not shrink the report to one test.
+
+    python allure_pipeline.py report --results allure-results --report allure-report --open
+    python allure_pipeline.py prune --keep 5
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Set
+
+from server_daemon import file_lock
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "allure-results")
+REPORT_DIR = os.path.join(PROJECT_ROOT, "allure-report")
+ALLURE_CMD = os.environ.get("ALLURE_CMD", r"C:\allure\allure-2.35.1\bin\allure.bat")
+KEEP = 5  # rotated result directories kept
+ROTATED = re.compile(r"^\d{8}-\d{6}(-\d+)?$")
+SOURCES = "report-sources"  # results behind the current report, kept for incremental runs
+
+
+def archive_dir(results_dir: str) -> str:
+    """Return where rotated results, the worker log and the report sources live."""
+    return results_dir.rstrip("/\\") + "-archive"
+
+
+def _spawn(args: List[str], log_path: str) -> subprocess.Popen:
+    """Start this module as a detached worker that outlives the pytest process."""
+    if os.name == "nt":
+        detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {"start_new_session": True}
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, "a") as log:
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), *args], cwd=PROJECT_ROOT,
+                                stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, **detach)
+
+
+def rotate_results(results_dir: str = RESULTS_DIR, keep: Optional[int] = KEEP) -> Optional[str]:
+    """
+    Move the previous session's results aside and leave an empty results directory.
+
+    Args:
+        results_dir: The directory allure-pytest writes to.
+        keep: Rotated directories to keep; older ones are pruned by a detached worker.
+            None skips pruning, 0 deletes the previous results in the background.
+
+    Returns:
+        The directory the previous results were moved to, or None when there were none.
+    """
+    rotated = None
+    if os.path.isdir(results_dir) and next(os.scandir(results_dir), None) is not None:
+        archive = archive_dir(results_dir)
+        os.makedirs(archive, exist_ok=True)
+        # Named after the previous session's last write, not this session's start
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(os.path.getmtime(results_dir)))
+        rotated, suffix = os.path.join(archive, stamp), 1
+        while os.path.exists(rotated):
+            rotated, suffix = os.path.join(archive, f"{stamp}-{suffix}"), suffix + 1
+        try:
+            os.rename(results_dir, rotated)
+        except OSError:  # e.g. a file held open on Windows: fall back to deleting in place
+            shutil.rmtree(results_dir, ignore_errors=True)
+            rotated = None
+    os.makedirs(results_dir, exist_ok=True)
+    if rotated and keep is not None:
+        _spawn(["prune", "--results", results_dir, "--keep", str(keep)],
+               os.path.join(archive_dir(results_dir), "prune.log"))
+    return rotated
+
+
+def prune(results_dir: str = RESULTS_DIR, keep: int = KEEP) -> List[str]:
+    """Delete all but the newest ``keep`` rotated result directories and return the deleted paths."""
+    archive = archive_dir(results_dir)
+    if not os.path.isdir(archive):
+        return []
+    rotated = sorted((entry.name for entry in os.scandir(archive) if entry.is_dir() and ROTATED.match(entry.name)),
+                     key=lambda name: (name[:15], int(name[16:] or 0)))
+    deleted = [os.path.join(archive, name) for name in rotated[:max(0, len(rotated) - keep)]]
+    for path in deleted:
+        shutil.rmtree(path, ignore_errors=True)  # a concurrent prune may be deleting it too
+    return deleted
+
+
+def start_report(results_dir: str = RESULTS_DIR, report_dir: str = REPORT_DIR, allure_cmd: str = ALLURE_CMD,
+                 incremental: bool = False, open_report: bool = True) -> str:
+    """
+    Generate the report in a detached worker and return the worker's log file.
+
+    Args:
+        results_dir: This session's Allure results.
+        report_dir: The report to replace.
+        allure_cmd: The Allure command line.
+        incremental: Keep the previous results of tests that did not run this session.
+        open_report: Run ``allure open`` on the new report.
+    """
+    log_path = os.path.join(archive_dir(results_dir), "report.log")
+    args = ["report", "--results", results_dir, "--report", report_dir, "--allure", allure_cmd]
+    _spawn(args + (["--incremental"] if incremental else []) + (["--open"] if open_report else []), log_path)
+    return log_path
+
+
+def _link(source: str, target: str):
+    try:
+        os.link(source, target)
+    except OSError:  # other file system, or no hard links
+        shutil.copy2(source, target)
+
+
+def snapshot(results_dir: str, target: str) -> int:
+    """Hard-link the result files into ``target`` (Allure never rewrites them) and return their count."""
+    os.makedirs(target, exist_ok=True)
+    count = 0
+    for entry in os.scandir(results_dir):
+        if entry.is_file():
+            _link(entry.path, os.path.join(target, entry.name))
+            count += 1
+    return count
+
+
+def _load(path: str) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _attachments(node: Dict) -> Iterator[str]:
+    """Yield the attachment files of a result or fixture, its steps included."""
+    for attachment in node.get("attachments") or ():
+        if attachment.get("source"):
+            yield attachment["source"]
+    for step in node.get("steps") or ():
+        yield from _attachments(step)
+
+
+def carry_over(previous: str, target: str) -> int:
+    """
+    Link the previous results of tests that have no result in ``target``.
+
+    A test is identified by its Allure ``historyId``. Its attachments and
+    the fixture containers that reference it come along.
+
+    Returns:
+        The number of test results carried over.
+    """
+    ran: Set[str] = set()
+    for path in glob.glob(os.path.join(target, "*-result.json")):
+        result = _load(path)
+        if result and result.get("historyId"):
+            ran.add(result["historyId"])
+
+    carried: Set[str] = set()
+    files: Set[str] = set()
+    for path in glob.glob(os.path.join(previous, "*-result.json")):
+        result = _load(path)
+        if not result or not result.get("historyId") or result["historyId"] in ran:
+            continue
+        carried.add(result.get("uuid"))
+        files.add(os.path.basename(path))
+        files.update(_attachments(result))
+    if not carried:
+        return 0
+    for path in glob.glob(os.path.join(previous, "*-container.json")):
+        container = _load(path)
+        if container and carried.intersection(container.get("children") or ()):
+            files.add(os.path.basename(path))
+            for fixture in (container.get("befores") or []) + (container.get("afters") or []):
+                files.update(_attachments(fixture))
+    for name in files:
+        source, destination = os.path.join(previous, name), os.path.join(target, name)
+        if os.path.isfile(source) and not os.path.exists(destination):
+            _link(source, destination)
+    return len(carried)
+
+
+def _replace(source: str, target: str, trash: str):
+    """Move ``source`` to ``target``, moving the old ``target`` to ``trash`` first."""
+    if os.path.exists(target):
+        try:
+            os.rename(target, trash)
+        except OSError:  # e.g. still served by `allure open` on Windows
+            shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.rename(source, target)
+    except OSError:
+        shutil.copytree(source, target, dirs_exist_ok=True)
+
+
+def resolve_allure(allure_cmd: str) -> str:
+    """Return the Allure command line, falling back to ``allure`` on the PATH."""
+    return allure_cmd if os.path.exists(allure_cmd) else shutil.which("allure") or allure_cmd
+
+
+def build_report(results_dir: str = RESULTS_DIR, report_dir: str = REPORT_DIR, allure_cmd: str = ALLURE_CMD,
+                 incremental: bool = False, open_report: bool = False) -> int:
+    """
+    Generate the report from a snapshot of the results and swap it in.
+
+    Args:
+        results_dir: This session's Allure results.
+        report_dir: The report to replace.
+        allure_cmd: The Allure command line.
+        incremental: Keep the previous results of tests that did not run this session.
+        open_report: Run ``allure open`` on the new report.
+
+    Returns:
+        The exit code of ``allure generate``.
+    """
+    archive = archive_dir(results_dir)
+    staging = os.path.join(archive, f"staging-{os.getpid()}")
+    start = time.perf_counter()
+    try:
+        # Snapshot first: the next session rotates results_dir away as soon as it starts
+        count = snapshot(results_dir, os.path.join(staging, "results"))
+        with file_lock(os.path.join(archive, "report.lock")):
+            waited = time.perf_counter() - start
+            sources = os.path.join(archive, SOURCES)
+            carried = 0
+            if incremental and os.path.isdir(sources):
+                carried = carry_over(sources, os.path.join(staging, "results"))
+            history = os.path.join(report_dir, "history")
+            if os.path.isdir(history):
+                shutil.copytree(history, os.path.join(staging, "results", "history"), dirs_exist_ok=True)
+
+            allure_cmd = resolve_allure(allure_cmd)
+            result = subprocess.run([allure_cmd, "generate", os.path.join(staging, "results"), "--clean",
+                                     "-o", os.path.join(staging, "report")], capture_output=True, text=True)
+            print(result.stdout + result.stderr, end="")
+            if result.returncode != 0:
+                print(f"allure generate failed (exit code {result.returncode})")
+                return result.returncode
+            _replace(os.path.join(staging, "report"), report_dir, os.path.join(staging, "old-report"))
+            _replace(os.path.join(staging, "results"), sources, os.path.join(staging, "old-sources"))
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} report of {count} result file(s), {carried} test(s) carried over, "
+              f"generated in {time.perf_counter() - start:.1f}s ({waited:.1f}s waiting for the lock): {report_dir}")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    if open_report:
+        subprocess.Popen([allure_cmd, "open", report_dir], stdin=subprocess.DEVNULL)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rotate Allure results and generate the report off the test run.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="generate the report from a results directory and swap it in")
+    report.add_argument("--results", default=RESULTS_DIR)
+    report.add_argument("--report", default=REPORT_DIR)
+    report.add_argument("--allure", default=ALLURE_CMD, help="Allure command line (default: %(default)s)")
+    report.add_argument("--incremental", action="store_true",
+                        help="keep the previous results of tests missing from --results")
+    report.add_argument("--open", action="store_true", help="open the report when it is ready")
+
+    prune_parser = commands.add_parser("prune", help="delete old rotated result directories")
+    prune_parser.add_argument("--results", default=RESULTS_DIR)
+    prune_parser.add_argument("--keep", type=int, default=KEEP)
+    args = parser.parse_args(argv)
+
+    if args.command == "prune":
+        for path in prune(os.path.abspath(args.results), args.keep):
+            print(f"Deleted {path}")
+        return 0
+    return build_report(os.path.abspath(args.results), os.path.abspath(args.report), args.allure,
+                        incremental=args.incremental, open_report=args.open)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,508 @@
+"""
+Append-only history of latency and benchmark results, keyed by commit, machine and story.
+
+Allure results are pruned after a few sessions, and the latency baseline
+keeps a single reference. This store keeps every run instead. The latency
+plugin appends one run per pytest session. ``load_runner.py --trend-store``
+appends its load tests too.
+
+A run records:
+
+- the commit, its commit time, and whether the tree was dirty;
+- a machine fingerprint: a hash of the environment written to
+  ``environment.properties`` (OS, Python, API base URL) plus CPU model,
+  core count and memory;
+- per story, the robust summary and a quantile-thinned copy of the samples.
+
+The store is a SQLite file with indexed tables. Runs are only ever inserted,
+and a query over thousands of runs reads a few index pages.
+
+    python src/test/python/benchmark_store.py runs --last 20
+    python src/test/python/benchmark_store.py trend                        # every story, sparklines
+    python src/test/python/benchmark_store.py trend --story "Get Book By ID" --html trend.html
+    python src/test/python/benchmark_store.py compare v1.4.0 HEAD          # significance per story
+
+Queries cover this machine unless ``--machine`` names another fingerprint or
+``all``, because latencies from different machines are not comparable.
+"""
+import argparse
+import hashlib
+import html
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from array import array
+from collections import defaultdict, namedtuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from books_client import DEFAULT_BASE_URL
+from latency_stats import TREND_Z, mann_whitney, percentile, robust_summary, trend
+
+
+DEFAULT_STORE = os.environ.get("BOOKS_TREND_STORE",
+                               os.path.join(os.path.dirname(__file__), "benchmark_history.db"))
+SCHEMA_VERSION = 1
+MAX_SAMPLES = 256  # quantiles kept per story and run
+# Runs per commit from which commits are compared on run medians instead of pooled samples.
+# Fewer runs cannot reach SIGNIFICANCE: with 3 against 3 the smallest two-sided p is 0.1.
+MIN_RUNS = 8
+SIGNIFICANCE = 0.01
+SPARKS = "▁▂▃▄▅▆▇█"
+BAR_WIDTH = 40
+SPARK_WIDTH = 48
+EROSION_POINTS = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    recorded REAL NOT NULL,
+    source TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    revision_time REAL,
+    dirty INTEGER NOT NULL,
+    machine TEXT NOT NULL,
+    environment TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    story TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    median REAL NOT NULL,
+    p95 REAL NOT NULL,
+    mad REAL NOT NULL,
+    samples BLOB NOT NULL,
+    PRIMARY KEY (story, run)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_by_machine ON runs (machine, source, revision_time, recorded);
+CREATE INDEX IF NOT EXISTS runs_by_revision ON runs (revision);
+"""
+
+Revision = namedtuple("Revision", ["commit", "time", "dirty"])
+Run = namedtuple("Run", ["id", "recorded", "source", "revision", "revision_time", "dirty", "machine"])
+Point = namedtuple("Point", ["revision", "revision_time", "runs", "median", "p95"])
+
+
+def environment(base_url: str) -> Dict[str, str]:
+    """
+    The test environment, as written to ``environment.properties`` and fingerprinted.
+
+    Args:
+        base_url: Base URL of the API under test
+    """
+    cpu = platform.processor() or platform.machine()
+    memory = ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu = next((line.partition(":")[2].strip() for line in f if line.startswith("model name")), cpu)
+        with open("/proc/meminfo") as f:
+            kib = int(next(line.split()[1] for line in f if line.startswith("MemTotal")))
+            memory = f"{round(kib / 2 ** 20)} GiB"
+    except (OSError, StopIteration, ValueError):
+        pass
+    return {
+        "OS": f"{platform.system()} {platform.release()}",
+        "Python": platform.python_version(),
+        "API_BASE_URL": base_url,
+        "CPU": cpu,
+        "Cores": str(os.cpu_count()),
+        "Memory": memory,
+    }
+
+
+def fingerprint(env: Dict[str, str]) -> str:
+    """
+    Short stable hash of an environment.
+
+    Only the host of the API base URL counts: shards and ``BOOKS_SERVER_PORT=0``
+    sessions run the same server on another port.
+    """
+    key = dict(env)
+    if key.get("API_BASE_URL"):
+        key["API_BASE_URL"] = urlsplit(key["API_BASE_URL"]).hostname or key["API_BASE_URL"]
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _git(*args: str, cwd: Optional[str] = None) -> Optional[str]:
+    try:
+        result = subprocess.run(["git", *args], cwd=cwd or os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def current_revision(cwd: Optional[str] = None) -> Revision:
+    """The checked-out commit (``GITHUB_SHA`` on CI), its commit time, and whether the tree has changes."""
+    commit = os.environ.get("GITHUB_SHA") or _git("rev-parse", "HEAD", cwd=cwd) or "unknown"
+    commit_time = _git("show", "-s", "--format=%ct", commit, cwd=cwd)
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no", cwd=cwd))
+    return Revision(commit, float(commit_time) if commit_time else None, dirty)
+
+
+def thin(values: Iterable[float], limit: int = MAX_SAMPLES) -> List[float]:
+    """At most ``limit`` evenly spaced quantiles of the values, sorted; all of them when fewer."""
+    ordered = sorted(values)
+    if len(ordered) <= limit:
+        return ordered
+    return [percentile(ordered, 100 * i / (limit - 1)) for i in range(limit)]
+
+
+class TrendStore:
+    """
+    The history file.
+
+    Args:
+        path: SQLite file, created on first use
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)  # shards may append at the same time
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{path} has schema version {version}, newer than this tool ({SCHEMA_VERSION})")
+        with self._db:
+            self._db.executescript(SCHEMA)
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self) -> "TrendStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, stories: Dict[str, Sequence[float]], source: str, env: Dict[str, str],
+               revision: Optional[Revision] = None, recorded: Optional[float] = None) -> int:
+        """
+        Record one run.
+
+        Args:
+            stories: Story -> latency samples in seconds
+            source: What produced the run, e.g. "pytest" or "load_runner"
+            env: Environment of the run, see ``environment``; it is fingerprinted
+            revision: Commit of the run (default: the checked-out one)
+            recorded: Epoch seconds of the run (default: now)
+
+        Returns:
+            Id of the new run
+        """
+        revision = revision or current_revision()
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO runs (recorded, source, revision, revision_time, dirty, machine, environment) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (recorded or time.time(), source, revision.commit, revision.time, int(revision.dirty),
+                 fingerprint(env), json.dumps(env, sort_keys=True)))
+            run = cursor.lastrowid
+            rows = []
+            for story, samples in stories.items():
+                if not samples:
+                    continue
+                summary = robust_summary(samples)
+                rows.append((run, story, summary["count"], summary["median"], summary["p95"], summary["mad"],
+                             array("f", thin(samples)).tobytes()))
+            self._db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return run
+
+    def _where(self, machine: Optional[str], source: Optional[str]) -> Tuple[str, list]:
+        clauses, params = [], []
+        if machine:
+            clauses.append("runs.machine = ?")
+            params.append(machine)
+        if source:
+            clauses.append("runs.source = ?")
+            params.append(source)
+        return (" AND ".join(clauses) or "1"), params
+
+    def runs(self, machine: Optional[str] = None, source: Optional[str] = None, last: Optional[int] = None) -> List[Run]:
+        """Runs in recording order, oldest first; ``last`` keeps the most recent ones."""
+        where, params = self._where(machine, source)
+        rows = self._db.execute(
+            f"SELECT id, recorded, source, revision, revision_time, dirty, machine FROM runs WHERE {where} "
+            f"ORDER BY recorded DESC LIMIT ?",
+            params + [last if last else -1]).fetchall()
+        return [Run(*row) for row in reversed(rows)]
+
+    def machines(self) -> List[Tuple[str, int, Dict[str, str]]]:
+        """Fingerprint, run count and environment of every machine."""
+        rows = self._db.execute("SELECT machine, COUNT(*), MAX(environment) FROM runs GROUP BY machine "
+                                "ORDER BY MAX(recorded) DESC")
+        return [(machine, count, json.loads(env)) for machine, count, env in rows]
+
+    def trends(self, stories: Optional[Sequence[str]] = None, machine: Optional[str] = None,
+               source: Optional[str] = None, last: Optional[int] = None) -> Dict[str, List[Point]]:
+        """
+        Latency per commit of every story (or the given ones), oldest first, in one query.
+
+        A commit's point is the median over its runs of their median and p95.
+        ``last`` keeps the most recent commits only.
+        """
+        where, params = self._where(machine, source)
+        if stories is not None:
+            where += f" AND results.story IN ({', '.join('?' * len(stories))})"
+            params += list(stories)
+        rows = self._db.execute(
+            f"SELECT results.story, runs.revision, runs.revision_time, runs.recorded, results.median, results.p95 "
+            f"FROM results JOIN runs ON runs.id = results.run WHERE {where}", params)
+        by_revision = defaultdict(dict)
+        for story, revision, revision_time, recorded, median, p95 in rows:
+            group = by_revision[story].get(revision)
+            if group is None:
+                by_revision[story][revision] = [revision_time, recorded, [median], [p95]]
+            else:
+                group[1] = min(group[1], recorded)
+                group[2].append(median)
+                group[3].append(p95)
+        trends = {}
+        for story, revisions in by_revision.items():
+            points = []
+            for revision, (revision_time, first_recorded, medians, p95s) in revisions.items():
+                if len(medians) > 1:
+                    point = Point(revision, revision_time, len(medians), percentile(sorted(medians), 50),
+                                  percentile(sorted(p95s), 50))
+                else:
+                    point = Point(revision, revision_time, 1, medians[0], p95s[0])
+                # Commit order; runs without a known commit time go by when they were recorded
+                points.append((revision_time if revision_time is not None else first_recorded, first_recorded, point))
+            points.sort(key=lambda item: item[:2])
+            series = [point for _, _, point in points]
+            trends[story] = series[-last:] if last else series
+        return trends
+
+    def resolve(self, revision: str) -> Optional[str]:
+        """The stored commit a prefix, tag or ref names; None when no run has it."""
+        full = _git("rev-parse", "--verify", "--quiet", f"{revision}^{{commit}}") or revision
+        row = self._db.execute("SELECT revision FROM runs WHERE revision = ? OR revision LIKE ? "
+                               "ORDER BY recorded DESC LIMIT 1", (full, revision + "%")).fetchone()
+        return row[0] if row else None
+
+    def results(self, revision: str, machine: Optional[str] = None,
+                source: Optional[str] = None) -> Dict[str, List[Tuple[float, List[float]]]]:
+        """Story -> (run median, run samples) for every run of a commit."""
+        where, params = self._where(machine, source)
+        rows = self._db.execute(
+            f"SELECT results.story, results.median, results.samples FROM results JOIN runs "
+            f"ON runs.id = results.run WHERE runs.revision = ? AND {where}", [revision] + params)
+        stories = defaultdict(list)
+        for story, median, blob in rows:
+            stories[story].append((median, array("f", blob).tolist()))
+        return stories
+
+
+def compare(base: Dict[str, List[Tuple[float, List[float]]]], head: Dict[str, List[Tuple[float, List[float]]]],
+            significance: float = SIGNIFICANCE) -> Dict[str, Dict]:
+    """
+    Compare the runs of two commits, story by story, with a Mann-Whitney U test.
+
+    With at least MIN_RUNS runs on both sides the test is on run medians, which
+    accounts for run-to-run variance. Otherwise it is on the pooled samples.
+
+    Returns:
+        dict keyed by story with ``base`` and ``head`` medians, ``change`` (relative),
+        ``p``, ``basis`` ("runs" or "samples") and ``verdict`` ("slower", "faster" or "same")
+    """
+    comparison = {}
+    for story in sorted(set(base) & set(head)):
+        before, after = base[story], head[story]
+        if len(before) >= MIN_RUNS and len(after) >= MIN_RUNS:
+            first, second, basis = [run[0] for run in before], [run[0] for run in after], "runs"
+        else:
+            first = [value for run in before for value in run[1]]
+            second = [value for run in after for value in run[1]]
+            basis = "samples"
+        base_median = percentile(sorted(value for run in before for value in run[1]), 50)
+        head_median = percentile(sorted(value for run in after for value in run[1]), 50)
+        test = mann_whitney(second, first)
+        verdict = "same"
+        if test["p"] < significance:
+            verdict = "slower" if test["z"] > 0 else "faster"
+        comparison[story] = {
+            "base": base_median, "head": head_median,
+            "change": head_median / base_median - 1 if base_median else math.nan,
+            "p": test["p"], "basis": basis, "runs": (len(before), len(after)), "verdict": verdict,
+        }
+    return comparison
+
+
+def _buckets(values: Sequence[float], count: int) -> List[float]:
+    """Medians of ``count`` consecutive, equally long stretches of the values (all of them when fewer)."""
+    if len(values) <= count:
+        return list(values)
+    return [percentile(sorted(values[len(values) * i // count:len(values) * (i + 1) // count]), 50)
+            for i in range(count)]
+
+
+def erosion(points: Sequence[Point]) -> Dict[str, float]:
+    """
+    Mann-Kendall trend of a story's medians over commits; ``eroding`` when it significantly grows.
+
+    Long histories are tested on the medians of EROSION_POINTS stretches of
+    consecutive commits. That is cheaper, and a slow drift across releases
+    stands out more clearly from commit-to-commit noise. ``slope`` is per commit.
+    """
+    medians = [point.median for point in points]
+    buckets = _buckets(medians, EROSION_POINTS)
+    result = trend(list(range(len(buckets))), buckets)
+    return {"slope": result["slope"] * len(buckets) / len(medians) if medians else 0.0, "z": result["z"],
+            "eroding": result["z"] > TREND_Z}
+
+
+def sparkline(values: Sequence[float]) -> str:
+    values = _buckets(values, SPARK_WIDTH)
+    low, high = min(values), max(values)
+    span = (high - low) or 1.0
+    return "".join(SPARKS[min(len(SPARKS) - 1, int((value - low) / span * len(SPARKS)))] for value in values)
+
+
+def format_trends(trends: Dict[str, List[Point]]) -> str:
+    """One line per story: commits, first and last median, slope per commit and a sparkline."""
+    lines = [f"{'Story':<32}{'Commits':>8}{'first ms':>10}{'last ms':>10}{'ms/commit':>11}{'z':>7}  Trend"]
+    for story, points in sorted(trends.items()):
+        result = erosion(points)
+        lines.append(f"{story[:31]:<32}{len(points):>8}{points[0].median * 1000:>10.2f}"
+                     f"{points[-1].median * 1000:>10.2f}{result['slope'] * 1000:>+11.3f}{result['z']:>7.2f}  "
+                     f"{sparkline([point.median for point in points])}"
+                     + ("  ERODING" if result["eroding"] else ""))
+    return "\n".join(lines)
+
+
+def format_story_trend(story: str, points: Sequence[Point]) -> str:
+    """A story's medians per commit as horizontal bars."""
+    high = max(point.median for point in points) or 1.0
+    lines = [story, f"{'Commit':<10}{'Runs':>5}{'median ms':>11}{'p95 ms':>9}"]
+    for point in points:
+        bar = "█" * max(1, round(point.median / high * BAR_WIDTH))
+        lines.append(f"{point.revision[:9]:<10}{point.runs:>5}{point.median * 1000:>11.2f}{point.p95 * 1000:>9.2f}  {bar}")
+    result = erosion(points)
+    lines.append(f"Mann-Kendall z {result['z']:.2f}, {result['slope'] * 1000:+.3f} ms per commit"
+                 + (" — ERODING" if result["eroding"] else ""))
+    return "\n".join(lines)
+
+
+def format_comparison(comparison: Dict[str, Dict], base: str, head: str) -> str:
+    lines = [f"{'Story':<32}{base[:9]:>10}{head[:9]:>10}{'change':>9}{'p':>9}  {'runs':<7}Verdict"]
+    for story, entry in comparison.items():
+        lines.append(f"{story[:31]:<32}{entry['base'] * 1000:>10.2f}{entry['head'] * 1000:>10.2f}"
+                     f"{entry['change']:>+9.1%}{entry['p']:>9.2g}  {'%d/%d' % entry['runs']:<7}"
+                     f"{entry['verdict'].upper() if entry['verdict'] != 'same' else 'same'}"
+                     + (" (pooled samples)" if entry["basis"] == "samples" else ""))
+    return "\n".join(lines)
+
+
+def render_html(trends: Dict[str, List[Point]], title: str = "Latency trends") -> str:
+    """A self-contained HTML page with one SVG chart (median and p95 per commit) per story."""
+    width, height, pad = 720, 180, 40
+    charts = []
+    for story, points in sorted(trends.items()):
+        high = max(point.p95 for point in points) or 1.0
+        step = (width - 2 * pad) / max(1, len(points) - 1)
+
+        def xy(i: int, value: float) -> str:
+            return f"{pad + i * step:.1f},{height - pad - value / high * (height - 2 * pad):.1f}"
+
+        median = " ".join(xy(i, point.median) for i, point in enumerate(points))
+        p95 = " ".join(xy(i, point.p95) for i, point in enumerate(points))
+        dots = "".join(
+            f'<circle cx="{xy(i, point.median).split(",")[0]}" cy="{xy(i, point.median).split(",")[1]}" r="3">'
+            f"<title>{html.escape(point.revision[:12])}: median {point.median * 1000:.2f} ms, "
+            f"p95 {point.p95 * 1000:.2f} ms, {point.runs} run(s)</title></circle>"
+            for i, point in enumerate(points))
+        result = erosion(points)
+        charts.append(
+            f"<h2>{html.escape(story)}{' — eroding' if result['eroding'] else ''}</h2>"
+            f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            f'<line x1="{pad}" y1="{height - pad}" x2="{width - pad}" y2="{height - pad}" stroke="#999"/>'
+            f'<text x="4" y="{pad}" font-size="11">{high * 1000:.1f} ms</text>'
+            f'<text x="4" y="{height - pad}" font-size="11">0</text>'
+            f'<text x="{pad}" y="{height - 8}" font-size="11">{html.escape(points[0].revision[:9])}</text>'
+            f'<text x="{width - pad}" y="{height - 8}" font-size="11" text-anchor="end">'
+            f"{html.escape(points[-1].revision[:9])}</text>"
+            f'<polyline points="{p95}" fill="none" stroke="#f0a35e" stroke-dasharray="4 3"/>'
+            f'<polyline points="{median}" fill="none" stroke="#3273dc" stroke-width="2"/>'
+            f'<g fill="#3273dc">{dots}</g></svg>'
+            f"<p>median (solid) and p95 (dashed) per commit; Mann-Kendall z {result['z']:.2f}, "
+            f"{result['slope'] * 1000:+.3f} ms per commit</p>")
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+            f"<style>body{{font-family:sans-serif;margin:2em}}h2{{font-size:1.1em}}</style></head>"
+            f"<body><h1>{html.escape(title)}</h1>{''.join(charts)}</body></html>")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the benchmark history: trends, commit comparisons, charts.")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="history file (default: %(default)s)")
+    parser.add_argument("--machine", help="machine fingerprint, or 'all' (default: this machine)")
+    parser.add_argument("--source", default="pytest", help="pytest, load_runner, ... or 'all' (default: pytest)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runs_parser = commands.add_parser("runs", help="list recorded runs and machines")
+    runs_parser.add_argument("--last", type=int, default=20)
+    trend_parser = commands.add_parser("trend", help="latency per commit, with an erosion test")
+    trend_parser.add_argument("--story", action="append", help="story to show (repeatable; default: all)")
+    trend_parser.add_argument("--last", type=int, help="most recent commits only")
+    trend_parser.add_argument("--html", help="also write the charts to this HTML file")
+    trend_parser.add_argument("--json", help="also write the series to this file")
+    compare_parser = commands.add_parser("compare", help="compare two commits story by story")
+    compare_parser.add_argument("base", help="commit, prefix, tag or ref")
+    compare_parser.add_argument("head", help="commit, prefix, tag or ref")
+    compare_parser.add_argument("--significance", type=float, default=SIGNIFICANCE)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.store):
+        parser.error(f"No history at {args.store}")
+    machine = None if args.machine == "all" else args.machine or fingerprint(environment(DEFAULT_BASE_URL))
+    source = None if args.source == "all" else args.source
+
+    with TrendStore(args.store) as store:
+        if args.command == "runs":
+            for fingerprint_, count, env in store.machines():
+                marker = "*" if fingerprint_ == machine else " "
+                print(f"{marker} machine {fingerprint_}: {count} run(s); "
+                      + ", ".join(f"{key}={value}" for key, value in env.items()))
+            for run in store.runs(machine, source, args.last):
+                print(f"  #{run.id:<6}{time.strftime('%Y-%m-%d %H:%M', time.localtime(run.recorded))}  "
+                      f"{run.revision[:12]}{'+' if run.dirty else ' '} {run.source:<12}{run.machine}")
+            return 0
+
+        if args.command == "trend":
+            trends = store.trends(args.story, machine, source, args.last)
+            if not trends:
+                print("No runs match; see the 'runs' command (this machine only unless --machine all)")
+                return 1
+            if len(trends) == 1:
+                print(format_story_trend(*next(iter(trends.items()))))
+            else:
+                print(format_trends(trends))
+            if args.html:
+                with open(args.html, "w", encoding="utf-8") as f:
+                    f.write(render_html(trends))
+            if args.json:
+                with open(args.json, "w") as f:
+                    json.dump({story: [point._asdict() for point in points] for story, points in trends.items()},
+                              f, indent=4)
+            return 0
+
+        base, head = store.resolve(args.base), store.resolve(args.head)
+        for name, revision in ((args.base, base), (args.head, head)):
+            if revision is None:
+                parser.error(f"No recorded run for {name}")
+        comparison = compare(store.results(base, machine, source), store.results(head, machine, source),
+                             args.significance)
+        if not comparison:
+            print("The two commits have no story in common on this machine")
+            return 1
+        print(format_comparison(comparison, base, head))
+        return 1 if any(entry["verdict"] == "slower" for entry in comparison.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
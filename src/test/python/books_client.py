@@ -0,0 +1,294 @@
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+DEFAULT_BASE_URL = os.environ.get("BOOKS_API_BASE_URL", "http://localhost:8080/api/v1")
+DEFAULT_TIMEOUT = 10  # seconds
+DEFAULT_POOL_SIZE = 10
+DEFAULT_ENDPOINT_TIMEOUTS = {"/recommendations": 60}  # OpenAI round trip is slow
+RETRY_STATUSES = (502, 503, 504)
+TIMING_HISTORY = 10_000  # most recent timings kept on the client
+
+RequestTiming = namedtuple(
+    "RequestTiming",
+    ["method", "endpoint", "params", "status", "connect", "ttfb", "total", "reused", "started"],
+)
+
+# Connect durations are written by the connection objects and read back by the
+# client on the same thread, so one slot per thread is enough.
+_connect_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = getattr(_connect_timing, "seconds", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = getattr(_connect_timing, "seconds", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools use connections that report their connect time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class BooksClient:
+    """
+    Reusable HTTP client for the Books API built on one shared connection pool.
+
+    Connections are kept alive between calls, so repeated requests skip the
+    TCP handshake. The pool is thread-safe: every thread gets its own
+    ``requests.Session`` but all sessions mount the same adapter, so tests and
+    load tools running on worker threads share the same sockets.
+
+    Args:
+        base_url: API root, e.g. ``http://localhost:8080/api/v1``
+        pool_size: Maximum number of kept-alive connections per host
+        timeout: Default timeout in seconds for every request
+        endpoint_timeouts: Timeout overrides keyed by endpoint prefix
+        retries: Number of retries on connection errors and 502/503/504 (0 disables)
+        backoff_factor: Backoff between retries, doubled on every attempt
+        keep_alive: Reuse connections between requests
+        trust_env: Look up proxy and netrc settings in the environment on every request;
+            False skips that lookup, about a third of the client's per-request cost
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT, endpoint_timeouts: Optional[Dict[str, float]] = None,
+                 retries: int = 0, backoff_factor: float = 0.3, keep_alive: bool = True, trust_env: bool = True):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.trust_env = trust_env
+        timeouts = DEFAULT_ENDPOINT_TIMEOUTS if endpoint_timeouts is None else endpoint_timeouts
+        # Longest prefix first so "/books/search" wins over "/books"
+        self.endpoint_timeouts = sorted(timeouts.items(), key=lambda item: len(item[0]), reverse=True)
+
+        max_retries = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # method-agnostic: the caller opted in
+            raise_on_status=False,
+        ) if retries else Retry(0, read=False)
+        self._adapter = _TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                          max_retries=max_retries, pool_block=True)
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[RequestTiming], None]] = []
+        self._interceptors: List[Callable[..., Optional[requests.Response]]] = []
+        self._response_hooks: List[Callable[..., None]] = []
+        self.timings = deque(maxlen=TIMING_HISTORY)
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.trust_env = self.trust_env
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            if not self.keep_alive:
+                session.headers["Connection"] = "close"
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def timeout_for(self, endpoint: str) -> float:
+        """Return the timeout configured for an endpoint."""
+        for prefix, timeout in self.endpoint_timeouts:
+            if endpoint.startswith(prefix):
+                return timeout
+        return self.timeout
+
+    def add_listener(self, listener: Callable[[RequestTiming], None]):
+        """Register a callback invoked with the RequestTiming of every request."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[RequestTiming], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def add_interceptor(self, interceptor: Callable[..., Optional[requests.Response]]):
+        """
+        Register a callable consulted before every request.
+
+        It is called as ``interceptor(method, endpoint, params, json_data)`` and
+        returns a Response to answer the request without sending it, or None.
+        """
+        with self._lock:
+            self._interceptors.append(interceptor)
+
+    def remove_interceptor(self, interceptor: Callable[..., Optional[requests.Response]]):
+        with self._lock:
+            if interceptor in self._interceptors:
+                self._interceptors.remove(interceptor)
+
+    def add_response_hook(self, hook: Callable[..., None]):
+        """
+        Register a callable invoked after every request that went over the network.
+
+        It is called as ``hook(method, endpoint, params, json_data, response)``.
+        """
+        with self._lock:
+            self._response_hooks.append(hook)
+
+    def remove_response_hook(self, hook: Callable[..., None]):
+        with self._lock:
+            if hook in self._response_hooks:
+                self._response_hooks.remove(hook)
+
+    def notify(self, timing: RequestTiming):
+        """Pass a timing to every registered listener."""
+        for listener in list(self._listeners):
+            listener(timing)
+
+    def request(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                json_data: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the shared pool and record its timing.
+
+        Args:
+            method: HTTP method (GET, POST, etc.)
+            endpoint: API endpoint (appended to base_url)
+            params: Query parameters as a dict, or None
+            json_data: JSON payload as a dict, or None (not sent for GET/DELETE)
+            kwargs: Extra arguments forwarded to ``requests.Session.request``
+
+        Returns:
+            requests.Response object with a ``timing`` attribute (RequestTiming)
+        """
+        method = method.upper()
+        for interceptor in list(self._interceptors):
+            response = interceptor(method, endpoint, params, json_data)
+            if response is not None:
+                if getattr(response, "timing", None) is not None:
+                    self.notify(response.timing)
+                return response
+
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
+        if method not in ("GET", "DELETE"):
+            kwargs["json"] = json_data or {}
+
+        _connect_timing.seconds = 0.0
+        started = time.time()
+        start = time.perf_counter()
+        response = self._session().request(method, f"{self.base_url}{endpoint}", params=params or {}, **kwargs)
+        total = time.perf_counter() - start
+        connect = _connect_timing.seconds
+
+        timing = RequestTiming(
+            method=method,
+            endpoint=endpoint,
+            params=params or None,
+            status=response.status_code,
+            connect=connect,
+            ttfb=response.elapsed.total_seconds(),
+            total=total,
+            reused=connect == 0.0,
+            started=started,
+        )
+        response.timing = timing
+        self.timings.append(timing)
+        self.notify(timing)
+        for hook in list(self._response_hooks):
+            hook(method, endpoint, params, json_data, response)
+        return response
+
+    def get(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, params=params, **kwargs)
+
+    def post(self, endpoint: str, json_data: Optional[Dict] = None, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, json_data=json_data, **kwargs)
+
+    def put(self, endpoint: str, json_data: Optional[Dict] = None, params: Optional[Dict] = None,
+            **kwargs) -> requests.Response:
+        return self.request("PUT", endpoint, params=params, json_data=json_data, **kwargs)
+
+    def delete(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        return self.request("DELETE", endpoint, params=params, **kwargs)
+
+    def close(self):
+        """Close every session and drop the pooled connections."""
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self._adapter.close()
+        self._local = threading.local()
+
+
+def request_key(method: str, endpoint: str, params: Optional[Dict], json_data: Optional[Dict]) -> str:
+    """Normalized identity of a request, as sent by BooksClient."""
+    method = method.upper()
+    body = None if method in ("GET", "DELETE") else (json_data or {})
+    return json.dumps([method, endpoint, params or {}, body], sort_keys=True, default=str)
+
+
+def is_unread(response: requests.Response) -> bool:
+    """
+    True for a ``stream=True`` response whose body is still on the socket.
+
+    requests keeps this in the private ``_content_consumed``; this is the one place that reads it.
+    """
+    return response.raw is not None and not response._content_consumed
+
+
+_default_client: Optional[BooksClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client(**kwargs) -> BooksClient:
+    """
+    Return the process-wide BooksClient, creating it on first use.
+
+    Tests and load tools call this to share the same connection pool.
+    Keyword arguments are only used when the client is created.
+    """
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = BooksClient(**kwargs)
+        return _default_client
+
+
+def set_client(client: Optional[BooksClient]):
+    """Replace the process-wide client (closing the previous one)."""
+    global _default_client
+    with _default_lock:
+        if _default_client is not None and _default_client is not client:
+            _default_client.close()
+        _default_client = client
@@ -0,0 +1,918 @@
+"""
+In-process Python stand-in for the Books API, so the suite can run without a JVM.
+
+``BooksApi`` serves the ``/api/v1`` contract of ``BookController``,
+``AdminController`` and ``GlobalExceptionHandler``. It starts from the seed
+catalog of ``initBooks`` (seed_catalog.py) and returns the same status codes
+and bodies: the ProblemDetail of the exception handler, the bare ``{"detail"}``
+bodies of the controller, and Spring Boot's default error body for everything
+the handler does not cover (malformed JSON, a non-numeric id, a missing
+``title`` parameter, an unknown path, and the 500 of a null field or a failed
+OpenAI call). ``BookStore`` keeps hash indexes on id and on the case-folded
+title, author and category, where the controller scans its list on every request.
+
+    pytest --books-server=python                    # the whole suite against the stand-in
+    python books_stub.py serve --port 8080          # a standalone stand-in for other tools
+
+Conformance keeps the stand-in from drifting from the real server:
+
+    pytest --books-conformance                      # replay every request of a real-server run
+    python books_stub.py conform --base-url http://localhost:8080/api/v1
+
+With ``--books-conformance`` every response of the real server is compared
+with the stand-in's answer to the same request, and any difference fails the
+session. ``conform`` sends the edge cases the suite does not send: odd ids,
+malformed bodies, coerced JSON types and null fields. Both need a real server
+that starts from the seed catalog. ``conform`` resets it through ``POST
+/api/v1/admin/reset`` when that endpoint is enabled.
+"""
+import argparse
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import urllib.request
+from collections import namedtuple
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+import requests
+
+from books_client import BooksClient, get_client
+from seed_catalog import seed_books
+
+
+DEFAULT_PORT = 8080
+API_PREFIX = "/api/v1"
+ERRORS_TYPE = "http://localhost:8080/api/v1/common-errors"
+FIELDS = ("title", "author", "category")
+# BookRequest: field, @NotEmpty message, @Size bounds and message
+CONSTRAINTS = (
+    ("title", "Title is required", 10, 50, "Title must be between 10 and 50 characters"),
+    ("author", "Author is required", 10, 25, "Author must be between 10 and 25 characters"),
+    ("category", "Category is required", 5, 20, "Category must be between 5 and 20 characters"),
+)
+RATING_MESSAGE = "Invalid rating: Rating must be between 1 and 5"
+INVALID_ID = "Invalid ID: Id must be greater than 0"
+INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+LONG_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+# OpenAIService
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+OPENAI_MODEL = "gpt-4"
+OPENAI_TIMEOUT = 10.0  # OkHttp's default read timeout
+INSTRUCTION = "List the book titles only, one per line, without any numbering or additional text. "
+JAVA_TRIM = "".join(map(chr, range(33)))  # String.trim strips every character up to the space
+
+MAX_REPORTED = 20  # mismatches listed in the terminal summary
+
+Reply = namedtuple("Reply", ["status", "body", "content_type", "headers"], defaults=("application/json", {}))
+ApiRequest = namedtuple("ApiRequest", ["path", "variable", "query", "body", "content_type"])
+Mismatch = namedtuple("Mismatch", ["context", "method", "target", "differences"])
+
+
+class Problem(Exception):
+    """A failure GlobalExceptionHandler turns into a ProblemDetail."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = int(status)
+        self.detail = detail
+
+
+class DefaultError(Exception):
+    """A failure no handler covers: Spring Boot answers with its default error body."""
+
+    def __init__(self, status: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(HTTPStatus(status).phrase)
+        self.status = int(status)
+        self.headers = headers or {}
+
+
+class NullField(DefaultError):
+    """``equalsIgnoreCase`` (or ``Map.of``) called on a null field: a NullPointerException, so a 500."""
+
+    def __init__(self, field: str):
+        super().__init__(HTTPStatus.INTERNAL_SERVER_ERROR)
+        self.field = field
+
+
+@functools.lru_cache(maxsize=None)
+def _fold_char(char: str) -> str:
+    # Java's simple case mappings: a character whose full mapping has several characters maps to itself
+    if char == "\u0130":  # capital I with dot above: simple lowercase "i", full lowercase "i" + combining dot
+        return "i"
+    upper = char.upper()
+    if len(upper) != 1:
+        title = char.title()  # e.g. the Greek letters with iota subscript
+        upper = title if len(title) == 1 else char
+    lower = upper.lower()
+    return lower if len(lower) == 1 else upper
+
+
+@functools.lru_cache(maxsize=65536)
+def fold(value: str) -> str:
+    """
+    Index key under which ``String.equalsIgnoreCase`` considers two strings equal.
+
+    Java compares character by character on ``toLowerCase(toUpperCase(c))``,
+    so unlike ``str.casefold`` "straße" does not match "STRASSE".
+    """
+    return "".join(map(_fold_char, value))
+
+
+def java_length(value: str) -> int:
+    """Length as ``@Size`` counts it: UTF-16 code units, so characters beyond the BMP count twice."""
+    return len(value.encode("utf-16-le")) // 2
+
+
+class BookStore:
+    """
+    The catalog in list order, with hash indexes on id and on the folded title, author and category.
+
+    Every book gets a sequence number that preserves the controller's list
+    order. Each index maps a key to the books that have it, so a lookup is a
+    dict access instead of a scan. Ids are not unique: a new book is
+    numbered ``size + 1``, which repeats an id after a delete. A null field
+    is indexed under None, because the controller fails when its stream
+    reaches such a book, and the stand-in has to fail at the same point.
+    """
+
+    def __init__(self, books: Optional[Iterable[Dict]] = None):
+        self.reset(seed_books() if books is None else books)
+
+    def reset(self, books: Iterable[Dict]):
+        self._books: Dict[int, Dict] = {}
+        self._by_id: Dict[int, Dict[int, Dict]] = {}
+        self._by_field: Dict[str, Dict[Optional[str], Dict[int, Dict]]] = {field: {} for field in FIELDS}
+        self._seq = 0
+        for book in books:
+            self.add(book)
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def book(self, seq: int) -> Dict:
+        return self._books[seq]
+
+    def books(self, seqs: Iterable[int]) -> List[Dict]:
+        """Copies of these books, ready to serialize outside the lock."""
+        return [dict(self._books[seq]) for seq in seqs]
+
+    def _index(self, seq: int, book: Dict):
+        for field in FIELDS:
+            key = None if book[field] is None else fold(book[field])
+            self._by_field[field].setdefault(key, {})[seq] = book
+
+    def _unindex(self, seq: int, book: Dict):
+        for field in FIELDS:
+            key = None if book[field] is None else fold(book[field])
+            bucket = self._by_field[field][key]
+            del bucket[seq]
+            if not bucket:
+                del self._by_field[field][key]
+
+    def add(self, book: Dict) -> Dict:
+        self._seq += 1
+        book = {"id": book["id"], **{field: book[field] for field in FIELDS}, "rating": book["rating"]}
+        self._books[self._seq] = book
+        self._by_id.setdefault(book["id"], {})[self._seq] = book
+        self._index(self._seq, book)
+        return book
+
+    def update(self, seq: int, changes: Dict) -> Dict:
+        book = self._books[seq]
+        self._unindex(seq, book)
+        book.update(changes)
+        self._index(seq, book)
+        return book
+
+    def remove(self, seqs: Iterable[int]):
+        for seq in seqs:
+            book = self._books.pop(seq)
+            bucket = self._by_id[book["id"]]
+            del bucket[seq]
+            if not bucket:
+                del self._by_id[book["id"]]
+            self._unindex(seq, book)
+
+    def with_id(self, book_id: int) -> List[int]:
+        """Sequence numbers of the books with this id, in catalog order (ids never change)."""
+        return list(self._by_id.get(book_id, ()))
+
+    def _nulls(self, field: str) -> Dict[int, Dict]:
+        return self._by_field[field].get(None, {})
+
+    def _matching(self, field: str, value: str) -> Dict[int, Dict]:
+        return self._by_field[field].get(fold(value), {})
+
+    def with_title(self, title: str) -> List[int]:
+        """The books a ``filter(book -> book.getTitle().equalsIgnoreCase(title))`` over every book keeps."""
+        if self._nulls("title"):
+            raise NullField("title")
+        return sorted(self._matching("title", title))
+
+    def select(self, category: Optional[str] = None, title: Optional[str] = None,
+               author: Optional[str] = None) -> List[int]:
+        """
+        The books ``getBooks`` returns for these filters, in catalog order.
+
+        Raises:
+            NullField: where the controller's stream would reach a null field
+        """
+        filters = [(field, value) for field, value in (("category", category), ("title", title), ("author", author))
+                   if value is not None]
+        if not filters:
+            return list(self._books)
+        if any(self._nulls(field) for field, _ in filters):
+            # The filters run in this order: a null field only fails for books that passed the earlier ones
+            passed = None
+            for field, value in filters:
+                nulls = self._nulls(field)
+                if nulls and (passed is None or not passed.isdisjoint(nulls)):
+                    raise NullField(field)
+                matching = self._matching(field, value).keys()
+                passed = set(matching) if passed is None else passed & matching
+        buckets = [self._matching(field, value) for field, value in filters]
+        smallest = min(buckets, key=len)
+        return sorted(seq for seq in smallest if all(seq in bucket for bucket in buckets))
+
+    def exists(self, title: str, author: str, category: str) -> bool:
+        """
+        The ``anyMatch`` of ``createBook``: a book with this title, author and category, ignoring case.
+
+        The stream stops at the first match, so a null field only fails when it comes first.
+        """
+        first_null = min(self._nulls("title"), default=None)
+        author, category = fold(author), fold(category)
+        for seq in sorted(self._matching("title", title)):
+            if first_null is not None and first_null < seq:
+                raise NullField("title")
+            book = self._books[seq]
+            if book["author"] is None:
+                raise NullField("author")
+            if fold(book["author"]) != author:
+                continue
+            if book["category"] is None:
+                raise NullField("category")
+            if fold(book["category"]) == category:
+                return True
+        if first_null is not None:
+            raise NullField("title")
+        return False
+
+
+_OPENER = urllib.request.build_opener(urllib.request.ProxyHandler({}))  # OkHttp ignores proxy variables
+
+
+def openai_recommender(base_url: Optional[str] = None, model: Optional[str] = None,
+                       timeout: float = OPENAI_TIMEOUT) -> Callable[[str], List[str]]:
+    """
+    Ask an OpenAI-compatible API for recommendations the way ``OpenAIService`` does.
+
+    The base URL and model come from OPENAI_BASE_URL and OPENAI_MODEL when the
+    recommender is created (the server reads them at startup), the key from
+    OPENAI_API_KEY on every call. Any failure raises.
+    """
+    base_url = base_url or os.environ.get("OPENAI_BASE_URL", OPENAI_BASE_URL)
+    model = model or os.environ.get("OPENAI_MODEL", OPENAI_MODEL)
+
+    def recommend(prompt: str) -> List[str]:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if api_key is None:
+            raise RuntimeError("API Key not found in environment variables.")
+        body = {"model": model, "messages": [{"role": "user", "content": INSTRUCTION + prompt}],
+                "max_tokens": 1500, "temperature": 0.7}
+        request = urllib.request.Request(f"{base_url}/chat/completions", data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json",
+                                                  "Authorization": f"Bearer {api_key}"}, method="POST")
+        with _OPENER.open(request, timeout=timeout) as response:
+            reply = json.load(response)["choices"][0]["message"]["content"]
+        return [line.strip(JAVA_TRIM) for line in reply.split("\n") if line.strip(JAVA_TRIM)]
+
+    return recommend
+
+
+def check_api_key(prompt: str) -> List[str]:
+    """A recommender that fails like ``OpenAIService`` without a key and otherwise recommends nothing."""
+    if os.environ.get("OPENAI_API_KEY") is None:
+        raise RuntimeError("API Key not found in environment variables.")
+    return []
+
+
+def _java_string(value) -> Optional[str]:
+    """Jackson's String coercion: scalars become their text, arrays and objects are unreadable."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return json.dumps(value)
+    raise DefaultError(HTTPStatus.BAD_REQUEST)
+
+
+def _java_int(value) -> int:
+    """Jackson's ``int`` coercion: null is 0, floats truncate, integer strings parse, the rest is unreadable."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        text = value.strip()
+        if text in ("", "null"):
+            return 0
+        if not re.fullmatch(r"[+-]?[0-9]+", text):
+            raise DefaultError(HTTPStatus.BAD_REQUEST)
+        value = int(text)
+    elif isinstance(value, float):
+        value = int(value)
+    elif isinstance(value, bool) or not isinstance(value, int):
+        raise DefaultError(HTTPStatus.BAD_REQUEST)
+    if not INT_RANGE[0] <= value <= INT_RANGE[1]:
+        raise DefaultError(HTTPStatus.BAD_REQUEST)
+    return value
+
+
+def _java_long(text: str) -> int:
+    """Spring's ``@PathVariable long`` conversion: whitespace removed, decimal or ``0x``/``#`` hex."""
+    text = "".join(char for char in unquote(text) if not char.isspace() or char in "\u00a0\u2007\u202f")
+    hexadecimal = re.fullmatch(r"(-?)(?:0[xX]|#)([0-9a-fA-F]+)", text)
+    if hexadecimal:
+        value = int(hexadecimal.group(1) + hexadecimal.group(2), 16)
+    elif re.fullmatch(r"[+-]?\d+", text):
+        value = int(text)
+    else:
+        raise DefaultError(HTTPStatus.BAD_REQUEST)
+    if not LONG_RANGE[0] <= value <= LONG_RANGE[1]:
+        raise DefaultError(HTTPStatus.BAD_REQUEST)
+    return value
+
+
+def _is_json(content_type: Optional[str]) -> bool:
+    mime = (content_type or "").split(";")[0].strip().lower()
+    return mime == "application/json" or (mime.startswith("application/") and mime.endswith("+json"))
+
+
+class BooksApi:
+    """
+    The ``/api/v1`` contract without HTTP: ``handle`` maps a request to a Reply.
+
+    Args:
+        recommend: Takes the prompt and returns the recommended titles; raising answers 500
+        admin_reset: Serve ``POST /api/v1/admin/reset``, like a server started with
+            ``books.admin.reset-enabled=true``
+        books: Initial catalog instead of the seed books
+    """
+
+    def __init__(self, recommend: Optional[Callable[[str], List[str]]] = None, admin_reset: bool = False,
+                 books: Optional[Iterable[Dict]] = None):
+        self.store = BookStore(books)
+        self.recommend = recommend or openai_recommender()
+        self._lock = threading.Lock()
+        self.routes = [
+            (re.compile(f"{API_PREFIX}/books"), {"GET": self.get_books, "POST": self.create_book,
+                                                 "PUT": self.update_book, "DELETE": self.delete_books}),
+            (re.compile(f"{API_PREFIX}/books/([^/]+)"), {"GET": self.get_book, "PUT": self.update_book_by_id,
+                                                         "DELETE": self.delete_book}),
+            (re.compile(f"{API_PREFIX}/recommendations/([^/]+)"), {"GET": self.get_recommendations}),
+        ]
+        if admin_reset:
+            self.routes.append((re.compile(f"{API_PREFIX}/admin/reset"), {"POST": self.reset}))
+
+    def handle(self, method: str, target: str, body: Optional[bytes] = None,
+               content_type: Optional[str] = None) -> Reply:
+        """
+        Answer one request.
+
+        Args:
+            method: HTTP method
+            target: Path and query string, e.g. ``/api/v1/books?title=Inferno``
+            body: Raw request body, or None
+            content_type: The request's Content-Type header
+
+        Returns:
+            Reply with the status, the JSON body (None for no body), its content type and extra headers
+        """
+        url = urlsplit(target)
+        method = method.upper()
+        try:
+            handlers, variable = self._route(url.path)
+            if method == "OPTIONS":
+                return Reply(HTTPStatus.OK, None, None, {"Allow": ", ".join(self._allowed(handlers))})
+            handler = handlers.get("GET" if method == "HEAD" else method)
+            if handler is None:
+                raise DefaultError(HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": ", ".join(self._allowed(handlers))})
+            query = {name: ",".join(values) for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+            return handler(ApiRequest(url.path, variable, query, body, content_type))
+        except Problem as error:
+            return Reply(error.status, {
+                "type": ERRORS_TYPE, "title": HTTPStatus(error.status).phrase, "status": error.status,
+                "detail": error.detail, "instance": url.path, "timestamp": datetime.now().isoformat(),
+            }, "application/problem+json")
+        except DefaultError as error:
+            return Reply(error.status, {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "status": error.status, "error": HTTPStatus(error.status).phrase, "path": url.path,
+            }, "application/json", error.headers)
+
+    def _route(self, path: str) -> Tuple[Dict[str, Callable], Optional[str]]:
+        decoded = "/".join(unquote(segment) for segment in path.split("/"))
+        for pattern, handlers in self.routes:
+            match = pattern.fullmatch(decoded)
+            if match:
+                return handlers, path.split("/")[-1] if match.groups() else None
+        raise DefaultError(HTTPStatus.NOT_FOUND)
+
+    @staticmethod
+    def _allowed(handlers: Dict[str, Callable]) -> List[str]:
+        return list(handlers) + (["HEAD"] if "GET" in handlers else []) + ["OPTIONS"]
+
+    @staticmethod
+    def _title(request: ApiRequest) -> str:
+        """The required ``title`` parameter (several values are joined with commas, as Spring does)."""
+        if "title" not in request.query:
+            raise DefaultError(HTTPStatus.BAD_REQUEST)
+        return request.query["title"]
+
+    @staticmethod
+    def _book_request(request: ApiRequest) -> Dict:
+        """The ``@RequestBody BookRequest``, converted the way Jackson converts it."""
+        if not _is_json(request.content_type):
+            # Without a Content-Type an empty body is just missing; anything else is not JSON
+            missing = request.content_type is None and not request.body
+            raise DefaultError(HTTPStatus.BAD_REQUEST if missing else HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+        if not request.body:
+            raise DefaultError(HTTPStatus.BAD_REQUEST)
+        try:
+            text = request.body.decode(json.detect_encoding(request.body)).lstrip(" \t\r\n")
+
+            def reject(constant):
+                raise ValueError(f"Non-standard token {constant}")
+
+            # Like Jackson: no NaN or Infinity, and whatever follows the first value is ignored
+            data, _ = json.JSONDecoder(parse_constant=reject).raw_decode(text)
+        except ValueError:
+            raise DefaultError(HTTPStatus.BAD_REQUEST) from None
+        if not isinstance(data, dict):
+            raise DefaultError(HTTPStatus.BAD_REQUEST)
+        return {**{field: _java_string(data.get(field)) for field in FIELDS}, "rating": _java_int(data.get("rating"))}
+
+    @staticmethod
+    def _validate(book: Dict):
+        """``@Valid``: every violated constraint, joined like the exception handler joins them."""
+        messages = []
+        for field, required, low, high, size_message in CONSTRAINTS:
+            value = book[field]
+            if not value:
+                messages.append(required)
+            if value is not None and not low <= java_length(value) <= high:
+                messages.append(size_message)
+        if not 1 <= book["rating"] <= 5:
+            messages.append(RATING_MESSAGE)
+        if messages:
+            raise Problem(HTTPStatus.BAD_REQUEST, "; ".join(messages))
+
+    def get_book(self, request: ApiRequest) -> Reply:
+        book_id = _java_long(request.variable)
+        if book_id < 1:
+            return Reply(HTTPStatus.BAD_REQUEST, {"detail": INVALID_ID})
+        with self._lock:
+            seqs = self.store.with_id(book_id)
+            if not seqs:
+                raise Problem(HTTPStatus.NOT_FOUND, f"Book with id {book_id} not found")
+            book = self.store.books(seqs[:1])[0]
+        return Reply(HTTPStatus.OK, {"book": {field: book[field] for field in (*FIELDS, "rating")}})
+
+    def get_books(self, request: ApiRequest) -> Reply:
+        filters = {name: request.query.get(name) for name in ("category", "title", "author")}
+        with self._lock:
+            books = self.store.books(self.store.select(**filters))
+        if not books:
+            raise Problem(HTTPStatus.NOT_FOUND, "No books found")
+        return Reply(HTTPStatus.OK, {"books": books})
+
+    def create_book(self, request: ApiRequest) -> Reply:
+        book = self._book_request(request)
+        self._validate(book)
+        with self._lock:
+            if self.store.exists(book["title"], book["author"], book["category"]):
+                raise Problem(HTTPStatus.CONFLICT, "Book already exists")
+            created = dict(self.store.add({"id": len(self.store) + 1, **book}))
+        return Reply(HTTPStatus.CREATED, {"message": "Book created successfully", "book": created})
+
+    def update_book(self, request: ApiRequest) -> Reply:
+        title = self._title(request)
+        book = self._book_request(request)
+        self._validate(book)
+        with self._lock:
+            seqs = self.store.with_title(title)
+            if not seqs:
+                return Reply(HTTPStatus.NOT_FOUND, {"detail": f"Book(s) with title '{title}' not found"})
+            if len(seqs) > 1:
+                return Reply(HTTPStatus.CONFLICT, {"detail": "Multiple books found", "books": self.store.books(seqs)})
+            self.store.update(seqs[0], book)
+        return Reply(HTTPStatus.OK, {"message": "Book updated successfully"})
+
+    def update_book_by_id(self, request: ApiRequest) -> Reply:
+        book_id = _java_long(request.variable)
+        book = self._book_request(request)  # no @Valid: nulls and out-of-range ratings are stored
+        if book_id < 1:
+            return Reply(HTTPStatus.BAD_REQUEST, {"detail": INVALID_ID})
+        with self._lock:
+            seqs = self.store.with_id(book_id)
+            if not seqs:
+                raise Problem(HTTPStatus.NOT_FOUND, f"Book with id: '{book_id}' not found")
+            old = dict(self.store.book(seqs[0]))
+            for field in FIELDS:
+                if old[field] is None:  # the OldBook snapshot is a Map.of, which rejects nulls
+                    raise NullField(field)
+            updated = dict(self.store.update(seqs[0], book))
+        return Reply(HTTPStatus.OK, {"message": "Book updated successfully", "OldBook": old, "UpdatedBook": updated})
+
+    def delete_books(self, request: ApiRequest) -> Reply:
+        title = self._title(request)
+        with self._lock:
+            seqs = self.store.with_title(title)
+            self.store.remove(seqs)
+        if not seqs:
+            raise Problem(HTTPStatus.NOT_FOUND, f"Book(s) with title '{title}' not found")
+        message = (f"1 book with title '{title}' deleted successfully" if len(seqs) == 1
+                   else f"{len(seqs)} books with title '{title}' deleted successfully")
+        return Reply(HTTPStatus.OK, {"detail": message})
+
+    def delete_book(self, request: ApiRequest) -> Reply:
+        book_id = _java_long(request.variable)
+        if book_id < 1:
+            return Reply(HTTPStatus.BAD_REQUEST, {"detail": INVALID_ID})
+        with self._lock:
+            seqs = self.store.with_id(book_id)
+            self.store.remove(seqs)
+        if not seqs:
+            raise Problem(HTTPStatus.NOT_FOUND, f"Book with id: '{book_id}' not found")
+        return Reply(HTTPStatus.OK, {"message": f"Book with id: '{book_id}' deleted successfully"})
+
+    def get_recommendations(self, request: ApiRequest) -> Reply:
+        book_id = _java_long(request.variable)
+        with self._lock:
+            seqs = self.store.with_id(book_id)
+            book = self.store.books(seqs[:1])[0] if seqs else None
+        if book is None:
+            raise Problem(HTTPStatus.NOT_FOUND, f"No book with id: '{book_id}' found")
+        title, category = ("null" if book[field] is None else book[field] for field in ("title", "category"))
+        prompt = f"Suggest 5 books similar to '{title}' in the '{category}' category"
+        try:  # outside the lock: the model may take seconds
+            recommendations = self.recommend(prompt)
+        except Exception:
+            raise DefaultError(HTTPStatus.INTERNAL_SERVER_ERROR) from None
+        return Reply(HTTPStatus.OK, {"prompt": prompt, "recommendations": recommendations})
+
+    def reset(self, request: ApiRequest) -> Reply:
+        with self._lock:
+            self.store.reset(seed_books())
+        return Reply(HTTPStatus.OK, {"message": "Books reset successfully"})
+
+
+class BooksStub:
+    """
+    In-process HTTP server for BooksApi.
+
+    Args:
+        port: Port to listen on (0 picks a free one)
+        api: The contract to serve; a fresh seeded BooksApi by default
+        admin_reset: Serve ``POST /api/v1/admin/reset`` (ignored when ``api`` is given)
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, api: Optional[BooksApi] = None, admin_reset: bool = False,
+                 host: str = "localhost"):
+        self.api = api or BooksApi(admin_reset=admin_reset)
+        self._thread: Optional[threading.Thread] = None
+
+        books_api = self.api
+
+        class Handler(_Handler):
+            api = books_api
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "BooksStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="books-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes: don't wait for the delayed ACK
+    api: BooksApi = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _serve(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        reply = self.api.handle(self.command, self.path, body, self.headers.get("Content-Type"))
+        data = b"" if reply.body is None else json.dumps(reply.body, ensure_ascii=False).encode()
+        self.send_response(reply.status)
+        if reply.body is not None:
+            self.send_header("Content-Type", reply.content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in reply.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_HEAD = do_OPTIONS = _serve
+
+
+# --- Conformance ---
+
+
+def comparable(status: int, body, content_type: Optional[str], path: str) -> Dict:
+    """
+    A response with what legitimately differs between two servers taken out.
+
+    Timestamps are dropped, validation messages are sorted (Hibernate
+    Validator reports violations in no fixed order) and recommended titles
+    are reduced to their type, since a model answers differently every time.
+    """
+    if isinstance(body, dict):
+        body = {key: value for key, value in body.items() if key != "timestamp"}
+        if body.get("type") == ERRORS_TYPE and body.get("status") == HTTPStatus.BAD_REQUEST \
+                and isinstance(body.get("detail"), str):
+            body["detail"] = sorted(body["detail"].split("; "))
+        if "/recommendations/" in path and status == HTTPStatus.OK and isinstance(body.get("recommendations"), list):
+            body["recommendations"] = "list" if all(isinstance(title, str)
+                                                    for title in body["recommendations"]) else body["recommendations"]
+    mime = (content_type or "").split(";")[0].strip().lower() or None
+    return {"status": int(status), "content_type": mime if body is not None else None, "body": body}
+
+
+def differences(real, stand_in, path: str = "") -> List[str]:
+    """Where two JSON values differ, one line per difference (dict key order is ignored)."""
+    if isinstance(real, dict) and isinstance(stand_in, dict):
+        found = []
+        for key in sorted(set(real) | set(stand_in), key=str):
+            if key not in stand_in:
+                found.append(f"{path}.{key}: missing from the stand-in")
+            elif key not in real:
+                found.append(f"{path}.{key}: only in the stand-in")
+            else:
+                found.extend(differences(real[key], stand_in[key], f"{path}.{key}"))
+        return found
+    if isinstance(real, list) and isinstance(stand_in, list) and len(real) == len(stand_in):
+        return [line for index, (a, b) in enumerate(zip(real, stand_in))
+                for line in differences(a, b, f"{path}[{index}]")]
+    if type(real) is not type(stand_in) or real != stand_in:
+        return [f"{path or 'response'}: real {real!r}, stand-in {stand_in!r}"]
+    return []
+
+
+class ConformanceMirror:
+    """
+    Replays requests answered by a real server against a BooksApi and records where the answers differ.
+
+    The mirror's catalog follows the real one only if both start from the
+    seed books and see the same writes in the same order. It never calls
+    the model: the recommendations are only checked to be a list of titles.
+
+    Args:
+        api: The stand-in to compare with; a fresh seeded BooksApi by default
+    """
+
+    def __init__(self, api: Optional[BooksApi] = None):
+        self.api = api or BooksApi(recommend=check_api_key)
+        self.context: Optional[str] = None  # e.g. the running test's node id
+        self.compared = 0
+        self.mismatches: List[Mismatch] = []
+        self._lock = threading.Lock()
+        self._client: Optional[BooksClient] = None
+
+    def attach(self, client: BooksClient) -> "ConformanceMirror":
+        """Check every response this client receives (detaching from any previous client)."""
+        if client is self._client:
+            return self
+        self.detach()
+        client.add_response_hook(self._observe)
+        self._client = client
+        return self
+
+    def detach(self):
+        if self._client is not None:
+            self._client.remove_response_hook(self._observe)
+            self._client = None
+
+    def _observe(self, method, endpoint, params, json_data, response):
+        self.check(response)
+
+    def check(self, response: requests.Response) -> List[str]:
+        """
+        Send the request behind a real response to the stand-in and compare the two answers.
+
+        The real body is read in full, so a ``stream=True`` response is no longer streamed.
+
+        Returns:
+            The differences, empty when the stand-in agrees
+        """
+        sent = response.request
+        body = sent.body.encode() if isinstance(sent.body, str) else sent.body
+        try:
+            real_body = response.json() if response.content else None
+        except ValueError:
+            real_body = response.text
+        with self._lock:
+            reply = self.api.handle(sent.method, sent.path_url, body, sent.headers.get("Content-Type"))
+            path = urlsplit(sent.path_url).path
+            found = differences(comparable(response.status_code, real_body, response.headers.get("Content-Type"), path),
+                                comparable(reply.status, reply.body, reply.content_type, path))
+            self.compared += 1
+            if found:
+                self.mismatches.append(Mismatch(self.context, sent.method, sent.path_url, found))
+        return found
+
+    def format_stats(self) -> str:
+        return f"{self.compared} responses compared with the stand-in, {len(self.mismatches)} differed"
+
+    def report_lines(self, limit: int = MAX_REPORTED) -> List[str]:
+        lines = []
+        for mismatch in self.mismatches[:limit]:
+            lines.append(f"{mismatch.context or '-'}: {mismatch.method} {mismatch.target}")
+            lines.extend(f"    {line}" for line in mismatch.differences)
+        if len(self.mismatches) > limit:
+            lines.append(f"... and {len(self.mismatches) - limit} more")
+        return lines
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("books_stub", "in-process Python stand-in of the Books API")
+    group.addoption("--books-conformance", action="store_true",
+                    help="replay every request against the stand-in (books_stub.py) and fail on any difference "
+                         "from the real server's response")
+
+
+def pytest_configure(config):
+    if not config.getoption("books_conformance"):
+        return
+    if config.getoption("books_server", None) == "python":
+        raise pytest.UsageError("--books-conformance compares the stand-in with a real server: "
+                                "it cannot run with --books-server=python")
+    config.pluginmanager.register(ConformancePlugin(), "books_conformance")
+
+
+class ConformancePlugin:
+    """Attaches a ConformanceMirror to the shared BooksClient and fails the session on any difference."""
+
+    def __init__(self):
+        self.mirror = ConformanceMirror()
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_setup(self, item):
+        self.mirror.context = item.nodeid
+        # After the fixtures: the server fixture installs the session's shared client
+        try:
+            return (yield)
+        finally:
+            self.mirror.attach(get_client())
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.mirror.detach()
+        if self.mirror.mismatches and session.exitstatus == pytest.ExitCode.OK:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_line(f"conformance: {self.mirror.format_stats()}")
+        for line in self.mirror.report_lines():
+            terminalreporter.write_line(f"  {line}")
+
+
+VALID = {"title": "Conformance Check", "author": "Stand-in Author", "category": "Testing", "rating": 4}
+
+# Requests the endpoint suite does not send, in order: later ones depend on the writes of earlier ones.
+# A body is sent as-is when it is a string and as JSON otherwise.
+EDGE_CASES: List[Tuple[str, str, object]] = [
+    ("GET", "/books/0", None),
+    ("GET", "/books/abc", None),
+    ("GET", "/books/0x1A", None),
+    ("GET", "/books/%2B7", None),
+    ("GET", "/books/99999999999999999999", None),
+    ("GET", "/books/", None),
+    ("GET", "/books?title=THE%20DA%20VINCI%20CODE", None),
+    ("GET", "/books?category=thriller&author=dan+brown", None),
+    ("GET", "/books?title=", None),
+    ("GET", "/books?title=Inferno&title=Gone+Girl", None),
+    ("GET", "/recommendations/999", None),
+    ("GET", "/unknown", None),
+    ("PATCH", "/books/1", {}),
+    ("POST", "/books/1", {}),
+    ("POST", "/books", "not json"),
+    ("POST", "/books", "[]"),
+    ("POST", "/books", "{}"),
+    ("POST", "/books", {"title": "", "author": "Short", "category": "abc", "rating": 9}),
+    ("POST", "/books", {**VALID, "title": ["Conformance Check"]}),
+    ("POST", "/books", {**VALID, "rating": True}),
+    ("POST", "/books", {**VALID, "rating": 2 ** 31}),
+    ("POST", "/books", {**VALID, "title": "\U0001F4DA" * 5}),
+    ("POST", "/books", {"title": "The Da Vinci Code", "author": "dan brown", "category": "THRILLER", "rating": 4}),
+    ("POST", "/books", {**VALID, "rating": "4"}),
+    ("POST", "/books", {**VALID, "author": 12345678901, "rating": 4.9}),
+    ("PUT", "/books", VALID),
+    ("PUT", "/books?title=the+da+vinci+code", VALID),
+    ("PUT", "/books?title=No+Such+Book", VALID),
+    ("PUT", "/books?title=Gone+Girl", {**VALID, "rating": 0}),
+    ("PUT", "/books?title=Gone+Girl", {**VALID, "title": "Gone Girl, Revised"}),
+    ("PUT", "/books/0", {}),
+    ("PUT", "/books/999", {}),
+    ("PUT", "/books/2", {"rating": 7}),
+    ("GET", "/books/2", None),
+    ("PUT", "/books/2", {}),
+    ("GET", "/books?category=fiction", None),
+    ("GET", "/books?author=Dan+Brown", None),
+    ("POST", "/books", {**VALID, "title": "Another Conformance Check"}),
+    ("DELETE", "/books?title=Inferno", None),
+    ("DELETE", "/books/2", None),
+    ("DELETE", "/books/2", None),
+    ("DELETE", "/books", None),
+    ("DELETE", "/books?title=the+da+vinci+code", None),
+    ("POST", "/books", {**VALID, "title": "Yet Another Conformance Check"}),
+    ("GET", "/books/25", None),
+    ("DELETE", "/books/25", None),
+]
+
+
+def run_edge_cases(base_url: str, mirror: ConformanceMirror) -> int:
+    """Send EDGE_CASES to the real server, checking every response with the mirror; return the request count."""
+    session = requests.Session()
+    session.trust_env = False
+    for number, (method, path, body) in enumerate(EDGE_CASES, 1):
+        mirror.context = f"edge case {number}"
+        data = body if isinstance(body, str) or body is None else json.dumps(body)
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        mirror.check(session.request(method, f"{base_url}{path}", data=data, headers=headers, timeout=30))
+    return len(EDGE_CASES)
+
+
+def reset_server(base_url: str) -> bool:
+    """Restore the real server's seed catalog; False when the admin endpoint is disabled."""
+    try:
+        return requests.post(f"{base_url}/admin/reset", timeout=30).status_code == HTTPStatus.OK
+    except requests.RequestException:
+        return False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="In-process Python stand-in of the Books API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="serve the stand-in over HTTP")
+    serve.add_argument("--host", default="localhost")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--admin-reset", action="store_true", help="enable POST /api/v1/admin/reset")
+
+    conform = commands.add_parser("conform", help="send edge cases to a real server and diff with the stand-in")
+    conform.add_argument("--base-url", default=f"http://localhost:{DEFAULT_PORT}{API_PREFIX}")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        stub = BooksStub(args.port, admin_reset=args.admin_reset, host=args.host)
+        print(f"Books API stand-in listening on {stub.base_url}")
+        try:
+            stub.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.server.server_close()
+        return 0
+
+    base_url = args.base_url.rstrip("/")
+    resettable = reset_server(base_url)
+    if not resettable:
+        print("POST /admin/reset is disabled: the server must have been started just now, from the seed catalog")
+    mirror = ConformanceMirror()
+    try:
+        run_edge_cases(base_url, mirror)
+    finally:
+        if resettable:
+            reset_server(base_url)
+    print(mirror.format_stats())
+    for line in mirror.report_lines(limit=len(mirror.mismatches)):
+        print(f"  {line}")
+    return 1 if mirror.mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Capacity planning over the OpenAIModel catalog.
+
+For a workload (requests per second, average prompt and completion tokens,
+daily volume) every model's sustained capacity follows from its limits: at most
+``rpm / 60`` requests and ``tpm / 60 / tokens-per-request`` requests a second,
+and ``tpd / tokens-per-request`` requests a day. The planner ranks the models
+that can carry the workload alone and, when none can, splits it across models.
+
+    python capacity_planner.py --rps 2 --prompt-tokens 60 --completion-tokens 1500
+    python capacity_planner.py --scenarios sweep.csv --json plans.json   # thousands of what-if rows
+
+Scenario CSV columns: ``rps,prompt_tokens,completion_tokens[,daily_requests][,model_type]``.
+"""
+import argparse
+import csv
+import json
+import math
+import sys
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from openai_model import MODELS_BY_TYPE, OpenAIModel
+from rate_limits import DAY, MINUTE
+
+
+Workload = namedtuple("Workload", ["rps", "prompt_tokens", "completion_tokens", "daily_requests", "model_type"],
+                      defaults=[None, "chat"])
+ModelCapacity = namedtuple("ModelCapacity", ["model", "max_rps", "max_daily", "utilization", "limiting"])
+Allocation = namedtuple("Allocation", ["model", "rps", "share"])
+Plan = namedtuple("Plan", ["workload", "ranked", "split", "shortfall"])
+EPSILON = 1e-9  # shares are floats: treat a remainder this small as covered
+
+
+class CapacityPlanner:
+    """
+    Precomputes per-second and per-day limits of the catalog, grouped by model type.
+
+    Args:
+        models: Models to plan over (default: the whole OpenAIModel catalog)
+    """
+
+    def __init__(self, models: Optional[Iterable[OpenAIModel]] = None):
+        by_type = MODELS_BY_TYPE if models is None else {}
+        if models is not None:
+            for model in models:
+                by_type.setdefault(model.model_type, []).append(model)
+        # model type -> [(model, requests/s, tokens/s, tokens/day or inf)]
+        self._limits = {
+            task_type: [(m, m.rpm / MINUTE, m.tpm / MINUTE, m.tpd if m.tpd else math.inf) for m in type_models]
+            for task_type, type_models in by_type.items()
+        }
+
+    def capacities(self, workload: Workload) -> List[ModelCapacity]:
+        """Sustained capacity of every model of the workload's type, in catalog order."""
+        tokens = workload.prompt_tokens + workload.completion_tokens
+        if tokens <= 0 or workload.rps <= 0:
+            raise ValueError("A workload needs a positive rate and token count")
+        rps = workload.rps
+        daily = workload.daily_requests if workload.daily_requests is not None else rps * DAY
+        result = []
+        for model, requests_per_second, tokens_per_second, tokens_per_day in self._limits.get(workload.model_type, ()):
+            by_tokens = tokens_per_second / tokens
+            max_daily = tokens_per_day / tokens
+            load_rpm, load_tpm, load_tpd = rps / requests_per_second, rps / by_tokens, daily / max_daily
+            if load_rpm >= load_tpm and load_rpm >= load_tpd:
+                utilization, limiting = load_rpm, "rpm"
+            elif load_tpm >= load_tpd:
+                utilization, limiting = load_tpm, "tpm"
+            else:
+                utilization, limiting = load_tpd, "tpd"
+            result.append(ModelCapacity(model, min(requests_per_second, by_tokens), max_daily, utilization, limiting))
+        return result
+
+    def plan(self, workload: Workload) -> Plan:
+        """
+        Rank the models that can carry the workload alone and split it when none can.
+
+        Args:
+            workload: Rate, token sizes, optional daily volume (defaults to ``rps`` all day) and model type
+
+        Returns:
+            Plan with ``ranked`` (models able to carry it alone, most headroom first), ``split``
+            (allocations over several models, or None when one model suffices or the catalog
+            cannot carry it) and ``shortfall`` (fraction of the workload left unserved, 0 when covered)
+        """
+        capacities = self.capacities(workload)
+        capacities.sort(key=_utilization)  # stable: ties keep catalog order
+        ranked = [c for c in capacities if c.utilization <= 1]
+        if ranked:
+            return Plan(workload, ranked, None, 0.0)
+
+        # Fill the models with the largest share of the workload first
+        remaining, split = 1.0, []
+        for capacity in capacities:
+            if remaining <= EPSILON:
+                break
+            share = min(remaining, 1 / capacity.utilization)
+            split.append(Allocation(capacity.model, workload.rps * share, share))
+            remaining -= share
+        shortfall = remaining if remaining > EPSILON else 0.0
+        return Plan(workload, [], split if shortfall == 0 else None, shortfall)
+
+    def plan_many(self, workloads: Sequence[Workload]) -> List[Plan]:
+        """Plan a batch of workloads (what-if sweeps); limits are computed once for the whole batch."""
+        return [self.plan(workload) for workload in workloads]
+
+
+def _utilization(capacity: ModelCapacity) -> float:
+    return capacity.utilization
+
+
+def read_scenarios(path: str) -> List[Workload]:
+    """
+    Read workloads from a CSV file with a header row (see the module docstring).
+
+    Raises:
+        ValueError: a row names a model type the catalog does not have
+    """
+    workloads = []
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), 2):
+            model_type = row.get("model_type") or "chat"
+            if model_type not in MODELS_BY_TYPE:
+                raise ValueError(f"{path}:{line}: unknown model type '{model_type}', "
+                                 f"expected one of: {', '.join(sorted(MODELS_BY_TYPE))}")
+            workloads.append(Workload(
+                rps=float(row["rps"]),
+                prompt_tokens=int(row["prompt_tokens"]),
+                completion_tokens=int(row["completion_tokens"]),
+                daily_requests=float(row["daily_requests"]) if row.get("daily_requests") else None,
+                model_type=model_type,
+            ))
+    return workloads
+
+
+def plan_to_dict(plan: Plan, top: int = 5) -> Dict:
+    return {
+        "workload": plan.workload._asdict(),
+        "ranked": [{"model": c.model.model_name, "max_rps": c.max_rps, "utilization": c.utilization,
+                    "limiting": c.limiting} for c in plan.ranked[:top]],
+        "split": [{"model": a.model.model_name, "rps": a.rps, "share": a.share} for a in plan.split or []],
+        "shortfall": plan.shortfall,
+    }
+
+
+def format_plan(plan: Plan, top: int = 5) -> str:
+    w = plan.workload
+    lines = [f"{w.rps:g} req/s x ({w.prompt_tokens} + {w.completion_tokens}) tokens, type {w.model_type}"]
+    if plan.ranked:
+        lines.append(f"  {'Model':<28}{'max req/s':>10}{'util':>8}  limit")
+        for c in plan.ranked[:top]:
+            lines.append(f"  {c.model.model_name:<28}{c.max_rps:>10.2f}{c.utilization:>8.1%}  {c.limiting}")
+    elif plan.split:
+        lines.append("  No single model is enough, split:")
+        for a in plan.split:
+            lines.append(f"  {a.model.model_name:<28}{a.rps:>10.2f} req/s ({a.share:.1%})")
+    else:
+        lines.append(f"  The catalog cannot carry this workload: {plan.shortfall:.1%} left unserved")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Size a recommendation workload against the OpenAIModel limits.")
+    parser.add_argument("--rps", type=float, help="requests per second")
+    parser.add_argument("--prompt-tokens", type=int, default=60)
+    parser.add_argument("--completion-tokens", type=int, default=1500)
+    parser.add_argument("--daily-requests", type=float, help="requests per day (default: rps all day)")
+    parser.add_argument("--type", default="chat", choices=sorted(MODELS_BY_TYPE), help="model type (default: chat)")
+    parser.add_argument("--scenarios", help="CSV of workloads to plan in one batch")
+    parser.add_argument("--top", type=int, default=5, help="ranked models to show per workload")
+    parser.add_argument("--json", help="write the plans to this file")
+    args = parser.parse_args(argv)
+
+    if args.scenarios:
+        try:
+            workloads = read_scenarios(args.scenarios)
+        except ValueError as error:
+            parser.error(str(error))
+    elif args.rps:
+        workloads = [Workload(args.rps, args.prompt_tokens, args.completion_tokens, args.daily_requests, args.type)]
+    else:
+        parser.error("either --rps or --scenarios is required")
+
+    plans = CapacityPlanner().plan_many(workloads)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([plan_to_dict(plan, args.top) for plan in plans], f, indent=4)
+    if len(plans) == 1:
+        print(format_plan(plans[0], args.top))
+    else:
+        covered = sum(1 for plan in plans if plan.ranked)
+        split = sum(1 for plan in plans if plan.split)
+        print(f"{len(plans)} scenarios: {covered} fit one model, {split} need a split, "
+              f"{len(plans) - covered - split} exceed the catalog")
+    return 0 if all(plan.ranked or plan.split for plan in plans) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
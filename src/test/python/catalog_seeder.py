@@ -0,0 +1,347 @@
+"""
+Bulk seeding of the Books API with a synthetic, deterministic catalog.
+
+The generator yields an endless stream of books for a seed. The first N books
+are the same whatever N is, so a 10k catalog is a prefix of the 1M one. Titles
+come from a few phrase patterns and series. Authors are drawn with a heavy tail:
+most books go to a small set of prolific authors, as in real catalogs.
+Categories follow a Zipf-like distribution. Every record passes ``BookRequest``
+validation: title 10–50, author 10–25 and category 5–20 characters, rating 1–5.
+No two books share the (title, author, category) triple that ``POST /books``
+rejects as a duplicate. The generator never emits a seed-catalog title, nor a
+category the suite expects to be empty.
+
+Books are sent through ``POST /books`` by a pool of workers on kept-alive
+connections, with a bounded window of requests in flight. Transient failures are
+retried. The number of books done is checkpointed, so an interrupted run resumes
+where it stopped. A 409 counts as already seeded, which makes a resumed run
+idempotent.
+
+    python catalog_seeder.py --count 100000 --workers 32
+    python catalog_seeder.py --count 1000000 --checkpoint seed.json   # rerun the same command to resume
+    python catalog_seeder.py --count 10000 --out corpus.jsonl --dry-run
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from books_client import DEFAULT_BASE_URL, BooksClient
+from latency_stats import summarize
+from seed_catalog import SEED_BOOKS
+
+
+TITLE_LENGTH, AUTHOR_LENGTH, CATEGORY_LENGTH = (10, 50), (10, 25), (5, 20)  # BookRequest constraints
+RATING_WEIGHTS = tuple(itertools.accumulate((3, 7, 20, 38, 32)))  # ratings 1..5, skewed positive like reviews
+NEW_AUTHOR_RATE = 0.4  # share of books written by an author not seen before
+SERIES_RATE = 0.08  # share of titles that are a numbered volume of a series
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 0.2  # seconds, doubled on every attempt
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines
+CHECKPOINT_INTERVAL = 5.0  # seconds between checkpoint writes
+
+# Zipf-like popularity: earlier categories are more common. "History" is left out,
+# test_cases expects GET /books?category=History to find nothing.
+CATEGORIES = ("Fiction", "Fantasy", "Thriller", "Mystery", "Romance", "Science Fiction", "Young Adult",
+              "Biography", "Horror", "Dystopian", "Adventure", "Classics", "Self-Help", "Memoir", "Crime",
+              "Philosophy", "Poetry", "Travel", "Graphic Novels", "Cookbooks")
+CATEGORY_WEIGHTS = tuple(itertools.accumulate(1 / rank ** 1.1 for rank in range(1, len(CATEGORIES) + 1)))
+RATINGS = (1, 2, 3, 4, 5)
+RESERVED_TITLES = frozenset(book["title"].lower() for book in SEED_BOOKS)
+
+FIRST_NAMES = ("Amara", "Benedict", "Chiamaka", "Dmitri", "Eleanor", "Farida", "Gabriel", "Harriet", "Ikechukwu",
+               "Josephine", "Kenji", "Lucinda", "Mateo", "Nadia", "Oluwaseun", "Penelope", "Quentin", "Rosalind",
+               "Sebastian", "Theodora", "Ulrich", "Valentina", "Wilhelmina", "Xavier", "Yevgenia", "Zachary",
+               "Adaeze", "Bartholomew", "Cordelia", "Desmond", "Esperanza", "Fitzgerald", "Genevieve", "Horatio",
+               "Isadora", "Jasper", "Katarina", "Leopold", "Marguerite", "Nikolai", "Ophelia", "Percival")
+LAST_NAMES = ("Abernathy", "Blackwood", "Castellanos", "Delacroix", "Eze", "Fairweather", "Grimaldi", "Hawthorne",
+              "Ivanova", "Johansson", "Kowalski", "Lindqvist", "Montgomery", "Nakamura", "Okonkwo", "Pemberton",
+              "Quartermaine", "Ravensworth", "Sutherland", "Thornbury", "Underwood", "Vasquez", "Whitlock",
+              "Yamamoto", "Zielinski", "Adeyemi", "Beaumont", "Carmichael", "Dunmore", "Ellsworth", "Fontaine",
+              "Greenhalgh", "Holloway", "Iwu", "Kingsley", "Lockhart", "Marlowe", "Northcott", "Osei", "Prescott")
+ADJECTIVES = ("Silent", "Hidden", "Broken", "Golden", "Forgotten", "Burning", "Crimson", "Endless", "Hollow",
+              "Midnight", "Scarlet", "Shattered", "Wandering", "Distant", "Quiet", "Restless", "Secret", "Wild",
+              "Frozen", "Ancient", "Bitter", "Crooked", "Drowned", "Fading", "Gilded", "Haunted", "Iron",
+              "Last", "Lonely", "Northern", "Pale", "Sleeping", "Stolen", "Twelfth", "Velvet", "Winter")
+NOUNS = ("Garden", "Kingdom", "River", "Empire", "Lighthouse", "Orchard", "Archive", "Harbor", "Cathedral",
+         "Compass", "Labyrinth", "Meridian", "Orchestra", "Prophecy", "Reckoning", "Sanctuary", "Tapestry",
+         "Wilderness", "Covenant", "Daughter", "Emissary", "Frontier", "Gambit", "Heiress", "Inheritance",
+         "Journey", "Keeper", "Legacy", "Mirror", "Nightingale", "Oracle", "Pilgrim", "Silence", "Tide", "Voyage")
+PLACES = ("Avalon", "Marrakesh", "Lagos", "Kyoto", "Venice", "the North", "the Valley", "Ashford", "Carthage",
+          "the Moors", "Samarkand", "the Delta", "Prague", "Timbuktu", "the Coast", "Zanzibar")
+TITLE_PATTERNS = (
+    "The {adj} {noun}",
+    "The {noun} of {place}",
+    "{adj} {noun}s",
+    "A {noun} in {place}",
+    "The {noun}'s {noun2}",
+    "{noun} and {noun2}",
+    "The {adj} {noun} of {place}",
+    "When the {noun} Was {adj}",
+)
+
+UploadReport = namedtuple("UploadReport", ["created", "existing", "failed", "next_index", "elapsed", "latency"])
+
+
+def _title(rng: random.Random) -> str:
+    while True:
+        title = rng.choice(TITLE_PATTERNS).format(adj=rng.choice(ADJECTIVES), noun=rng.choice(NOUNS),
+                                                   noun2=rng.choice(NOUNS), place=rng.choice(PLACES))
+        if rng.random() < SERIES_RATE:
+            title = f"{title}: Book {rng.randint(2, 12)}"
+        if TITLE_LENGTH[0] <= len(title) <= TITLE_LENGTH[1] and title.lower() not in RESERVED_TITLES:
+            return title
+
+
+def _author(rng: random.Random) -> str:
+    while True:
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        author = f"{first} {chr(rng.randint(65, 90))}. {last}" if rng.random() < 0.3 else f"{first} {last}"
+        if AUTHOR_LENGTH[0] <= len(author) <= AUTHOR_LENGTH[1]:
+            return author
+
+
+def generate_books(seed: int = 0) -> Iterator[Dict]:
+    """
+    Endless, deterministic stream of valid, mutually distinct books.
+
+    Args:
+        seed: Corpus seed; the same seed always yields the same sequence
+
+    Returns:
+        Iterator of ``{"title", "author", "category", "rating"}`` dicts
+    """
+    rng = random.Random(seed)
+    book_authors: List[str] = []
+    seen = set()
+    while True:
+        if not book_authors or rng.random() < NEW_AUTHOR_RATE:
+            author = _author(rng)
+        else:
+            # Preferential attachment: the author of a random earlier book, so prolific authors
+            # keep writing and the number of books per author follows a power law
+            author = book_authors[int(rng.random() * len(book_authors))]
+        category = rng.choices(CATEGORIES, cum_weights=CATEGORY_WEIGHTS)[0]
+        title = _title(rng)
+        key = hash((title.lower(), author.lower(), category.lower()))
+        if key in seen:
+            continue
+        seen.add(key)
+        book_authors.append(author)
+        yield {"title": title, "author": author, "category": category,
+               "rating": rng.choices(RATINGS, cum_weights=RATING_WEIGHTS)[0]}
+
+
+def read_checkpoint(path: Optional[str]) -> Dict:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_checkpoint(path: str, state: Dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+class BulkUploader:
+    """
+    Sends books through ``POST /books`` concurrently with a bounded window in flight.
+
+    Args:
+        client: BooksClient whose pool should be at least ``workers`` connections
+        workers: Concurrent requests
+        window: Books handed to the workers ahead of completion (default: 4 x workers)
+        progress: Print a progress line to stderr every second
+    """
+
+    def __init__(self, client: BooksClient, workers: int = 16, window: Optional[int] = None, progress: bool = True):
+        self.client = client
+        self.workers = workers
+        self.window = window or 4 * workers
+        self.progress = progress
+        self.statuses: Counter = Counter()
+        self._latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def _post(self, book: Dict) -> Tuple[str, Optional[float]]:
+        """Send one book with retries; return its outcome ("created", "existing" or "failed") and latency."""
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                start = time.perf_counter()
+                response = self.client.post("/books", json_data=book)
+                latency = time.perf_counter() - start
+            except requests.RequestException:
+                response, latency = None, None
+            status = getattr(response, "status_code", None)
+            if status is not None:
+                with self._lock:
+                    self.statuses[status] += 1
+            if status == 201:
+                return "created", latency
+            if status == 409:
+                return "existing", latency
+            if status is not None and status < 500:
+                return "failed", latency  # rejected as invalid: retrying will not help
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        return "failed", None
+
+    def upload(self, books: Iterable[Dict], total: Optional[int] = None, start: int = 0,
+               checkpoint: Optional[str] = None, checkpoint_state: Optional[Dict] = None) -> UploadReport:
+        """
+        Upload ``books`` in order of submission and stop at the first book that keeps failing.
+
+        Args:
+            books: Books to send; the first one is book number ``start`` of the corpus
+            total: Number of books, for progress and ETA only
+            start: Corpus index of the first book (when resuming)
+            checkpoint: File updated with ``{"next_index": ...}`` as books complete
+            checkpoint_state: Extra keys stored in the checkpoint (seed, target count)
+
+        Returns:
+            UploadReport; ``next_index`` is the first corpus index not known to be on the
+            server, where a resumed run has to start
+        """
+        outcomes: Counter = Counter()
+        done = set()
+        next_index = start
+        stop = threading.Event()
+        slots = threading.BoundedSemaphore(self.window)
+        began = last_progress = last_checkpoint = time.perf_counter()
+
+        def finished(index: int, future):
+            nonlocal next_index
+            outcome, latency = future.result()
+            with self._lock:
+                outcomes[outcome] += 1
+                if latency is not None:
+                    self._latencies.append(latency)
+                if outcome == "failed":
+                    stop.set()
+                else:
+                    done.add(index)
+                    while next_index in done:
+                        done.discard(next_index)
+                        next_index += 1
+            slots.release()
+
+        def report_progress(final: bool = False):
+            elapsed = time.perf_counter() - began
+            completed = outcomes["created"] + outcomes["existing"]
+            rate = completed / elapsed if elapsed else 0.0
+            line = f"\r  {completed:>10,} books  {rate:>9,.0f} books/s"
+            if total:
+                eta = (total - completed) / rate if rate else float("inf")
+                line += f"  {completed / total:6.1%}  eta {eta:,.0f}s"
+            sys.stderr.write(line + ("\n" if final else ""))
+            sys.stderr.flush()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="seeder") as pool:
+            for index, book in enumerate(books, start):
+                while not slots.acquire(timeout=PROGRESS_INTERVAL):
+                    if stop.is_set():
+                        break
+                    if self.progress:
+                        report_progress()
+                if stop.is_set():
+                    break
+                pool.submit(self._post, book).add_done_callback(lambda f, i=index: finished(i, f))
+
+                now = time.perf_counter()
+                if self.progress and now - last_progress >= PROGRESS_INTERVAL:
+                    report_progress()
+                    last_progress = now
+                if checkpoint and now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                    with self._lock:
+                        write_checkpoint(checkpoint, {**(checkpoint_state or {}), "next_index": next_index})
+                    last_checkpoint = now
+
+        if self.progress:
+            report_progress(final=True)
+        if checkpoint:
+            write_checkpoint(checkpoint, {**(checkpoint_state or {}), "next_index": next_index})
+        return UploadReport(outcomes["created"], outcomes["existing"], outcomes["failed"], next_index,
+                            time.perf_counter() - began, summarize(self._latencies))
+
+
+def seed_server(client: BooksClient, count: int, seed: int = 0, start: int = 0, workers: int = 16,
+                progress: bool = False) -> UploadReport:
+    """Upload books ``start`` to ``count`` of the corpus for ``seed`` (e.g. to grow a catalog in steps)."""
+    books = itertools.islice(generate_books(seed), start, count)
+    return BulkUploader(client, workers=workers, progress=progress).upload(books, total=count - start, start=start)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Seed the Books API with a synthetic, deterministic catalog.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--count", type=int, default=10_000, help="books in the corpus (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed (default: 0)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--window", type=int, help="books in flight (default: 4 x workers)")
+    parser.add_argument("--checkpoint", help="resume file; rerun with the same arguments to continue")
+    parser.add_argument("--out", help="also write the corpus as JSON lines to this file")
+    parser.add_argument("--dry-run", action="store_true", help="generate (and --out) without uploading")
+    parser.add_argument("--json", help="write the upload report to this file")
+    args = parser.parse_args(argv)
+
+    state = read_checkpoint(args.checkpoint)
+    if state and (state.get("seed"), state.get("count")) != (args.seed, args.count):
+        parser.error(f"{args.checkpoint} belongs to --seed {state.get('seed')} --count {state.get('count')}")
+    start = state.get("next_index", 0)
+
+    if args.out or args.dry_run:
+        generated = time.perf_counter()
+        books = itertools.islice(generate_books(args.seed), args.count)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.writelines(json.dumps(book) + "\n" for book in books)
+        else:
+            for _ in books:
+                pass
+        print(f"Generated {args.count:,} books in {time.perf_counter() - generated:.2f}s")
+        if args.dry_run:
+            return 0
+
+    if start >= args.count:
+        print(f"{args.checkpoint}: all {args.count:,} books already seeded")
+        return 0
+    if start:
+        print(f"Resuming at book {start:,} of {args.count:,}")
+
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers)
+    uploader = BulkUploader(client, workers=args.workers, window=args.window)
+    try:
+        report = uploader.upload(itertools.islice(generate_books(args.seed), start, args.count),
+                                 total=args.count - start, start=start, checkpoint=args.checkpoint,
+                                 checkpoint_state={"seed": args.seed, "count": args.count})
+    finally:
+        client.close()
+
+    latency = report.latency
+    print(f"{report.created:,} created, {report.existing:,} already present, {report.failed:,} failed "
+          f"in {report.elapsed:.2f}s ({(report.created + report.existing) / report.elapsed:,.0f} books/s)")
+    print(f"POST /books latency: p50 {latency['p50'] * 1000:.1f} ms, p99 {latency['p99'] * 1000:.1f} ms, "
+          f"max {latency['max'] * 1000:.1f} ms; statuses {dict(uploader.statuses)}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report._asdict(), f, indent=4)
+    if report.failed:
+        resume = f"; rerun to resume at book {report.next_index:,}" if args.checkpoint else ""
+        print(f"Stopped after a book kept failing{resume}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
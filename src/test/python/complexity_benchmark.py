@@ -0,0 +1,295 @@
+"""
+Complexity-scaling benchmark: how each endpoint's latency grows with the catalog.
+
+The catalog is grown in geometric steps with ``catalog_seeder`` (e.g. 100, 1k,
+10k, 100k, 1M books). At every size, each probe is timed repeatedly. Lookups ask
+for values that are absent or sit at the end of the list, so they cost a full
+search and return the same small body at any size. ``t(n) = a + b·f(n)`` is then
+fitted to the medians for ``f`` in 1, log n, n and n², each median weighted by
+its uncertainty: the spread (MAD) of its repeats. The simplest class whose fit
+is not significantly worse than the best one is reported, so growth within the
+measured noise counts as O(1), and growth beyond it does not.
+
+The run fails when a probe's class is worse than its declared target. The targets
+below describe the controller as it is: every lookup is a ``books.stream()`` scan.
+Tighten a target once an index is in place, and the benchmark guards it from then on.
+
+    python complexity_benchmark.py                                  # 100 -> 100k books
+    python complexity_benchmark.py --max-size 1000000 --repeat 50
+    python complexity_benchmark.py --target get_by_id=O(1) --json complexity.json
+
+Needs a server whose catalog only grows during the run, e.g. a freshly started one.
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Sequence
+
+from books_client import DEFAULT_BASE_URL, BooksClient
+from catalog_seeder import seed_server
+
+
+CLASSES = ("O(1)", "O(log n)", "O(n)", "O(n^2)")
+GROWTH = {
+    "O(1)": lambda n: 0.0,
+    "O(log n)": math.log,
+    "O(n)": float,
+    "O(n^2)": lambda n: float(n) ** 2,
+}
+SIGNIFICANT_CHI2 = 9.0  # a simpler class loses when its chi-square exceeds the best fit's by this (about 3 sigma)
+MAD_TO_SIGMA = 1.4826  # standard deviation of a normal sample per unit of median absolute deviation
+MEDIAN_ERROR = 1.2533  # standard error of a median per sigma / sqrt(n)
+TIMER_RESOLUTION = 1e-6  # seconds; the uncertainty of a median cannot be smaller
+DRIFT = 0.01  # relative drift between sizes, measured minutes apart, that the repeats at one size cannot show
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000)
+PROBE_BOOK = {"author": "Benchmark Author", "category": "Benchmarks", "rating": 3}
+
+Probe = namedtuple("Probe", ["name", "description", "target"])
+Fit = namedtuple("Fit", ["complexity", "intercept", "slope", "exponent", "chi2"])
+
+# Declared targets: what each endpoint may cost at most as the catalog grows
+PROBES = (
+    Probe("get_by_id", "GET /books/{id} of the newest book", "O(n)"),
+    Probe("filter_title", "GET /books?title= with no match", "O(n)"),
+    Probe("filter_author", "GET /books?author= with no match", "O(n)"),
+    Probe("filter_category", "GET /books?category= with no match", "O(n)"),
+    Probe("create", "POST /books (duplicate check)", "O(n)"),
+    Probe("delete_by_id", "DELETE /books/{id} of the newest book", "O(n)"),
+)
+
+
+def median_error(samples: Sequence[float]) -> float:
+    """
+    Uncertainty in seconds of the median of these repeats.
+
+    It is estimated from their median absolute deviation, which a few slow
+    outliers do not inflate. It never drops below the timer resolution, nor
+    below DRIFT of the median.
+    """
+    median = statistics.median(samples)
+    mad = statistics.median(abs(value - median) for value in samples)
+    error = MEDIAN_ERROR * MAD_TO_SIGMA * mad / math.sqrt(len(samples))
+    return math.sqrt(error ** 2 + TIMER_RESOLUTION ** 2 + (DRIFT * median) ** 2)
+
+
+def fit_complexity(sizes: Sequence[int], samples: Sequence[Sequence[float]]) -> Fit:
+    """
+    Fit ``t(n) = a + b·f(n)`` (``b >= 0``) for every class and pick the simplest one the data cannot reject.
+
+    Every median is weighted by ``1 / median_error²``. A class is rejected when its
+    chi-square exceeds the best class's by more than SIGNIFICANT_CHI2. When even
+    the best fit scatters more than the errors allow (chi-square per degree of
+    freedom above 1), the errors were underestimated, and the threshold grows
+    in proportion.
+
+    Args:
+        sizes: Catalog sizes
+        samples: Latencies in seconds of the repeats at each size
+
+    Returns:
+        Fit with the chosen class, its intercept and slope, the log-log exponent between
+        the smallest and largest size, and the chi-square of every class
+    """
+    times = [statistics.median(values) for values in samples]
+    weights = [1 / median_error(values) ** 2 for values in samples]
+    total = sum(weights)
+    chi2, params = {}, {}
+    for name in CLASSES:
+        xs = [GROWTH[name](n) for n in sizes]
+        mean_x = sum(w * x for w, x in zip(weights, xs)) / total
+        mean_t = sum(w * t for w, t in zip(weights, times)) / total
+        var_x = sum(w * (x - mean_x) ** 2 for w, x in zip(weights, xs))
+        covariance = sum(w * (x - mean_x) * (t - mean_t) for w, x, t in zip(weights, xs, times))
+        slope = max(0.0, covariance / var_x) if var_x else 0.0
+        intercept = mean_t - slope * mean_x
+        chi2[name] = sum(w * (t - intercept - slope * x) ** 2 for w, x, t in zip(weights, xs, times))
+        params[name] = (intercept, slope)
+
+    best = min(chi2.values())
+    scatter = max(1.0, best / (len(sizes) - 2)) if len(sizes) > 2 else 1.0
+    chosen = next(name for name in CLASSES if chi2[name] - best <= SIGNIFICANT_CHI2 * scatter)
+    intercept, slope = params[chosen]
+
+    exponent = math.nan
+    if min(times) > 0 and max(sizes) > min(sizes):
+        small, large = sizes.index(min(sizes)), sizes.index(max(sizes))
+        exponent = math.log(times[large] / times[small]) / math.log(sizes[large] / sizes[small])
+    return Fit(chosen, intercept, slope, exponent, chi2)
+
+
+def geometric_sizes(start: int, stop: int, factor: float) -> List[int]:
+    sizes, size = [], float(start)
+    while size <= stop * (1 + 1e-9):
+        sizes.append(int(round(size)))
+        size *= factor
+    return sizes
+
+
+class ComplexityBenchmark:
+    """
+    Grows the catalog step by step and times every probe at every size.
+
+    Args:
+        client: BooksClient pointed at the server under test
+        repeat: Timed repetitions per probe and size (the median is kept)
+        warmup: Untimed repetitions before timing (JIT, caches)
+        workers: Concurrent uploads while growing the catalog
+        seed: Corpus seed for the grown books
+    """
+
+    def __init__(self, client: BooksClient, repeat: int = 30, warmup: int = 5, workers: int = 16, seed: int = 0):
+        self.client = client
+        self.repeat = repeat
+        self.warmup = warmup
+        self.workers = workers
+        self.seed = seed
+        self._probe_count = 0
+
+    def catalog_size(self) -> int:
+        return len(self.client.get("/books").json().get("books", []))
+
+    def _timed(self, send: Callable[[], object]) -> float:
+        response = send()
+        return response.timing.total
+
+    def _create_probe(self):
+        self._probe_count += 1
+        book = {**PROBE_BOOK, "title": f"Benchmark Probe {self._probe_count:07d}"}
+        return self.client.post("/books", json_data=book)
+
+    def _measure_size(self) -> Dict[str, List[float]]:
+        """Latencies in seconds of every probe's timed repeats at the current catalog size."""
+        samples: Dict[str, List[float]] = {probe.name: [] for probe in PROBES}
+        for iteration in range(self.warmup + self.repeat):
+            timed = iteration >= self.warmup
+            created = self._create_probe()
+            newest = created.json()["book"]["id"]
+            timings = {
+                "create": created.timing.total,
+                "get_by_id": self._timed(lambda: self.client.get(f"/books/{newest}")),
+                "filter_title": self._timed(lambda: self.client.get("/books", params={"title": "Benchmark Absent"})),
+                "filter_author": self._timed(lambda: self.client.get("/books", params={"author": "Nobody Inparticular"})),
+                "filter_category": self._timed(lambda: self.client.get("/books", params={"category": "Nonexistent"})),
+                # Deleting the probe keeps the catalog at the step's size
+                "delete_by_id": self._timed(lambda: self.client.delete(f"/books/{newest}")),
+            }
+            if timed:
+                for name, seconds in timings.items():
+                    samples[name].append(seconds)
+        return samples
+
+    def run(self, sizes: Sequence[int], progress: bool = True) -> Dict[int, Dict[str, List[float]]]:
+        """
+        Grow the catalog to every size in turn and measure.
+
+        Returns:
+            size -> probe name -> latencies in seconds of the timed repeats
+        """
+        base = self.catalog_size()
+        seeded = 0
+        results = {}
+        for size in sorted(sizes):
+            target = max(0, size - base)
+            if target > seeded:
+                start = time.perf_counter()
+                report = seed_server(self.client, target, seed=self.seed, start=seeded, workers=self.workers)
+                if report.failed:
+                    raise RuntimeError(f"Seeding to {size} books failed at corpus index {report.next_index}")
+                seeded = target
+                if progress:
+                    print(f"  grew the catalog to {base + seeded:,} books in {time.perf_counter() - start:.1f}s")
+            results[base + seeded] = self._measure_size()
+            if progress:
+                print(f"  measured {base + seeded:,} books: " + ", ".join(
+                    f"{name} {statistics.median(values) * 1000:.2f} ms"
+                    for name, values in results[base + seeded].items()))
+        return results
+
+
+def evaluate(results: Dict[int, Dict[str, List[float]]], targets: Dict[str, str]) -> List[Dict]:
+    """Fit every probe and compare it with its target; one dict per probe."""
+    sizes = sorted(results)
+    verdicts = []
+    for probe in PROBES:
+        samples = [results[size][probe.name] for size in sizes]
+        fit = fit_complexity(sizes, samples)
+        target = targets.get(probe.name, probe.target)
+        verdicts.append({
+            "probe": probe.name,
+            "description": probe.description,
+            "medians_ms": {str(size): statistics.median(values) * 1000 for size, values in zip(sizes, samples)},
+            "complexity": fit.complexity,
+            "exponent": fit.exponent,
+            "target": target,
+            "ok": CLASSES.index(fit.complexity) <= CLASSES.index(target),
+        })
+    return verdicts
+
+
+def format_verdicts(verdicts: List[Dict]) -> str:
+    sizes = list(verdicts[0]["medians_ms"]) if verdicts else []
+    header = f"{'Probe':<18}" + "".join(f"{int(size):>11,}" for size in sizes) + f"{'fit':>12}{'n^k':>7}{'target':>12}"
+    lines = [header + "  (median ms per catalog size)"]
+    for v in verdicts:
+        mark = "" if v["ok"] else "  <-- worse than target"
+        lines.append(f"{v['probe']:<18}" + "".join(f"{ms:>11.2f}" for ms in v["medians_ms"].values())
+                     + f"{v['complexity']:>12}{v['exponent']:>7.2f}{v['target']:>12}{mark}")
+    return "\n".join(lines)
+
+
+def _parse_targets(text: str) -> Dict[str, str]:
+    names = {probe.name for probe in PROBES}
+    targets = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, complexity = item.partition("=")
+        if name not in names or complexity not in CLASSES:
+            raise argparse.ArgumentTypeError(
+                f"Invalid target '{item}': probes are {sorted(names)}, classes are {list(CLASSES)}")
+        targets[name] = complexity
+    return targets
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure how endpoint latency grows with the catalog size.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--min-size", type=int, default=DEFAULT_SIZES[0])
+    parser.add_argument("--max-size", type=int, default=DEFAULT_SIZES[-1])
+    parser.add_argument("--factor", type=float, default=10.0, help="growth factor between steps (default: 10)")
+    parser.add_argument("--repeat", type=int, default=30, help="timed repetitions per probe and size")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=16, help="concurrent uploads while growing the catalog")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed of the grown books")
+    parser.add_argument("--target", type=_parse_targets, action="append", default=[],
+                        help="override declared targets, e.g. get_by_id=O(1),filter_title=O(log n)")
+    parser.add_argument("--json", help="also write the verdicts to this file")
+    args = parser.parse_args(argv)
+
+    sizes = geometric_sizes(args.min_size, args.max_size, args.factor)
+    if len(sizes) < 3:
+        parser.error("at least three sizes are needed to fit a growth curve")
+    targets = {name: complexity for overrides in args.target for name, complexity in overrides.items()}
+
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers, timeout=120)
+    try:
+        results = ComplexityBenchmark(client, args.repeat, args.warmup, args.workers, args.seed).run(sizes)
+    finally:
+        client.close()
+
+    verdicts = evaluate(results, targets)
+    print(format_verdicts(verdicts))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(verdicts, f, indent=4)
+    failed = [v["probe"] for v in verdicts if not v["ok"]]
+    if failed:
+        print(f"Worse than the declared complexity: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,21 @@
+import fnmatch
 import subprocess
 import time
 import pytest
-import os, shutil, sys
+import os
 import socket
 import platform
 
+import allure_pipeline
+from benchmark_store import environment
+from books_client import BooksClient, get_client, set_client
+import server_daemon
+from openai_stub import OpenAIStub
+from server_resources import find_server_pid
+from server_readiness import format_report, wait_until_ready
+
+pytest_plugins = ["latency_plugin", "parallel_scheduler", "response_cassette", "response_logging", "json_stream", "resource_monitor", "response_cache", "books_stub"]
+
 # --- Configuration ---
 
 
@@ -13,76 +24,133 @@ MVN_EXEC = "mvn.cmd" if platform.system() == "Windows" else "mvn"
 
 MAVEN_HOME = os.environ.get("MVN_HOME", r"C:\apache-maven-3.9.5")  # default if not set
 MAVEN_CMD = os.path.join(MAVEN_HOME, "bin", MVN_EXEC)
-SPRING_BOOT_CMD = [MAVEN_CMD, "spring-boot:run"]
-SERVER_PORT = 8080
-BASE_URL = f"http://localhost:{SERVER_PORT}/api/v1/"
+DEFAULT_SERVER_PORT = 8080
 STARTUP_WAIT = 120  # seconds
 POLL_INTERVAL = 1  # seconds
-LOG_FILE = "springboot.log"
 PROJECT_PATH = os.getcwd()
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
 RESULTS_DIR = os.path.join(PROJECT_ROOT, "allure-results")
 PATH_PROJECT=r"C:\Users\okeyb\Documents\Java\books"
+if not os.path.isdir(PATH_PROJECT):
+    PATH_PROJECT = PROJECT_ROOT
+# Set by shard_runner.py: every shard runs its own server on a free port
+SHARD = os.environ.get("BOOKS_SHARD")
 
-def is_port_open(port, host="localhost"):
-    """Check if a TCP port is open on a host."""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.settimeout(0.5)  # quick timeout to avoid blocking
-        try:
-            sock.connect((host, port))
-            return True
-        except (ConnectionRefusedError, socket.timeout):
-            return False
-
-def wait_for_port(port, host="localhost", timeout=60, interval=0.5):
-    """
-    Wait until a TCP port is open or until timeout.
 
-    Args:
-        port (int): Port number to check.
-        host (str): Hostname or IP.
-        timeout (float): Maximum seconds to wait.
-        interval (float): Seconds to wait between checks.
+def find_free_port(host="localhost") -> int:
+    """Ask the OS for a free ephemeral TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
 
-    Returns:
-        True if port opens within timeout.
 
-    Raises:
-        TimeoutError: If port is not open within timeout.
-    """
-    start = time.time()
-    while True:
-        if is_port_open(port, host):
-            return True
-        elapsed = time.time() - start
-        if elapsed >= timeout:
-            raise TimeoutError(f"Server not available on {host}:{port} after {timeout}s")
-        time.sleep(min(interval, timeout - elapsed))
+# BOOKS_SERVER_PORT=0 picks a free ephemeral port, so several sessions can run side by side
+REQUESTED_PORT = os.environ.get("BOOKS_SERVER_PORT")
+SERVER_PORT = int(REQUESTED_PORT or DEFAULT_SERVER_PORT) or find_free_port()
+BASE_URL = f"http://localhost:{SERVER_PORT}/api/v1/"
+SPRING_BOOT_CMD = [MAVEN_CMD, "spring-boot:run", f"-Dspring-boot.run.arguments=--server.port={SERVER_PORT}"]
+LOG_FILE = "springboot.log" if SERVER_PORT == DEFAULT_SERVER_PORT else f"springboot-{SERVER_PORT}.log"
+SERVER_MODES = ("spawn", "daemon", "python")
+REPORT_MODES = ("background", "inline", "off")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--books-server", choices=SERVER_MODES, default=os.environ.get("BOOKS_SERVER_MODE", "spawn"),
+                     help="spawn: start and stop a server for this session (default); "
+                          "daemon: attach to a warm reusable server, starting it only when needed; "
+                          "python: serve the API from the in-process stand-in in books_stub.py, no JVM")
+    parser.addoption("--openai-stub", metavar="LATENCY", default=None,
+                     help="point the spawned server (or the Python stand-in) at a local OpenAI stand-in with this latency, "
+                          "e.g. fixed:0.05")
+    parser.addoption("--allure-report-mode", choices=REPORT_MODES,
+                     default=os.environ.get("BOOKS_REPORT_MODE", "background"),
+                     help="background: generate and open the Allure report in a detached worker (default); "
+                          "inline: wait for it before exiting; off: no report")
+    parser.addoption("--allure-keep-results", type=int, default=allure_pipeline.KEEP,
+                     help="rotated allure-results directories to keep (default: %(default)s)")
+
+@pytest.fixture(scope="session")
+def openai_stub(request):
+    """Local OpenAI stand-in (openai_stub.py) for the spawned server, or None without --openai-stub."""
+    latency = request.config.getoption("openai_stub")
+    if latency is None:
+        yield None
+        return
+    stub = OpenAIStub(port=0, latency=latency).start()
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    print(f"\nOpenAI stand-in listening on {stub.base_url}")
+    yield stub
+    stub.stop()
 
 
 @pytest.fixture(scope="session", autouse=True)
-def spring_boot_server():
+def spring_boot_server(request):
 
     """
     Start Spring Boot only if running locally.
-    On CI (GitHub Actions), the server is started by the workflow.
+    On CI (GitHub Actions), the server is started by the workflow unless a
+    port was requested explicitly (BOOKS_SERVER_PORT), e.g. by shard_runner.py.
+    With --books-server=daemon the warm server from server_daemon.py is reused
+    (its catalog reset to the seed books) and left running after the session.
+    With --books-server=python the in-process stand-in (books_stub.py) answers
+    instead, on a free port unless BOOKS_SERVER_PORT is set, even on CI.
+    A pure --cassette=replay run answers every request from the cassette and
+    starts no server, as does a session whose tests are all marked ``offline``.
+    The shared BooksClient is pointed at the server's base URL.
     """
-    if os.getenv("CI", "false").lower() == "true":
-        print("CI environment detected — assuming Spring Boot is already running.")
+    from books_stub import BooksStub  # plugin modules: imported late so pytest can rewrite their asserts
+    from resource_monitor import monitor_server
+    set_client(BooksClient(base_url=BASE_URL))
+    if all(item.get_closest_marker("offline") for item in request.session.items):
+        yield
+        return
+    if request.config.getoption("cassette") == "replay" and not request.config.getoption("cassette_rule"):
+        print("\nReplaying responses from the cassette — no Spring Boot server needed.")
+        yield
+        return
+
+    if request.config.getoption("books_server") == "python":
+        request.getfixturevalue("openai_stub")  # the stand-in reads OPENAI_BASE_URL when it is created
+        start = time.perf_counter()
+        stub = BooksStub(port=SERVER_PORT if REQUESTED_PORT is not None else 0).start()
+        set_client(BooksClient(base_url=stub.base_url))
+        print(f"\nStarted the in-process Books API stand-in on {stub.base_url} in {time.perf_counter() - start:.3f}s")
         yield
+        stub.stop()
+        return
+
+    if os.getenv("CI", "false").lower() == "true" and REQUESTED_PORT is None:
+        print("CI environment detected — assuming Spring Boot is already running.")
+        with monitor_server(find_server_pid(SERVER_PORT)):
+            yield
         return
 
-    # Start Spring Boot
+    if request.config.getoption("books_server") == "daemon":
+        start = time.perf_counter()
+        state = server_daemon.ensure_server(SERVER_PORT, maven_cmd=MAVEN_CMD, timeout=STARTUP_WAIT)
+        action = "Attached to warm" if state["warm"] else "Started"
+        print(f"\n{action} Spring Boot daemon (pid {state['pid']}) on port {SERVER_PORT} "
+              f"in {time.perf_counter() - start:.3f}s")
+        with monitor_server(state["pid"]):
+            yield
+        return
+
+    # Start Spring Boot (the stand-in has to be up first: the server reads OPENAI_BASE_URL at startup)
+    request.getfixturevalue("openai_stub")
     print("\nStarting Spring Boot server...")
+    launched = time.perf_counter()
     with open(LOG_FILE, "w") as log:
         process = subprocess.Popen(SPRING_BOOT_CMD, cwd=PATH_PROJECT, stdout=log, stderr=log)
 
-    # Wait until server is up
+    # Follow the log until Spring Boot reports it started, then confirm with a real request
     print(f"Waiting for Spring Boot to start on port {SERVER_PORT}...")
-    wait_for_port(SERVER_PORT, timeout=STARTUP_WAIT)
+    report = wait_until_ready(process, LOG_FILE, f"{BASE_URL}books", timeout=STARTUP_WAIT, started=launched)
+    print(f"Spring Boot {format_report(report)}")
 
-    # Run tests
-    yield
+    # Run tests (mvn spring-boot:run forks the JVM: monitor the process that owns the port)
+    with monitor_server(find_server_pid(SERVER_PORT) or process.pid):
+        yield
 
     # Teardown: stop Spring Boot
     print("\nStopping Spring Boot server...")
@@ -93,51 +161,77 @@ def spring_boot_server():
     process.wait()
 
 
-def run_command(cmd, description: str):
-    """Run a subprocess command and print stdout/stderr."""
-    print(description)
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.stdout:
-        print("STDOUT:\n", result.stdout)
-    if result.stderr:
-        print("STDERR:\n", result.stderr)
-    return result.returncode
+@pytest.fixture(scope="session")
+def books_client():
+    """Shared, kept-alive BooksClient used by make_request and any load tooling."""
+    client = get_client()
+    yield client
+    set_client(None)
+
 
 def pytest_sessionstart(session):
-    """Clean allure-results and create environment.properties before tests start."""
+    """Rotate the previous allure-results away and create environment.properties before tests start."""
+    global RESULTS_DIR
+    RESULTS_DIR = os.path.abspath(session.config.getoption("allure_report_dir") or RESULTS_DIR)
 
-    # Clean previous results
-    if os.path.exists(RESULTS_DIR):
-        print("Cleaning old Allure results...")
-        shutil.rmtree(RESULTS_DIR)
-    os.makedirs(RESULTS_DIR, exist_ok=True)
+    # A rename: the old results are deleted in the background once they fall out of the kept ones
+    rotated = allure_pipeline.rotate_results(RESULTS_DIR, keep=session.config.getoption("allure_keep_results"))
+    if rotated:
+        print(f"Previous Allure results moved to {rotated}")
 
     # Create environment.properties
     env_file = os.path.join(RESULTS_DIR, "environment.properties")
-    os_name = f"{platform.system()} {platform.release()}"
-    python_version = f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+    # The same environment fingerprints the machine in the benchmark history
     with open(env_file, "w") as f:
-        f.write(f"OS={os_name}\n")
-        f.write(f"Python={python_version}\n")
-        f.write("Project=BooksApp\n")
-        f.write(f"API_BASE_URL={BASE_URL}\n")
+        for key, value in {**environment(BASE_URL), "Project": "BooksApp"}.items():
+            f.write(f"{key}={value}\n")
+
+def suite_files(config) -> set:
+    """Test modules of the whole suite: the ``python_files`` under ``testpaths``."""
+    patterns = config.getini("python_files")
+    files = set()
+    for testpath in config.getini("testpaths") or ["."]:
+        for directory, _, names in os.walk(os.path.join(str(config.rootpath), testpath)):
+            files.update(os.path.join(directory, name) for name in names
+                         if any(fnmatch.fnmatch(name, pattern) for pattern in patterns))
+    return files
 
+
+def is_partial_run(session) -> bool:
+    """
+    True when the session ran a selection of the suite.
+
+    That is: tests deselected (-k, -m, --deselect), --lf, a node id argument, or
+    path arguments that leave out a test module of the suite. ``pytest src/test/python``
+    is the whole suite, as is a path to its only test module.
+    """
+    config = session.config
+    reporter = config.pluginmanager.get_plugin("terminalreporter")
+    if reporter and reporter.stats.get("deselected") or config.getoption("lf", False):
+        return True
+    if any("::" in arg for arg in config.args):
+        return True
+    paths = [os.path.abspath(os.path.join(str(config.invocation_params.dir), arg)) for arg in config.args]
+    return not all(any(file == path or file.startswith(path + os.sep) for path in paths)
+                   for file in suite_files(config))
+
+
+@pytest.hookimpl(trylast=True)  # after the background attachment writer has flushed
 def pytest_sessionfinish(session, exitstatus):
-    """After tests finish, generate and open Allure report automatically."""
+    """After tests finish, generate and open the Allure report without holding up the session."""
 
-    if os.getenv("CI", "false").lower() == "true":
+    mode = session.config.getoption("allure_report_mode")
+    if os.getenv("CI", "false").lower() == "true" or SHARD is not None or mode == "off":
         return
 
     report_dir = os.path.join(PROJECT_ROOT, "allure-report")
-    allure_cmd = r"C:\allure\allure-2.35.1\bin\allure.bat"
-
-    # Generate report
-    generate_cmd = [allure_cmd, "generate", RESULTS_DIR, "--clean", "-o", report_dir]
-    if run_command(generate_cmd, description="Generating Allure report...") != 0:
-        print("Allure report generation failed!")
+    incremental = is_partial_run(session)
+    if mode == "inline":
+        print("Generating Allure report...")
+        if allure_pipeline.build_report(RESULTS_DIR, report_dir, incremental=incremental, open_report=True) != 0:
+            print("Allure report generation failed!")
         return
 
-    # Open report
-    print("Opening Allure report in browser...")
-    subprocess.Popen([allure_cmd, "open", report_dir])
+    log_path = allure_pipeline.start_report(RESULTS_DIR, report_dir, incremental=incremental)
+    print(f"Generating {'incremental ' if incremental else ''}Allure report in the background (log: {log_path})")
 
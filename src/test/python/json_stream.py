@@ -0,0 +1,194 @@
+"""
+Incremental parsing of large JSON listings straight from the socket.
+
+``GET /books`` without a filter returns the whole catalog as ``{"books": [...]}``.
+``response.json()`` builds all of it in memory before a single book is checked.
+``iter_json_array`` reads the body in chunks instead and yields the elements of
+one top-level array one at a time. Every element is decoded by the C ``json``
+decoder as soon as its bytes have arrived, and the consumed part of the buffer
+is dropped. Memory stays at about one chunk plus one element, however large the
+response. A validator that stops early also stops reading the socket.
+
+    for book in stream_books(client.get("/books", stream=True)):
+        assert book["category"] == "Fantasy"
+
+    pytest --stream-listings          # test_endpoints validates listings this way
+"""
+import codecs
+import json
+import json.scanner
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+import requests
+
+from books_client import is_unread
+
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")  # what may follow a number's prefix, e.g. the ".5" of "2.5"
+
+_scan_once = json.scanner.make_scanner(json.JSONDecoder())  # the C scanner behind json.loads
+_stream_listings = os.environ.get("BOOKS_STREAM_LISTINGS", "false").lower() == "true"
+
+
+class _Buffer:
+    """Decoded text of a byte stream, read on demand and trimmed behind the cursor."""
+
+    def __init__(self, chunks: Iterable[bytes], encoding: str = "utf-8"):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder(encoding)("strict").decode
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self) -> bool:
+        """Append the next chunk; False once the stream has ended."""
+        if self.exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            self.text += self._decode(b"", final=True)
+            return False
+        if self.pos > len(self.text) // 2:
+            self.text, self.pos = self.text[self.pos:], 0
+        self.text += self._decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at the end of the stream)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{found or 'end of data'}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value, reading more chunks until it is whole."""
+        if self.pos >= len(self.text) or self.text[self.pos] in WHITESPACE:
+            self.peek()
+        while True:
+            try:
+                value, end = _scan_once(self.text, self.pos)
+            except (StopIteration, json.JSONDecodeError) as e:
+                # Incomplete value: read on. At the end of the stream it is malformed.
+                if not self.fill():
+                    raise ValueError(f"Malformed JSON in stream near: {self.text[self.pos:self.pos + 40]!r}") from e
+                continue
+            # A number that reaches the end of the buffer may continue in the next chunk:
+            # "2" of "25", or "2" followed by the unfinished "." or "e" of "2.5" or "2e5"
+            if isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(self.text, end) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def more_elements(self) -> bool:
+        """Consume the separator after an array element: True for ',', False for the closing ']'."""
+        match = _SEPARATOR.match(self.text, self.pos)
+        if match and match.end() < len(self.text):  # fast path: separator and next token in the buffer
+            self.pos = match.end()
+            return match.group(1) == ","
+        if self.peek() == "]":
+            self.pos += 1
+            return False
+        self.expect(",")
+        return True
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str, encoding: str = "utf-8") -> Iterator[Any]:
+    """
+    Yield the elements of the array under ``key`` in a top-level JSON object, one at a time.
+
+    Args:
+        chunks: Body bytes in any chunking, e.g. ``response.iter_content(CHUNK_SIZE)``
+        key: Top-level key holding the array (other keys are skipped without being kept)
+        encoding: Body encoding
+
+    Returns:
+        Iterator over the decoded elements; empty when the key is absent
+    """
+    buffer = _Buffer(chunks, encoding)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return
+    while True:
+        name = buffer.value()
+        buffer.expect(":")
+        if name == key:
+            break
+        buffer.value()  # another key's value: decode and drop
+        if buffer.peek() == "}":
+            return
+        buffer.expect(",")
+
+    buffer.expect("[")
+    if buffer.peek() == "]":
+        return
+    while True:
+        yield buffer.value()
+        if not buffer.more_elements():
+            return
+
+
+def stream_books(response: requests.Response) -> Iterator[Dict]:
+    """
+    Books of a ``{"books": [...]}`` response, read incrementally when it was sent with ``stream=True``.
+
+    ``response.streamed`` tells whether the body came from the socket and
+    ``response.streamed_items`` counts the books read so far. A streamed response
+    is closed when iteration ends or is abandoned, releasing the socket. A body
+    that is already in memory (prefetched, replayed) is parsed the same way.
+    """
+    response.streamed = is_unread(response)
+    chunks = response.iter_content(CHUNK_SIZE) if response.streamed else [response.content]
+    response.streamed_items = 0
+    try:
+        for book in iter_json_array(chunks, "books", response.encoding or "utf-8"):
+            response.streamed_items += 1
+            yield book
+    finally:
+        response.close()
+
+
+def validate_stream(books: Iterable[Dict], check: Callable[[Dict], Optional[str]]) -> int:
+    """
+    Apply ``check`` to every book and stop at the first mismatch.
+
+    Args:
+        books: Books, e.g. from ``stream_books``
+        check: Returns an error message for a bad book, None for a good one
+
+    Returns:
+        Number of books checked
+    """
+    count = 0
+    for count, book in enumerate(books, 1):
+        error = check(book)
+        if error:
+            raise AssertionError(f"Book #{count}: {error}: {book}")
+    return count
+
+
+def streaming_enabled() -> bool:
+    """Whether listing tests should validate ``GET /books`` incrementally."""
+    return _stream_listings
+
+
+def pytest_addoption(parser):
+    parser.addoption("--stream-listings", action="store_true", default=_stream_listings,
+                     help="validate GET /books listings incrementally from the socket instead of response.json()")
+
+
+def pytest_configure(config):
+    global _stream_listings
+    _stream_listings = config.getoption("stream_listings")
@@ -0,0 +1,234 @@
+"""
+Pytest plugin that records the latency of every request sent through the shared
+BooksClient, attributes it to the test id and Allure story, and gates the session
+against a baseline.
+
+    pytest --latency-repeat 20                     # repeat read-only requests for stable stats
+    pytest --latency-repeat 20 --latency-update-baseline
+    pytest --latency-tolerance 0.5                 # fail when median/p95 grows by more than 50%
+    pytest --trend-store                           # append this session to the benchmark history
+
+A baseline records where it was measured: the machine fingerprint of
+``benchmark_store.environment`` and the server (Spring Boot or the Python
+stand-in, with the real OpenAI API or the local stand-in). Only a session
+that matches it is gated; any other session, such as CI before a baseline has
+been recorded on its runner, gets a warning instead.
+
+A test case may declare ``"latency_budget": <seconds>``; the test fails when the
+median latency of its requests exceeds the budget.
+
+With ``--trend-store`` the session's per-story samples are appended to the
+benchmark history (``benchmark_store.py``), unless the responses were replayed
+from a cassette.
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import allure
+import pytest
+
+from benchmark_store import DEFAULT_STORE, TrendStore, environment, fingerprint
+from books_client import RequestTiming, get_client
+from latency_stats import robust_summary
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "latency_baseline.json")
+DEFAULT_TOLERANCE = 0.25  # 25% slower than baseline fails the session
+DEFAULT_MIN_DELTA_MS = 5.0  # ignore regressions smaller than this, they are noise
+GATED_METRICS = ("median", "p95")
+REPEATABLE_METHODS = ("GET",)  # repeating mutations would change server state
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("latency", "request latency capture and regression gate")
+    group.addoption("--latency-repeat", type=int, default=1,
+                    help="send every read-only request of a test this many times (default: 1)")
+    group.addoption("--latency-baseline", default=DEFAULT_BASELINE,
+                    help="baseline JSON to compare against")
+    group.addoption("--latency-tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="allowed relative regression of a story's median/p95 (default: 0.25)")
+    group.addoption("--latency-min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                    help="absolute regression (ms) below which differences are ignored")
+    group.addoption("--latency-update-baseline", action="store_true",
+                    help="write this session's statistics to the baseline file instead of comparing")
+    group.addoption("--trend-store", nargs="?", const=DEFAULT_STORE, default=None, metavar="PATH",
+                    help=f"append this session to the benchmark history (default path: {DEFAULT_STORE})")
+
+
+def pytest_configure(config):
+    config.pluginmanager.register(LatencyRecorder(config), "latency_recorder")
+
+
+def story_for(item) -> str:
+    """Return the Allure story of a test, falling back to its feature or function name."""
+    case = _case_for(item)
+    if case and case.get("story"):
+        return case["story"]
+    labels = {}
+    for marker in item.iter_markers("allure_label"):
+        labels.setdefault(marker.kwargs.get("label_type"), marker.args[0] if marker.args else None)
+    return labels.get("story") or labels.get("feature") or item.originalname
+
+
+def _case_for(item) -> Optional[Dict]:
+    callspec = getattr(item, "callspec", None)
+    case = callspec.params.get("case") if callspec else None
+    return case if isinstance(case, dict) else None
+
+
+def measured_on(config, base_url: str) -> Dict[str, str]:
+    """Where a session's latencies come from: the machine fingerprint and the server behind the API."""
+    server = "python stand-in" if config.getoption("books_server", None) == "python" else "spring boot"
+    stub = config.getoption("openai_stub", None)
+    return {"machine": fingerprint(environment(base_url)), "server": server,
+            "openai": f"stand-in {stub}" if stub else "api.openai.com"}
+
+
+def compare_to_baseline(current: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float,
+                        min_delta: float) -> List[str]:
+    """
+    Compare per-story statistics to a baseline.
+
+    Args:
+        current: Story -> robust summary for this session
+        baseline: Story -> robust summary from the baseline file
+        tolerance: Allowed relative growth (0.25 = 25%)
+        min_delta: Absolute growth in seconds below which changes are ignored
+
+    Returns:
+        list of human-readable regression messages (empty when within tolerance)
+    """
+    regressions = []
+    for story, stats in sorted(current.items()):
+        reference = baseline.get(story)
+        if not reference:
+            continue
+        for metric in GATED_METRICS:
+            before, after = reference[metric], stats[metric]
+            if after > before * (1 + tolerance) and after - before > min_delta:
+                regressions.append(
+                    f"{story}: {metric} {before * 1000:.2f}ms -> {after * 1000:.2f}ms "
+                    f"(+{(after / before - 1) if before else float('inf'):.0%}, tolerance {tolerance:.0%})"
+                )
+    return regressions
+
+
+class LatencyRecorder:
+    """Collects per-test and per-story latencies from the shared BooksClient."""
+
+    def __init__(self, config):
+        self.config = config
+        self.repeat = max(1, config.getoption("latency_repeat"))
+        self.baseline_path = config.getoption("latency_baseline")
+        self.tolerance = config.getoption("latency_tolerance")
+        self.min_delta = config.getoption("latency_min_delta_ms") / 1000
+        self.update_baseline = config.getoption("latency_update_baseline")
+        self.trend_store = config.getoption("trend_store")
+        self.base_url: Optional[str] = None
+        self.by_test: Dict[str, List[float]] = defaultdict(list)
+        self.by_story: Dict[str, List[float]] = defaultdict(list)
+        self.regressions: List[str] = []
+        self.baseline_missing = False
+        self.baseline_elsewhere: Optional[Dict[str, str]] = None  # where a baseline that was not gated was measured
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item):
+        timings: List[RequestTiming] = []
+        thread = threading.get_ident()
+
+        def listener(timing: RequestTiming):
+            # Tests may run concurrently (parallel_scheduler); keep only this test's requests
+            if threading.get_ident() == thread:
+                timings.append(timing)
+
+        client = get_client()
+        self.base_url = client.base_url
+        client.add_listener(listener)
+        try:
+            result = yield
+            for timing in [t for t in timings if t.method in REPEATABLE_METHODS]:
+                for _ in range(self.repeat - 1):
+                    client.request(timing.method, timing.endpoint, params=timing.params)
+        finally:
+            client.remove_listener(listener)
+
+        samples = [t.total for t in timings]
+        if samples:
+            self._record(item, samples)
+        return result
+
+    def _record(self, item, samples: List[float]):
+        story = story_for(item)
+        self.by_test[item.nodeid].extend(samples)
+        self.by_story[story].extend(samples)
+        summary = robust_summary(samples)
+        allure.attach(json.dumps({"story": story, **summary}, indent=4), name="Latency",
+                      attachment_type=allure.attachment_type.JSON)
+
+        case = _case_for(item)
+        budget = case.get("latency_budget") if case else None
+        if budget is not None and summary["median"] > budget:
+            raise AssertionError(
+                f"Latency budget exceeded for {story}: median {summary['median'] * 1000:.2f}ms "
+                f"> budget {budget * 1000:.2f}ms over {summary['count']} request(s)"
+            )
+
+    def story_stats(self) -> Dict[str, Dict]:
+        return {story: robust_summary(samples) for story, samples in self.by_story.items()}
+
+    def record_trend(self):
+        """Append this session's samples to the benchmark history."""
+        if not self.trend_store or self.config.getoption("cassette", None) == "replay":
+            return  # replayed responses say nothing about the server's latency
+        with TrendStore(self.trend_store) as store:
+            store.append(self.by_story, "pytest", environment(self.base_url))
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        stats = self.story_stats()
+        if not stats:
+            return
+        self.record_trend()
+        source = measured_on(self.config, self.base_url)
+        if self.update_baseline:
+            with open(self.baseline_path, "w") as f:
+                json.dump({"measured_on": source, "stories": stats}, f, indent=4, sort_keys=True)
+            return
+        if not os.path.exists(self.baseline_path):
+            self.baseline_missing = True  # reported in the summary: nothing was gated
+            return
+        with open(self.baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get("measured_on") != source:
+            # Latencies of another machine or server say nothing about this one
+            self.baseline_elsewhere = baseline.get("measured_on") or {}
+            return
+        self.regressions = compare_to_baseline(stats, baseline["stories"], self.tolerance, self.min_delta)
+        if self.regressions and session.exitstatus == pytest.ExitCode.OK:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+    def pytest_terminal_summary(self, terminalreporter):
+        stats = self.story_stats()
+        if not stats:
+            return
+        terminalreporter.section("request latency")
+        terminalreporter.write_line(f"{'Story':<28}{'Reqs':>6}{'median':>10}{'p95':>10}{'MAD':>10}")
+        for story, summary in sorted(stats.items()):
+            terminalreporter.write_line(
+                f"{story[:27]:<28}{summary['count']:>6}{summary['median'] * 1000:>10.2f}"
+                f"{summary['p95'] * 1000:>10.2f}{summary['mad'] * 1000:>10.2f}"
+            )
+        if self.update_baseline:
+            terminalreporter.write_line(f"Baseline written to {self.baseline_path}")
+        if self.baseline_missing:
+            terminalreporter.write_line(f"No latency baseline at {self.baseline_path}, latencies were not gated; "
+                                        f"record one with --latency-update-baseline", yellow=True)
+        if self.baseline_elsewhere is not None:
+            theirs = ", ".join(f"{key} {value}" for key, value in sorted(self.baseline_elsewhere.items())) or "unknown"
+            ours = ", ".join(f"{key} {value}" for key, value in sorted(measured_on(self.config, self.base_url).items()))
+            terminalreporter.write_line(f"Latency baseline at {self.baseline_path} was measured on {theirs}, "
+                                        f"not on this session's {ours}; latencies were not gated", yellow=True)
+        for regression in self.regressions:
+            terminalreporter.write_line(f"LATENCY REGRESSION {regression}", red=True)
@@ -0,0 +1,187 @@
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence
+
+
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """
+    Return the q-th percentile of already sorted values (linear interpolation).
+
+    Args:
+        sorted_values: Values sorted in ascending order
+        q: Percentile between 0 and 100
+
+    Returns:
+        The interpolated percentile, or NaN when there are no values
+    """
+    if not sorted_values:
+        return math.nan
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def percentile_label(q: float) -> str:
+    """Format a percentile as a short label, e.g. 99.9 -> 'p99.9'."""
+    return f"p{q:g}"
+
+
+def summarize(values: Iterable[float], percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+    """
+    Summarize latency samples.
+
+    Args:
+        values: Latency samples in seconds
+        percentiles: Percentiles to include in the summary
+
+    Returns:
+        dict with count, min, max, mean and one key per requested percentile
+    """
+    ordered: List[float] = sorted(values)
+    summary = {
+        "count": len(ordered),
+        "min": ordered[0] if ordered else math.nan,
+        "max": ordered[-1] if ordered else math.nan,
+        "mean": sum(ordered) / len(ordered) if ordered else math.nan,
+    }
+    for q in percentiles:
+        summary[percentile_label(q)] = percentile(ordered, q)
+    return summary
+
+
+def robust_summary(values: Iterable[float]) -> Dict[str, float]:
+    """
+    Outlier-resistant summary used for regression gates.
+
+    Args:
+        values: Latency samples in seconds
+
+    Returns:
+        dict with count, median, p95, MAD (median absolute deviation) and IQR
+    """
+    ordered: List[float] = sorted(values)
+    median = percentile(ordered, 50)
+    deviations = sorted(abs(v - median) for v in ordered)
+    return {
+        "count": len(ordered),
+        "median": median,
+        "p95": percentile(ordered, 95),
+        "mad": percentile(deviations, 50),
+        "iqr": percentile(ordered, 75) - percentile(ordered, 25),
+    }
+
+
+TREND_Z = 2.576  # two-sided 1% level of the Mann-Kendall test
+TREND_POINTS = 400  # longer series are thinned evenly before the O(n^2) pair comparisons
+
+
+def trend(times: Sequence[float], values: Sequence[float]) -> Dict[str, float]:
+    """
+    Non-parametric trend of a time series: Mann-Kendall test and Theil-Sen slope.
+
+    Both only compare pairs of points, so a few outliers (a GC pause, a slow
+    request) do not make a flat series look like it grows.
+
+    Args:
+        times: Sample times in seconds, ascending
+        values: One value per time
+
+    Returns:
+        dict with ``slope`` (median change per second) and ``z`` (Mann-Kendall statistic,
+        with the tie correction); ``z > TREND_Z`` is a significant increase at the 1% level
+    """
+    if len(times) != len(values):
+        raise ValueError("times and values must have the same length")
+    step = max(1, math.ceil(len(values) / TREND_POINTS))
+    times, values = list(times)[::step], list(values)[::step]
+    n = len(values)
+    if n < 3:
+        return {"slope": 0.0, "z": 0.0}
+
+    s, slopes = 0, []
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            difference = values[j] - values[i]
+            s += (difference > 0) - (difference < 0)
+            if times[j] != times[i]:
+                slopes.append(difference / (times[j] - times[i]))
+    ties = Counter(values).values()
+    variance = (n * (n - 1) * (2 * n + 5) - sum(t * (t - 1) * (2 * t + 5) for t in ties)) / 18
+    z = 0.0 if s == 0 or variance <= 0 else (s - math.copysign(1, s)) / math.sqrt(variance)
+    return {"slope": percentile(sorted(slopes), 50) if slopes else 0.0, "z": z}
+
+
+def ks_test(first: Sequence[float], second: Sequence[float]) -> Dict[str, float]:
+    """
+    Two-sample Kolmogorov-Smirnov test: do two samples come from the same distribution?
+
+    Args:
+        first: Sample values
+        second: Sample values
+
+    Returns:
+        dict with ``d`` (largest gap between the two empirical CDFs, 0 to 1) and ``p``
+        (asymptotic p-value; small when the distributions differ)
+    """
+    a, b = sorted(first), sorted(second)
+    n, m = len(a), len(b)
+    if not n or not m:
+        return {"d": math.nan, "p": math.nan}
+    d = i = j = 0
+    while i < n and j < m:
+        value = min(a[i], b[j])
+        while i < n and a[i] == value:
+            i += 1
+        while j < m and b[j] == value:
+            j += 1
+        d = max(d, abs(i / n - j / m))
+    effective = n * m / (n + m)
+    scaled = (math.sqrt(effective) + 0.12 + 0.11 / math.sqrt(effective)) * d
+    if scaled < 0.3:  # the series converges slowly here, and p is 1 to many digits
+        return {"d": d, "p": 1.0}
+    p = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * scaled * scaled) for k in range(1, 101))
+    return {"d": d, "p": min(1.0, max(0.0, p))}
+
+
+def mann_whitney(first: Sequence[float], second: Sequence[float]) -> Dict[str, float]:
+    """
+    Mann-Whitney U test: does one sample tend to be larger than the other?
+
+    Uses the normal approximation with the tie correction and a continuity correction.
+
+    Args:
+        first: Sample values
+        second: Sample values
+
+    Returns:
+        dict with ``u`` (U statistic of ``first``), ``z`` (positive when ``first`` tends to be
+        larger) and ``p`` (two-sided p-value)
+    """
+    n, m = len(first), len(second)
+    if not n or not m:
+        return {"u": math.nan, "z": math.nan, "p": math.nan}
+    pooled = sorted([(value, 0) for value in first] + [(value, 1) for value in second])
+    rank_sum, ties, i = 0.0, 0.0, 0
+    while i < len(pooled):
+        j = i
+        while j < len(pooled) and pooled[j][0] == pooled[i][0]:
+            j += 1
+        average = (i + j + 1) / 2  # ranks i+1 .. j
+        rank_sum += average * sum(1 for k in range(i, j) if pooled[k][1] == 0)
+        ties += (j - i) ** 3 - (j - i)
+        i = j
+    total = n + m
+    u = rank_sum - n * (n + 1) / 2
+    variance = n * m / 12 * ((total + 1) - ties / (total * (total - 1))) if total > 1 else 0.0
+    difference = u - n * m / 2
+    if variance <= 0 or difference == 0:
+        return {"u": u, "z": 0.0, "p": 1.0}
+    z = (difference - math.copysign(0.5, difference)) / math.sqrt(variance)
+    return {"u": u, "z": z, "p": math.erfc(abs(z) / math.sqrt(2))}
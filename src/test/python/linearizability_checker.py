@@ -0,0 +1,471 @@
+"""
+Linearizability check of the Books API under concurrent CRUD traffic.
+
+``BookController`` keeps the catalog in an unsynchronized ``ArrayList`` and gives
+a new book the id ``books.size() + 1``. Concurrent requests can hand out one id
+twice, lose an update or corrupt the list.
+
+Each round, workers start together and send randomized requests on a few shared
+titles and ids: create, get by id, list by title, update by id, delete by id and
+delete by title. Every request is recorded with the time it was sent, the time
+its response arrived, and the response. The history is then checked against a
+sequential model of the controller.
+
+The history is linearizable when some serial order of the requests explains
+every response. That order must respect real time: a request that was answered
+before another was sent comes first. A history that fails is shrunk to a
+minimal failing interleaving and printed.
+
+    python src/test/python/linearizability_checker.py --workers 8 --operations 200 --rounds 50
+    python src/test/python/linearizability_checker.py --history failing.json   # save a failing history
+    python src/test/python/linearizability_checker.py --check failing.json     # re-check a saved one
+
+The model gives a new book the id ``size + 1``, like the controller does. A
+deletion followed by a create therefore reuses an id in the model too, and that
+sequential duplicate is not reported. Only behavior that no serial order
+explains is.
+
+A request that failed in transport may or may not have taken effect; the
+checker allows either. The run expects to have the server to itself. Its books
+are deleted by title after every round.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from books_client import DEFAULT_BASE_URL, BooksClient
+
+
+AUTHOR = "Linearizability Check"
+CATEGORY = "Fiction"
+KINDS = ("create", "get", "list", "update", "delete", "delete_title")
+DEFAULT_MIX = {"create": 3, "get": 3, "list": 2, "update": 2, "delete": 1, "delete_title": 1}
+DEFAULT_KEYS = 3  # shared titles per round: few, so that requests collide
+MAX_STATES = 2_000_000  # search budget per check; beyond it a history is reported as undecided
+ANY = "any"  # outcome of an operation whose response a shrunk history no longer checks
+TIMELINE_WIDTH = 32
+
+Book = namedtuple("Book", ["id", "title", "author", "category", "rating"])
+# call and ret in perf_counter seconds; a request that failed in transport has ret inf and outcome None
+Operation = namedtuple("Operation", ["worker", "kind", "args", "call", "ret", "outcome"])
+
+
+def _same(first: str, second: str) -> bool:
+    return first.lower() == second.lower()  # equalsIgnoreCase
+
+
+def apply(state: Tuple[Book, ...], kind: str, args: tuple) -> Tuple[Tuple[Book, ...], tuple]:
+    """
+    Sequential model of ``BookController``: the catalog after one operation and its response.
+
+    Args:
+        state: The catalog in list order
+        kind: One of KINDS
+        args: ``(title, rating)`` for create, ``(id, title, rating)`` for update,
+            ``(title,)`` for list and delete_title, ``(id,)`` for get and delete
+
+    Returns:
+        tuple of (new catalog, ``(status, value)``)
+    """
+    if kind == "create":
+        title, rating = args
+        if any(_same(book.title, title) and _same(book.author, AUTHOR) and _same(book.category, CATEGORY)
+               for book in state):
+            return state, (409, None)
+        book = Book(len(state) + 1, title, AUTHOR, CATEGORY, rating)
+        return state + (book,), (201, book)
+    if kind in ("get", "update"):
+        position = next((i for i, book in enumerate(state) if book.id == args[0]), None)
+        if position is None:
+            return state, (404, None)
+        book = state[position]
+        if kind == "get":
+            return state, (200, tuple(book[1:]))
+        updated = Book(book.id, args[1], AUTHOR, CATEGORY, args[2])
+        return state[:position] + (updated,) + state[position + 1:], (200, book)
+    if kind == "list":
+        found = tuple(book for book in state if _same(book.title, args[0]))
+        return state, (200, found) if found else (404, None)
+    if kind == "delete":
+        remaining = tuple(book for book in state if book.id != args[0])
+        return remaining, (200, None) if len(remaining) < len(state) else (404, None)
+    if kind == "delete_title":
+        remaining = tuple(book for book in state if not _same(book.title, args[0]))
+        deleted = len(state) - len(remaining)
+        return remaining, (200, deleted) if deleted else (404, None)
+    raise ValueError(f"Unknown operation: {kind}")
+
+
+def _book(data: Dict) -> Book:
+    return Book(*(data[field] for field in Book._fields))
+
+
+def observe(kind: str, response: requests.Response) -> tuple:
+    """
+    A response as ``(status, value)``, comparable with the model's.
+
+    A status or body the model never produces comes back with the body text as its value.
+    """
+    status = response.status_code
+    try:
+        body = response.json()
+        if status in (404, 409) or (status == 200 and kind == "delete"):
+            return status, None
+        if status == 201 and kind == "create":
+            return status, _book(body["book"])
+        if status == 200 and kind == "get":
+            return status, tuple(body["book"][field] for field in Book._fields[1:])
+        if status == 200 and kind == "list":
+            return status, tuple(_book(book) for book in body["books"])
+        if status == 200 and kind == "update":
+            return status, _book(body["OldBook"])
+        if status == 200 and kind == "delete_title":
+            return status, int(body["detail"].split()[0])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return status, response.text[:200]
+
+
+def send(client: BooksClient, kind: str, args: tuple) -> requests.Response:
+    if kind == "create":
+        return client.post("/books", {"title": args[0], "author": AUTHOR, "category": CATEGORY, "rating": args[1]})
+    if kind == "get":
+        return client.get(f"/books/{args[0]}")
+    if kind == "list":
+        return client.get("/books", params={"title": args[0]})
+    if kind == "update":
+        return client.put(f"/books/{args[0]}",
+                          {"title": args[1], "author": AUTHOR, "category": CATEGORY, "rating": args[2]})
+    if kind == "delete":
+        return client.delete(f"/books/{args[0]}")
+    return client.delete("/books", params={"title": args[0]})
+
+
+def catalog(client: BooksClient) -> Tuple[Book, ...]:
+    """The server's catalog in list order."""
+    response = client.get("/books")
+    if response.status_code == 404:
+        return ()
+    response.raise_for_status()
+    return tuple(_book(book) for book in response.json()["books"])
+
+
+def record_history(client: BooksClient, titles: Sequence[str], ids: Sequence[int], operations: int,
+                   workers: int, seed: int, mix: Optional[Dict[str, int]] = None) -> List[Operation]:
+    """
+    Send ``operations`` random requests from concurrent workers and record them.
+
+    Args:
+        client: Client with a pool of at least ``workers`` connections
+        titles: Titles to create, list, rename to and delete
+        ids: Ids to get, update and delete
+        operations: Requests in total
+        workers: Concurrent workers; they start together
+        seed: Seed of the workers' choices
+        mix: Relative weight of every operation kind
+
+    Returns:
+        The history, sorted by call time
+    """
+    weights = [(mix or DEFAULT_MIX).get(kind, 0) for kind in KINDS]
+    history: List[Operation] = []
+    remaining = [operations]
+    lock = threading.Lock()
+    barrier = threading.Barrier(workers)
+
+    def work(worker: int):
+        rng = random.Random(seed * 1_000_003 + worker)
+        barrier.wait()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            kind = rng.choices(KINDS, weights)[0]
+            if kind == "create":
+                args = (rng.choice(titles), rng.randint(1, 5))
+            elif kind == "update":
+                args = (rng.choice(ids), rng.choice(titles), rng.randint(1, 5))
+            elif kind in ("get", "delete"):
+                args = (rng.choice(ids),)
+            else:
+                args = (rng.choice(titles),)
+            call = time.perf_counter()
+            try:
+                response = send(client, kind, args)
+            except requests.RequestException:
+                operation = Operation(worker, kind, args, call, math.inf, None)
+            else:
+                operation = Operation(worker, kind, args, call, time.perf_counter(), observe(kind, response))
+            with lock:
+                history.append(operation)
+
+    threads = [threading.Thread(target=work, args=(worker,), name=f"linearizability-{worker}")
+               for worker in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(history, key=lambda operation: operation.call)
+
+
+def check(history: Sequence[Operation], initial: Tuple[Book, ...], max_states: int = MAX_STATES) -> Optional[bool]:
+    """
+    Whether a history is linearizable with respect to ``apply``.
+
+    A depth-first search over partial linearizations (Wing & Gong, with the
+    memoization of Lowe). The next operation must have been sent before every
+    pending operation was answered. A state is the set of operations
+    linearized so far together with the catalog they produce, and each state
+    is searched once.
+
+    Args:
+        history: Operations sorted by call time
+        initial: The catalog before the first operation
+        max_states: Search budget
+
+    Returns:
+        True or False; None when the budget ran out first
+    """
+    count = len(history)
+    required = sum(1 << i for i, operation in enumerate(history) if operation.ret != math.inf)
+    by_return = sorted(range(count), key=lambda i: history[i].ret)
+    start = (0, initial)
+    seen = {start}
+    stack = [start]
+    while stack:
+        done, state = stack.pop()
+        if done & required == required:
+            return True
+        horizon = next(history[i].ret for i in by_return if not done >> i & 1)
+        for i in range(count):
+            operation = history[i]
+            if operation.call > horizon:
+                break
+            if done >> i & 1:
+                continue
+            after, outcome = apply(state, operation.kind, operation.args)
+            if operation.outcome not in (None, ANY) and outcome != operation.outcome:
+                continue
+            successor = (done | 1 << i, after)
+            if successor not in seen:
+                if len(seen) >= max_states:
+                    return None
+                seen.add(successor)
+                stack.append(successor)
+    return False
+
+
+def minimize(history: Sequence[Operation], initial: Tuple[Book, ...],
+             max_states: int = MAX_STATES) -> List[Operation]:
+    """
+    Shrink a non-linearizable history to a minimal failing interleaving.
+
+    The history is first cut after its shortest failing prefix. Then every
+    response that is not needed for the failure is relaxed to ``ANY``: the
+    operation still takes effect, but its response is no longer checked.
+    Operations sent after the last checked one returned cannot matter and are
+    dropped. The others stay, since their effects are part of the failure.
+
+    Returns:
+        The shrunk history; the operations whose outcome is not ANY are the failing core
+    """
+    def fails(candidate: Sequence[Operation]) -> bool:
+        return check(candidate, initial, max_states) is False
+
+    low, high = 1, len(history)
+    while low < high:
+        middle = (low + high) // 2
+        if fails(history[:middle]):
+            high = middle
+        else:
+            low = middle + 1
+    current = list(history[:high])
+
+    checked = [i for i, operation in enumerate(current) if operation.outcome not in (None, ANY)]
+    size = max(1, len(checked) // 2)
+    while True:
+        position = 0
+        while position < len(checked):
+            relaxed = set(checked[position:position + size])
+            candidate = [operation._replace(outcome=ANY) if i in relaxed else operation
+                         for i, operation in enumerate(current)]
+            if fails(candidate):
+                current = candidate
+                checked = checked[:position] + checked[position + size:]
+            else:
+                position += size
+        if size == 1:
+            break
+        size //= 2
+
+    last = max((operation.ret for operation in current if operation.outcome not in (None, ANY)), default=math.inf)
+    return [operation for operation in current if operation.call <= last]
+
+
+def describe(operation: Operation) -> str:
+    kind, args = operation.kind, operation.args
+    if kind == "create":
+        return f"POST /books '{args[0]}' rating {args[1]}"
+    if kind == "update":
+        return f"PUT /books/{args[0]} '{args[1]}' rating {args[2]}"
+    if kind == "get":
+        return f"GET /books/{args[0]}"
+    if kind == "delete":
+        return f"DELETE /books/{args[0]}"
+    if kind == "list":
+        return f"GET /books?title='{args[0]}'"
+    return f"DELETE /books?title='{args[0]}'"
+
+
+def describe_outcome(outcome) -> str:
+    if outcome is None:
+        return "no response"
+    if outcome == ANY:
+        return "(response not needed)"
+    status, value = outcome
+    if isinstance(value, Book):
+        return f"{status} id {value.id} '{value.title}' rating {value.rating}"
+    if isinstance(value, tuple) and value and isinstance(value[0], Book):
+        return f"{status} ids {[book.id for book in value]}"
+    if isinstance(value, tuple):
+        return f"{status} '{value[0]}' rating {value[-1]}"
+    return f"{status}" if value is None else f"{status} {value}"
+
+
+def format_interleaving(history: Sequence[Operation]) -> str:
+    """
+    A minimal failing history as a timeline, one operation per line.
+
+    Responses marked ``*`` are those that no serial order explains together.
+    Operations that finished before the first of them are only counted.
+    """
+    core = [operation for operation in history if operation.outcome not in (None, ANY)]
+    start = min(operation.call for operation in core)
+    end = max(operation.ret for operation in core)
+    shown = [operation for operation in history if operation.outcome not in (None, ANY) or operation.ret >= start]
+    earlier = len(history) - len(shown)
+    scale = TIMELINE_WIDTH / max(end - start, 1e-9)
+    lines = []
+    if earlier:
+        lines.append(f"  ({earlier} earlier operation(s) took effect first; their responses are not needed)")
+    for operation in shown:
+        begin = max(0, min(TIMELINE_WIDTH - 1, int((operation.call - start) * scale)))
+        finish = TIMELINE_WIDTH if operation.ret == math.inf else int((operation.ret - start) * scale)
+        finish = max(begin + 1, min(TIMELINE_WIDTH, finish))
+        bar = " " * begin + "=" * (finish - begin) + " " * (TIMELINE_WIDTH - finish)
+        mark = "*" if operation.outcome not in (None, ANY) else " "
+        lines.append(f" {mark} worker {operation.worker:<3} |{bar}| {describe(operation):<52} -> "
+                     f"{describe_outcome(operation.outcome)}")
+    lines.append(f"  window {(end - start) * 1000:.1f} ms; no serial order of these operations gives every * response")
+    return "\n".join(lines)
+
+
+def _outcome_from_json(kind: str, outcome):
+    if outcome is None or outcome == ANY:
+        return outcome
+    status, value = outcome
+    if isinstance(value, list):
+        if kind == "list":
+            value = tuple(Book(*book) for book in value)
+        elif kind in ("create", "update"):
+            value = Book(*value)
+        else:
+            value = tuple(value)
+    return status, value
+
+
+def save_history(path: str, history: Sequence[Operation], initial: Tuple[Book, ...]):
+    with open(path, "w") as f:
+        json.dump({
+            "initial": [list(book) for book in initial],
+            "operations": [{**operation._asdict(), "ret": None if operation.ret == math.inf else operation.ret}
+                           for operation in history],
+        }, f, indent=1, ensure_ascii=False)
+
+
+def load_history(path: str) -> Tuple[List[Operation], Tuple[Book, ...]]:
+    with open(path) as f:
+        data = json.load(f)
+    history = [Operation(item["worker"], item["kind"], tuple(item["args"]), item["call"],
+                         math.inf if item["ret"] is None else item["ret"],
+                         _outcome_from_json(item["kind"], item["outcome"]))
+               for item in data["operations"]]
+    return sorted(history, key=lambda operation: operation.call), tuple(Book(*book) for book in data["initial"])
+
+
+def cleanup(client: BooksClient, titles: Sequence[str]):
+    """Delete every book with one of the round's titles."""
+    for title in titles:
+        client.delete("/books", params={"title": title})
+
+
+def report(history: Sequence[Operation], initial: Tuple[Book, ...], max_states: int,
+           save: Optional[str] = None) -> Optional[bool]:
+    """Check a history, print the minimal interleaving when it fails, and return the verdict."""
+    verdict = check(history, initial, max_states)
+    if verdict is False:
+        print("Not linearizable. Minimal failing interleaving:")
+        print(format_interleaving(minimize(history, initial, max_states)))
+        if save:
+            save_history(save, history, initial)
+            print(f"Full history written to {save}")
+    return verdict
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check that concurrent CRUD requests on the Books API "
+                                                 "are linearizable.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=200, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=20, help="independent histories to record and check")
+    parser.add_argument("--keys", type=int, default=DEFAULT_KEYS, help="shared titles per round")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-states", type=int, default=MAX_STATES, help="search budget per history")
+    parser.add_argument("--history", help="write a failing history to this file")
+    parser.add_argument("--check", metavar="FILE", help="check a saved history instead of recording one")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        history, initial = load_history(args.check)
+        verdict = report(history, initial, args.max_states)
+        if verdict is not False:
+            print("Linearizable." if verdict else "Undecided: the search budget ran out (raise --max-states).")
+        return 1 if verdict is False else 0
+
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers, trust_env=False)
+    undecided = checked = 0
+    try:
+        for round_index in range(args.rounds):
+            titles = [f"Linearizability {args.seed}-{round_index}-{key}" for key in range(args.keys)]
+            initial = catalog(client)
+            ids = range(len(initial) + 1, len(initial) + 2 * args.keys + 2)
+            try:
+                history = record_history(client, titles, ids, args.operations, args.workers,
+                                         args.seed * 100_003 + round_index)
+            finally:
+                cleanup(client, titles)
+            checked += len(history)
+            print(f"Round {round_index + 1}/{args.rounds}: {len(history)} operations")
+            verdict = report(history, initial, args.max_states, args.history)
+            if verdict is False:
+                return 1
+            undecided += verdict is None
+    finally:
+        client.close()
+    print(f"{checked:,} operations in {args.rounds} round(s): linearizable"
+          + (f", {undecided} round(s) undecided (raise --max-states)" if undecided else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""
+Load generator that replays the ``test_cases`` table as a weighted workload.
+
+Closed loop (each worker sends its next request as soon as the previous one returns):
+    python load_runner.py --workers 16 --duration 30
+
+Open loop (constant arrival rate, latency corrected for coordinated omission):
+    python load_runner.py --workers 64 --rate 200 --duration 30
+
+Recommendation calls are paced by a ModelScheduler within the limits of the
+model the server uses (``--recommend-model``), instead of bursting into 429s:
+    python load_runner.py --weights GET=0,PUT=0,DELETE=0,RECOMMEND=1 --recommend-model gpt-4o-mini
+
+With ``--response-cache`` the client answers repeated reads from a read-through
+cache (``response_cache.py``) that the run's own writes invalidate. The summary
+shows how much of the load a caching tier in front of the API would absorb:
+    python load_runner.py --workers 16 --duration 30 --response-cache --response-cache-ttl 60
+
+With ``--trend-store`` the latencies are appended to the benchmark history
+(``benchmark_store.py``), under a source that names the mode and worker count:
+    python load_runner.py --workers 16 --duration 30 --trend-store src/test/python/benchmark_history.db
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from benchmark_store import TrendStore, environment
+from books_client import DEFAULT_BASE_URL, BooksClient
+from latency_stats import DEFAULT_PERCENTILES, percentile_label, summarize
+from model_scheduler import ModelScheduler, recommendation_cost
+from openai_model import get_model
+from response_cache import DEFAULT_MAX_BYTES, DEFAULT_TTL, ResponseCache
+from test_endpoints import test_cases
+
+
+# RECOMMEND calls hit the paid OpenAI API, so they are opt-in
+DEFAULT_WEIGHTS = {"GET": 10, "PUT": 1, "DELETE": 1, "RECOMMEND": 0}
+ERROR_STATUS = "ERR"  # recorded when the request raised instead of returning
+RECOMMENDATIONS_PREFIX = "/recommendations/"
+
+LoadCase = namedtuple("LoadCase", ["method", "story", "endpoint", "params", "payload", "expected_status"])
+Sample = namedtuple("Sample", ["story", "status", "expected", "latency", "service_time"])
+
+
+def build_workload(cases: Dict[str, List[Dict]] = test_cases,
+                   weights: Dict[str, float] = DEFAULT_WEIGHTS) -> Tuple[List[LoadCase], List[float]]:
+    """
+    Turn the test_cases table into a weighted list of requests.
+
+    The weight of a group is split evenly across its cases.
+
+    Args:
+        cases: test_cases-shaped dict keyed by GET/PUT/DELETE/RECOMMEND
+        weights: Relative weight of every group (missing groups are skipped)
+
+    Returns:
+        tuple of (cases, weights) ready for ``random.choices``
+    """
+    workload, case_weights = [], []
+    for group, group_cases in cases.items():
+        weight = weights.get(group, 0)
+        if weight <= 0 or not group_cases:
+            continue
+        method = "GET" if group == "RECOMMEND" else group
+        for case in group_cases:
+            workload.append(LoadCase(
+                method=method,
+                story=case["story"],
+                endpoint=case["endpoint"],
+                params=case["params"] or None,
+                payload=case.get("payload"),
+                expected_status=int(case["expected_status"]),
+            ))
+            case_weights.append(weight / len(group_cases))
+    if not workload:
+        raise ValueError("Workload is empty: every group has a zero weight")
+    return workload, case_weights
+
+
+def _send(client: BooksClient, case: LoadCase, scheduler: Optional[ModelScheduler] = None,
+          cache: Optional[ResponseCache] = None) -> Tuple[object, float]:
+    start = time.perf_counter()
+
+    def send(model=None):
+        return client.request(case.method, case.endpoint, params=case.params, json_data=case.payload)
+
+    try:
+        # A cached recommendation costs no tokens: it does not wait for the scheduler
+        paced = cache is None or not cache.contains(case.method, case.endpoint, case.params)
+        if scheduler is not None and paced and case.endpoint.startswith(RECOMMENDATIONS_PREFIX):
+            book_id = case.endpoint[len(RECOMMENDATIONS_PREFIX):]
+            tokens = recommendation_cost(int(book_id) if book_id.isdigit() else 0)
+            status = scheduler.submit(send, tokens=tokens).result().status_code
+        else:
+            status = send().status_code
+    except Exception:
+        status = ERROR_STATUS
+    return status, time.perf_counter() - start
+
+
+def run_closed_loop(client: BooksClient, workload: Sequence[LoadCase], weights: Sequence[float],
+                    workers: int, duration: Optional[float] = None, total_requests: Optional[int] = None,
+                    seed: int = 0, scheduler: Optional[ModelScheduler] = None,
+                    cache: Optional[ResponseCache] = None) -> Tuple[List[Sample], float]:
+    """
+    Run ``workers`` threads that each send back-to-back requests.
+
+    Stops after ``duration`` seconds or ``total_requests`` requests, whichever comes first.
+    Recommendation requests wait for ``scheduler`` when one is given, unless
+    ``cache`` (attached to ``client``) already holds the response.
+
+    Returns:
+        tuple of (samples, elapsed seconds)
+    """
+    if duration is None and total_requests is None:
+        raise ValueError("Either duration or total_requests is required")
+    deadline = time.perf_counter() + duration if duration is not None else None
+    budget = iter(range(total_requests)) if total_requests is not None else None
+    lock = threading.Lock()
+    results: List[List[Sample]] = [[] for _ in range(workers)]
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        samples = results[index]
+        while deadline is None or time.perf_counter() < deadline:
+            if budget is not None:
+                with lock:
+                    if next(budget, None) is None:
+                        return
+            case = rng.choices(workload, weights)[0]
+            status, elapsed = _send(client, case, scheduler, cache)
+            samples.append(Sample(case.story, status, case.expected_status, elapsed, elapsed))
+
+    return _run_workers(worker, workers, results)
+
+
+def run_open_loop(client: BooksClient, workload: Sequence[LoadCase], weights: Sequence[float],
+                  workers: int, rate: float, duration: float, seed: int = 0,
+                  scheduler: Optional[ModelScheduler] = None,
+                  cache: Optional[ResponseCache] = None) -> Tuple[List[Sample], float]:
+    """
+    Send requests at a constant arrival rate, independent of response times.
+
+    Request ``i`` is due at ``start + i / rate``. Latency is measured from that
+    intended start rather than from when a worker got around to sending it, so
+    a stalled server is charged for the queueing it caused (coordinated
+    omission correction). ``service_time`` keeps the uncorrected value, and
+    includes the wait for ``scheduler`` on recommendation requests.
+
+    Returns:
+        tuple of (samples, elapsed seconds)
+    """
+    if rate <= 0:
+        raise ValueError("rate must be positive")
+    schedule = iter(range(int(rate * duration)))
+    lock = threading.Lock()
+    results: List[List[Sample]] = [[] for _ in range(workers)]
+    start = time.perf_counter() + 0.05  # give every worker time to start
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        samples = results[index]
+        while True:
+            with lock:
+                slot = next(schedule, None)
+            if slot is None:
+                return
+            intended = start + slot / rate
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            case = rng.choices(workload, weights)[0]
+            status, service_time = _send(client, case, scheduler, cache)
+            latency = time.perf_counter() - intended
+            samples.append(Sample(case.story, status, case.expected_status, latency, service_time))
+
+    return _run_workers(worker, workers, results)
+
+
+def _run_workers(target, workers: int, results: List[List[Sample]]) -> Tuple[List[Sample], float]:
+    threads = [threading.Thread(target=target, args=(i,), daemon=True) for i in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return [sample for samples in results for sample in samples], elapsed
+
+
+def build_report(samples: Sequence[Sample], elapsed: float,
+                 percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Dict]:
+    """
+    Aggregate samples into throughput, status-code rates and latency percentiles per story.
+
+    Returns:
+        dict keyed by story, plus an "ALL" entry for the whole run
+    """
+    by_story = defaultdict(list)
+    for sample in samples:
+        by_story[sample.story].append(sample)
+    by_story["ALL"] = list(samples)
+
+    report = {}
+    for story, story_samples in by_story.items():
+        statuses = Counter(str(s.status) for s in story_samples)
+        unexpected = sum(1 for s in story_samples if s.status != s.expected)
+        count = len(story_samples)
+        report[story] = {
+            "requests": count,
+            "throughput": count / elapsed if elapsed else 0.0,
+            "status_rates": {status: n / count for status, n in sorted(statuses.items())},
+            "unexpected_rate": unexpected / count if count else 0.0,
+            "latency": summarize((s.latency for s in story_samples), percentiles),
+            "service_time": summarize((s.service_time for s in story_samples), percentiles),
+        }
+    return report
+
+
+def format_report(report: Dict[str, Dict], percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> str:
+    """Render a report as a fixed-width text table (latencies in ms)."""
+    labels = [percentile_label(q) for q in percentiles]
+    header = f"{'Story':<24}{'Reqs':>8}{'Req/s':>10}{'Unexp%':>8}" + "".join(f"{label:>10}" for label in labels) + "  Status codes"
+    lines = [header, "-" * len(header)]
+    for story, entry in sorted(report.items(), key=lambda item: (item[0] == "ALL", item[0])):
+        latency = entry["latency"]
+        statuses = ", ".join(f"{status}={rate:.1%}" for status, rate in entry["status_rates"].items())
+        lines.append(
+            f"{story[:23]:<24}{entry['requests']:>8}{entry['throughput']:>10.1f}{entry['unexpected_rate']:>8.1%}"
+            + "".join(f"{latency[label] * 1000:>10.2f}" for label in labels)
+            + f"  {statuses}"
+        )
+    return "\n".join(lines)
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in filter(None, value.split(",")):
+        group, _, weight = item.partition("=")
+        weights[group.strip().upper()] = float(weight)
+    return weights
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay test_cases as a concurrent load test.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="closed loop only: stop after this many requests")
+    parser.add_argument("--rate", type=float, help="open loop: requests per second (omit for closed loop)")
+    parser.add_argument("--weights", type=_parse_weights, default=dict(DEFAULT_WEIGHTS),
+                        help="group weights, e.g. GET=10,PUT=1,DELETE=1,RECOMMEND=0")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recommend-model", default=os.environ.get("OPENAI_MODEL", "gpt-4"),
+                        help="model the server uses for recommendations, sets the pacing limits (default: gpt-4)")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--trend-store", help="append the latencies to this benchmark history")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="answer repeated reads from a client-side cache invalidated by the run's writes")
+    parser.add_argument("--response-cache-ttl", type=float, default=DEFAULT_TTL,
+                        help="seconds a cached response stays fresh, 0 for no expiry (default: %(default)s)")
+    parser.add_argument("--response-cache-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help="memory bound of the cache in MiB (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    workload, weights = build_workload(test_cases, args.weights)
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers)
+    cache = None
+    if args.response_cache:
+        cache = ResponseCache(max_bytes=int(args.response_cache_mb * 1024 * 1024),
+                              ttl=args.response_cache_ttl).attach(client)
+    scheduler = None
+    if args.weights.get("RECOMMEND", 0) > 0:
+        try:
+            model = get_model(args.recommend_model)
+        except ValueError as e:
+            parser.error(str(e))
+        scheduler = ModelScheduler([model], workers=args.workers)
+    try:
+        if args.rate:
+            samples, elapsed = run_open_loop(client, workload, weights, args.workers, args.rate, args.duration,
+                                             args.seed, scheduler, cache)
+        else:
+            duration = None if args.requests else args.duration
+            samples, elapsed = run_closed_loop(client, workload, weights, args.workers, duration, args.requests,
+                                               args.seed, scheduler, cache)
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+        client.close()
+
+    report = build_report(samples, elapsed)
+    mode = f"open loop @ {args.rate:g} req/s" if args.rate else "closed loop"
+    print(f"{mode}, {args.workers} workers, {len(samples)} requests in {elapsed:.2f}s")
+    print(format_report(report))
+    if cache is not None:
+        print(f"Response cache: {cache.format_stats()}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.trend_store:
+        by_story = defaultdict(list)
+        for sample in samples:
+            if sample.status != ERROR_STATUS:
+                by_story[sample.story].append(sample.latency)
+        source = f"load_runner/{f'rate={args.rate:g}' if args.rate else 'closed'}/workers={args.workers}"
+        with TrendStore(args.trend_store) as store:
+            store.append(by_story, source, environment(args.base_url))
+        print(f"Appended to {args.trend_store} as {source}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""
+Replay recorded production traffic against a build of the Books API.
+
+Two log formats are read, line by line, as a generator pipeline. The file is
+never loaded whole, and memory stays at the reorder buffer plus the queue.
+
+Spring (Tomcat) access logs, in the common or combined pattern, optionally
+followed by the duration of the request (``%D``):
+
+    127.0.0.1 - - [18/Oct/2026:10:00:01 +0000] "GET /api/v1/books?title=Gone%20Girl HTTP/1.1" 200 312 5127
+
+JSONL captures, one request per line. ``timestamp`` is epoch seconds or ISO
+8601. ``query``, ``body``, ``status`` and ``latency`` (seconds) are optional:
+
+    {"timestamp": 1792317601.25, "method": "POST", "path": "/api/v1/books", "body": {...}, "status": 201, "latency": 0.004}
+
+Requests are sent at their recorded offsets from the first one, divided by
+``--speed``; ``--speed max`` sends them as fast as the workers can. Latency is
+measured from when a request was due, so a build that falls behind is charged
+for the queueing it causes. The report compares the replayed latency
+distribution of every route with the recorded one, where the log has
+durations. It also shows how often the status code matches.
+
+    python src/test/python/log_replay.py access_log.2026-10-18.txt --speed 10 --workers 32
+    python src/test/python/log_replay.py capture.jsonl.gz --speed max --read-only --json replay.json
+
+Access logs have no request bodies, so a POST or PUT from one is skipped and
+counted. They also log start times at one-second resolution unless the pattern
+adds milliseconds (``%{begin:msec}t`` or a ``.SSS`` date). Lines are written
+when requests complete, so they are re-sorted by start time within a window of
+``--reorder-window`` lines.
+
+Replaying writes changes the catalog of the target: use a scratch server.
+"""
+import argparse
+import gzip
+import heapq
+import itertools
+import json
+import math
+import queue
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import requests
+
+from books_client import DEFAULT_BASE_URL, BooksClient
+from latency_stats import DEFAULT_PERCENTILES, ks_test, percentile_label, summarize
+
+
+DEFAULT_PREFIX = "/api/v1"  # recorded paths are relative to this once stripped
+DEFAULT_REORDER_WINDOW = 1000  # lines
+QUEUE_DEPTH = 4  # requests queued per worker ahead of the clock
+START_DELAY = 0.05  # seconds for the workers to start before the first request is due
+ERROR_STATUS = "ERR"  # recorded when the request raised instead of returning
+SIGNIFICANCE = 0.01  # KS p-value below which a route's latency distribution has changed
+DURATION_UNITS = {"us": 1e-6, "ms": 1e-3, "s": 1.0}
+WITH_BODY = ("POST", "PUT", "PATCH")
+
+ACCESS_LOG = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<target>\S+)(?: [^"]*)?" '
+    r'(?P<status>\d{3}) \S+(?: "[^"]*" "[^"]*")?(?: (?P<duration>\d+(?:\.\d+)?))?\s*$'
+)
+CLF_TIME = ("%d/%b/%Y:%H:%M:%S %z", "%d/%b/%Y:%H:%M:%S.%f %z")
+_ID_SEGMENT = re.compile(r"^-?\d+$")
+
+LogEntry = namedtuple("LogEntry", ["time", "method", "path", "params", "body", "status", "latency"])
+Replayed = namedtuple("Replayed", ["route", "status", "recorded_status", "recorded_latency",
+                                   "latency", "service_time", "lag"])
+
+
+def open_log(path: str) -> TextIO:
+    """A log file as text, gunzipped when it ends in .gz; ``-`` reads stdin."""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _clf_timestamp(text: str) -> float:
+    if text.isdigit():  # %{begin:msec}t: epoch milliseconds
+        return int(text) / 1000
+    for layout in CLF_TIME:
+        try:
+            return datetime.strptime(text, layout).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Unknown access log time: {text}")
+
+
+def _split_target(target: str) -> Tuple[str, Dict[str, str]]:
+    parts = urlsplit(target)
+    return unquote(parts.path), dict(parse_qsl(parts.query, keep_blank_values=True))
+
+
+def parse_jsonl(line: str) -> LogEntry:
+    record = json.loads(line)
+    path, params = _split_target(record["path"])
+    query = record.get("query")
+    if isinstance(query, str):
+        params.update(parse_qsl(query.lstrip("?"), keep_blank_values=True))
+    elif query:
+        params.update(query)
+    body = record.get("body")
+    if isinstance(body, str):
+        body = json.loads(body) if body else None
+    latency = record.get("latency")
+    if latency is None and record.get("duration_ms") is not None:
+        latency = record["duration_ms"] / 1000
+    return LogEntry(_timestamp(record["timestamp"]), record["method"].upper(), path, params or None, body,
+                    record.get("status"), latency)
+
+
+def parse_access_log(line: str, duration_unit: float = DURATION_UNITS["us"]) -> LogEntry:
+    match = ACCESS_LOG.match(line)
+    if match is None:
+        raise ValueError("Not an access log line")
+    path, params = _split_target(match["target"])
+    duration = match["duration"]
+    return LogEntry(_clf_timestamp(match["time"]), match["method"], path, params or None, None,
+                    int(match["status"]), float(duration) * duration_unit if duration is not None else None)
+
+
+def parse_entries(lines: Iterable[str], skipped: Counter, duration_unit: float = DURATION_UNITS["us"]
+                  ) -> Iterator[LogEntry]:
+    """
+    Entries of a log, in file order; each line is read as JSONL when it starts with ``{``.
+
+    Args:
+        lines: Log lines
+        skipped: Counts the lines that could not be parsed, under "unparsable"
+        duration_unit: Seconds per unit of the access log duration field (Tomcat 10 ``%D``: microseconds)
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            if line.startswith("{"):
+                yield parse_jsonl(line)
+            else:
+                yield parse_access_log(line, duration_unit)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            skipped["unparsable"] += 1
+
+
+def select(entries: Iterable[LogEntry], skipped: Counter, prefix: str = DEFAULT_PREFIX,
+           read_only: bool = False) -> Iterator[LogEntry]:
+    """
+    Entries that can be replayed, with paths made relative to the API root.
+
+    Requests outside ``prefix``, bodiless writes, and (with ``read_only``) anything but
+    GET are counted in ``skipped`` instead.
+    """
+    prefix = prefix.rstrip("/")
+    for entry in entries:
+        if prefix and not (entry.path == prefix or entry.path.startswith(prefix + "/")):
+            skipped["outside " + prefix] += 1
+        elif read_only and entry.method != "GET":
+            skipped["not GET (--read-only)"] += 1
+        elif entry.method in WITH_BODY and entry.body is None:
+            skipped["write without body"] += 1
+        else:
+            yield entry._replace(path=entry.path[len(prefix):] or "/")
+
+
+def reorder(entries: Iterable[LogEntry], window: int = DEFAULT_REORDER_WINDOW) -> Iterator[LogEntry]:
+    """
+    Sort entries by start time within a sliding window of ``window`` entries.
+
+    Access logs are written in completion order. A request that started earlier but
+    took longer appears later, within about as many lines as were in flight.
+    """
+    heap: List[Tuple[float, int, LogEntry]] = []
+    for sequence, entry in enumerate(entries):
+        heapq.heappush(heap, (entry.time, sequence, entry))
+        if len(heap) > window:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def schedule(entries: Iterable[LogEntry], speed: float) -> Iterator[Tuple[Optional[float], LogEntry]]:
+    """
+    Pair every entry with its send offset in seconds from the first one.
+
+    The recorded offset is divided by ``speed``. With speed inf the offset is None and
+    requests go out as fast as they can be sent.
+    """
+    origin = None
+    for entry in entries:
+        if speed == math.inf:
+            yield None, entry
+            continue
+        if origin is None:
+            origin = entry.time
+        yield max(0.0, entry.time - origin) / speed, entry
+
+
+def route(method: str, path: str, params: Optional[Dict[str, str]]) -> str:
+    """Route template of a request, e.g. ``GET /books/{id}`` or ``GET /books?author&category``."""
+    template = "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+    query = "&".join(sorted(params)) if params else ""
+    return f"{method} {template}" + (f"?{query}" if query else "")
+
+
+def replay(client: BooksClient, timed: Iterable[Tuple[Optional[float], LogEntry]],
+           workers: int) -> Tuple[List[Replayed], float]:
+    """
+    Send scheduled entries from a worker pool.
+
+    The calling thread is the clock: it hands each entry to the pool when it is due,
+    through a queue of ``QUEUE_DEPTH`` entries per worker. A request is charged
+    from its due time, so time waiting for a free worker counts as latency. ``lag``
+    is how late it was actually sent. Entries without a due time go out as soon as
+    a worker is free.
+
+    Returns:
+        tuple of (one Replayed per request, elapsed seconds)
+    """
+    pending: "queue.Queue[Optional[Tuple[Optional[float], LogEntry]]]" = queue.Queue(maxsize=workers * QUEUE_DEPTH)
+    results: List[List[Replayed]] = [[] for _ in range(workers)]
+
+    def work(index: int):
+        samples = results[index]
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            due, entry = item
+            start = time.perf_counter()
+            if due is None:
+                due = start
+            try:
+                status = client.request(entry.method, entry.path, params=entry.params, json_data=entry.body).status_code
+            except requests.RequestException:
+                status = ERROR_STATUS
+            end = time.perf_counter()
+            samples.append(Replayed(route(entry.method, entry.path, entry.params), status, entry.status,
+                                    entry.latency, end - due, end - start, start - due))
+
+    threads = [threading.Thread(target=work, args=(i,), name=f"replay-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    clock = started + START_DELAY
+    for offset, entry in timed:
+        due = None
+        if offset is not None:
+            due = clock + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        pending.put((due, entry))
+    for _ in threads:
+        pending.put(None)
+    for thread in threads:
+        thread.join()
+    return [sample for samples in results for sample in samples], time.perf_counter() - started
+
+
+def compare(samples: Sequence[Replayed],
+            percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Dict]:
+    """
+    Replayed against recorded latency and status, per route and for "ALL".
+
+    Returns:
+        dict keyed by route with ``requests``, ``replayed`` and ``recorded`` summaries
+        (the latter None without recorded durations), ``ks`` (Kolmogorov-Smirnov test of
+        the two distributions), ``changed`` (its p-value is below SIGNIFICANCE),
+        ``status_match`` (share of requests answered with the recorded status),
+        ``errors`` and ``lag`` (p99 of the send delay behind schedule)
+    """
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample.route].append(sample)
+    by_route["ALL"] = list(samples)
+
+    report = {}
+    for name, group in by_route.items():
+        replayed = [sample.latency for sample in group]
+        recorded = [sample.recorded_latency for sample in group if sample.recorded_latency is not None]
+        with_status = [sample for sample in group if sample.recorded_status is not None]
+        ks = ks_test(recorded, replayed) if recorded else None
+        report[name] = {
+            "requests": len(group),
+            "replayed": summarize(replayed, percentiles),
+            "recorded": summarize(recorded, percentiles) if recorded else None,
+            "ks": ks,
+            "changed": ks is not None and ks["p"] < SIGNIFICANCE,
+            "status_match": (sum(1 for sample in with_status if sample.status == sample.recorded_status)
+                             / len(with_status)) if with_status else None,
+            "errors": sum(1 for sample in group if sample.status == ERROR_STATUS),
+            "lag": summarize((sample.lag for sample in group), (99,))["p99"],
+        }
+    return report
+
+
+def format_comparison(report: Dict[str, Dict], percentiles: Sequence[float] = (50, 99)) -> str:
+    """Render a comparison as a fixed-width table (latencies in ms, recorded -> replayed)."""
+    labels = [percentile_label(q) for q in percentiles]
+    header = (f"{'Route':<32}{'Reqs':>7}" + "".join(f"{label + ' rec -> replay':>24}" for label in labels)
+              + f"{'KS D':>7}{'p':>9}{'Status=':>9}{'Errors':>8}")
+    lines = [header, "-" * len(header)]
+    for name, entry in sorted(report.items(), key=lambda item: (item[0] == "ALL", item[0])):
+        cells = []
+        for label in labels:
+            recorded = f"{entry['recorded'][label] * 1000:.2f}" if entry["recorded"] else "-"
+            cells.append(f"{recorded + ' -> ' + format(entry['replayed'][label] * 1000, '.2f'):>24}")
+        ks = entry["ks"]
+        match = "-" if entry["status_match"] is None else f"{entry['status_match']:.1%}"
+        lines.append(f"{name[:31]:<32}{entry['requests']:>7}" + "".join(cells)
+                     + (f"{ks['d']:>7.3f}{ks['p']:>9.2g}" if ks else f"{'-':>7}{'-':>9}")
+                     + f"{match:>9}{entry['errors']:>8}" + ("  changed" if entry["changed"] else ""))
+    return "\n".join(lines)
+
+
+def parse_speed(text: str) -> float:
+    """``2``, ``10x``, ``0.5`` or ``max``."""
+    if text.lower() == "max":
+        return math.inf
+    speed = float(text.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive")
+    return speed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a recorded access log or JSONL capture against the "
+                                                 "Books API and compare latencies with the recording.")
+    parser.add_argument("log", help="access log or JSONL capture (.gz is read compressed, - is stdin)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--speed", type=parse_speed, default=1.0,
+                        help="time compression: 1 keeps the recorded timing, 10x sends ten times as fast, max "
+                             "sends as fast as possible (default: 1)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="path prefix of the API in the log")
+    parser.add_argument("--read-only", action="store_true", help="replay GET requests only")
+    parser.add_argument("--limit", type=int, help="replay at most this many requests")
+    parser.add_argument("--duration-unit", choices=sorted(DURATION_UNITS), default="us",
+                        help="unit of the access log duration field (Tomcat 10 %%D: us; Tomcat 9: ms)")
+    parser.add_argument("--reorder-window", type=int, default=DEFAULT_REORDER_WINDOW,
+                        help="lines within which entries are re-sorted by start time")
+    parser.add_argument("--json", help="also write the comparison to this file")
+    args = parser.parse_args(argv)
+
+    skipped = Counter()
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers, trust_env=False)
+    with open_log(args.log) as lines:
+        entries = select(parse_entries(lines, skipped, DURATION_UNITS[args.duration_unit]), skipped,
+                         args.prefix, args.read_only)
+        entries = reorder(entries, args.reorder_window)
+        if args.limit is not None:
+            entries = itertools.islice(entries, args.limit)
+        try:
+            samples, elapsed = replay(client, schedule(entries, args.speed), args.workers)
+        finally:
+            client.close()
+
+    if not samples:
+        print(f"Nothing to replay in {args.log}" + (f" (skipped: {dict(skipped)})" if skipped else ""))
+        return 1
+    report = compare(samples)
+    speed = "max speed" if args.speed == math.inf else f"{args.speed:g}x"
+    print(f"Replayed {len(samples):,} requests at {speed} with {args.workers} workers in {elapsed:.2f}s "
+          f"({len(samples) / elapsed:,.1f} req/s); sent up to {report['ALL']['lag'] * 1000:.1f} ms (p99) "
+          f"behind schedule")
+    if skipped:
+        print("Skipped: " + ", ".join(f"{count:,} {reason}" for reason, count in skipped.most_common()))
+    print(format_comparison(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"skipped": dict(skipped), "elapsed": elapsed, "routes": report}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Client-side pacing of OpenAI calls with one token bucket per model.
+
+Every model gets three buckets sized from its ``OpenAIModel`` limits: requests
+(``rpm``), tokens per minute (``tpm``) and tokens per day (``tpd``). A call is
+charged its estimated prompt tokens plus ``max_tokens`` up front, the way the
+API counts it, and queued until every bucket of some model can pay for it. When
+several models are given, each call goes to the model that can take it first,
+so work spreads over the catalog once one model is saturated. A 429 that slips
+through pauses the model for its ``retry-after`` and the call is re-queued.
+
+    scheduler = ModelScheduler([OpenAIModel.GPT_4O_MINI, OpenAIModel.GPT_4_1_MINI])
+    future = scheduler.submit(lambda model: send(model.model_name, prompt), prompt=prompt, max_tokens=500)
+
+    python model_scheduler.py --base-url http://localhost:8089/v1 --models gpt-4o-mini,gpt-4.1-mini --requests 2000
+"""
+import argparse
+import math
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, List, Optional, Sequence
+
+from books_client import BooksClient
+from openai_model import OpenAIModel, get_model
+from rate_limits import DEFAULT_COMPLETION_TOKENS, ModelBudget, estimate_cost
+from seed_catalog import SEED_BOOKS
+
+
+DEFAULT_RETRY_AFTER = 1.0  # seconds, when a 429 carries no retry-after header
+MAX_ATTEMPTS = 3
+DISPATCH_MARGIN = 0.05  # seconds added to budget waits to absorb jitter between us and the server's clock
+
+# Mirrors OpenAIService: the prompt the server sends for /recommendations/{id} and its max_tokens
+RECOMMENDATION_PROMPT = ("List the book titles only, one per line, without any numbering or additional text. "
+                         "Suggest 5 books similar to '{title}' in the '{category}' category")
+RECOMMENDATION_MAX_TOKENS = 1500
+
+
+def recommendation_cost(book_id: int) -> int:
+    """Token cost of ``GET /recommendations/{book_id}`` (seed catalog titles, generic prompt otherwise)."""
+    book = next((b for b in SEED_BOOKS if b["id"] == book_id), {"title": "", "category": ""})
+    return estimate_cost(RECOMMENDATION_PROMPT.format(**book), RECOMMENDATION_MAX_TOKENS)
+
+
+class _Job:
+    __slots__ = ("call", "tokens", "future", "attempts")
+
+    def __init__(self, call: Callable[[OpenAIModel], object], tokens: int):
+        self.call = call
+        self.tokens = tokens
+        self.future = Future()
+        self.attempts = 0
+
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds to wait when ``response`` is a 429, else None."""
+    if getattr(response, "status_code", None) != 429:
+        return None
+    headers = getattr(response, "headers", {}) or {}
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    return float(headers.get("retry-after") or DEFAULT_RETRY_AFTER)
+
+
+class ModelScheduler:
+    """
+    Queues calls and releases them at the highest rate the models' limits allow.
+
+    Args:
+        models: Models the calls may be sent to, in order of preference
+        workers: Maximum number of calls in flight
+        limit_scale: Multiplier applied to every model limit (match the stand-in's ``--limit-scale``)
+    """
+
+    def __init__(self, models: Sequence[OpenAIModel], workers: int = 8, limit_scale: float = 1.0):
+        if not models:
+            raise ValueError("At least one model is required")
+        now = time.monotonic()
+        self.budgets = [ModelBudget(model, limit_scale, now) for model in models]
+        self.dispatched: Counter = Counter()
+        self.throttled: Counter = Counter()
+        self._queue: Deque[_Job] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-call")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="model-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, call: Callable[[OpenAIModel], object], prompt: str = "",
+               max_tokens: Optional[int] = DEFAULT_COMPLETION_TOKENS, tokens: Optional[int] = None) -> Future:
+        """
+        Queue ``call(model)`` to run once a model has budget for it.
+
+        Args:
+            call: Sends the request to the given model and returns its response
+            prompt: Prompt text, used to estimate the token cost
+            max_tokens: Completion budget of the call, charged up front
+            tokens: Explicit token cost, overriding the estimate
+
+        Returns:
+            Future resolving to the value returned by ``call``
+        """
+        job = _Job(call, tokens if tokens is not None else estimate_cost(prompt, max_tokens))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+            self._queue.append(job)
+            self._condition.notify()
+        return job.future
+
+    def _dispatch(self):
+        with self._condition:
+            while True:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                job = self._queue[0]
+                now = time.monotonic()
+                ready, budget = self._earliest(job.tokens, now)
+                if math.isinf(ready):
+                    self._queue.popleft()
+                    job.future.set_exception(ValueError(
+                        f"A call costing {job.tokens} tokens exceeds the limits of every model"))
+                    continue
+                if ready > now:
+                    self._condition.wait(ready - now + DISPATCH_MARGIN)
+                    continue
+                self._queue.popleft()
+                budget.take(job.tokens, now)
+                self.dispatched[budget.spec.model_name] += 1
+                self._executor.submit(self._run, job, budget)
+
+    def _earliest(self, tokens: int, now: float):
+        best = None
+        for budget in self.budgets:
+            ready = budget.ready_at(tokens, now)
+            if best is None or ready < best[0]:
+                best = (ready, budget)
+        return best
+
+    def _run(self, job: _Job, budget: ModelBudget):
+        job.attempts += 1
+        try:
+            result = job.call(budget.spec)
+        except Exception as e:
+            job.future.set_exception(e)
+            return
+        wait = _retry_after(result)
+        if wait is None or job.attempts >= MAX_ATTEMPTS:
+            job.future.set_result(result)
+            return
+        with self._condition:
+            self.throttled[budget.spec.model_name] += 1
+            budget.pause(wait, time.monotonic())
+            self._queue.appendleft(job)
+            self._condition.notify()
+
+    def close(self, wait: bool = True):
+        """Stop accepting calls; with ``wait`` finish the queued ones first."""
+        with self._condition:
+            self._closed = True
+            if not wait:
+                while self._queue:
+                    self._queue.popleft().future.cancel()
+            self._condition.notify()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Fan chat completions out over models within their rate limits.")
+    parser.add_argument("--base-url", default="http://localhost:8089/v1", help="OpenAI-compatible API root")
+    parser.add_argument("--api-key", default="stub")
+    parser.add_argument("--models", default="gpt-4o-mini", help="comma-separated model names")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--max-tokens", type=int, default=RECOMMENDATION_MAX_TOKENS)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--limit-scale", type=float, default=1.0, help="multiply every model limit by this factor")
+    args = parser.parse_args(argv)
+
+    models = [get_model(name.strip()) for name in args.models.split(",") if name.strip()]
+    prompt = RECOMMENDATION_PROMPT.format(title="The Hobbit", category="Fantasy")
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers, timeout=60)
+    headers = {"Authorization": f"Bearer {args.api_key}"}
+
+    def call(model: OpenAIModel):
+        body = {"model": model.model_name, "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": args.max_tokens}
+        return client.post("/chat/completions", json_data=body, headers=headers)
+
+    start = time.perf_counter()
+    with ModelScheduler(models, workers=args.workers, limit_scale=args.limit_scale) as scheduler:
+        futures = [scheduler.submit(call, prompt=prompt, max_tokens=args.max_tokens) for _ in range(args.requests)]
+        statuses = Counter(future.result().status_code for future in futures)
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    print(f"{args.requests} calls in {elapsed:.2f}s ({args.requests / elapsed:.1f} calls/s), statuses {dict(statuses)}")
+    for budget in scheduler.budgets:
+        name = budget.spec.model_name
+        print(f"  {name:<24}{scheduler.dispatched[name]:>8} dispatched{scheduler.throttled[name]:>6} throttled")
+
+
+if __name__ == "__main__":
+    main()
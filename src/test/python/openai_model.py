@@ -74,8 +74,29 @@ class OpenAIModel(Enum):
     def is_transcribe_model(self): return self.model_type == "transcribe"
 
 
+# Catalog indexes, built once: lookups by name and type no longer scan the enum
+MODELS_BY_NAME = {model.model_name: model for model in OpenAIModel}
+MODELS_BY_TYPE = {
+    task_type: [model for model in OpenAIModel if model.model_type == task_type]
+    for task_type in dict.fromkeys(model.model_type for model in OpenAIModel)
+}
+CHEAPEST_BY_TYPE = {task_type: min(models, key=lambda m: m.tpm) for task_type, models in MODELS_BY_TYPE.items()}
+
+
+def get_model(name):
+    """Return the OpenAIModel with this model name (raises ValueError if unknown)."""
+    try:
+        return MODELS_BY_NAME[name]
+    except KeyError:
+        raise ValueError(f"Unknown model '{name}'") from None
+
+
 # Optional helper function to get the cheapest model by TPM
 def get_cheapest_model(models, task_type="chat"):
+    if models is OpenAIModel:
+        if task_type not in CHEAPEST_BY_TYPE:
+            raise ValueError(f"No models found for task type '{task_type}'")
+        return CHEAPEST_BY_TYPE[task_type]
     filtered = [m for m in models if m.model_type == task_type]
     if not filtered:
         raise ValueError(f"No models found for task type '{task_type}'")
@@ -86,4 +107,4 @@ def get_learning_model(models):
     """
     Returns the cheapest chat model suitable for online learning/practice.
     """
-    return get_cheapest_model(models, task_type="chat")
\ No newline at end of file
+    return get_cheapest_model(models, task_type="chat")
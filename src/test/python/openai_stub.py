@@ -0,0 +1,331 @@
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+It answers ``POST /v1/chat/completions`` (plain and ``"stream": true``) with book
+titles from the seed catalog and enforces the per-model ``rpm``, ``tpm`` and
+``tpd`` limits of ``OpenAIModel`` as continuously refilled buckets (see
+``rate_limits.py``): over-limit requests get a 429 with ``retry-after`` and
+``x-ratelimit-*`` headers. Latency is drawn from a configurable distribution, so the recommendations path
+can be load-tested, and its behavior under upstream throttling observed,
+without network access or an API key.
+
+    python openai_stub.py --port 8089 --latency lognormal:0.8,0.4 --token-latency 0.01
+    OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=stub mvn spring-boot:run
+
+    pytest --openai-stub=fixed:0.05      # the spawned server talks to an in-process stub
+
+Latency specs: ``fixed:S``, ``uniform:LOW,HIGH``, ``normal:MEAN,STD``,
+``lognormal:MEDIAN,SIGMA`` and ``exponential:MEAN`` (seconds).
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from openai_model import ModelSpec, OpenAIModel
+from rate_limits import (CHARS_PER_TOKEN, DEFAULT_COMPLETION_TOKENS, ModelBudget, estimate_prompt_tokens,
+                         estimate_tokens)
+from seed_catalog import seed_books
+
+
+DEFAULT_PORT = 8089
+DEFAULT_LATENCY = "fixed:0"
+REQUESTED_COUNT = re.compile(r"(\d+) books")
+
+Distribution = Callable[[random.Random], float]
+
+
+def parse_distribution(spec: str) -> Distribution:
+    """
+    Parse a latency spec such as ``lognormal:0.8,0.4`` into a sampler.
+
+    Args:
+        spec: ``kind:arg[,arg]`` with the kinds listed in the module docstring
+
+    Returns:
+        callable taking a ``random.Random`` and returning a delay in seconds (never negative)
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec '{spec}'") from None
+    samplers = {
+        "fixed": (1, lambda rng, s: s),
+        "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+        "normal": (2, lambda rng, mean, std: rng.gauss(mean, std)),
+        "lognormal": (2, lambda rng, median, sigma: median * math.exp(rng.gauss(0, sigma))),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1 / mean) if mean > 0 else 0.0),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(f"Invalid latency spec '{spec}', expected one of: "
+                         "fixed:S, uniform:LOW,HIGH, normal:MEAN,STD, lognormal:MEDIAN,SIGMA, exponential:MEAN")
+    sampler = samplers[kind][1]
+    return lambda rng: max(0.0, sampler(rng, *values))
+
+
+class ModelLimiter:
+    """Enforces one model's requests-per-minute, tokens-per-minute and tokens-per-day limits."""
+
+    def __init__(self, spec: ModelSpec, scale: float = 1.0):
+        self.budget = ModelBudget(spec, scale)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int, now: Optional[float] = None) -> Tuple[Optional[str], float, Dict[str, str]]:
+        """
+        Admit a request costing ``tokens`` or report which limit it hits.
+
+        Returns:
+            tuple of (exceeded limit "requests"/"tokens"/"tokens_per_day" or None,
+            seconds to wait before retrying, ``x-ratelimit-*`` headers)
+        """
+        now = time.monotonic() if now is None else now
+        budget = self.budget
+        with self._lock:
+            ready = budget.ready_times(tokens, now)
+            exceeded, ready_at = max(ready.items(), key=lambda item: item[1])
+            wait = ready_at - now
+            if wait <= 0:
+                exceeded = None
+                budget.take(tokens, now)
+            headers = {
+                "x-ratelimit-limit-requests": str(budget.rpm),
+                "x-ratelimit-limit-tokens": str(budget.tpm),
+                "x-ratelimit-remaining-requests": str(max(0, int(budget.requests.available(now)))),
+                "x-ratelimit-remaining-tokens": str(max(0, int(budget.tokens.available(now)))),
+                "x-ratelimit-reset-requests": f"{max(0.0, ready['requests'] - now):.3f}s",
+                "x-ratelimit-reset-tokens": f"{max(0.0, ready['tokens'] - now):.3f}s",
+            }
+            return exceeded, wait, headers
+
+
+class OpenAIStub:
+    """
+    In-process chat-completions server.
+
+    Args:
+        port: Port to listen on (0 picks a free one)
+        latency: Latency spec for the time to first token
+        token_latency: Seconds between generated tokens (streaming chunk spacing)
+        limit_scale: Multiplier applied to every model limit, e.g. 0.01 to provoke 429s quickly
+        seed: Seed for latency sampling and generated titles
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, latency: str = DEFAULT_LATENCY, token_latency: float = 0.0,
+                 limit_scale: float = 1.0, seed: Optional[int] = None, host: str = "localhost"):
+        self.models: Dict[str, ModelSpec] = {model.model_name: model.value for model in OpenAIModel}
+        self.limiters = {name: ModelLimiter(spec, limit_scale) for name, spec in self.models.items()}
+        self.latency = parse_distribution(latency)
+        self.token_latency = token_latency
+        self.titles = [book["title"] for book in seed_books()]
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+
+        stub = self
+
+        class Handler(_Handler):
+            server_stub = stub
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def sample_latency(self) -> float:
+        with self._rng_lock:
+            return self.latency(self._rng)
+
+    def complete(self, messages: List[Dict]) -> str:
+        """Book titles, one per line, as many as the prompt asks for (5 by default)."""
+        prompt = " ".join(str(m.get("content") or "") for m in messages)
+        match = REQUESTED_COUNT.search(prompt)
+        count = int(match.group(1)) if match else 5
+        candidates = [title for title in self.titles if title not in prompt]
+        with self._rng_lock:
+            picks = self._rng.sample(candidates, min(count, len(candidates)))
+        return "\n".join(picks)
+
+    def count(self, model: str, **increments: int):
+        """Add to a model's counters; every handler thread calls this, so it holds the stats lock."""
+        with self._stats_lock:
+            counters = self.stats[model]
+            for name, amount in increments.items():
+                counters[name] += amount
+
+    def stats_snapshot(self) -> Dict[str, Dict[str, int]]:
+        """A consistent copy of the counters, taken while no handler is updating them."""
+        with self._stats_lock:
+            return {model: dict(counters) for model, counters in self.stats.items()}
+
+    def next_id(self) -> str:
+        return f"chatcmpl-stub-{next(self._ids)}"
+
+    def start(self) -> "OpenAIStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="openai-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_stub: OpenAIStub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str, error_type: str, code: Optional[str] = None,
+               headers: Optional[Dict[str, str]] = None):
+        self._send_json(status, {"error": {"message": message, "type": error_type, "param": None, "code": code}},
+                        headers)
+
+    def do_GET(self):
+        stub = self.server_stub
+        if self.path.rstrip("/") == "/v1/models":
+            data = [{"id": name, "object": "model", "owned_by": "stub"} for name in stub.models]
+            return self._send_json(HTTPStatus.OK, {"object": "list", "data": data})
+        if self.path.rstrip("/") == "/stats":
+            return self._send_json(HTTPStatus.OK, stub.stats_snapshot())
+        self._error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}", "invalid_request_error")
+
+    def do_POST(self):
+        stub = self.server_stub
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._error(HTTPStatus.BAD_REQUEST, "Invalid JSON body", "invalid_request_error")
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            return self._error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}", "invalid_request_error")
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._error(HTTPStatus.UNAUTHORIZED, "No API key provided", "invalid_request_error",
+                               "invalid_api_key")
+
+        model = body.get("model")
+        if model not in stub.models:
+            return self._error(HTTPStatus.NOT_FOUND, f"The model '{model}' does not exist", "invalid_request_error",
+                               "model_not_found")
+        messages = body.get("messages") or []
+        prompt_tokens = estimate_prompt_tokens(messages)
+        max_tokens = body.get("max_tokens")
+        stub.count(model, requests=1)
+
+        # Like the real API, the token limit is charged prompt + max_tokens up front
+        exceeded, wait, headers = stub.limiters[model].acquire(prompt_tokens + (max_tokens or DEFAULT_COMPLETION_TOKENS))
+        if exceeded and math.isinf(wait):
+            stub.count(model, too_large=1)
+            return self._error(HTTPStatus.TOO_MANY_REQUESTS,
+                               f"Request too large for {model} on {exceeded}: it can never fit the limit.",
+                               exceeded, "rate_limit_exceeded", headers)
+        if exceeded:
+            stub.count(model, throttled=1, **{f"throttled_{exceeded}": 1})
+            headers.update({"retry-after": str(math.ceil(wait)), "retry-after-ms": str(int(wait * 1000))})
+            return self._error(HTTPStatus.TOO_MANY_REQUESTS,
+                               f"Rate limit reached for {model} on {exceeded}. Please try again in {wait:.3f}s.",
+                               exceeded, "rate_limit_exceeded", headers)
+
+        content = stub.complete(messages)
+        finish_reason = "stop"
+        if max_tokens is not None and estimate_tokens(content) > max_tokens:
+            content, finish_reason = content[:max_tokens * CHARS_PER_TOKEN], "length"
+        completion_tokens = estimate_tokens(content)
+        stub.count(model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        time.sleep(stub.sample_latency())
+        if body.get("stream"):
+            return self._stream(model, content, finish_reason, headers)
+
+        time.sleep(stub.token_latency * completion_tokens)
+        self._send_json(HTTPStatus.OK, {
+            "id": stub.next_id(),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }, headers)
+
+    def _stream(self, model: str, content: str, finish_reason: str, headers: Dict[str, str]):
+        stub = self.server_stub
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        completion_id, created = stub.next_id(), int(time.time())
+
+        def event(delta: Dict, reason: Optional[str] = None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": reason}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+
+        event({"role": "assistant", "content": ""})
+        pieces = [content[i:i + CHARS_PER_TOKEN] for i in range(0, len(content), CHARS_PER_TOKEN)]
+        for piece in pieces:
+            time.sleep(stub.token_latency)
+            event({"content": piece})
+        event({}, finish_reason)
+        self._write_chunk("data: [DONE]\n\n")
+        self._write_chunk("")  # terminating zero-length chunk
+
+    def _write_chunk(self, text: str):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Local OpenAI chat-completions stand-in enforcing OpenAIModel limits.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default=DEFAULT_LATENCY, help="time to first token, e.g. lognormal:0.8,0.4")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--limit-scale", type=float, default=1.0, help="multiply every model limit by this factor")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    stub = OpenAIStub(args.port, args.latency, args.token_latency, args.limit_scale, args.seed, args.host)
+    print(f"OpenAI stand-in listening on {stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Mutation-aware parallel scheduler for the endpoint suite.
+
+Every test is classified by the request it sends: which books it reads and,
+when it is expected to succeed with a mutating method, which books it writes
+(by id, title, author and category). Two tests conflict when one writes a
+resource the other reads or writes.
+
+The requests are sent concurrently on a worker pool, each one waiting only for
+the earlier requests it conflicts with, so every response is the one a serial
+run in file order would get. Pytest then runs the tests as usual and the shared
+BooksClient answers each test's request with its prefetched response, keeping
+fixtures, assertions and Allure reporting on pytest's normal serial path.
+
+    pytest --parallel-cases=8
+    pytest --parallel-cases=8 --schedule-plan    # print the dependency plan
+
+Tests in ``test_cases`` / parametrize tables are classified automatically.
+Other tests declare their request with ``@pytest.mark.api_call(method, endpoint, ...)``;
+unclassified tests run alone, after everything before them and before everything after.
+
+A segment is prefetched before its first test runs, so every write in it has
+reached the server by the time its tests run. ``--latency-repeat`` would repeat
+the reads against that later state, and is rejected together with
+``--parallel-cases``.
+
+The client's response hooks (the cassette, the response cache, the conformance
+mirror) see prefetched responses when they arrive: on the prefetch threads and
+before the segment's tests run, not in file order. A response reaches them only
+after the responses of the requests it waits for, so cache invalidation and the
+mirror's catalog still follow the server. What a hook ties to the running test,
+such as the mirror's context, names the test that ran before the segment. The
+answers the tests receive from the prefetch do not go through the hooks again.
+"""
+import re
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Set
+
+import pytest
+import requests
+
+from books_client import BooksClient, get_client, request_key
+from seed_catalog import seed_books
+
+
+EVERYTHING = "*"
+ALL_BOOKS = "all"
+BOOK_FIELDS = ("title", "author", "category", "rating")
+MUTATING_METHODS = ("POST", "PUT", "DELETE")
+ID_ENDPOINT = re.compile(r"^/(books|recommendations)/(-?\d+)$")
+
+ApiCall = namedtuple("ApiCall", ["method", "endpoint", "params", "payload", "expected_status"])
+CaseAccess = namedtuple("CaseAccess", ["reads", "writes"])
+EXCLUSIVE = CaseAccess(frozenset([EVERYTHING]), frozenset([EVERYTHING]))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("parallel", "mutation-aware parallel execution")
+    group.addoption("--parallel-cases", type=int, default=1,
+                    help="send non-conflicting requests concurrently on this many threads (default: 1)")
+    group.addoption("--schedule-plan", action="store_true",
+                    help="print every test's resources and the tests it waits for")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "api_call(method, endpoint, params=None, payload=None, expected_status=None): "
+                                       "request a test sends, used by the parallel scheduler")
+    if config.getoption("parallel_cases") > 1 and config.getoption("latency_repeat", 1) > 1:
+        raise pytest.UsageError("--latency-repeat cannot be combined with --parallel-cases: the reads are "
+                                "prefetched, so their repeats would see the writes of later tests")
+    if config.getoption("parallel_cases") > 1 or config.getoption("schedule_plan"):
+        config.pluginmanager.register(ParallelScheduler(config), "parallel_scheduler_runner")
+
+
+def _book_keys(book: Dict) -> Set[str]:
+    keys = {f"id:{book['id']}", ALL_BOOKS}
+    keys.update(f"{field}:{str(book[field]).lower()}" for field in ("title", "author", "category") if book.get(field))
+    return keys
+
+
+class CatalogModel:
+    """
+    Sequential model of ``BookController`` state used to resolve what a request touches.
+
+    Mutations expected to succeed are applied to the model, so later requests
+    are resolved against the catalog as it will be when they run.
+    """
+
+    def __init__(self, books: Optional[List[Dict]] = None):
+        self.books = books if books is not None else seed_books()
+
+    def _matching(self, field: str, value) -> List[Dict]:
+        if field == "id":
+            return [book for book in self.books if book["id"] == value]
+        return [book for book in self.books if str(book[field]).lower() == str(value).lower()]
+
+    def access(self, call: ApiCall) -> CaseAccess:
+        """Return the resources read and written by a request and apply its effect."""
+        method = call.method.upper()
+        params = call.params or {}
+        match = ID_ENDPOINT.match(call.endpoint)
+        book_id = int(match.group(2)) if match else None
+        reads, writes = set(), set()
+
+        if book_id is not None and book_id < 1:
+            return CaseAccess(frozenset(), frozenset())  # rejected before state is read
+        if book_id is not None:
+            reads.add(f"id:{book_id}")
+        else:
+            reads.update(f"{field}:{str(value).lower()}" for field, value in params.items())
+            if method == "GET" and not params:
+                reads.add(ALL_BOOKS)
+        if method == "POST" and call.payload and call.payload.get("title"):
+            reads.add(f"title:{str(call.payload['title']).lower()}")
+
+        succeeds = call.expected_status is not None and 200 <= int(call.expected_status) < 300
+        if method in MUTATING_METHODS and (succeeds or call.expected_status is None):
+            writes = self._apply(method, book_id, params, call.payload or {})
+        return CaseAccess(frozenset(reads), frozenset(writes))
+
+    def _apply(self, method: str, book_id: Optional[int], params: Dict, payload: Dict) -> Set[str]:
+        if method == "POST":
+            book = {"id": len(self.books) + 1, **{field: payload.get(field) for field in BOOK_FIELDS}}
+            self.books.append(book)
+            return _book_keys(book)
+
+        if book_id is not None:
+            targets = self._matching("id", book_id)
+        elif "title" in params:
+            targets = self._matching("title", params["title"])
+        else:
+            targets = []
+        if not targets:
+            return {EVERYTHING}  # the model cannot tell what changes: be safe
+
+        writes = set()
+        for book in targets:
+            writes |= _book_keys(book)
+            if method == "DELETE":
+                self.books.remove(book)
+            else:
+                book.update({field: payload[field] for field in BOOK_FIELDS if field in payload})
+                writes |= _book_keys(book)
+        return writes
+
+
+def conflicts(first: CaseAccess, second: CaseAccess) -> bool:
+    """True when the two accesses cannot run concurrently."""
+    if EVERYTHING in first.writes and (second.reads or second.writes):
+        return True
+    if EVERYTHING in second.writes and (first.reads or first.writes):
+        return True
+    if EVERYTHING in first.reads and second.writes or EVERYTHING in second.reads and first.writes:
+        return True
+    return bool(first.writes & (second.reads | second.writes) or second.writes & first.reads)
+
+
+def api_call_for(item) -> Optional[ApiCall]:
+    """Work out the request a collected test sends, or None when it cannot be classified."""
+    callspec = getattr(item, "callspec", None)
+    params = callspec.params if callspec else {}
+
+    case = params.get("case")
+    if isinstance(case, dict):
+        for group, cases in getattr(item.module, "test_cases", {}).items():
+            if any(c is case for c in cases):
+                method = "GET" if group == "RECOMMEND" else group
+                return ApiCall(method, case["endpoint"], case.get("params"), case.get("payload"),
+                               case.get("expected_status"))
+
+    marker = item.get_closest_marker("api_call")
+    if marker:
+        method, endpoint = marker.args[:2]
+        return ApiCall(
+            method,
+            endpoint,
+            marker.kwargs.get("params", params.get("params")),
+            marker.kwargs.get("payload", params.get("payload", params.get("book"))),
+            marker.kwargs.get("expected_status", params.get("expected_status")),
+        )
+    return None
+
+
+def classify(items) -> List[CaseAccess]:
+    """Return the resources every item touches, resolved in collection order."""
+    model = CatalogModel()
+    return [model.access(call) if call else EXCLUSIVE for call in map(api_call_for, items)]
+
+
+def build_plan(accesses: Sequence[CaseAccess]) -> List[Set[int]]:
+    """Return, for every item, the indexes of the earlier items it must wait for."""
+    return [
+        {j for j in range(i) if conflicts(accesses[j], accesses[i])}
+        for i in range(len(accesses))
+    ]
+
+
+def prefetch(client: BooksClient, calls: Dict[int, ApiCall], plan: Sequence[Set[int]],
+             workers: int) -> Dict[int, requests.Response]:
+    """
+    Send the given requests concurrently, each after the requests it depends on.
+
+    The client's response hooks run on the worker threads as each response
+    arrives; a request is sent only once the hooks of its dependencies are done.
+
+    Args:
+        client: Client used to send the requests
+        calls: Item index -> request to send
+        plan: Dependencies from build_plan (indexes outside ``calls`` are ignored)
+        workers: Number of concurrent requests
+
+    Returns:
+        dict of item index -> response (exceptions are stored as the value)
+    """
+    waiting = {i: plan[i] & calls.keys() for i in calls}
+    dependents = {i: [j for j in calls if i in waiting[j]] for i in calls}
+    responses = {}
+
+    def send(index: int):
+        call = calls[index]
+        try:
+            return index, client.request(call.method, call.endpoint, params=call.params, json_data=call.payload)
+        except Exception as e:
+            return index, e
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") as pool:
+        running = set()
+        while waiting or running:
+            for index in sorted(i for i, deps in waiting.items() if not deps):
+                del waiting[index]
+                running.add(pool.submit(send, index))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, response = future.result()
+                responses[index] = response
+                for dependent in dependents[index]:
+                    waiting[dependent].discard(index)
+    return responses
+
+
+class ParallelScheduler:
+    def __init__(self, config):
+        self.config = config
+        self.workers = config.getoption("parallel_cases")
+        self.show_plan = config.getoption("schedule_plan")
+        self._prefetched: Dict[str, tuple] = {}
+        self._current: Optional[str] = None
+        self._client: Optional[BooksClient] = None
+
+    def _attach(self):
+        """Keep the interceptor on the shared client; the server fixture replaces it on the first test."""
+        client = get_client()
+        if client is self._client:
+            return
+        self._detach()
+        client.add_interceptor(self._intercept)
+        self._client = client
+
+    def _detach(self):
+        if self._client is not None:
+            self._client.remove_interceptor(self._intercept)
+            self._client = None
+
+    def _print_plan(self, items, plan, accesses):
+        reporter = self.config.pluginmanager.get_plugin("terminalreporter")
+        reporter.section("schedule plan")
+        for index, (item, deps, access) in enumerate(zip(items, plan, accesses)):
+            resources = ", ".join(sorted(access.writes)) or "-"
+            waits = ", ".join(str(d) for d in sorted(deps)) or "-"
+            reporter.write_line(f"[{index:>3}] {item.nodeid}\n      writes: {resources}\n      waits for: {waits}")
+        independent = sum(1 for deps in plan if not deps)
+        reporter.write_line(f"{len(items)} tests, {independent} with no dependencies")
+
+    def _intercept(self, method, endpoint, params, json_data) -> Optional[requests.Response]:
+        entry = self._prefetched.get(self._current)
+        if entry is None or entry[0] != request_key(method, endpoint, params, json_data):
+            return None
+        del self._prefetched[self._current]
+        if isinstance(entry[1], Exception):
+            raise entry[1]
+        return entry[1]
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item):
+        self._current = item.nodeid
+        try:
+            return (yield)
+        finally:
+            self._current = None
+
+    def _prefetch_segment(self, items, calls: Dict[int, ApiCall], plan):
+        client = get_client()
+        responses = prefetch(client, calls, plan, self.workers)
+        for index, response in responses.items():
+            call = calls[index]
+            key = request_key(call.method, call.endpoint, call.params, call.payload)
+            self._prefetched[items[index].nodeid] = (key, response)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        if session.config.option.collectonly or not session.items:
+            return None
+        if session.testsfailed and not session.config.option.continue_on_collection_errors:
+            raise session.Interrupted(f"{session.testsfailed} error(s) during collection")
+
+        items = session.items
+        accesses = classify(items)
+        plan = build_plan(accesses)
+        if self.show_plan:
+            self._print_plan(items, plan, accesses)
+        if self.workers <= 1:
+            return None  # let pytest run them serially
+
+        try:
+            for index, item in enumerate(items):
+                self._attach()
+                # The first test runs live: it brings up the session fixtures (the server).
+                # Every later classified test is prefetched in segments that end at the
+                # next test the scheduler cannot classify, which runs live on its own.
+                if index > 0 and item.nodeid not in self._prefetched and accesses[index] is not EXCLUSIVE:
+                    end = next((j for j in range(index, len(items)) if accesses[j] is EXCLUSIVE), len(items))
+                    calls = {j: api_call_for(items[j]) for j in range(index, end)}
+                    self._prefetch_segment(items, calls, plan)
+
+                nextitem = items[index + 1] if index + 1 < len(items) else None
+                item.config.hook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+                self._prefetched.pop(item.nodeid, None)
+                if session.shouldfail:
+                    raise session.Failed(session.shouldfail)
+                if session.shouldstop:
+                    raise session.Interrupted(session.shouldstop)
+        finally:
+            self._detach()
+        return True
@@ -0,0 +1,804 @@
+"""
+Generative fuzzing of the ``POST /books`` and ``PUT /books/{id}`` payload validation.
+
+``invalid_rules`` in test_endpoints lists a few bad values per field. This tool
+derives whole value classes from the same rules instead: the bounds come from
+their error messages, and ``TITLE_RULE`` adds the title, which they leave out.
+The classes are:
+
+- boundaries: min, max, min - 1, max + 1;
+- unicode and astral-plane strings;
+- oversized strings;
+- wrong JSON types, null and missing fields.
+
+Every payload has an expected verdict derived from the same rules. Lengths are
+counted in UTF-16 code units, as Bean Validation's ``@Size`` counts them. The
+payloads are sent from a pool of workers over kept-alive connections, at
+thousands of requests per second. A response that contradicts the verdict is a
+failure:
+
+- an invalid payload accepted;
+- a valid payload rejected;
+- a 5xx or a dropped connection;
+- a 400 whose detail does not list the violated rules;
+- an accepted value that is not stored as sent.
+
+Failures are grouped by response signature (method, route, failure kind,
+status and the detail with numbers and quoted values blanked out). A few
+examples of every group are shrunk to a minimal reproducer. Each field that
+does not matter is reset to a valid baseline value, then strings are shortened
+and numbers pulled towards zero, while the signature still reproduces.
+
+    python payload_fuzzer.py --requests 100000 --workers 32
+    python payload_fuzzer.py --endpoint put --duration 60
+    python payload_fuzzer.py --seed 7 --json findings.json
+
+Valid payloads create real books. They are deleted again at the end, along with
+the books the PUT phase updates. Every PUT worker updates a target book of its
+own. ``PUT /books/{id}`` has no ``@Valid``, so an invalid update is stored, and a
+null field then breaks the ``Map.of`` of every later update of that book and the
+duplicate check of ``POST /books``. A target that accepted an invalid update is
+therefore put back to a valid book before its next case. One that stored a null
+is deleted and replaced by a fresh book, while no other update is in flight.
+POST is fuzzed before PUT so that it never meets such a book.
+"""
+import argparse
+import contextlib
+import json
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import requests
+
+from books_client import DEFAULT_BASE_URL, BooksClient
+from test_endpoints import invalid_rules
+
+
+TITLE_RULE = {"type": str, "error_msg": "Title must be between 10 and 50 characters"}  # not in invalid_rules
+REQUIRED_MSG = "{} is required"  # @NotEmpty on every string field of BookRequest
+FIELD_ORDER = ("title", "author", "category", "rating")
+ENDPOINTS = ("post", "put")
+VALID, INVALID, EITHER = "valid", "invalid", "either"  # EITHER: Jackson may coerce the value or reject it
+MISSING = object()  # the field is left out of the payload
+
+MUTATED_FIELDS_WEIGHTS = (1, 7, 2)  # payloads with 0, 1 or 2 fields outside the valid classes
+OVERSIZED_LENGTHS = (1_000, 10_000, 100_000, 1_000_000)
+EXAMPLES_PER_SIGNATURE = 4  # payloads kept (and shrunk) per response signature
+MAX_SHRINK_REQUESTS = 64  # requests spent shrinking one example
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines
+DETAIL_SHAPE_LENGTH = 120
+MAX_QUERY_TITLE = 1024  # bytes; longer titles are cleaned up by id
+REPRODUCER_LENGTH = 200  # characters of a reproducer printed
+
+# Sample alphabets for generated strings; the astral ones take two UTF-16 code units each
+ASCII = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .,'-&"
+UNICODE = "éüñçøßłşžأبتשלוםДжЯ中文字日本語한국어ॐ́​‮"
+ASTRAL = "😀📚🐉𝔘𝕟𝖎𠜎"
+
+FieldSpec = namedtuple("FieldSpec", ["name", "type", "low", "high", "message"])
+Value = namedtuple("Value", ["kind", "value", "verdict", "messages"])
+FuzzCase = namedtuple("FuzzCase", ["index", "values", "extra"])
+Finding = namedtuple("Finding", ["signature", "count", "reproducers", "unreproduced"])
+FuzzReport = namedtuple("FuzzReport", ["sent", "elapsed", "statuses", "findings", "left_behind", "targets_replaced"])
+
+
+def field_specs(rules: Dict = invalid_rules) -> List[FieldSpec]:
+    """
+    Field constraints of ``BookRequest``, read from ``invalid_rules``-shaped definitions.
+
+    Args:
+        rules: Per-field ``{"type", "error_msg"}`` entries whose message states the bounds
+            ("... between 10 and 25 ..."); entries without a type, such as the
+            conflict case, are skipped. A missing ``title`` entry is taken from ``TITLE_RULE``.
+
+    Returns:
+        One FieldSpec per field, in payload order
+    """
+    rules = {"title": TITLE_RULE, **rules}
+    specs = []
+    for name in FIELD_ORDER:
+        rule = rules.get(name)
+        if not rule or "type" not in rule:
+            continue
+        bounds = re.search(r"between (\d+) and (\d+)", rule["error_msg"])
+        if bounds is None:
+            raise ValueError(f"No bounds in the {name} rule message '{rule['error_msg']}'")
+        specs.append(FieldSpec(name, rule["type"], int(bounds.group(1)), int(bounds.group(2)), rule["error_msg"]))
+    return specs
+
+
+def java_length(text: str) -> int:
+    """Length as ``String.length()`` counts it: UTF-16 code units."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _text(rng: random.Random, alphabet: str, length: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def _string_value(spec: FieldSpec, kind: str, rng: random.Random) -> Value:
+    required = REQUIRED_MSG.format(spec.name.capitalize())
+    if kind == "missing":
+        return Value(kind, MISSING, INVALID, (required,))
+    if kind == "null":
+        return Value(kind, None, INVALID, (required,))
+    if kind == "empty":
+        return Value(kind, "", INVALID, (required, spec.message) if spec.low else (required,))
+    if kind in ("integer", "boolean"):
+        return Value(kind, rng.randint(0, 10 ** 12) if kind == "integer" else rng.random() < 0.5, EITHER, None)
+    if kind == "list":
+        return Value(kind, [_text(rng, ASCII, spec.low)], INVALID, None)
+    if kind == "object":
+        return Value(kind, {"value": _text(rng, ASCII, spec.low)}, INVALID, None)
+
+    if kind == "oversized":
+        text = "x" * rng.choice(OVERSIZED_LENGTHS)
+    elif kind == "astral":
+        text = _text(rng, ASTRAL, rng.randint((spec.low + 1) // 2, spec.high // 2))
+    elif kind == "astral_over":  # fits in code points, not in UTF-16 code units
+        text = _text(rng, ASTRAL, rng.randint(spec.high // 2 + 1, spec.high))
+    else:
+        length = {"min": spec.low, "max": spec.high, "below_min": spec.low - 1, "above_max": spec.high + 1,
+                  "blank": spec.low}.get(kind)
+        if length is None:
+            length = rng.randint(spec.low, spec.high)
+        alphabet = {"unicode": UNICODE, "blank": " "}.get(kind, ASCII)
+        text = _text(rng, alphabet, length)
+    valid = spec.low <= java_length(text) <= spec.high
+    return Value(kind, text, VALID if valid else INVALID, None if valid else (spec.message,))
+
+
+def _int_value(spec: FieldSpec, kind: str, rng: random.Random) -> Value:
+    if kind == "missing":
+        return Value(kind, MISSING, INVALID, (spec.message,))  # an absent int binds to 0
+    if kind == "null":
+        return Value(kind, None, INVALID, None)
+    if kind in ("float", "numeric_string", "boolean"):
+        number = rng.randint(spec.low, spec.high)
+        value = {"float": number + 0.5, "numeric_string": str(number), "boolean": rng.random() < 0.5}[kind]
+        return Value(kind, value, EITHER, None)
+    if kind == "string":
+        return Value(kind, _text(rng, ASCII, 5), INVALID, None)
+    if kind == "list":
+        return Value(kind, [spec.low], INVALID, None)
+    if kind == "object":
+        return Value(kind, {"value": spec.low}, INVALID, None)
+    if kind == "overflow":  # beyond a Java int
+        return Value(kind, rng.choice((2 ** 31, 2 ** 63, 10 ** 30)), INVALID, None)
+
+    number = {"min": spec.low, "max": spec.high, "below_min": spec.low - 1, "above_max": spec.high + 1,
+              "negative": -rng.randint(1, 2 ** 31)}.get(kind)
+    if number is None:
+        number = rng.randint(spec.low, spec.high)
+    valid = spec.low <= number <= spec.high
+    return Value(kind, number, VALID if valid else INVALID, None if valid else (spec.message,))
+
+
+# Value classes per field type: the first list stays valid, the second breaks the rules or the type
+STRING_KINDS = (("random", "min", "max", "unicode", "astral", "blank"),
+                ("below_min", "above_max", "empty", "oversized", "astral_over", "missing", "null",
+                 "integer", "boolean", "list", "object"))
+INT_KINDS = (("random", "min", "max"),
+             ("below_min", "above_max", "negative", "overflow", "missing", "null",
+              "float", "numeric_string", "boolean", "string", "list", "object"))
+
+
+def make_value(spec: FieldSpec, kind: str, rng: random.Random) -> Value:
+    """Generate one value of ``kind`` for a field."""
+    return (_string_value if spec.type is str else _int_value)(spec, kind, rng)
+
+
+def generate_case(specs: Sequence[FieldSpec], index: int, seed: int = 0) -> FuzzCase:
+    """
+    Payload number ``index`` of the run for ``seed``: the same whatever the thread or run.
+
+    Most payloads break exactly one field, so a failure points at its cause. Some
+    break two, and a few are valid and check that good data still goes through.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    mutated = rng.choices(range(len(MUTATED_FIELDS_WEIGHTS)), weights=MUTATED_FIELDS_WEIGHTS)[0]
+    broken = set(rng.sample(range(len(specs)), min(mutated, len(specs))))
+    values = OrderedDict()
+    for position, spec in enumerate(specs):
+        valid_kinds, invalid_kinds = STRING_KINDS if spec.type is str else INT_KINDS
+        kind = rng.choice(invalid_kinds if position in broken else valid_kinds)
+        values[spec.name] = make_value(spec, kind, rng)
+    extra = {"publisher": _text(rng, ASCII, 12)} if rng.random() < 0.05 else {}  # unknown fields are ignored
+    return FuzzCase(index, values, extra)
+
+
+def payload_of(case: FuzzCase) -> Dict:
+    payload = {name: value.value for name, value in case.values.items() if value.value is not MISSING}
+    payload.update(case.extra)
+    return payload
+
+
+def verdict_of(case: FuzzCase) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    """
+    Expected outcome of a payload and, when it is invalid, the detail messages it should produce.
+
+    The messages are None when they cannot be predicted: a type error is reported by
+    the JSON reader, not by the validator.
+    """
+    verdicts = {value.verdict for value in case.values.values()}
+    if INVALID not in verdicts:
+        return (EITHER if EITHER in verdicts else VALID), None
+    invalid = [value for value in case.values.values() if value.verdict == INVALID]
+    if EITHER in verdicts or any(value.messages is None for value in invalid):
+        return INVALID, None
+    return INVALID, tuple(sorted({message for value in invalid for message in value.messages}))
+
+
+def _detail(response: requests.Response) -> str:
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text[:DETAIL_SHAPE_LENGTH]
+    if isinstance(body, dict):
+        return str(body.get("detail") or body.get("error") or body.get("message") or "")
+    return ""
+
+
+def detail_shape(detail: str) -> str:
+    """Detail with the request-specific parts blanked out, for grouping."""
+    shape = re.sub(r"'[^']*'|\"[^\"]*\"", "'…'", detail)
+    return re.sub(r"\d+", "#", shape)[:DETAIL_SHAPE_LENGTH]
+
+
+class _Gate:
+    """A readers-writer lock: many holders of ``shared``, or one of ``exclusive`` that waits for them."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0  # exclusive holders waiting; they go before new shared holders
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._condition:
+            while self._exclusive or self._waiting:
+                self._condition.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._condition.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+class PayloadFuzzer:
+    """
+    Sends generated payloads to one endpoint and collects the responses that break the rules.
+
+    PUT payloads update target books that the fuzzer creates, one per worker, with
+    ``create_target``. After an invalid payload is accepted the target is put back
+    to a valid book, or replaced when a field was stored as null (see the module
+    docstring), so every case starts from the same server state.
+
+    Args:
+        client: BooksClient whose pool should be at least ``workers`` connections
+        method: "POST" (``/books``) or "PUT" (``/books/{id}`` of a target)
+        specs: Field constraints, from ``field_specs``
+        protected_ids: Ids of the books that were there before; never deleted by id
+        workers: Concurrent requests
+        seed: Run seed; payload ``i`` is the same for the same seed
+        progress: Print a progress line to stderr every second
+    """
+
+    def __init__(self, client: BooksClient, method: str, specs: Sequence[FieldSpec],
+                 protected_ids: Iterable[int] = (), workers: int = 16, seed: int = 0, progress: bool = True):
+        self.client = client
+        self.method = method
+        self.specs = specs
+        self.route = "/books" if method == "POST" else "/books/{id}"
+        self.workers = workers
+        self.seed = seed
+        self.progress = progress
+        self.statuses: Counter = Counter()
+        self.created: List[Tuple[int, object]] = []  # (id, title) of the books created by valid payloads
+        self.protected_ids = frozenset(protected_ids)
+        self.left_behind = 0
+        self.target_ids: Set[int] = set()  # PUT targets on the server
+        self.target_titles: List[str] = []  # titles of every book created by create_target
+        self.targets_replaced = 0
+        self._groups: Dict[tuple, List] = {}  # signature -> [count, examples]
+        self._lock = threading.Lock()
+        self._idle_targets: queue.SimpleQueue = queue.SimpleQueue()  # (id, title) of the targets not in use
+        self._gate = _Gate()  # updates share it; creating a target takes it alone
+
+    def send(self, payload: Dict, target_id: Optional[int] = None) -> Tuple[Optional[requests.Response], Optional[str]]:
+        """Send one payload (a PUT to ``target_id``); return the response, or the name of the error that replaced it."""
+        endpoint = "/books" if self.method == "POST" else f"/books/{target_id}"
+        try:
+            return self.client.request(self.method, endpoint, json_data=payload), None
+        except requests.RequestException as e:
+            return None, type(e).__name__
+
+    def _send_case(self, case: FuzzCase, payload: Dict) -> Tuple[Optional[requests.Response], Optional[str]]:
+        """Send a case's payload; a PUT goes to an idle target, which is restored or replaced afterwards."""
+        if self.method == "POST":
+            return self.send(payload)
+        try:
+            target = self._idle_targets.get_nowait()
+        except queue.Empty:
+            target = self._new_target()
+        with self._gate.shared():
+            response, error = self.send(payload, target[0])
+            if response is not None and response.status_code < 300 and verdict_of(case)[0] != VALID:
+                target = self._restore_target(target, response)
+        if target is not None:
+            self._idle_targets.put(target)
+        return response, error
+
+    def _new_target(self) -> Tuple[int, str]:
+        with self._gate.exclusive():
+            with self._lock:
+                name = f"Fuzz target {self.seed}.{len(self.target_titles)}"
+                taken = self.protected_ids | self.target_ids
+            target_id, titles = create_target(self.client, self.specs, name, taken)
+            with self._lock:
+                self.target_ids.add(target_id)
+                self.target_titles.extend(titles)
+        return target_id, titles[-1]
+
+    def _restore_target(self, target: Tuple[int, str], response: requests.Response) -> Optional[Tuple[int, str]]:
+        """
+        Put a target back to a valid book after it accepted an invalid update.
+
+        Returns:
+            The target, or None when it stored a null field and was deleted instead;
+            a fresh target is created outside the shared gate
+        """
+        target_id, title = target
+        try:
+            book = response.json().get("UpdatedBook")
+            stored_null = any(book.get(spec.name) is None for spec in self.specs)
+        except (ValueError, AttributeError):
+            stored_null = True
+        if not stored_null:
+            self.client.put(f"/books/{target_id}", json_data={**baseline_payload(self.specs), "title": title})
+            return target
+        self.client.delete(f"/books/{target_id}")  # the target's id is its own, so nothing else goes with it
+        with self._lock:
+            self.target_ids.discard(target_id)
+            self.targets_replaced += 1
+        return None
+
+    def classify(self, case: FuzzCase, response: Optional[requests.Response],
+                 error: Optional[str]) -> Optional[tuple]:
+        """Response signature of a failure, or None when the response matches the payload's verdict."""
+        if response is None:
+            return self.method, self.route, "transport error", error, ""
+        status = response.status_code
+        verdict, messages = verdict_of(case)
+        detail = _detail(response) if status >= 300 else ""
+        kind = None
+        if status >= 500:
+            kind = "server error"
+        elif verdict == INVALID and status < 300:
+            kind = "accepted invalid payload"
+        elif verdict == VALID and status == 400:
+            kind = "rejected valid payload"
+        elif verdict == VALID and status not in ((201, 409) if self.method == "POST" else (200,)):
+            kind = "unexpected status"
+        elif verdict == INVALID and status == 400 and messages and set(detail.split("; ")) != set(messages):
+            kind = "wrong error detail"
+        elif verdict != INVALID and status < 300 and not self._stored_as_sent(case, response):
+            kind = "stored value differs"
+        if kind is None:
+            return None
+        return self.method, self.route, kind, status, detail_shape(detail)
+
+    def _stored_as_sent(self, case: FuzzCase, response: requests.Response) -> bool:
+        try:
+            book = response.json().get("book" if self.method == "POST" else "UpdatedBook")
+        except (ValueError, AttributeError):
+            return False
+        if not isinstance(book, dict):
+            return False
+        return all(book.get(name) == value.value for name, value in case.values.items() if value.verdict == VALID)
+
+    def _remember_created(self, response: Optional[requests.Response]):
+        if response is None or self.method != "POST" or response.status_code != 201:
+            return
+        try:
+            book = response.json()["book"]
+            created = book["id"], book.get("title")
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            self.created.append(created)
+
+    def _run_case(self, index: int):
+        case = generate_case(self.specs, index, self.seed)
+        response, error = self._send_case(case, payload_of(case))
+        signature = self.classify(case, response, error)
+        self._remember_created(response)
+        with self._lock:
+            self.statuses[response.status_code if response is not None else error] += 1
+            if signature is None:
+                return
+            group = self._groups.setdefault(signature, [0, []])
+            group[0] += 1
+            broken = frozenset(name for name, value in case.values.items() if value.verdict != VALID)
+            examples = group[1]
+            # One example per set of broken fields, so a group that mixes causes keeps each of them
+            if len(examples) < EXAMPLES_PER_SIGNATURE and all(kept[0] != broken for kept in examples):
+                examples.append((broken, case))
+
+    def run(self, requests_count: Optional[int] = None, duration: Optional[float] = None) -> float:
+        """
+        Send payloads until ``requests_count`` are done or ``duration`` seconds have passed.
+
+        Returns:
+            Elapsed seconds
+        """
+        if requests_count is None and duration is None:
+            raise ValueError("Give a request count, a duration or both")
+        sent = [0]
+        began = time.perf_counter()
+        deadline = began + duration if duration is not None else None
+
+        def take() -> Optional[int]:
+            with self._lock:
+                if requests_count is not None and sent[0] >= requests_count:
+                    return None
+                sent[0] += 1
+                return sent[0] - 1
+
+        def work():
+            while deadline is None or time.perf_counter() < deadline:
+                index = take()
+                if index is None:
+                    return
+                self._run_case(index)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fuzzer") as pool:
+            futures = [pool.submit(work) for _ in range(self.workers)]
+            while wait(futures, timeout=PROGRESS_INTERVAL).not_done:
+                if self.progress:
+                    self._report_progress(sent[0], time.perf_counter() - began)
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - began
+        if self.progress:
+            self._report_progress(sent[0], elapsed, final=True)
+        return elapsed
+
+    def _report_progress(self, sent: int, elapsed: float, final: bool = False):
+        rate = sent / elapsed if elapsed else 0.0
+        line = f"\r  {self.method} {self.route}: {sent:>10,} payloads  {rate:>8,.0f} req/s  {len(self._groups)} failure groups"
+        sys.stderr.write(line + ("\n" if final else ""))
+        sys.stderr.flush()
+
+    def reproduce(self, payload: Dict) -> Optional[tuple]:
+        """Send a payload again and return its failure signature (None if it passes)."""
+        case = case_from_payload(self.specs, payload)
+        response, error = self._send_case(case, payload)
+        signature = self.classify(case, response, error)
+        self._remember_created(response)
+        if response is not None and response.status_code == 201 and self.method == "POST":
+            self.cleanup()  # the next attempt with the same payload would be a 409
+        return signature
+
+    def findings(self, shrink_examples: bool = True) -> List[Finding]:
+        """
+        One finding per response signature, most frequent first.
+
+        With ``shrink_examples`` every kept example is shrunk and the distinct
+        reproducers are listed; examples that do not fail again when sent on their own
+        are listed as ``unreproduced``. Without it the examples are reported as sent.
+        """
+        findings = []
+        for signature, (count, examples) in sorted(self._groups.items(), key=lambda item: -item[1][0]):
+            reproducers, unreproduced = [], []
+            for _, case in examples:
+                payload = payload_of(case)
+                if shrink_examples:
+                    payload, reproduced = shrink(self.specs, payload, signature, self.reproduce)
+                    if not reproduced:
+                        unreproduced.append(payload)
+                        continue
+                if payload not in reproducers:
+                    reproducers.append(payload)
+            findings.append(Finding(signature, count, reproducers, unreproduced))
+        return findings
+
+    def cleanup(self):
+        """
+        Delete the books created by valid payloads, newest first, and the PUT targets.
+
+        They are deleted by title where they have one: the server numbers new books
+        ``size + 1``, so after earlier deletions a new id can be shared with an older
+        book, and ``DELETE /books/{id}`` would remove both. Books without a title that
+        fits in a query string are deleted by id, unless the id is one of
+        ``protected_ids``; those are left on the server and counted in ``left_behind``.
+        Targets have an id of their own and are deleted by id, the other books
+        ``create_target`` made by title.
+        """
+        with self._lock:
+            created, self.created = self.created, []
+            target_ids, self.target_ids = self.target_ids, set()
+            target_titles, self.target_titles = self.target_titles, []
+        while not self._idle_targets.empty():
+            self._idle_targets.get_nowait()
+        for book_id, title in reversed(created):
+            try:
+                if isinstance(title, str) and 0 < len(title.encode()) <= MAX_QUERY_TITLE:
+                    self.client.delete("/books", params={"title": title})
+                elif book_id in self.protected_ids:
+                    self.left_behind += 1
+                else:
+                    self.client.delete(f"/books/{book_id}")
+            except requests.RequestException:
+                pass
+        for target_id in target_ids:
+            try:
+                self.client.delete(f"/books/{target_id}")
+            except requests.RequestException:
+                pass
+        for title in target_titles:
+            try:
+                self.client.delete("/books", params={"title": title})
+            except requests.RequestException:
+                pass
+
+
+def case_from_payload(specs: Sequence[FieldSpec], payload: Dict) -> FuzzCase:
+    """Rebuild the verdict bookkeeping of a hand-edited (e.g. shrunk) payload."""
+    values = OrderedDict()
+    for spec in specs:
+        value = payload.get(spec.name, MISSING)
+        values[spec.name] = _classify_value(spec, value)
+    extra = {name: value for name, value in payload.items() if name not in values}
+    return FuzzCase(-1, values, extra)
+
+
+def _classify_value(spec: FieldSpec, value) -> Value:
+    rng = random.Random(0)
+    if value is MISSING:
+        return make_value(spec, "missing", rng)
+    if value is None:
+        return make_value(spec, "null", rng)
+    if spec.type is str:
+        if isinstance(value, str):
+            if value == "":
+                return make_value(spec, "empty", rng)
+            valid = spec.low <= java_length(value) <= spec.high
+            return Value("string", value, VALID if valid else INVALID, None if valid else (spec.message,))
+        kind = "boolean" if isinstance(value, bool) else "integer" if isinstance(value, (int, float)) else "object"
+        return Value(kind, value, EITHER if kind != "object" else INVALID, None)
+    if isinstance(value, int) and not isinstance(value, bool):
+        if not -2 ** 31 <= value < 2 ** 31:
+            return Value("overflow", value, INVALID, None)
+        valid = spec.low <= value <= spec.high
+        return Value("integer", value, VALID if valid else INVALID, None if valid else (spec.message,))
+    if isinstance(value, (bool, float)) or (isinstance(value, str) and value.strip().lstrip("-").isdigit()):
+        return Value("coercible", value, EITHER, None)
+    return Value("wrong type", value, INVALID, None)
+
+
+def baseline_payload(specs: Sequence[FieldSpec]) -> Dict:
+    """A valid payload that the shrinker resets unimportant fields to."""
+    payload = {}
+    for spec in specs:
+        if spec.type is str:
+            payload[spec.name] = (f"Fuzz {spec.name} " + "x" * spec.high)[:max(spec.low, min(spec.high, 20))]
+        else:
+            payload[spec.name] = spec.low
+    return payload
+
+
+def _smaller(value) -> List:
+    """Simpler candidates for a value, simplest first."""
+    if isinstance(value, str):
+        candidates = []
+        if not value.isascii():
+            candidates.append("a" * java_length(value))
+        length = 1
+        while length < len(value):
+            candidates.append(value[:length])
+            length *= 2
+        return sorted(candidates, key=len)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return sorted({0, 1, -1, value // 2, value // 10} - {value}, key=abs)
+    if isinstance(value, list):
+        return [[]] + [value[:1]] * (len(value) > 1)
+    if isinstance(value, dict):
+        return [{}]
+    return []
+
+
+def shrink(specs: Sequence[FieldSpec], payload: Dict, signature: tuple,
+           reproduce: Callable[[Dict], Optional[tuple]]) -> Tuple[Dict, bool]:
+    """
+    Reduce a failing payload to the smallest one that still fails with the same signature.
+
+    Args:
+        specs: Field constraints, for the valid baseline
+        payload: The payload that failed
+        signature: Its failure signature
+        reproduce: Sends a payload and returns its failure signature, or None
+
+    Returns:
+        tuple of (smallest failing payload, whether the original reproduced at all);
+        a failure that depends on server state may not reproduce, it is then returned as is
+    """
+    budget = [MAX_SHRINK_REQUESTS]
+
+    def fails(candidate: Dict) -> bool:
+        budget[0] -= 1
+        return budget[0] >= 0 and reproduce(candidate) == signature
+
+    if not fails(payload):
+        return payload, False
+    current = dict(payload)
+    baseline = baseline_payload(specs)
+
+    # 1. Reset every field that is not needed for the failure to its baseline value
+    for name in list(current):
+        if current.get(name) == baseline.get(name, MISSING):
+            continue
+        candidate = dict(current)
+        if name in baseline:
+            candidate[name] = baseline[name]
+        else:
+            del candidate[name]
+        if fails(candidate):
+            current = candidate
+
+    # 2. Simplify what is left: shorter strings, smaller numbers, empty containers
+    for name in list(current):
+        if current.get(name) == baseline.get(name, MISSING):
+            continue
+        for smaller in _smaller(current[name]):
+            if budget[0] <= 0:
+                break
+            candidate = {**current, name: smaller}
+            if fails(candidate):
+                current = candidate
+                break
+    return current, True
+
+
+def catalog_ids(client: BooksClient) -> Set[int]:
+    """Ids of the books on the server."""
+    response = client.get("/books")
+    if response.status_code == 404:
+        return set()
+    response.raise_for_status()
+    return {book["id"] for book in response.json()["books"]}
+
+
+def create_target(client: BooksClient, specs: Sequence[FieldSpec], name: str,
+                  taken_ids: Set[int]) -> Tuple[int, List[str]]:
+    """
+    Create a book for the PUT phase to update, with an id no other book has.
+
+    ``PUT /books/{id}`` updates the first book with the id, so a target that shares
+    its id with an older book would overwrite that one. Books are created until one
+    gets a free id.
+
+    Args:
+        name: Title of the books, numbered by attempt
+        taken_ids: Ids the target must not have
+
+    Returns:
+        tuple of (target id, titles of every book created, the target's last)
+    """
+    titles = []
+    for attempt in range(len(taken_ids) + 1):
+        payload = {**baseline_payload(specs), "title": f"{name}-{attempt}"[:50]}
+        response = client.post("/books", json_data=payload)
+        if response.status_code != 201:
+            raise RuntimeError(f"Could not create the PUT target book: {response.status_code} {response.text}")
+        titles.append(payload["title"])
+        target_id = response.json()["book"]["id"]
+        if target_id not in taken_ids:
+            return target_id, titles
+    raise RuntimeError("Could not create a PUT target book with an id of its own")
+
+
+def fuzz(client: BooksClient, endpoints: Sequence[str] = ENDPOINTS, requests_count: Optional[int] = 10_000,
+         duration: Optional[float] = None, workers: int = 16, seed: int = 0, shrink_findings: bool = True,
+         progress: bool = True) -> Dict[str, FuzzReport]:
+    """
+    Fuzz each endpoint in turn (POST before PUT) and clean up after it.
+
+    Returns:
+        FuzzReport per endpoint name
+    """
+    specs = field_specs()
+    reports = {}
+    for endpoint in ENDPOINTS:
+        if endpoint not in endpoints:
+            continue
+        fuzzer = PayloadFuzzer(client, endpoint.upper(), specs, protected_ids=catalog_ids(client), workers=workers,
+                               seed=seed, progress=progress)
+        try:
+            elapsed = fuzzer.run(requests_count, duration)
+            findings = fuzzer.findings(shrink_findings)
+        finally:
+            fuzzer.cleanup()
+        reports[endpoint] = FuzzReport(sum(fuzzer.statuses.values()), elapsed, dict(fuzzer.statuses), findings,
+                                       fuzzer.left_behind, fuzzer.targets_replaced)
+    return reports
+
+
+def _short(payload: Dict) -> str:
+    text = json.dumps(payload, ensure_ascii=False)
+    return text if len(text) <= REPRODUCER_LENGTH else f"{text[:REPRODUCER_LENGTH]}... ({len(text):,} chars)"
+
+
+def format_finding(finding: Finding) -> str:
+    method, route, kind, status, detail = finding.signature
+    lines = [f"{method} {route}: {kind} -> {status}" + (f" {detail!r}" if detail else "") + f"  ({finding.count:,}x)"]
+    lines.extend(f"    {_short(payload)}" for payload in finding.reproducers)
+    lines.extend(f"    {_short(payload)}  (did not fail again on its own)" for payload in finding.unreproduced)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fuzz the payload validation of POST /books and PUT /books/{id}.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--endpoint", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, help="payloads per endpoint (default: 10000 without --duration)")
+    parser.add_argument("--duration", type=float, help="seconds per endpoint")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-shrink", action="store_true", help="report the first failing payload of each group")
+    parser.add_argument("--json", help="write the findings to this file")
+    args = parser.parse_args(argv)
+    requests_count = args.requests if args.requests is not None or args.duration is not None else 10_000
+
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers, trust_env=False)
+    try:
+        reports = fuzz(client, args.endpoint, requests_count, args.duration, args.workers, args.seed,
+                       shrink_findings=not args.no_shrink)
+    finally:
+        client.close()
+
+    failed = False
+    for endpoint, report in reports.items():
+        print(f"{endpoint.upper()}: {report.sent:,} payloads in {report.elapsed:.1f}s "
+              f"({report.sent / report.elapsed:,.0f} req/s); statuses {report.statuses}")
+        for finding in report.findings:
+            print(format_finding(finding))
+        if report.left_behind:
+            print(f"{report.left_behind} created book(s) left on the server: their id is shared with an older book")
+        if report.targets_replaced:
+            print(f"{report.targets_replaced:,} target book(s) replaced after an update stored a null field")
+        failed = failed or bool(report.findings)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({endpoint: {**report._asdict(), "findings": [finding._asdict() for finding in report.findings]}
+                       for endpoint, report in reports.items()}, f, indent=4, ensure_ascii=False, default=str)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
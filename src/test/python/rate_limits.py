@@ -0,0 +1,115 @@
+"""
+Token estimates and token buckets shared by the OpenAI stand-in and the client-side scheduler.
+
+Both sides model a model's limits the same way, as buckets refilled continuously:
+``rpm`` requests and ``tpm`` tokens per minute, ``tpd`` tokens per day. A call is
+charged its prompt tokens plus ``max_tokens`` up front, as the real API does.
+"""
+import math
+import time
+from typing import Dict, List, Optional
+
+
+CHARS_PER_TOKEN = 4  # rough English average used by OpenAI's own guidance
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators around every chat message
+DEFAULT_COMPLETION_TOKENS = 256  # charged when a call does not send max_tokens
+MINUTE, DAY = 60.0, 86_400.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text (about four characters per token)."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def estimate_prompt_tokens(messages: List[Dict]) -> int:
+    """Approximate prompt tokens of a chat ``messages`` list."""
+    return sum(MESSAGE_OVERHEAD_TOKENS + estimate_tokens(str(m.get("content") or "")) for m in messages)
+
+
+def estimate_cost(prompt: str = "", max_tokens: Optional[int] = DEFAULT_COMPLETION_TOKENS) -> int:
+    """Tokens a single-message chat call is charged: prompt estimate plus ``max_tokens``."""
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(prompt) + (max_tokens or 0)
+
+
+class TokenBucket:
+    """
+    Bucket holding up to ``capacity`` units, refilled continuously at ``rate`` units per second.
+
+    Args:
+        capacity: Burst size, e.g. a model's ``tpm``
+        rate: Refill per second, e.g. ``tpm / 60``
+    """
+
+    def __init__(self, capacity: float, rate: float, now: Optional[float] = None):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.level
+
+    def ready_at(self, amount: float, now: float) -> float:
+        """Monotonic time at which ``amount`` can be taken (``inf`` if it exceeds the capacity)."""
+        self._refill(now)
+        if amount > self.capacity:
+            return math.inf
+        return now if self.level >= amount else now + (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+
+class ModelBudget:
+    """
+    The request, token-per-minute and token-per-day buckets of one model.
+
+    Args:
+        spec: ``ModelSpec`` or ``OpenAIModel`` with ``rpm``, ``tpm`` and ``tpd`` (None = no daily limit)
+        scale: Multiplier applied to every limit
+    """
+
+    def __init__(self, spec, scale: float = 1.0, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.spec = spec
+        self.rpm = max(1, int(spec.rpm * scale))
+        self.tpm = max(1, int(spec.tpm * scale))
+        self.tpd = max(1, int(spec.tpd * scale)) if spec.tpd else None
+        self.requests = TokenBucket(self.rpm, self.rpm / MINUTE, now)
+        self.tokens = TokenBucket(self.tpm, self.tpm / MINUTE, now)
+        self.daily = TokenBucket(self.tpd, self.tpd / DAY, now) if self.tpd else None
+        self.paused_until = 0.0
+
+    def ready_times(self, tokens: int, now: float) -> Dict[str, float]:
+        """Limit name ("requests", "tokens", "tokens_per_day") -> time a call costing ``tokens`` fits it."""
+        times = {"requests": self.requests.ready_at(1, now), "tokens": self.tokens.ready_at(tokens, now)}
+        if self.daily:
+            times["tokens_per_day"] = self.daily.ready_at(tokens, now)
+        return times
+
+    def ready_at(self, tokens: int, now: float) -> float:
+        """Earliest monotonic time at which a call costing ``tokens`` fits every limit."""
+        return max(self.paused_until, *self.ready_times(tokens, now).values())
+
+    def take(self, tokens: int, now: float):
+        self.requests.take(1, now)
+        self.tokens.take(tokens, now)
+        if self.daily:
+            self.daily.take(tokens, now)
+
+    def pause(self, seconds: float, now: float):
+        """
+        Admit nothing for ``seconds`` after a 429 with retry-after.
+
+        The server said the budget is spent, so the minute buckets restart empty
+        and later calls are released at the refill rate instead of in a burst.
+        """
+        self.paused_until = max(self.paused_until, now + seconds)
+        for bucket in (self.requests, self.tokens):
+            bucket.take(max(0.0, bucket.available(now)), now)
@@ -0,0 +1,269 @@
+"""
+Server and client resource usage per test, attached to Allure.
+
+The session fixture starts a sampler once the server is up. At a fixed interval
+it records the server's CPU time, RSS, threads and open descriptors from
+``/proc``, and its heap and GC counters from the JVM's hsperfdata. It also
+records this process's CPU time, RSS, allocated blocks and GC collections.
+
+Every test gets a "Resources" attachment with the deltas over its call phase.
+A verdict says what the time went to:
+
+- the server was CPU-bound;
+- the server was allocating or collecting garbage;
+- the client was CPU-bound;
+- neither process was busy, so the time went to waiting: I/O, sleeps, or a
+  call the server made elsewhere.
+
+The whole session's timeline is attached as CSV when the fixture tears down.
+
+    pytest --resource-interval=0.25     # timeline period in seconds (default: 1)
+    pytest --resource-interval=0        # no resource monitoring
+
+CPU time in ``/proc`` is counted in clock ticks (10 ms), so tests shorter than
+``MIN_CLASSIFIED`` get their numbers but no verdict.
+"""
+import contextlib
+import gc
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+import allure
+import pytest
+
+from server_resources import JvmSample, ResourceSample, read_jvm_sample, read_sample, supported
+
+
+DEFAULT_INTERVAL = 1.0  # seconds between timeline samples
+MIN_CLASSIFIED = 0.05  # seconds; shorter tests are below the resolution of /proc CPU times
+CPU_BOUND_SHARE = 0.5  # cores busy on average over the test
+ALLOCATING_BYTES = 4 * 2 ** 20  # heap growth during a test that counts as allocating
+MIB = 2 ** 20
+
+ClientSample = namedtuple("ClientSample", ["cpu", "rss", "blocks", "gc_count"])
+MonitorSample = namedtuple("MonitorSample", ["time", "test", "server", "jvm", "client"])
+
+
+def client_sample() -> ClientSample:
+    """CPU time, RSS, allocated blocks and GC collections of this process."""
+    rss = read_sample(os.getpid()).rss if supported() else None
+    return ClientSample(time.process_time(), rss, sys.getallocatedblocks(),
+                        sum(generation["collections"] for generation in gc.get_stats()))
+
+
+def _delta(end, start, field):
+    first, last = getattr(start, field, None), getattr(end, field, None)
+    return None if first is None or last is None else last - first
+
+
+def usage(start: MonitorSample, end: MonitorSample) -> Dict[str, Optional[float]]:
+    """Resource deltas between two samples (None where a side was not sampled)."""
+    return {
+        "wall": end.time - start.time,
+        "server_cpu": _delta(end.server, start.server, "cpu"),
+        "server_rss": _delta(end.server, start.server, "rss"),
+        "server_threads": _delta(end.server, start.server, "threads"),
+        "server_fds": _delta(end.server, start.server, "fds"),
+        "heap": _delta(end.jvm, start.jvm, "heap_used"),
+        "gc_count": _delta(end.jvm, start.jvm, "gc_count"),
+        "gc_time": _delta(end.jvm, start.jvm, "gc_time"),
+        "client_cpu": _delta(end.client, start.client, "cpu"),
+        "client_rss": _delta(end.client, start.client, "rss"),
+        "client_blocks": _delta(end.client, start.client, "blocks"),
+        "client_gc": _delta(end.client, start.client, "gc_count"),
+    }
+
+
+def classify(deltas: Dict[str, Optional[float]]) -> str:
+    """What a test's time went to, judged from its resource deltas."""
+    wall = deltas["wall"]
+    if wall < MIN_CLASSIFIED:
+        return f"too short to classify (under {MIN_CLASSIFIED * 1000:.0f} ms)"
+    if deltas["server_cpu"] is not None and deltas["server_cpu"] / wall >= CPU_BOUND_SHARE:
+        return "server CPU-bound"
+    if deltas["gc_count"] or (deltas["heap"] or 0) >= ALLOCATING_BYTES:
+        return "server allocating"
+    if deltas["client_cpu"] / wall >= CPU_BOUND_SHARE:
+        return "client CPU-bound"
+    return "waiting: neither process busy"
+
+
+def format_usage(deltas: Dict[str, Optional[float]], start: MonitorSample, end: MonitorSample) -> str:
+    def mib(value):
+        return "-" if value is None else f"{value / MIB:+.1f} MiB"
+
+    wall = deltas["wall"]
+    exited = start.server is not None and end.server is None
+    verdict = "server exited during the test" if exited else classify(deltas)
+    lines = [f"verdict: {verdict}", f"wall    {wall * 1000:.1f} ms"]
+    if exited:
+        lines.append("server  no end sample: the process was gone")
+    elif start.server is not None:
+        cpu = deltas["server_cpu"]
+        lines.append(f"server  cpu {cpu * 1000:.0f} ms ({cpu / wall if wall else 0:.0%} of a core), "
+                     f"rss {mib(deltas['server_rss'])}, threads {start.server.threads} -> {end.server.threads}, "
+                     f"fds {start.server.fds} -> {end.server.fds}")
+    if start.jvm is not None and end.jvm is not None:
+        lines.append(f"jvm     heap {mib(deltas['heap'])} ({end.jvm.heap_used / MIB:.1f} of "
+                     f"{end.jvm.heap_capacity / MIB:.1f} MiB), gc {deltas['gc_count']} "
+                     f"({deltas['gc_time'] * 1000:.1f} ms)")
+    client_cpu = deltas["client_cpu"]
+    lines.append(f"client  cpu {client_cpu * 1000:.0f} ms ({client_cpu / wall if wall else 0:.0%} of a core), "
+                 f"rss {mib(deltas['client_rss'])}, allocated blocks {deltas['client_blocks']:+,}, "
+                 f"gc {deltas['client_gc']}")
+    return "\n".join(lines)
+
+
+class ResourceMonitor:
+    """
+    Samples the server (and this process) into a session timeline on a background thread.
+
+    Args:
+        pid: Server process
+        interval: Seconds between timeline samples
+    """
+
+    def __init__(self, pid: int, interval: float = DEFAULT_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.timeline: List[MonitorSample] = []
+        self.current: Optional[str] = None  # nodeid of the running test
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+
+    def snapshot(self) -> MonitorSample:
+        try:
+            server: Optional[ResourceSample] = read_sample(self.pid)
+        except ProcessLookupError:
+            server = None
+        jvm: Optional[JvmSample] = read_jvm_sample(self.pid) if server is not None else None
+        return MonitorSample(time.time(), self.current, server, jvm, client_sample())
+
+    def _run(self):
+        while True:
+            sample = self.snapshot()
+            self.timeline.append(sample)
+            if sample.server is None or self._stop.wait(self.interval):
+                return
+
+    def start(self) -> "ResourceMonitor":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.timeline.append(self.snapshot())
+
+    def timeline_csv(self) -> str:
+        """The timeline with CPU as utilization since the previous sample."""
+        rows = ["seconds,test,server_cpu_pct,server_rss_mib,heap_used_mib,heap_capacity_mib,gc_count,gc_ms,"
+                "server_threads,server_fds,client_cpu_pct,client_rss_mib,client_blocks,client_gc"]
+        started = self.timeline[0].time if self.timeline else 0.0
+        previous = None
+        for sample in self.timeline:
+            server, jvm, client = sample.server, sample.jvm, sample.client
+            elapsed = sample.time - previous.time if previous else 0.0
+
+            def pct(end, begin):
+                return f"{100 * (end - begin) / elapsed:.1f}" if elapsed > 0 and end is not None and begin is not None else ""
+
+            server_cpu = pct(server.cpu, previous.server.cpu) if server and previous and previous.server else ""
+            client_cpu = pct(client.cpu, previous.client.cpu) if previous else ""
+            rows.append(",".join(str(value) for value in (
+                f"{sample.time - started:.3f}", sample.test or "", server_cpu,
+                f"{server.rss / MIB:.1f}" if server else "",
+                f"{jvm.heap_used / MIB:.1f}" if jvm else "", f"{jvm.heap_capacity / MIB:.1f}" if jvm else "",
+                jvm.gc_count if jvm else "", f"{jvm.gc_time * 1000:.1f}" if jvm else "",
+                server.threads if server else "", server.fds if server else "",
+                client_cpu, f"{client.rss / MIB:.1f}" if client.rss is not None else "", client.blocks, client.gc_count,
+            )))
+            previous = sample
+        return "\n".join(rows) + "\n"
+
+
+_monitor: Optional[ResourceMonitor] = None
+_interval = DEFAULT_INTERVAL
+
+
+def get_monitor() -> Optional[ResourceMonitor]:
+    return _monitor
+
+
+def set_monitor(monitor: Optional[ResourceMonitor]):
+    global _monitor
+    _monitor = monitor
+
+
+@contextlib.contextmanager
+def monitor_server(pid: Optional[int]):
+    """
+    Monitor the server while the block runs, then attach the session timeline.
+
+    Does nothing without a pid, off Linux, or with ``--resource-interval=0``.
+    """
+    if pid is None or not supported() or _interval <= 0:
+        yield None
+        return
+    monitor = ResourceMonitor(pid, _interval).start()
+    set_monitor(monitor)
+    try:
+        yield monitor
+    finally:
+        set_monitor(None)
+        monitor.stop()
+        allure.attach(monitor.timeline_csv(), name="Resource timeline", attachment_type=allure.attachment_type.CSV)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--resource-interval", type=float, default=DEFAULT_INTERVAL,
+                     help="seconds between server resource samples for the Allure timeline (0 disables; default: 1)")
+
+
+def pytest_configure(config):
+    global _interval
+    _interval = config.getoption("resource_interval")
+    config.pluginmanager.register(ResourceMonitorPlugin(), "resource_monitor_plugin")
+
+
+class ResourceMonitorPlugin:
+    """Attaches every test's resource deltas to its Allure result."""
+
+    def __init__(self):
+        self.session_start: Optional[MonitorSample] = None
+        self.session_end: Optional[MonitorSample] = None
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item):
+        monitor = get_monitor()
+        if monitor is None:
+            return (yield)
+        monitor.current = item.nodeid
+        start = monitor.snapshot()
+        if self.session_start is None:
+            self.session_start = start
+        try:
+            return (yield)
+        finally:
+            end = monitor.snapshot()
+            monitor.current = None
+            self.session_end = end
+            allure.attach(format_usage(usage(start, end), start, end), name="Resources",
+                          attachment_type=allure.attachment_type.TEXT)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        start, end = self.session_start, self.session_end
+        if start is None or end is None or start.server is None or end.server is None:
+            return
+        deltas = usage(start, end)
+        line = (f"server resources over the tests: cpu {deltas['server_cpu']:.2f}s, "
+                f"rss {start.server.rss / MIB:.0f} -> {end.server.rss / MIB:.0f} MiB, "
+                f"threads {start.server.threads} -> {end.server.threads}, fds {start.server.fds} -> {end.server.fds}")
+        if start.jvm is not None and end.jvm is not None:
+            line += (f", heap {start.jvm.heap_used / MIB:.0f} -> {end.jvm.heap_used / MIB:.0f} MiB, "
+                     f"{deltas['gc_count']} GCs ({deltas['gc_time'] * 1000:.0f} ms)")
+        terminalreporter.write_line(line)
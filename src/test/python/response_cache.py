@@ -0,0 +1,412 @@
+"""
+Read-through response cache in front of the Books API, plugged into BooksClient.
+
+GET responses for ``/books``, ``/books/{id}`` and ``/recommendations/{id}`` are
+stored under a normalized key: method, path, and query sorted by name. Entries
+are evicted least recently used first once the cache exceeds its memory bound,
+and they expire after a TTL. Every entry carries the resources its response
+depends on, using the parallel scheduler's vocabulary: ``id:7``, ``title:dune``,
+``author:...``, ``category:...``, ``all`` for the unfiltered listing. A
+successful POST, PUT or DELETE through the same client drops exactly the
+entries whose resources it changed:
+
+- POST and PUT use the created, old and updated books in the response body;
+- a DELETE, or a PUT by title, uses the books the cache has seen in earlier
+  responses. When the book is unknown, every entry of the affected fields is dropped.
+
+A rejected mutation (4xx) changes nothing. Any other failure flushes the cache.
+Writes made by other clients are not seen, so the TTL bounds their staleness.
+
+    pytest --response-cache --response-cache-ttl=300 --response-cache-mb=64
+    python load_runner.py --response-cache --weights GET=10,PUT=1,DELETE=1,RECOMMEND=1
+
+Hits, misses, evictions and the request time the hits saved are reported, to
+estimate what a caching tier in front of the API would take off the server and
+off paid recommendation calls.
+"""
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from datetime import timedelta
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+from urllib.parse import urlencode
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from books_client import BooksClient, get_client, is_unread
+
+
+DEFAULT_TTL = 300.0  # seconds; 0 or None never expires
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_OVERHEAD = 512  # bytes per entry for the key, the Response object and the bookkeeping
+CACHEABLE_STATUSES = (200, 400, 404)  # 400/404 are negative entries, invalidated like any other
+ID_ENDPOINT = re.compile(r"^/(books|recommendations)/(-?\d+)$")
+FILTERS = ("title", "author", "category")
+ALL_BOOKS = "all"
+ANY_BOOK = frozenset(f"{field}:*" for field in ("id",) + FILTERS)  # an unknown book could be any of them
+
+Entry = namedtuple("Entry", ["response", "tags", "size", "expires", "cost"])
+
+
+def normalize_path(endpoint: str) -> str:
+    """Collapse duplicate and trailing slashes: ``/books//7/`` and ``/books/7`` are one resource."""
+    return "/" + "/".join(part for part in endpoint.split("/") if part)
+
+
+def cache_key(method: str, endpoint: str, params: Optional[Dict] = None) -> str:
+    """Normalized identity of a read: method, path and query sorted by name."""
+    query = urlencode(sorted((params or {}).items(), key=lambda item: str(item[0])), doseq=True)
+    return f"{method.upper()} {normalize_path(endpoint)}?{query}"
+
+
+def read_tags(path: str, params: Optional[Dict]) -> Optional[FrozenSet[str]]:
+    """Return the resources a GET depends on, or None when it is not cacheable."""
+    match = ID_ENDPOINT.match(path)
+    if match:
+        return frozenset([f"id:{int(match.group(2))}"])
+    if path != "/books":
+        return None
+    filters = {f"{field}:{str(value).lower()}" for field, value in (params or {}).items() if field in FILTERS}
+    return frozenset(filters or [ALL_BOOKS])
+
+
+def book_tags(book: Optional[Dict], book_id: Optional[int] = None) -> Set[str]:
+    """Return the resources a book appears under (its id, title, author, category and the listing)."""
+    tags = {ALL_BOOKS}
+    if not isinstance(book, dict):
+        return tags
+    book_id = book.get("id", book_id)
+    if book_id is not None:
+        tags.add(f"id:{int(book_id)}")
+    tags.update(f"{field}:{str(book[field]).lower()}" for field in FILTERS if book.get(field) is not None)
+    return tags
+
+
+def _copy(response: requests.Response) -> requests.Response:
+    """A fresh Response over the cached body, so callers never share state or re-report a timing."""
+    copy = requests.Response()
+    copy.status_code = response.status_code
+    copy.reason = response.reason
+    copy.url = response.url
+    copy.headers = CaseInsensitiveDict(response.headers)
+    copy.encoding = response.encoding
+    copy.request = response.request
+    copy.elapsed = timedelta(0)
+    copy._content = response.content
+    copy._content_consumed = True
+    copy.timing = None  # served locally: nothing for latency statistics
+    copy.cached = True
+    return copy
+
+
+class ResponseCache:
+    """
+    LRU/TTL read-through cache attached to a BooksClient's interceptor and response hook.
+
+    Args:
+        max_bytes: Memory bound over bodies, headers and per-entry overhead
+        ttl: Seconds an entry stays fresh; 0 or None never expires
+        max_entry_bytes: Larger responses are not stored (default: an eighth of max_bytes)
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = DEFAULT_TTL,
+                 max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self.size = 0
+        self.stats = Counter()
+        self.saved_seconds = 0.0
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = defaultdict(set)
+        # Books seen in responses, for mutations that do not describe what they changed
+        self._books: Dict[int, Set[str]] = {}
+        self._titles: Dict[str, Set[int]] = defaultdict(set)
+        # Invalidation generations: a read that started before an invalidation it overlaps is not stored
+        self._generation = 0
+        self._invalidated: Dict[str, int] = {}
+        self._flushed = 0
+        self._pending = threading.local()
+        self._lock = threading.RLock()
+        self._client: Optional[BooksClient] = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def attach(self, client: BooksClient) -> "ResponseCache":
+        """Serve and fill the cache from this client's requests (detaching from any previous client)."""
+        if client is self._client:
+            return self
+        if self._client is not None:
+            self.detach()
+        client.add_interceptor(self._lookup)
+        client.add_response_hook(self._observe)
+        self._client = client
+        return self
+
+    def detach(self):
+        if self._client is not None:
+            self._client.remove_interceptor(self._lookup)
+            self._client.remove_response_hook(self._observe)
+            self._client = None
+
+    def contains(self, method: str, endpoint: str, params: Optional[Dict] = None) -> bool:
+        """True when a fresh entry would answer this request (without counting a hit)."""
+        with self._lock:
+            entry = self._entries.get(cache_key(method, endpoint, params))
+            return entry is not None and (entry.expires is None or entry.expires > time.monotonic())
+
+    def _lookup(self, method, endpoint, params, json_data) -> Optional[requests.Response]:
+        self._pending.read = None
+        if method != "GET":
+            return None
+        path = normalize_path(endpoint)
+        tags = read_tags(path, params)
+        if tags is None:
+            return None
+        key = cache_key(method, path, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.saved_seconds += entry.cost
+                return _copy(entry.response)
+            self.stats["misses"] += 1
+            self._pending.read = (key, path, tags, self._generation)
+        return None
+
+    def _observe(self, method, endpoint, params, json_data, response):
+        pending = getattr(self._pending, "read", None)
+        self._pending.read = None
+        if method == "GET":
+            if pending is not None:
+                self._store(*pending, response)
+        elif method in ("POST", "PUT", "DELETE"):
+            self._mutated(method, normalize_path(endpoint), params or {}, json_data or {}, response)
+
+    @staticmethod
+    def _json(response: requests.Response) -> Dict:
+        try:
+            body = response.json()
+        except ValueError:
+            return {}
+        return body if isinstance(body, dict) else {}
+
+    def _store(self, key: str, path: str, tags: FrozenSet[str], generation: int, response: requests.Response):
+        if response.status_code not in CACHEABLE_STATUSES or is_unread(response):
+            self.stats["uncacheable"] += 1  # an error, or a stream=True body still on the socket
+            return
+        headers = sum(len(name) + len(value) for name, value in response.headers.items())
+        size = len(response.content) + headers + len(key) + ENTRY_OVERHEAD
+        if size > self.max_entry_bytes:
+            self.stats["too_large"] += 1
+            return
+        body = self._json(response) if response.status_code == 200 else {}
+        cost = response.timing.total if getattr(response, "timing", None) is not None else 0.0
+        with self._lock:
+            if self._stale(tags, generation):
+                self.stats["raced"] += 1  # a mutation overlapped this read: its body may predate it
+                return
+            self._learn(path, body)
+            if key in self._entries:
+                self._remove(key)
+            expires = time.monotonic() + self.ttl if self.ttl else None
+            self._entries[key] = Entry(response, tags, size, expires, cost)
+            for tag in tags:
+                self._by_tag[tag].add(key)
+            self.size += size
+            self.stats["stored"] += 1
+            while self.size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evicted"] += 1
+
+    def _stale(self, tags: Iterable[str], generation: int) -> bool:
+        if self._flushed > generation:
+            return True
+        for tag in tags:
+            field = tag.partition(":")[0]
+            if self._invalidated.get(tag, -1) > generation or self._invalidated.get(f"{field}:*", -1) > generation:
+                return True
+        return False
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def _learn(self, path: str, body: Dict):
+        """Remember the books a response shows, by id, for later mutations that do not name them."""
+        match = ID_ENDPOINT.match(path)
+        if match and match.group(1) == "books" and isinstance(body.get("book"), dict):
+            self._remember(int(match.group(2)), book_tags(body["book"], int(match.group(2))))
+        for book in body.get("books") or ():
+            if isinstance(book, dict) and book.get("id") is not None:
+                self._remember(int(book["id"]), book_tags(book))
+
+    def _remember(self, book_id: int, tags: Set[str], replace: bool = False):
+        if replace:
+            self._forget(book_id)
+        self._books[book_id] = self._books.get(book_id, set()) | tags
+        for tag in tags:
+            if tag.startswith("title:"):
+                self._titles[tag[len("title:"):]].add(book_id)
+
+    def _forget(self, book_id: int):
+        for tag in self._books.pop(book_id, ()):
+            if tag.startswith("title:"):
+                ids = self._titles.get(tag[len("title:"):])
+                if ids is not None:
+                    ids.discard(book_id)
+
+    def _mutated(self, method: str, path: str, params: Dict, payload: Dict, response: requests.Response):
+        if 400 <= response.status_code < 500:
+            return  # rejected: the controller changes nothing
+        if response.status_code >= 300:
+            self.flush()
+            return
+        body = self._json(response)
+        match = ID_ENDPOINT.match(path)
+        with self._lock:
+            if method == "POST" and path == "/books":
+                book = body.get("book") if isinstance(body.get("book"), dict) else payload
+                tags = book_tags(book)
+                if book.get("id") is None:
+                    tags |= {"id:*"}
+                self.invalidate(tags)
+                if book.get("id") is not None:
+                    self._remember(int(book["id"]), book_tags(book))
+            elif match and match.group(1) == "books":
+                book_id = int(match.group(2))
+                tags = {f"id:{book_id}", ALL_BOOKS} | self._books.get(book_id, set())
+                old, new = body.get("OldBook"), body.get("UpdatedBook")
+                if method == "PUT":
+                    tags |= book_tags(payload) | book_tags(old) | book_tags(new)
+                if book_id not in self._books and not isinstance(old, dict):
+                    tags |= ANY_BOOK - {"id:*"}  # where the book was listed is unknown
+                self.invalidate(tags)
+                if method == "PUT":
+                    self._remember(book_id, book_tags(new if isinstance(new, dict) else payload, book_id), replace=True)
+                else:
+                    self._forget(book_id)
+            elif path == "/books" and "title" in params:
+                title = str(params["title"]).lower()
+                ids = set(self._titles.get(title, ()))
+                tags = {f"title:{title}", ALL_BOOKS}
+                for book_id in ids:
+                    tags |= self._books.get(book_id, set())
+                if not ids:
+                    tags |= ANY_BOOK
+                if method == "PUT":
+                    tags |= book_tags(payload)
+                self.invalidate(tags)
+                for book_id in ids:
+                    if method == "PUT":
+                        self._remember(book_id, book_tags(payload, book_id), replace=True)
+                    else:
+                        self._forget(book_id)
+            else:
+                self.flush()  # e.g. an admin reset: anything may have changed
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """
+        Drop every entry that depends on one of the resources.
+
+        Args:
+            tags: Resources such as ``id:7``, ``title:dune`` or ``all``;
+                ``author:*`` stands for every author
+
+        Returns:
+            The number of entries dropped
+        """
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for tag in tags:
+                self._invalidated[tag] = self._generation
+                if tag.endswith(":*"):
+                    prefix = tag[:-1]
+                    for indexed in [indexed for indexed in self._by_tag if indexed.startswith(prefix)]:
+                        keys |= self._by_tag[indexed]
+                else:
+                    keys |= self._by_tag.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidated"] += len(keys)
+            return len(keys)
+
+    def flush(self):
+        """Drop every entry and everything learned about the catalog."""
+        with self._lock:
+            self._generation += 1
+            self._flushed = self._generation
+            self._entries.clear()
+            self._by_tag.clear()
+            self._books.clear()
+            self._titles.clear()
+            self.size = 0
+            self.stats["flushes"] += 1
+
+    def hit_ratio(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def format_stats(self) -> str:
+        """One-line summary: hits, misses, hit ratio, request time saved and what was dropped."""
+        stats = self.stats
+        return (f"{stats['hits']} hits, {stats['misses']} misses ({self.hit_ratio():.1%} hit ratio), "
+                f"{self.saved_seconds:.2f}s of request time saved; {len(self)} entries, {self.size / 1024:.0f} KiB; "
+                f"{stats['invalidated']} invalidated, {stats['evicted']} evicted, {stats['expired']} expired, "
+                f"{stats['flushes']} flushes")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("response_cache", "client-side read-through response cache")
+    group.addoption("--response-cache", action="store_true",
+                    help="answer repeated GETs from a client-side cache invalidated by the session's own writes")
+    group.addoption("--response-cache-ttl", type=float, default=DEFAULT_TTL,
+                    help="seconds a cached response stays fresh, 0 for no expiry (default: %(default)s)")
+    group.addoption("--response-cache-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                    help="memory bound of the cache in MiB (default: %(default)s)")
+
+
+def pytest_configure(config):
+    if not config.getoption("response_cache"):
+        return
+    if config.getoption("cassette", "off") != "off":
+        raise pytest.UsageError("--response-cache and --cassette both answer requests locally: use one of them")
+    config.pluginmanager.register(CachePlugin(config), "response_cache_runner")
+
+
+class CachePlugin:
+    """Attaches the session's ResponseCache to the shared BooksClient and reports its counters."""
+
+    def __init__(self, config):
+        self.cache = ResponseCache(max_bytes=int(config.getoption("response_cache_mb") * 1024 * 1024),
+                                   ttl=config.getoption("response_cache_ttl"))
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_setup(self, item):
+        # After the fixtures: the server fixture installs the session's shared client
+        try:
+            return (yield)
+        finally:
+            self.cache.attach(get_client())
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.cache.detach()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_line(f"response cache: {self.cache.format_stats()}")
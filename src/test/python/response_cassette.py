@@ -0,0 +1,359 @@
+"""
+Record/replay layer under ``make_request``: responses of a session are stored in
+one indexed cassette file and answered from it on later runs.
+
+    pytest --cassette=record                  # hit the server, store every response
+    pytest --cassette=replay                  # no server: answer every request from the cassette
+    pytest --cassette=record-missing          # replay what is stored, record the rest
+    pytest --cassette=replay --cassette-rule='GET:^/recommendations/=live'   # per-endpoint overrides
+    python response_cassette.py list cassettes/default.cassette
+
+A request is identified by its method, endpoint, sorted query parameters and
+body, plus how many identical requests came before it in the session (the same
+GET before and after a DELETE gets two entries). The module-level ``random``
+is seeded in cassette modes so the random ids in ``test_cases`` repeat.
+
+Recording reads every response body as it arrives, so the recording modes
+refuse ``--stream-listings``; a replayed listing is parsed from memory.
+
+Cassette layout: a header, the zlib-compressed records, an index of fixed-size
+``(fingerprint, offset, length)`` entries sorted by fingerprint and a footer
+pointing at the index. The file is memory-mapped and looked up by binary search,
+so opening a cassette does not read it. Saving writes a new file and renames it
+over the old one, so an interrupted save never loses earlier recordings.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import threading
+import zlib
+from collections import Counter, namedtuple
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from books_client import get_client, request_key
+
+
+MODES = ("off", "record", "replay", "record-missing")
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "cassettes")
+DEFAULT_NAME = "default"
+DEFAULT_SEED = 0
+LIVE, REPLAY = "live", "replay"
+
+HEADER_MAGIC = b"BKCASS1\0"
+FOOTER = struct.Struct("<QQ8s")  # index offset, entry count, magic
+FOOTER_MAGIC = b"BKCIDX1\0"
+ENTRY = struct.Struct("<16sQI")  # fingerprint, record offset, record length
+COPY_CHUNK = 1 << 20  # bytes of stored records copied at a time on save
+
+Rule = namedtuple("Rule", ["method", "pattern", "action"])
+
+
+class CassetteMiss(LookupError):
+    """A request has no recorded response in replay mode."""
+
+
+def fingerprint(key: str, occurrence: int) -> bytes:
+    """16-byte digest of a request key and its occurrence number in the session."""
+    return hashlib.blake2b(f"{key}#{occurrence}".encode(), digest_size=16).digest()
+
+
+def parse_rule(text: str) -> Rule:
+    """Parse ``[METHOD:]REGEX=live|replay``, e.g. ``DELETE:^/books=live``."""
+    target, _, action = text.rpartition("=")
+    if action not in (LIVE, REPLAY) or not target:
+        raise ValueError(f"Invalid cassette rule '{text}', expected '[METHOD:]REGEX=live|replay'")
+    method = re.match(r"([A-Za-z]+):", target)
+    pattern = target[method.end():] if method else target
+    return Rule(method.group(1).upper() if method else None, re.compile(pattern), action)
+
+
+def _encode(response: requests.Response, key: str) -> bytes:
+    meta = {
+        "key": key,
+        "status": response.status_code,
+        "reason": response.reason,
+        "url": response.url,
+        "headers": dict(response.headers),
+        "elapsed": response.elapsed.total_seconds(),
+    }
+    return zlib.compress(json.dumps(meta).encode() + b"\n" + response.content)
+
+
+def _decode(record: bytes) -> requests.Response:
+    meta, _, body = zlib.decompress(record).partition(b"\n")
+    meta = json.loads(meta)
+    response = requests.Response()
+    response.status_code = meta["status"]
+    response.reason = meta["reason"]
+    response.url = meta["url"]
+    response.headers = CaseInsensitiveDict(meta["headers"])
+    response.elapsed = timedelta(seconds=meta["elapsed"])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = body
+    response.timing = None  # replayed: nothing for latency statistics
+    response.replayed = True
+    return response
+
+
+class Cassette:
+    """
+    One cassette file: memory-mapped recorded entries plus the entries recorded this session.
+
+    Args:
+        path: Cassette file
+        fresh: Ignore (and on save replace) any existing content
+    """
+
+    def __init__(self, path: str, fresh: bool = False):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._index_offset = len(HEADER_MAGIC)
+        self._count = 0
+        self._new: Dict[bytes, bytes] = {}
+        if not fresh and os.path.exists(path) and os.path.getsize(path) > 0:
+            self._open()
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(HEADER_MAGIC)] != HEADER_MAGIC or len(self._map) < len(HEADER_MAGIC) + FOOTER.size:
+            raise ValueError(f"{self.path} is not a cassette")
+        self._index_offset, self._count, magic = FOOTER.unpack_from(self._map, len(self._map) - FOOTER.size)
+        if magic != FOOTER_MAGIC:
+            raise ValueError(f"{self.path} has no index (interrupted write?)")
+
+    def __len__(self):
+        return self._count + len(self._new)
+
+    def _entry(self, position: int) -> Tuple[bytes, int, int]:
+        return ENTRY.unpack_from(self._map, self._index_offset + position * ENTRY.size)
+
+    def _find(self, digest: bytes) -> Optional[Tuple[int, int]]:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < digest:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            found, offset, length = self._entry(low)
+            if found == digest:
+                return offset, length
+        return None
+
+    def get(self, digest: bytes) -> Optional[requests.Response]:
+        """Return the recorded response for a fingerprint, or None."""
+        if digest in self._new:
+            return _decode(self._new[digest])
+        if self._map is None:
+            return None
+        location = self._find(digest)
+        if location is None:
+            return None
+        offset, length = location
+        return _decode(self._map[offset:offset + length])
+
+    def put(self, digest: bytes, response: requests.Response, key: str):
+        self._new[digest] = _encode(response, key)
+
+    def entries(self):
+        """Yield (fingerprint, request key, status) of every stored entry."""
+        records = [(digest, self._map[offset:offset + length])
+                   for digest, offset, length in map(self._entry, range(self._count))]
+        for digest, record in records + list(self._new.items()):
+            meta = json.loads(zlib.decompress(record).partition(b"\n")[0])
+            yield digest, meta["key"], meta["status"]
+
+    def save(self):
+        """
+        Write the stored entries and this session's to a new file that then replaces the cassette.
+
+        An interrupted save leaves the previous cassette as it was.
+        """
+        if not self._new:
+            self.close()
+            return
+        index = [self._entry(position) for position in range(self._count)] if self._map is not None else []
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                if self._map is not None:
+                    # The records keep their offsets: they are copied with the header in front of them
+                    for start in range(0, self._index_offset, COPY_CHUNK):
+                        f.write(self._map[start:min(start + COPY_CHUNK, self._index_offset)])
+                else:
+                    f.write(HEADER_MAGIC)
+                known = {entry[0] for entry in index}
+                for digest, record in self._new.items():
+                    if digest in known:
+                        continue  # record-missing never re-records a hit
+                    index.append((digest, f.tell(), len(record)))
+                    f.write(record)
+                index_offset = f.tell()
+                index.sort()
+                for entry in index:
+                    f.write(ENTRY.pack(*entry))
+                f.write(FOOTER.pack(index_offset, len(index), FOOTER_MAGIC))
+                f.flush()
+                os.fsync(f.fileno())
+            self.close()  # Windows cannot replace a mapped file
+            os.replace(temporary, self.path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self._new.clear()
+        self._open()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("cassette", "record/replay of API responses")
+    group.addoption("--cassette", choices=MODES, default=os.environ.get("BOOKS_CASSETTE", "off"),
+                    help="record, replay or record-missing API responses (default: off)")
+    group.addoption("--cassette-name", default=DEFAULT_NAME,
+                    help="cassette file in src/test/python/cassettes, or a path (default: default)")
+    group.addoption("--cassette-rule", action="append", default=[], metavar="[METHOD:]REGEX=live|replay",
+                    help="per-endpoint override, first match wins; may be repeated")
+    group.addoption("--cassette-seed", type=int, default=DEFAULT_SEED,
+                    help="seed for the module-level random in cassette modes (default: 0)")
+
+
+def pytest_configure(config):
+    if config.getoption("cassette") in ("record", "record-missing") and config.getoption("stream_listings", False):
+        raise pytest.UsageError(f"--cassette={config.getoption('cassette')} cannot be combined with --stream-listings: "
+                                f"recording reads every body in full, so the listings would not be streamed")
+    if config.getoption("cassette") != "off":
+        # Before collection: test modules draw their random ids at import time
+        random.seed(config.getoption("cassette_seed"))
+        config.pluginmanager.register(CassettePlayer(config), "cassette_player")
+
+
+def cassette_path(name: str) -> str:
+    if os.sep in name or "/" in name or name.endswith(".cassette"):
+        return os.path.abspath(name)
+    return os.path.join(DEFAULT_DIR, f"{name}.cassette")
+
+
+class CassettePlayer:
+    """Answers BooksClient requests from the cassette and records live responses, per the mode and rules."""
+
+    def __init__(self, config):
+        self.mode = config.getoption("cassette")
+        self.rules = [parse_rule(text) for text in config.getoption("cassette_rule")]
+        self.cassette = Cassette(cassette_path(config.getoption("cassette_name")), fresh=self.mode == "record")
+        self.stats = Counter()
+        self._occurrences = Counter()
+        self._pending = threading.local()
+        self._lock = threading.Lock()
+        self._client = None
+
+    def action_for(self, method: str, endpoint: str) -> str:
+        for rule in self.rules:
+            if (rule.method is None or rule.method == method) and rule.pattern.search(endpoint):
+                return rule.action
+        return REPLAY
+
+    def _intercept(self, method, endpoint, params, json_data) -> Optional[requests.Response]:
+        key = request_key(method, endpoint, params, json_data)
+        with self._lock:
+            occurrence = self._occurrences[key]
+            self._occurrences[key] += 1
+        digest = fingerprint(key, occurrence)
+        self._pending.request = None
+
+        if self.action_for(method, endpoint) == LIVE:
+            self.stats["live"] += 1
+            return None
+        if self.mode != "record":
+            response = self.cassette.get(digest)
+            if response is not None:
+                self.stats["replayed"] += 1
+                return response
+            if self.mode == "replay":
+                self.stats["missing"] += 1
+                raise CassetteMiss(f"No recorded response for {key} (occurrence {occurrence}) "
+                                   f"in {self.cassette.path}")
+        self._pending.request = (digest, key)
+        return None
+
+    def _record(self, method, endpoint, params, json_data, response):
+        pending = getattr(self._pending, "request", None)
+        self._pending.request = None
+        if pending is None:
+            return
+        digest, key = pending
+        with self._lock:
+            self.cassette.put(digest, response, key)
+        self.stats["recorded"] += 1
+
+    def _attach(self):
+        client = get_client()
+        if client is self._client:
+            return
+        if self._client is not None:
+            self._detach()
+        client.add_interceptor(self._intercept)
+        client.add_response_hook(self._record)
+        self._client = client
+
+    def _detach(self):
+        self._client.remove_interceptor(self._intercept)
+        self._client.remove_response_hook(self._record)
+        self._client = None
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_setup(self, item):
+        # After the fixtures: the server fixture installs the session's shared client
+        try:
+            return (yield)
+        finally:
+            self._attach()
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        if self._client is not None:
+            self._detach()
+        self.cassette.save()
+        self.cassette.close()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        counts = ", ".join(f"{name} {count}" for name, count in sorted(self.stats.items())) or "no requests"
+        terminalreporter.write_line(f"cassette {self.mode} ({self.cassette.path}): {counts}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect a response cassette.")
+    parser.add_argument("command", choices=["list"])
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    cassette = Cassette(args.path)
+    for digest, key, status in cassette.entries():
+        print(f"{digest.hex()}  {status}  {key}")
+    print(f"{len(cassette)} entries")
+    cassette.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
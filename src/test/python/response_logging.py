@@ -0,0 +1,235 @@
+"""
+Response printing and Allure body attachments sized for high-volume runs.
+
+``make_request`` prints every response and the tests attach every body to
+Allure. At load-test volume that formatting and file I/O costs more than the
+request, so this plugin offers cheaper tiers:
+
+    pytest --response-output=compact            # raw body, no json parse/pretty-print
+    pytest --response-output=quiet              # print nothing, keep only failure bodies
+    pytest --response-sample=0.05               # print/attach 5% of the tests' bodies
+    pytest --response-max-bytes=4096            # truncate printed and attached bodies
+    pytest --attach-compress-over=65536         # gzip attachments above 64 KiB
+    pytest --attach-writer=background           # write attachment files off the test thread, in batches
+
+Whatever the tier, the last responses of a failing test are printed in its report
+section and attached to Allure in full, so a failure never loses its evidence.
+"""
+import gzip
+import json
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import allure
+import allure_commons
+import pytest
+import requests
+from allure_commons.logger import AllureFileLogger
+
+
+OUTPUT_MODES = ("pretty", "compact", "quiet")
+WRITER_MODES = ("sync", "background")
+KEPT_RESPONSES = 5  # most recent responses of the running test kept for its failure report
+WRITER_BATCH = 64  # attachment files written per wake-up of the background writer
+GZIP_LEVEL = 1  # favor speed: attachments are read by people, not archived
+TRUNCATED = "\n... [truncated {} of {} bytes]"
+
+
+class ResponseLog:
+    """
+    Decides what to print and attach for every response, per the configured tier.
+
+    Args:
+        output: "pretty" (indented, sorted JSON), "compact" (raw body) or "quiet" (nothing)
+        sample: Fraction of tests whose bodies are printed and attached (failures always are)
+        max_bytes: Truncate printed and attached bodies beyond this size (0 = never)
+        compress_over: Gzip attachments larger than this many bytes (0 = never)
+    """
+
+    def __init__(self, output: str = "pretty", sample: float = 1.0, max_bytes: int = 0, compress_over: int = 0):
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"Unknown response output '{output}', expected one of {OUTPUT_MODES}")
+        if not 0.0 <= sample <= 1.0:
+            raise ValueError("sample must be between 0 and 1")
+        self.output = output
+        self.sample = sample
+        self.max_bytes = max_bytes
+        self.compress_over = compress_over
+        self.sampled = True
+        self._credit = 1.0
+        self._kept: Deque[requests.Response] = deque(maxlen=KEPT_RESPONSES)
+        self._attached: Dict[int, bool] = {}  # id of every attached response -> whether it was attached in full
+
+    def start_test(self):
+        """Reset the per-test state and draw whether this test's bodies are sampled."""
+        self._kept.clear()
+        self._attached.clear()
+        # Even spacing instead of random draws: deterministic and leaves the global random alone
+        self._credit += self.sample
+        self.sampled = self._credit >= 1.0
+        if self.sampled:
+            self._credit -= 1.0
+
+    def _truncate(self, body: bytes) -> bytes:
+        if not self.max_bytes or len(body) <= self.max_bytes:
+            return body
+        return body[:self.max_bytes] + TRUNCATED.format(len(body) - self.max_bytes, len(body)).encode()
+
+    def print_response(self, response: requests.Response):
+        self._kept.append(response)
+        if not self.sampled or self.output == "quiet":
+            return
+        if self.output == "pretty" and not self.max_bytes:
+            print(json.dumps(response.json(), indent=4, sort_keys=True))
+        else:
+            sys.stdout.write(self._truncate(response.content).decode(response.encoding or "utf-8", "replace") + "\n")
+
+    def attach_response(self, response: requests.Response, name: str = "Response Body", force: bool = False):
+        """
+        Attach the body to the running Allure test, unless it is outside the sample.
+
+        ``force`` attaches it in full, even when a truncated copy was attached before.
+        """
+        if not (force or self.sampled):
+            return
+        attached_in_full = self._attached.get(id(response))
+        if attached_in_full or (attached_in_full is not None and not force):
+            return
+        in_full = force or not self.max_bytes or len(response.content) <= self.max_bytes
+        self._attached[id(response)] = in_full
+        body = response.content if in_full else self._truncate(response.content)
+        if self.compress_over and len(body) > self.compress_over:
+            allure.attach(gzip.compress(body, GZIP_LEVEL), name=f"{name} (gzip)",
+                          attachment_type="application/gzip", extension="json.gz")
+        else:
+            allure.attach(body, name=name, attachment_type=allure.attachment_type.JSON)
+
+    def failure_bodies(self) -> List[requests.Response]:
+        """The running test's most recent responses, oldest first."""
+        return list(self._kept)
+
+
+class BackgroundFileLogger(AllureFileLogger):
+    """
+    AllureFileLogger that hands attachment files to a writer thread.
+
+    Test results still go through the synchronous path, they are written once per
+    test; attachment bodies are queued and written in batches of ``WRITER_BATCH``.
+    """
+
+    def __init__(self, report_dir):
+        super().__init__(report_dir)
+        self.written = 0
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write, name="allure-attachments", daemon=True)
+        self._writer.start()
+
+    @allure_commons.hookimpl
+    def report_attached_data(self, body, file_name):
+        self._queue.put((body, file_name))
+
+    def _write(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITER_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    return
+                AllureFileLogger.report_attached_data(self, *item)
+                self.written += 1
+
+    def close(self):
+        """Write out everything queued and stop the writer."""
+        self._queue.put(None)
+        self._writer.join()
+
+
+_default_log = ResponseLog()
+
+
+def get_response_log() -> ResponseLog:
+    return _default_log
+
+
+def set_response_log(log: ResponseLog):
+    global _default_log
+    _default_log = log
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("response-logging", "response printing and Allure body attachments")
+    group.addoption("--response-output", choices=OUTPUT_MODES,
+                    default=os.environ.get("BOOKS_RESPONSE_OUTPUT", "pretty"),
+                    help="pretty: indented JSON (default); compact: raw body; quiet: failure bodies only")
+    group.addoption("--response-sample", type=float, default=1.0,
+                    help="fraction of tests whose response bodies are printed and attached (default: 1)")
+    group.addoption("--response-max-bytes", type=int, default=0,
+                    help="truncate printed and attached bodies beyond this many bytes (default: 0, never)")
+    group.addoption("--attach-compress-over", type=int, default=0,
+                    help="gzip response attachments larger than this many bytes (default: 0, never)")
+    group.addoption("--attach-writer", choices=WRITER_MODES, default="sync",
+                    help="background: write Allure attachment files from a batching thread")
+
+
+def pytest_configure(config):
+    set_response_log(ResponseLog(
+        output=config.getoption("response_output"),
+        sample=config.getoption("response_sample"),
+        max_bytes=config.getoption("response_max_bytes"),
+        compress_over=config.getoption("attach_compress_over"),
+    ))
+    config.pluginmanager.register(ResponseLogPlugin(config), "response_log_plugin")
+
+
+class ResponseLogPlugin:
+    """Drives the shared ResponseLog per test and swaps in the background attachment writer."""
+
+    def __init__(self, config):
+        self.writer_mode = config.getoption("attach_writer")
+        self._file_logger: Optional[AllureFileLogger] = None
+        self._background: Optional[BackgroundFileLogger] = None
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionstart(self, session):
+        if self.writer_mode != "background":
+            return
+        self._file_logger = next((p for p in allure_commons.plugin_manager.get_plugins()
+                                  if type(p) is AllureFileLogger), None)
+        if self._file_logger is None:
+            return  # no --alluredir: nothing to write
+        self._background = BackgroundFileLogger(self._file_logger._report_dir)
+        allure_commons.plugin_manager.unregister(self._file_logger)
+        allure_commons.plugin_manager.register(self._background)
+
+    def pytest_runtest_setup(self, item):
+        get_response_log().start_test()
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        report = yield
+        if report.when == "call" and report.failed:
+            log = get_response_log()
+            bodies = log.failure_bodies()
+            if bodies:
+                report.sections.append(("Response bodies", "\n".join(
+                    f"{r.request.method if r.request else ''} {r.url} -> {r.status_code}\n{r.text}" for r in bodies)))
+            for index, response in enumerate(bodies, 1):
+                log.attach_response(response, name=f"Response Body {index} (failure)", force=True)
+        return report
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        if self._background is None:
+            return
+        self._background.close()
+        # Hand back the original logger: allure's own cleanup unregisters it
+        allure_commons.plugin_manager.unregister(self._background)
+        allure_commons.plugin_manager.register(self._file_logger)
+        self._background = None
@@ -0,0 +1,36 @@
+"""Seed catalog loaded by ``BookController.initBooks``; keep the two in sync."""
+from typing import Dict, List
+
+
+SEED_BOOKS: List[Dict] = [
+    {"id": 1, "title": "To Kill a Mockingbird", "author": "Harper Lee", "category": "Fiction", "rating": 5},
+    {"id": 2, "title": "1984", "author": "George Orwell", "category": "Fiction", "rating": 4},
+    {"id": 3, "title": "The Great Gatsby", "author": "F. Scott Fitzgerald", "category": "Fiction", "rating": 4},
+    {"id": 4, "title": "The Catcher in the Rye", "author": "J.D. Salinger", "category": "Fiction", "rating": 3},
+    {"id": 5, "title": "Moby Dick", "author": "Herman Melville", "category": "Fiction", "rating": 4},
+    {"id": 6, "title": "War and Peace", "author": "Leo Tolstoy", "category": "Fiction", "rating": 5},
+    {"id": 7, "title": "Angels & Demons", "author": "Dan Brown", "category": "Thriller", "rating": 4},
+    {"id": 8, "title": "The Hobbit", "author": "J.R.R. Tolkien", "category": "Fantasy", "rating": 5},
+    {"id": 9, "title": "The Lord of the Rings", "author": "J.R.R. Tolkien", "category": "Fantasy", "rating": 5},
+    {"id": 10, "title": "Harry Potter and the Sorcerer's Stone", "author": "J.K. Rowling", "category": "Fantasy", "rating": 5},
+    {"id": 11, "title": "The Da Vinci Code", "author": "Dan Brown", "category": "Thriller", "rating": 4},
+    {"id": 12, "title": "The Girl with the Dragon Tattoo", "author": "Stieg Larsson", "category": "Thriller", "rating": 4},
+    {"id": 13, "title": "Gone Girl", "author": "Gillian Flynn", "category": "Thriller", "rating": 4},
+    {"id": 14, "title": "The Hunger Games", "author": "Suzanne Collins", "category": "Dystopian", "rating": 4},
+    {"id": 15, "title": "Divergent", "author": "Veronica Roth", "category": "Dystopian", "rating": 3},
+    {"id": 16, "title": "The Da Vinci Code", "author": "Onwumere Bright", "category": "Thriller", "rating": 5},
+    {"id": 17, "title": "Inferno", "author": "Dan Brown", "category": "Thriller", "rating": 5},
+    {"id": 18, "title": "Pride and Prejudice", "author": "Jane Austen", "category": "Fiction", "rating": 4},
+    {"id": 19, "title": "The Lost Symbol", "author": "Dan Brown", "category": "Thriller", "rating": 5},
+    {"id": 20, "title": "The Last Templar", "author": "Raymond Khoury", "category": "Thriller", "rating": 4},
+    {"id": 21, "title": "A Game of Thrones", "author": "George R.R. Martin", "category": "Thriller", "rating": 5},
+    {"id": 22, "title": "The Chronicles of Narnia", "author": "C.S. Lewis", "category": "Thriller", "rating": 5},
+    {"id": 23, "title": "The Wheel of Time", "author": "Robert Jordan", "category": "Fiction", "rating": 4},
+    {"id": 24, "title": "The Sword of Shannara", "author": "Terry Brooks", "category": "Thriller", "rating": 5},
+    {"id": 25, "title": "The Malazan Book of the Fallen", "author": "Steven Erikson", "category": "Thriller", "rating": 4},
+]
+
+
+def seed_books() -> List[Dict]:
+    """Return a fresh, mutable copy of the seed catalog."""
+    return [dict(book) for book in SEED_BOOKS]
@@ -0,0 +1,281 @@
+"""
+Warm, reusable Spring Boot server for local test sessions.
+
+Instead of ``mvn spring-boot:run`` on every session, the packaged jar is started
+once as a detached process and left running. Later sessions find it through a
+state file, check that it is healthy and still runs the current build, restore
+the seed catalog through ``POST /api/v1/admin/reset`` and attach in milliseconds.
+The server is only (re)started when it is missing, unhealthy or stale.
+
+    pytest --books-server=daemon                  # attach to the warm server, start it if needed
+    python server_daemon.py status
+    python server_daemon.py stop
+
+The reset endpoint only exists when the server runs with
+``--books.admin.reset-enabled=true``, which this module passes on start.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from server_readiness import ServerStartupError, wait_until_ready
+
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+STATE_DIR = os.path.join(PROJECT_ROOT, ".books-server")
+DEFAULT_PORT = 8080
+STARTUP_WAIT = 120  # seconds
+HEALTH_TIMEOUT = 2  # seconds
+POLL_INTERVAL = 0.2  # seconds
+MVN_EXEC = "mvn.cmd" if platform.system() == "Windows" else "mvn"
+MAVEN_CMD = os.path.join(os.environ.get("MVN_HOME", r"C:\apache-maven-3.9.5"), "bin", MVN_EXEC)
+JAVA_CMD = os.path.join(os.environ["JAVA_HOME"], "bin", "java") if os.environ.get("JAVA_HOME") else "java"
+SOURCES = [os.path.join(PROJECT_ROOT, "pom.xml"), os.path.join(PROJECT_ROOT, "src", "main")]
+
+
+def _state_path(port: int) -> str:
+    return os.path.join(STATE_DIR, f"server-{port}.json")
+
+
+def _log_path(port: int) -> str:
+    return os.path.join(STATE_DIR, f"server-{port}.log")
+
+
+@contextlib.contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on a lock file, waiting for other processes to release it."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 attempts
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _locked(port: int):
+    """Hold an exclusive lock on the port's state so concurrent sessions start one server."""
+    return file_lock(os.path.join(STATE_DIR, f"server-{port}.lock"))
+
+
+def read_state(port: int) -> Optional[Dict]:
+    """Return the recorded state of the daemon on a port, or None."""
+    try:
+        with open(_state_path(port)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(port: int, state: Optional[Dict]):
+    path = _state_path(port)
+    if state is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, "w") as f:
+        json.dump(state, f, indent=4)
+
+
+def pid_alive(pid: int) -> bool:
+    """True when a process with this pid is running."""
+    if os.name == "nt":
+        # os.kill(pid, 0) terminates the process on Windows
+        result = subprocess.run(["tasklist", "/FI", f"PID eq {pid}", "/NH"], capture_output=True, text=True)
+        return str(pid) in result.stdout
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def find_jar() -> Optional[str]:
+    """Return the packaged Spring Boot jar under target/, or None."""
+    jars = [jar for jar in glob.glob(os.path.join(PROJECT_ROOT, "target", "books-*.jar"))
+            if not jar.endswith("-plain.jar")]
+    return max(jars, key=os.path.getmtime) if jars else None
+
+
+def _newest_source_mtime() -> float:
+    newest = 0.0
+    for source in SOURCES:
+        if os.path.isfile(source):
+            newest = max(newest, os.path.getmtime(source))
+        for root, _, files in os.walk(source):
+            for name in files:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+    return newest
+
+
+def jar_is_stale(jar: Optional[str]) -> bool:
+    """True when there is no jar or a source file changed after it was built."""
+    return jar is None or os.path.getmtime(jar) < _newest_source_mtime()
+
+
+def build_jar(maven_cmd: str = MAVEN_CMD) -> str:
+    """Package the application (tests skipped) and return the jar path."""
+    print("Packaging Spring Boot jar...")
+    result = subprocess.run([maven_cmd, "-q", "-DskipTests", "package"], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    jar = find_jar()
+    if result.returncode != 0 or jar is None:
+        raise RuntimeError(f"mvn package failed (exit code {result.returncode}):\n{result.stdout}{result.stderr}")
+    return jar
+
+
+def is_healthy(port: int, host: str = "localhost") -> bool:
+    """True when the API answers a catalog read on this port."""
+    try:
+        return requests.get(f"http://{host}:{port}/api/v1/books", timeout=HEALTH_TIMEOUT).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def reset_catalog(port: int, host: str = "localhost") -> bool:
+    """Restore the seed catalog; False when the server has no reset endpoint."""
+    try:
+        return requests.post(f"http://{host}:{port}/api/v1/admin/reset", timeout=HEALTH_TIMEOUT).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def _start(port: int, jar: str, timeout: float) -> Dict:
+    cmd: List[str] = [JAVA_CMD, "-jar", jar, f"--server.port={port}", "--books.admin.reset-enabled=true"]
+    if os.name == "nt":
+        detach = {"creationflags": subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        detach = {"start_new_session": True}
+    with open(_log_path(port), "w") as log:
+        process = subprocess.Popen(cmd, cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL, **detach)
+
+    try:
+        wait_until_ready(process, _log_path(port), f"http://localhost:{port}/api/v1/books", timeout)
+    except ServerStartupError:
+        if process.poll() is None:
+            process.kill()
+        raise
+    return {"pid": process.pid, "port": port, "jar": jar, "jar_mtime": os.path.getmtime(jar),
+            "started": time.time(), "log": _log_path(port)}
+
+
+def _stop(state: Optional[Dict]):
+    if not state or not pid_alive(state["pid"]):
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(state["pid"])], capture_output=True)
+        return
+    import signal
+    os.kill(state["pid"], signal.SIGTERM)
+    deadline = time.monotonic() + 30
+    while pid_alive(state["pid"]) and time.monotonic() < deadline:
+        with contextlib.suppress(ChildProcessError):
+            os.waitpid(state["pid"], os.WNOHANG)  # reap it when this process started the daemon
+        time.sleep(POLL_INTERVAL)
+    if pid_alive(state["pid"]):
+        os.kill(state["pid"], signal.SIGKILL)
+
+
+def _is_warm(state: Optional[Dict], jar: Optional[str]) -> bool:
+    return bool(
+        state and jar
+        and state.get("jar") == jar and state.get("jar_mtime") == os.path.getmtime(jar)
+        and pid_alive(state["pid"]) and is_healthy(state["port"])
+    )
+
+
+def ensure_server(port: int = DEFAULT_PORT, maven_cmd: str = MAVEN_CMD, timeout: float = STARTUP_WAIT) -> Dict:
+    """
+    Return a healthy daemon on ``port`` serving the seed catalog, starting it only when needed.
+
+    Args:
+        port: Port the daemon listens on
+        maven_cmd: Maven executable used when the jar has to be (re)built
+        timeout: Maximum seconds to wait for a fresh server to become healthy
+
+    Returns:
+        dict with the daemon state (pid, port, jar, started, log) and ``warm``,
+        True when an already running server was reused
+    """
+    with _locked(port):
+        state = read_state(port)
+        jar = find_jar()
+        if not jar_is_stale(jar) and _is_warm(state, jar) and reset_catalog(port):
+            return {**state, "warm": True}
+
+        _stop(state)
+        _write_state(port, None)
+        if jar_is_stale(jar):
+            jar = build_jar(maven_cmd)
+        state = _start(port, jar, timeout)
+        _write_state(port, state)
+        return {**state, "warm": False}
+
+
+def stop_server(port: int = DEFAULT_PORT):
+    """Stop the daemon on ``port`` if one is recorded."""
+    with _locked(port):
+        _stop(read_state(port))
+        _write_state(port, None)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the warm Books API server used by test sessions.")
+    parser.add_argument("command", choices=["start", "stop", "status", "reset"])
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    if args.command == "start":
+        state = ensure_server(args.port)
+        print(f"{'Reused' if state['warm'] else 'Started'} server pid {state['pid']} on port {args.port}")
+    elif args.command == "stop":
+        stop_server(args.port)
+        print(f"Stopped server on port {args.port}")
+    elif args.command == "reset":
+        if not reset_catalog(args.port):
+            print(f"No resettable server on port {args.port}")
+            return 1
+        print("Catalog reset")
+    else:
+        state = read_state(args.port)
+        if not state or not pid_alive(state["pid"]):
+            print(f"No server running on port {args.port}")
+            return 1
+        jar = find_jar()
+        stale = " (stale build)" if jar_is_stale(jar) or state["jar"] != jar or state["jar_mtime"] != os.path.getmtime(jar) else ""
+        health = "healthy" if is_healthy(args.port) else "unhealthy"
+        print(f"Server pid {state['pid']} on port {args.port}: {health}{stale}, "
+              f"up {time.time() - state['started']:.0f}s, log {state['log']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
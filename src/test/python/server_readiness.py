@@ -0,0 +1,159 @@
+"""
+Event-driven readiness detection for a freshly launched Spring Boot server.
+
+The server log is followed as it is written: it is polled every
+``FOLLOW_INTERVAL`` (50 ms) while nothing new arrives, not watched with file
+system notifications. Known startup lines mark the phases of the boot, and once
+Spring Boot logs ``Started ... in N seconds`` the server is confirmed with an
+HTTP probe against a real endpoint. When the child process exits before that,
+the wait fails immediately with the end of the log.
+"""
+import os
+import re
+import time
+from collections import deque, namedtuple
+from typing import List, Optional
+
+import requests
+
+
+FOLLOW_INTERVAL = 0.05  # seconds between reads of the log when nothing new was written
+PROBE_INTERVAL = 1.0  # seconds between fallback probes while the started marker has not been seen
+PROBE_TIMEOUT = 2  # seconds
+EXCERPT_LINES = 40
+API_ERRORS_TYPE = "http://localhost:8080/api/v1/common-errors"  # ProblemDetail type of the API's own errors
+
+# (phase, pattern): a phase ends when its pattern first appears in the log
+PHASES = [
+    ("launch", re.compile(r"Starting \w+ (v[\w.-]+ )?using Java")),
+    ("context", re.compile(r"Root WebApplicationContext: initialization completed")),
+    ("web server", re.compile(r"Tomcat started on port")),
+    ("application", re.compile(r"Started \w+ in [\d.]+ seconds")),
+]
+STARTED_MARKER = PHASES[-1][1]
+
+StartupPhase = namedtuple("StartupPhase", ["name", "seconds"])
+StartupReport = namedtuple("StartupReport", ["total", "phases"])
+
+
+class ServerStartupError(RuntimeError):
+    """The server process exited or did not become ready; the message ends with the log excerpt."""
+
+
+class LogFollower:
+    """Reads the lines appended to a file since the last call, like ``tail -f``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._partial = ""
+        self.recent = deque(maxlen=EXCERPT_LINES)
+
+    def read_lines(self) -> List[str]:
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return []
+            self._file = open(self.path, encoding="utf-8", errors="replace")
+        data = self._partial + self._file.read()
+        lines = data.split("\n")
+        self._partial = lines.pop()  # incomplete last line, finished by a later write
+        self.recent.extend(lines)
+        return lines
+
+    def excerpt(self) -> str:
+        return "\n".join(list(self.recent) + ([self._partial] if self._partial else []))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def probe(url: str) -> bool:
+    """
+    True when this API answers the endpoint: a 200, or a 404 with the API's ProblemDetail body.
+
+    ``GET /books`` is a 404 on an empty catalog. Any other answer, such as the
+    404 of another process that holds the port, means the server is not ready.
+    """
+    try:
+        response = requests.get(url, timeout=PROBE_TIMEOUT)
+    except requests.RequestException:
+        return False
+    if response.status_code == 200:
+        return True
+    if response.status_code != 404:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and body.get("type") == API_ERRORS_TYPE
+
+
+def wait_until_ready(process, log_file: str, probe_url: str, timeout: float,
+                     started: Optional[float] = None) -> StartupReport:
+    """
+    Wait until the server logged its startup marker and answers ``probe_url``.
+
+    Args:
+        process: The launched server (``subprocess.Popen``)
+        log_file: File the server writes its output to
+        probe_url: Endpoint that must answer once the server is ready
+        timeout: Maximum seconds to wait
+        started: ``time.perf_counter()`` at launch (defaults to now)
+
+    Returns:
+        StartupReport with the total startup time and the duration of every phase seen in the log
+
+    Raises:
+        ServerStartupError: If the process exits or the server is not ready within timeout
+    """
+    started = time.perf_counter() if started is None else started
+    follower = LogFollower(log_file)
+    phase_ends = {}
+    marker_seen = False
+    next_probe = started + PROBE_INTERVAL
+    try:
+        while True:
+            lines = follower.read_lines()
+            now = time.perf_counter()
+            for line in lines:
+                for name, pattern in PHASES:
+                    if name not in phase_ends and pattern.search(line):
+                        phase_ends[name] = now
+                marker_seen = marker_seen or STARTED_MARKER.search(line) is not None
+
+            # Probe as soon as the marker shows up; fall back to slow probing in case the log format differs
+            if marker_seen or now >= next_probe:
+                if probe(probe_url):
+                    phase_ends["first response"] = time.perf_counter()
+                    return _report(started, phase_ends)
+                next_probe = time.perf_counter() + PROBE_INTERVAL
+
+            if process.poll() is not None:
+                follower.read_lines()
+                raise ServerStartupError(f"Server exited with code {process.returncode} during startup. "
+                                         f"Last lines of {log_file}:\n{follower.excerpt()}")
+            if now - started >= timeout:
+                raise ServerStartupError(f"Server not ready after {timeout}s. "
+                                         f"Last lines of {log_file}:\n{follower.excerpt()}")
+            if not lines:
+                time.sleep(FOLLOW_INTERVAL)
+    finally:
+        follower.close()
+
+
+def _report(started: float, phase_ends: dict) -> StartupReport:
+    phases, previous = [], started
+    for name in [name for name, _ in PHASES] + ["first response"]:
+        if name in phase_ends:
+            phases.append(StartupPhase(name, phase_ends[name] - previous))
+            previous = phase_ends[name]
+    return StartupReport(previous - started, phases)
+
+
+def format_report(report: StartupReport) -> str:
+    """One-line summary, e.g. ``ready in 9.81s (launch 4.20s, context 3.90s, ...)``."""
+    phases = ", ".join(f"{phase.name} {phase.seconds:.2f}s" for phase in report.phases)
+    return f"ready in {report.total:.2f}s ({phases})"
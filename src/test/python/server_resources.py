@@ -0,0 +1,225 @@
+"""
+Resource usage of the server process, read from ``/proc`` (Linux only).
+
+A sample holds the resident set size, the CPU time used so far, the number of
+threads and the number of open file descriptors. ``ResourceSampler`` collects
+samples on a background thread at a fixed interval:
+
+    pid = find_server_pid(8080)
+    sampler = ResourceSampler(pid, interval=5).start()
+    ...
+    sampler.stop()
+    print(sampler.samples[-1].rss / 2 ** 20, "MiB")
+
+``mvn spring-boot:run`` forks the JVM that serves the requests. The pid of the
+Maven process is therefore the wrong one to sample, and ``find_server_pid``
+looks up the process that owns the listening socket instead.
+
+The JVM heap is invisible in ``/proc``. ``read_jvm_sample`` reads it from the
+JVM's hsperfdata file. That is the memory-mapped counter block that ``jstat``
+reads, and the JVM updates it anyway, so reading it costs no request and no
+attach.
+"""
+import glob
+import os
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional
+
+
+PROC = "/proc"
+LISTEN = "0A"  # TCP state code of a listening socket in /proc/net/tcp
+DEFAULT_INTERVAL = 5.0  # seconds between samples
+HSPERFDATA = "/tmp/hsperfdata_*/{pid}"  # the JVM's performance counters, unless started with -XX:-UsePerfData
+HSPERF_MAGIC = b"\xca\xfe\xc0\xc0"
+HSPERF_PROLOGUE = 32  # magic, byte order, versions, accessible, used, overflow, timestamp, entry offset, count
+HSPERF_ENTRY = "iiibbbbi"  # entry length, name offset, vector length, type, flags, units, variability, data offset
+_HEAP_SPACE = re.compile(r"sun\.gc\.generation\.\d+\.space\.\d+\.used")
+_GENERATION_CAPACITY = re.compile(r"sun\.gc\.generation\.\d+\.capacity")
+_COLLECTOR = re.compile(r"sun\.gc\.collector\.\d+\.(invocations|time)")
+
+ResourceSample = namedtuple("ResourceSample", ["time", "rss", "cpu", "threads", "fds"])
+JvmSample = namedtuple("JvmSample", ["heap_used", "heap_capacity", "gc_count", "gc_time", "java_threads"])
+
+
+def supported() -> bool:
+    """True where process resources can be read from /proc."""
+    return os.path.isfile(os.path.join(PROC, "self", "stat"))
+
+
+def read_sample(pid: int) -> ResourceSample:
+    """
+    Read one sample of a process.
+
+    Args:
+        pid: Process to read
+
+    Returns:
+        ResourceSample with the wall-clock ``time``, ``rss`` in bytes, ``cpu`` (user +
+        system) in seconds since the process started, ``threads`` and ``fds``
+
+    Raises:
+        ProcessLookupError: when the process has exited
+    """
+    try:
+        with open(os.path.join(PROC, str(pid), "stat")) as f:
+            stat = f.read()
+        fds = len(os.listdir(os.path.join(PROC, str(pid), "fd")))
+    except FileNotFoundError:
+        raise ProcessLookupError(f"No process {pid}") from None
+    # The command name may contain spaces and parentheses: split after the last ')'
+    fields = stat.rpartition(")")[2].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return ResourceSample(
+        time=time.time(),
+        rss=int(fields[21]) * os.sysconf("SC_PAGE_SIZE"),
+        cpu=(int(fields[11]) + int(fields[12])) / ticks,
+        threads=int(fields[17]),
+        fds=fds,
+    )
+
+
+def read_jvm_counters(pid: int) -> Optional[Dict[str, int]]:
+    """
+    The long-valued hsperfdata counters of a JVM, by name; None when it publishes none.
+    """
+    paths = glob.glob(HSPERFDATA.format(pid=pid))
+    if not paths:
+        return None
+    try:
+        with open(paths[0], "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:4] != HSPERF_MAGIC:
+        return None
+    order = "<" if data[4] == 1 else ">"
+    entry_offset, count = struct.unpack_from(order + "ii", data, HSPERF_PROLOGUE - 8)
+    entry = struct.Struct(order + HSPERF_ENTRY)
+    counters = {}
+    for _ in range(count):
+        length, name_offset, vector_length, data_type, _, _, _, data_offset = entry.unpack_from(data, entry_offset)
+        if vector_length == 0 and data_type == ord("J"):
+            start = entry_offset + name_offset
+            name = data[start:data.index(b"\0", start)].decode("ascii", "replace")
+            counters[name] = struct.unpack_from(order + "q", data, entry_offset + data_offset)[0]
+        entry_offset += length
+    return counters
+
+
+def read_jvm_sample(pid: int) -> Optional[JvmSample]:
+    """
+    Heap and GC state of a JVM from its hsperfdata counters, or None for a non-JVM process.
+
+    Returns:
+        JvmSample with ``heap_used`` and ``heap_capacity`` in bytes (all generations),
+        ``gc_count`` and ``gc_time`` (seconds) summed over the collectors, and ``java_threads``
+    """
+    counters = read_jvm_counters(pid)
+    if not counters:
+        return None
+    frequency = counters.get("sun.os.hrt.frequency") or 1
+    collectors = [(name, value) for name, value in counters.items() if _COLLECTOR.fullmatch(name)]
+    return JvmSample(
+        heap_used=sum(value for name, value in counters.items() if _HEAP_SPACE.fullmatch(name)),
+        heap_capacity=sum(value for name, value in counters.items() if _GENERATION_CAPACITY.fullmatch(name)),
+        gc_count=sum(value for name, value in collectors if name.endswith("invocations")),
+        gc_time=sum(value for name, value in collectors if name.endswith("time")) / frequency,
+        java_threads=counters.get("java.threads.live"),
+    )
+
+
+def _listening_inodes(port: int) -> set:
+    inodes = set()
+    for table in ("tcp", "tcp6"):
+        try:
+            with open(os.path.join(PROC, "net", table)) as f:
+                next(f)  # header
+                for line in f:
+                    fields = line.split()
+                    if fields[3] == LISTEN and int(fields[1].rpartition(":")[2], 16) == port:
+                        inodes.add(fields[9])
+        except FileNotFoundError:
+            continue
+    return inodes
+
+
+def find_server_pid(port: int) -> Optional[int]:
+    """
+    Pid of the local process listening on a TCP port, or None.
+
+    Only processes whose file descriptors this user may read are found, which
+    includes every server started by this user.
+    """
+    if not supported():
+        return None
+    sockets = {f"socket:[{inode}]" for inode in _listening_inodes(port)}
+    if not sockets:
+        return None
+    for entry in os.listdir(PROC):
+        if not entry.isdigit():
+            continue
+        fd_dir = os.path.join(PROC, entry, "fd")
+        try:
+            for fd in os.listdir(fd_dir):
+                if os.readlink(os.path.join(fd_dir, fd)) in sockets:
+                    return int(entry)
+        except OSError:
+            continue  # exited meanwhile, or not ours to read
+    return None
+
+
+def cpu_percent(first: ResourceSample, second: ResourceSample) -> float:
+    """CPU utilization between two samples, in percent of one core."""
+    elapsed = second.time - first.time
+    return 100.0 * (second.cpu - first.cpu) / elapsed if elapsed > 0 else 0.0
+
+
+class ResourceSampler:
+    """
+    Samples a process on a background thread.
+
+    Args:
+        pid: Process to sample
+        interval: Seconds between samples
+        on_sample: Optional callback invoked with every sample, on the sampler thread
+    """
+
+    def __init__(self, pid: int, interval: float = DEFAULT_INTERVAL,
+                 on_sample: Optional[Callable[[ResourceSample], None]] = None):
+        self.pid = pid
+        self.interval = interval
+        self.on_sample = on_sample
+        self.samples: List[ResourceSample] = []
+        self.exited = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"resources-{pid}", daemon=True)
+
+    def sample(self) -> Optional[ResourceSample]:
+        """Take a sample now; None once the process has exited."""
+        try:
+            sample = read_sample(self.pid)
+        except ProcessLookupError:
+            self.exited = True
+            return None
+        self.samples.append(sample)
+        if self.on_sample is not None:
+            self.on_sample(sample)
+        return sample
+
+    def _run(self):
+        while self.sample() is not None and not self._stop.wait(self.interval):
+            pass
+
+    def start(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Optional[ResourceSample]:
+        """Stop sampling and take a final sample."""
+        self._stop.set()
+        self._thread.join()
+        return None if self.exited else self.sample()
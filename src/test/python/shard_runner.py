@@ -0,0 +1,124 @@
+"""
+Run the test modules in parallel processes, each with its own freshly seeded server.
+
+Every shard is a separate pytest process started with ``BOOKS_SERVER_PORT=0``:
+its ``spring_boot_server`` fixture launches a server on a free ephemeral port and
+points the shared BooksClient at it. Allure results of all shards are merged
+into ``allure-results`` afterwards.
+
+The unit of distribution is the test module, never a test inside one. The
+endpoint suite is a single module, ``test_endpoints.py``, so all of it runs in
+one shard however many workers there are; extra workers only help once the
+suite is split into modules, for example one per resource group.
+
+    python shard_runner.py --workers 4
+    python shard_runner.py --workers 2 -- -m get       # extra pytest arguments after --
+"""
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+from allure_pipeline import rotate_results
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(HERE, "../../../"))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "allure-results")
+SHARDS_DIR = os.path.join(PROJECT_ROOT, "allure-results-shards")
+
+
+def discover_modules(paths: Optional[List[str]] = None) -> List[str]:
+    """Return the test modules to distribute (defaults to every test_*.py next to this file)."""
+    if paths:
+        return [os.path.abspath(path) for path in paths]
+    return sorted(glob.glob(os.path.join(HERE, "test_*.py")))
+
+
+def assign_shards(modules: List[str], workers: int) -> List[List[str]]:
+    """
+    Spread modules over workers, largest first onto the least loaded shard.
+
+    Modules are never split: tests inside one module may depend on each other's
+    server state, and each shard starts from the seed catalog.
+    """
+    shards: List[List[str]] = [[] for _ in range(max(1, workers))]
+    loads = [0] * len(shards)
+    for module in sorted(modules, key=os.path.getsize, reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(module)
+        loads[target] += os.path.getsize(module)
+    return [shard for shard in shards if shard]
+
+
+def merge_results(shard_dirs: List[str], results_dir: str = RESULTS_DIR):
+    """Merge per-shard Allure results into one directory (result file names are UUIDs)."""
+    rotate_results(results_dir)
+    environment = None
+    for shard_dir in shard_dirs:
+        if not os.path.isdir(shard_dir):
+            continue
+        for name in os.listdir(shard_dir):
+            source = os.path.join(shard_dir, name)
+            if name == "environment.properties":
+                environment = environment or source
+                continue
+            shutil.copy2(source, os.path.join(results_dir, name))
+    if environment:
+        with open(environment) as f:
+            lines = [line for line in f if not line.startswith("API_BASE_URL=")]
+        with open(os.path.join(results_dir, "environment.properties"), "w") as f:
+            f.writelines(lines)
+            f.write(f"Shards={len(shard_dirs)}\n")
+
+
+def run_shards(shards: List[List[str]], pytest_args: List[str]) -> List[int]:
+    """Start one pytest process per shard and wait for all of them."""
+    if os.path.exists(SHARDS_DIR):
+        shutil.rmtree(SHARDS_DIR)
+    os.makedirs(SHARDS_DIR)
+
+    processes = []
+    for index, modules in enumerate(shards):
+        shard_dir = os.path.join(SHARDS_DIR, f"shard-{index}")
+        env = dict(os.environ, BOOKS_SERVER_PORT="0", BOOKS_SHARD=str(index))
+        cmd = [sys.executable, "-m", "pytest", *modules, f"--alluredir={shard_dir}", *pytest_args]
+        log = open(os.path.join(SHARDS_DIR, f"shard-{index}.log"), "w")
+        print(f"Shard {index}: {', '.join(os.path.basename(m) for m in modules)}")
+        processes.append((subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT), log))
+
+    codes = []
+    for index, (process, log) in enumerate(processes):
+        codes.append(process.wait())
+        log.close()
+        print(f"Shard {index} finished with exit code {codes[-1]} (log: {log.name})")
+    return codes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    pytest_args = argv[argv.index("--") + 1:] if "--" in argv else []
+    own_args = argv[:argv.index("--")] if "--" in argv else argv
+
+    parser = argparse.ArgumentParser(description="Run test modules in parallel, one server per shard.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("modules", nargs="*", help="test modules (default: every test_*.py)")
+    args = parser.parse_args(own_args)
+
+    shards = assign_shards(discover_modules(args.modules), args.workers)
+    if not shards:
+        print("No test modules found")
+        return 1
+    start = time.perf_counter()
+    codes = run_shards(shards, pytest_args)
+    merge_results([os.path.join(SHARDS_DIR, f"shard-{i}") for i in range(len(shards))])
+    print(f"{len(shards)} shard(s) finished in {time.perf_counter() - start:.1f}s, results merged into {RESULTS_DIR}")
+    return max(codes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,462 @@
+"""
+Soak test: hours of sustained, mixed create/read/update/delete/recommend traffic
+against a running server, with the server process watched for leaks.
+
+    python soak_runner.py --duration 4h --rate 200
+    python soak_runner.py --duration 30m --workers 16 --mix create=2,read=10,update=2,delete=1
+    python soak_runner.py --duration 8h --rate 100 --mix recommend=0.1 --json soak.json
+
+Creates post new books from the ``catalog_seeder`` generator. Updates and deletes
+work on books the soak created itself, addressed by title: ids are ``size + 1``
+on the server and stop being unique once books are deleted. Reads fetch a book
+by id or filter by title or category. With the default mix the catalog keeps
+growing, as it does in production, where nothing but ``DELETE`` shrinks the
+in-memory ``books`` list.
+
+Every ``--window`` seconds a line reports throughput, errors, p50/p99 latency
+and the catalog size. The same line shows the server's RSS, CPU, threads and
+open file descriptors, sampled from ``/proc`` every ``--sample-interval``
+seconds. The server is the process listening on the base URL's port, or
+``--pid``. At the end every metric gets a growth verdict. A metric is flagged
+when it rises significantly over the whole run (Mann-Kendall test), still
+rises over the second half (so a heap that grew during warm-up and then
+settled is not flagged), and its last tenth is clearly above its first. The
+exit code is 1 when anything is flagged.
+"""
+import argparse
+import json
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict, namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from books_client import DEFAULT_BASE_URL, BooksClient
+from catalog_seeder import CATEGORIES, generate_books
+from latency_stats import TREND_Z, percentile, summarize, trend
+from model_scheduler import ModelScheduler, recommendation_cost
+from openai_model import get_model
+from seed_catalog import SEED_BOOKS
+from server_resources import DEFAULT_INTERVAL, ResourceSampler, cpu_percent, find_server_pid, supported
+
+
+OPERATIONS = ("create", "read", "update", "delete", "recommend")
+# RECOMMEND calls hit the paid OpenAI API, so they are opt-in; more creates than deletes grows the catalog
+DEFAULT_MIX = {"create": 2, "read": 10, "update": 2, "delete": 1, "recommend": 0}
+OK_STATUSES = {
+    "create": {201, 409},  # 409: another client created the same book
+    "read": {200, 404},  # 404: the book was deleted meanwhile, or the filter matches nothing
+    "update": {200, 404, 409},  # 409: the title is shared with a book created outside this run
+    "delete": {200, 404},
+    "recommend": {200},
+}
+ERROR_STATUS = "ERR"
+DEFAULT_WINDOW = 60.0  # seconds per report line
+EDGE_SHARE = 0.1  # share of the run at each end compared for the growth verdict
+MIN_GROWTH = 0.05  # relative resource growth below this is never flagged
+MIN_DRIFT = 0.2  # relative latency or CPU increase below this is never flagged
+MIN_TREND_POINTS = 6
+DISPLAY_UNITS = {"rss": (2 ** -20, "MiB"), "latency p50": (1000, "ms"), "latency p99": (1000, "ms")}
+
+Window = namedtuple("Window", ["start", "length", "requests", "errors", "latency", "operations", "catalog",
+                               "rss", "cpu", "threads", "fds"])
+Growth = namedtuple("Growth", ["metric", "first", "last", "change", "slope_per_hour", "z", "flagged"])
+
+
+def parse_duration(text: str) -> float:
+    """Seconds in ``90``, ``90s``, ``30m``, ``4h`` or ``1h30m``."""
+    parts = re.fullmatch(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s?)?", text.strip())
+    if not text.strip() or parts is None:
+        raise argparse.ArgumentTypeError(f"Invalid duration '{text}', expected e.g. 90, 30m, 4h or 1h30m")
+    hours, minutes, seconds = (float(part or 0) for part in parts.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, text.split(",")):
+        operation, _, weight = item.partition("=")
+        operation = operation.strip().lower()
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{operation}', expected one of {OPERATIONS}")
+        mix[operation] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("The mix needs at least one operation with a positive weight")
+    return mix
+
+
+class SoakTraffic:
+    """
+    The operations of a soak, with the books the soak created so far.
+
+    A book taken for an update or a delete is out of the pool until the request
+    returns, so two workers never race on the same book.
+
+    Args:
+        client: BooksClient whose pool should be at least as large as the number of workers
+        seed: Seed of the generated books; titles also get a per-run suffix, so they stay unique
+            even next to the leftovers of an interrupted soak with the same seed
+        catalog: Number of books on the server when the soak starts, tracked as it creates and deletes
+        scheduler: Paces recommendation calls within the model limits (needed for ``recommend``)
+    """
+
+    def __init__(self, client: BooksClient, seed: int = 0, catalog: int = 0,
+                 scheduler: Optional[ModelScheduler] = None):
+        self.client = client
+        self.scheduler = scheduler
+        self.catalog = catalog
+        self._books = generate_books(seed)
+        self._tag = f"s{seed}.{secrets.token_hex(2)}"
+        self._created = 0
+        self._pool: List[Tuple[int, str]] = []  # (id, title) of the books this soak owns
+        self._max_id = max((book["id"] for book in SEED_BOOKS), default=1)
+        self._lock = threading.Lock()
+
+    def _next_book(self) -> Dict:
+        with self._lock:
+            book = next(self._books)
+            self._created += 1
+            suffix = f" {self._tag}-{self._created}"
+        return {**book, "title": book["title"][:50 - len(suffix)] + suffix}
+
+    def _take(self, rng: random.Random) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            if not self._pool:
+                return None
+            index = rng.randrange(len(self._pool))
+            self._pool[index], self._pool[-1] = self._pool[-1], self._pool[index]
+            return self._pool.pop()
+
+    def _put_back(self, book: Tuple[int, str]):
+        with self._lock:
+            self._pool.append(book)
+
+    def _create(self, rng: random.Random) -> requests.Response:
+        book = self._next_book()
+        response = self.client.post("/books", json_data=book)
+        if response.status_code == 201:
+            book_id = response.json()["book"]["id"]
+            with self._lock:
+                self._pool.append((book_id, book["title"]))
+                self._max_id = max(self._max_id, book_id)
+                self.catalog += 1
+        return response
+
+    def _read(self, rng: random.Random) -> requests.Response:
+        kind = rng.randrange(3)
+        if kind == 0:
+            return self.client.get(f"/books/{rng.randint(1, self._max_id)}")
+        if kind == 1:
+            with self._lock:
+                title = rng.choice(self._pool)[1] if self._pool else rng.choice(SEED_BOOKS)["title"]
+            return self.client.get("/books", params={"title": title})
+        return self.client.get("/books", params={"category": rng.choice(CATEGORIES)})
+
+    def _update(self, rng: random.Random) -> Optional[requests.Response]:
+        taken = self._take(rng)
+        if taken is None:
+            return None
+        book = self._next_book()
+        try:
+            response = self.client.put("/books", json_data=book, params={"title": taken[1]})
+        except requests.RequestException:
+            self._put_back(taken)
+            raise
+        self._put_back((taken[0], book["title"]) if response.status_code == 200 else taken)
+        return response
+
+    def _delete(self, rng: random.Random) -> Optional[requests.Response]:
+        taken = self._take(rng)
+        if taken is None:
+            return None
+        try:
+            response = self.client.delete("/books", params={"title": taken[1]})
+        except requests.RequestException:
+            self._put_back(taken)
+            raise
+        if response.status_code == 200:
+            with self._lock:
+                self.catalog -= 1
+        else:
+            self._put_back(taken)
+        return response
+
+    def _recommend(self, rng: random.Random) -> requests.Response:
+        book_id = rng.randint(1, len(SEED_BOOKS))
+
+        def send(model=None):
+            return self.client.get(f"/recommendations/{book_id}")
+
+        if self.scheduler is None:
+            return send()
+        return self.scheduler.submit(send, tokens=recommendation_cost(book_id)).result()
+
+    def run(self, operation: str, rng: random.Random) -> Tuple[str, object, float]:
+        """
+        Perform one operation.
+
+        An update or delete with no book of its own to work on creates one instead.
+
+        Returns:
+            tuple of (the operation performed, its status or ``ERROR_STATUS``, latency in seconds)
+        """
+        start = time.perf_counter()
+        try:
+            response = getattr(self, f"_{operation}")(rng)
+            if response is None:
+                operation, response = "create", self._create(rng)
+            status = response.status_code
+        except Exception:
+            status = ERROR_STATUS
+        return operation, status, time.perf_counter() - start
+
+    def cleanup(self) -> int:
+        """Delete every book the soak still owns; return how many were deleted."""
+        with self._lock:
+            pool, self._pool = self._pool, []
+        deleted = 0
+        for _, title in pool:
+            try:
+                deleted += self.client.delete("/books", params={"title": title}).status_code == 200
+            except requests.RequestException:
+                pass
+        return deleted
+
+
+class SoakRecorder:
+    """Latencies of the current window, turned into one Window per ``window`` seconds."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self.windows: List[Window] = []
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, status, latency: float):
+        with self._lock:
+            self._latencies[operation].append(latency)
+            if status not in OK_STATUSES[operation]:
+                self._errors += 1
+
+    def close_window(self, start: float, length: float, catalog: int, sampler: Optional[ResourceSampler]) -> Window:
+        with self._lock:
+            latencies, self._latencies = self._latencies, defaultdict(list)
+            errors, self._errors = self._errors, 0
+        every = [latency for values in latencies.values() for latency in values]
+        operations = {operation: summarize(values, (50, 99)) for operation, values in latencies.items()}
+        rss = cpu = threads = fds = None
+        samples = sampler.samples if sampler is not None else []
+        if samples:
+            last = samples[-1]
+            rss, threads, fds = last.rss, last.threads, last.fds
+            earlier = [sample for sample in samples if sample.time <= last.time - self.window * 0.5]
+            if earlier:
+                cpu = cpu_percent(earlier[-1], last)
+        window = Window(start, length, len(every), errors, summarize(every, (50, 99)), operations, catalog,
+                        rss, cpu, threads, fds)
+        self.windows.append(window)
+        return window
+
+
+def run_soak(traffic: SoakTraffic, mix: Dict[str, float], duration: float, workers: int,
+             rate: Optional[float] = None, window: float = DEFAULT_WINDOW, seed: int = 0,
+             sampler: Optional[ResourceSampler] = None, progress: bool = True) -> List[Window]:
+    """
+    Drive the mix for ``duration`` seconds and return one Window per ``window`` seconds.
+
+    Without ``rate`` the workers send back to back (closed loop). With it, request
+    ``i`` is due at ``start + i / rate`` and its latency is measured from then, so a
+    server that slows down is charged for the queueing it causes.
+    """
+    operations = [operation for operation in OPERATIONS if mix.get(operation, 0) > 0]
+    weights = [mix[operation] for operation in operations]
+    recorder = SoakRecorder(window)
+    start = time.perf_counter() + 0.05
+    deadline = start + duration
+    slots = iter(range(int(rate * duration))) if rate else None
+    lock = threading.Lock()
+
+    def worker(index: int):
+        rng = random.Random(seed * 1_000_003 + index)
+        while True:
+            intended = None
+            if slots is not None:
+                with lock:
+                    slot = next(slots, None)
+                if slot is None:
+                    return
+                intended = start + slot / rate
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            elif time.perf_counter() >= deadline:
+                return
+            operation = rng.choices(operations, weights)[0]
+            operation, status, latency = traffic.run(operation, rng)
+            if intended is not None:
+                latency = time.perf_counter() - intended
+            recorder.record(operation, status, latency)
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"soak-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    if progress:
+        print(format_window_header())
+    window_start = start
+    while True:
+        alive = any(thread.is_alive() for thread in threads)
+        now = time.perf_counter()
+        if alive and now < window_start + window:
+            time.sleep(min(window_start + window - now, 0.5))
+            continue
+        length = min(window, now - window_start)
+        closed = recorder.close_window(window_start - start, length, traffic.catalog, sampler)
+        window_start += window
+        if progress:
+            print(format_window(closed))
+        if not alive:
+            break
+    return recorder.windows
+
+
+def _growth(metric: str, times: Sequence[float], values: Sequence[float], threshold: float) -> Optional[Growth]:
+    points = [(t, v) for t, v in zip(times, values) if v is not None]
+    if len(points) < MIN_TREND_POINTS:
+        return None
+    times, values = [t for t, _ in points], [v for _, v in points]
+    edge = max(1, int(len(values) * EDGE_SHARE))
+    first, last = percentile(sorted(values[:edge]), 50), percentile(sorted(values[-edge:]), 50)
+    change = (last - first) / first if first else (float("inf") if last > first else 0.0)
+    whole = trend(times, values)
+    half = len(values) // 2
+    tail = trend(times[half:], values[half:])
+    flagged = whole["z"] > TREND_Z and tail["z"] > TREND_Z and change > threshold
+    return Growth(metric, first, last, change, whole["slope"] * 3600, whole["z"], flagged)
+
+
+def analyze(windows: Sequence[Window], sampler: Optional[ResourceSampler] = None) -> List[Growth]:
+    """Growth verdict of every resource and latency metric of a soak."""
+    # The last window is cut short when the traffic stops; too few requests to judge it
+    longest = max((window.length for window in windows), default=0)
+    windows = [window for window in windows if window.length >= longest / 2]
+    results = []
+    samples = sampler.samples if sampler is not None else []
+    times = [sample.time for sample in samples]
+    for metric in ("rss", "threads", "fds"):
+        results.append(_growth(metric, times, [getattr(sample, metric) for sample in samples], MIN_GROWTH))
+    window_times = [window.start for window in windows]
+    results.append(_growth("cpu %", window_times, [window.cpu for window in windows], MIN_DRIFT))
+    for label in ("p50", "p99"):
+        results.append(_growth(f"latency {label}", window_times,
+                               [window.latency[label] if window.requests else None for window in windows], MIN_DRIFT))
+    return [result for result in results if result is not None]
+
+
+def format_window_header() -> str:
+    return (f"{'Time':>8}{'Req/s':>9}{'Err%':>7}{'p50 ms':>9}{'p99 ms':>9}{'Books':>9}"
+            f"{'RSS MiB':>9}{'CPU%':>7}{'Thr':>6}{'FDs':>6}")
+
+
+def format_window(window: Window) -> str:
+    def number(value, scale=1.0, fmt="{:.0f}"):
+        return "-" if value is None else fmt.format(value * scale)
+
+    elapsed = window.start + window.length
+    line = (f"{int(elapsed // 3600):>2}:{int(elapsed % 3600 // 60):02}:{int(elapsed % 60):02}"
+            f"{window.requests / window.length if window.length else 0:>9.1f}{(window.errors / window.requests if window.requests else 0):>7.1%}")
+    if window.requests:
+        line += f"{window.latency['p50'] * 1000:>9.1f}{window.latency['p99'] * 1000:>9.1f}"
+    else:
+        line += f"{'-':>9}{'-':>9}"
+    return (line + f"{window.catalog:>9,}{number(window.rss, 2 ** -20):>9}{number(window.cpu, fmt='{:.1f}'):>7}"
+            f"{number(window.threads):>6}{number(window.fds):>6}")
+
+
+def format_growth(results: Sequence[Growth]) -> str:
+    header = f"{'Metric':<14}{'Unit':<6}{'First':>10}{'Last':>10}{'Change':>9}{'Per hour':>11}{'MK z':>8}  Verdict"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        scale, unit = DISPLAY_UNITS.get(result.metric, (1, ""))
+        lines.append(f"{result.metric:<14}{unit:<6}{result.first * scale:>10.1f}{result.last * scale:>10.1f}"
+                     f"{result.change:>9.1%}{result.slope_per_hour * scale:>11.2f}{result.z:>8.2f}  "
+                     + ("GROWING" if result.flagged else "stable"))
+    return "\n".join(lines)
+
+
+def catalog_size(client: BooksClient) -> int:
+    response = client.get("/books")
+    return len(response.json().get("books", [])) if response.status_code == 200 else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Soak the Books API with sustained mixed traffic and watch for leaks.")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--duration", type=parse_duration, default=parse_duration("1h"),
+                        help="how long to run, e.g. 90s, 30m, 4h (default: 1h)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, help="requests per second (omit to send back to back)")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="operation weights, e.g. create=2,read=10,update=2,delete=1,recommend=0")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW, help="seconds per report line (default: 60)")
+    parser.add_argument("--pid", type=int, help="server process to sample (default: the one listening on the port)")
+    parser.add_argument("--sample-interval", type=float, default=DEFAULT_INTERVAL,
+                        help="seconds between /proc samples (default: 5)")
+    parser.add_argument("--seed", type=int, help="seed of the generated books (default: random)")
+    parser.add_argument("--keep", action="store_true", help="leave the created books on the server")
+    parser.add_argument("--recommend-model", default="gpt-4",
+                        help="model the server uses for recommendations, sets the pacing limits (default: gpt-4)")
+    parser.add_argument("--json", help="write windows, resource samples and verdicts to this file")
+    args = parser.parse_args(argv)
+    seed = args.seed if args.seed is not None else random.randrange(10 ** 6)
+
+    pid = args.pid
+    if pid is None and supported():
+        url = urlparse(args.base_url)
+        if url.hostname in ("localhost", "127.0.0.1", "::1"):
+            pid = find_server_pid(url.port or 80)
+    sampler = ResourceSampler(pid, args.sample_interval).start() if pid is not None else None
+    scheduler = None
+    if args.mix.get("recommend", 0) > 0:
+        try:
+            scheduler = ModelScheduler([get_model(args.recommend_model)], workers=args.workers)
+        except ValueError as e:
+            parser.error(str(e))
+
+    client = BooksClient(base_url=args.base_url, pool_size=args.workers)
+    traffic = SoakTraffic(client, seed=seed, catalog=catalog_size(client), scheduler=scheduler)
+    mode = f"{args.rate:g} req/s" if args.rate else "back to back"
+    print(f"Soak for {args.duration:,.0f}s, {args.workers} workers, {mode}, seed {seed}, "
+          + (f"sampling pid {pid}" if sampler else "server resources not sampled (no local pid)"))
+    try:
+        windows = run_soak(traffic, args.mix, args.duration, args.workers, args.rate, args.window, seed, sampler)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if scheduler is not None:
+            scheduler.close()
+        if not args.keep:
+            print(f"Deleted {traffic.cleanup():,} books created by the soak")
+        client.close()
+
+    results = analyze(windows, sampler)
+    print(format_growth(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "seed": seed, "pid": pid, "mix": args.mix, "rate": args.rate,
+                "windows": [window._asdict() for window in windows],
+                "samples": [sample._asdict() for sample in sampler.samples] if sampler else [],
+                "growth": [result._asdict() for result in results],
+            }, f, indent=4)
+    return 1 if any(result.flagged for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
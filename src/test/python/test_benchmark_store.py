@@ -0,0 +1,95 @@
+"""Unit tests for the commit comparison and erosion check in benchmark_store.py; no server needed."""
+import math
+import random
+
+import pytest
+
+from benchmark_store import MIN_RUNS, Point, Revision, TrendStore, compare, erosion, thin
+
+
+pytestmark = pytest.mark.offline
+
+ENV = {"OS": "Linux", "Python": "3", "API_BASE_URL": "http://localhost:8080/api/v1", "CPU": "x", "Cores": "4",
+       "Memory": "8 GiB"}
+
+
+def runs(rng: random.Random, count: int, median: float, samples: int = 50, spread: float = 0.1):
+    """``count`` runs as stored: (run median, thinned samples), samples log-normal around ``median``."""
+    result = []
+    for _ in range(count):
+        values = thin(median * rng.lognormvariate(0, spread) for _ in range(samples))
+        result.append((values[len(values) // 2], values))
+    return result
+
+
+@pytest.mark.parametrize("count", [3, MIN_RUNS])
+def test_slower_and_faster_commits(count):
+    rng = random.Random(count)
+    base = {"Get Book By ID": runs(rng, count, 0.010), "Create Book": runs(rng, count, 0.020)}
+    head = {"Get Book By ID": runs(rng, count, 0.013), "Create Book": runs(rng, count, 0.015)}
+    comparison = compare(base, head)
+
+    assert comparison["Get Book By ID"]["verdict"] == "slower"
+    assert comparison["Create Book"]["verdict"] == "faster"
+    assert comparison["Get Book By ID"]["change"] == pytest.approx(0.3, abs=0.05)
+    assert comparison["Create Book"]["change"] == pytest.approx(-0.25, abs=0.05)
+    assert comparison["Get Book By ID"]["basis"] == ("runs" if count >= MIN_RUNS else "samples")
+    assert comparison["Get Book By ID"]["runs"] == (count, count)
+
+
+def test_same_commit_twice_is_the_same():
+    stories = {"Get All Books": runs(random.Random(1), 4, 0.005)}
+    result = compare(stories, stories)["Get All Books"]
+    assert result["verdict"] == "same"
+    assert result["change"] == 0
+    assert result["p"] == 1.0
+
+
+def test_run_medians_absorb_run_to_run_noise():
+    # Every run is shifted as a whole by its own noise, and within a run the samples are tight:
+    # pooled, thousands of samples make any shift significant; on run medians it is noise
+    rng = random.Random(2)
+    base = {"Get Book By ID": [(median, [median] * 50) for median in (rng.gauss(0.010, 0.001) for _ in range(MIN_RUNS))]}
+    head = {"Get Book By ID": [(median, [median] * 50) for median in (rng.gauss(0.010, 0.001) for _ in range(MIN_RUNS))]}
+    result = compare(base, head)["Get Book By ID"]
+    assert result["basis"] == "runs"
+    assert result["verdict"] == "same"
+
+
+def test_only_stories_on_both_sides_are_compared():
+    rng = random.Random(3)
+    base = {"Old": runs(rng, 2, 0.01), "Both": runs(rng, 2, 0.01)}
+    head = {"New": runs(rng, 2, 0.01), "Both": runs(rng, 2, 0.01)}
+    assert list(compare(base, head)) == ["Both"]
+
+
+def test_zero_base_median_has_no_relative_change():
+    result = compare({"Story": [(0.0, [0.0] * 10)]}, {"Story": [(0.001, [0.001] * 10)]})["Story"]
+    assert math.isnan(result["change"])
+    assert result["verdict"] == "slower"
+
+
+def test_stored_runs_compare_like_the_originals(tmp_path):
+    rng = random.Random(4)
+    base_samples = [[0.010 * rng.lognormvariate(0, 0.1) for _ in range(1000)] for _ in range(3)]
+    head_samples = [[0.012 * rng.lognormvariate(0, 0.1) for _ in range(1000)] for _ in range(3)]
+    with TrendStore(str(tmp_path / "history.db")) as store:
+        for number, samples in enumerate(base_samples):
+            store.append({"Story": samples}, "pytest", ENV, Revision("aaaa", 1.0, False), recorded=10 + number)
+        for number, samples in enumerate(head_samples):
+            store.append({"Story": samples}, "pytest", ENV, Revision("bbbb", 2.0, False), recorded=20 + number)
+        assert store.resolve("bbbb") == "bbbb"
+        result = compare(store.results("aaaa"), store.results("bbbb"))["Story"]
+        assert [point.runs for point in store.trends()["Story"]] == [3, 3]
+    assert result["verdict"] == "slower"
+    assert result["runs"] == (3, 3)
+    assert result["change"] == pytest.approx(0.2, abs=0.03)
+
+
+def test_erosion_of_a_slow_drift_over_many_commits():
+    rng = random.Random(5)
+    drifting = [Point(str(i), i, 1, 0.010 * (1 + i / 2000) * rng.lognormvariate(0, 0.05), 0.0) for i in range(1000)]
+    flat = [point._replace(median=0.010 * rng.lognormvariate(0, 0.05)) for point in drifting]
+    assert erosion(drifting)["eroding"] is True
+    assert erosion(drifting)["slope"] == pytest.approx(0.010 / 2000, rel=0.5)
+    assert erosion(flat)["eroding"] is False
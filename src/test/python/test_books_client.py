@@ -0,0 +1,42 @@
+"""Unit tests for is_unread in books_client.py, against an in-process books_stub; no server needed."""
+import pytest
+import requests
+
+from books_client import BooksClient, is_unread
+from books_stub import BooksApi, BooksStub
+from json_stream import stream_books
+
+
+pytestmark = pytest.mark.offline
+
+
+@pytest.fixture(scope="module")
+def client():
+    stub = BooksStub(port=0, api=BooksApi(recommend=lambda prompt: [])).start()
+    client = BooksClient(base_url=stub.base_url)
+    yield client
+    client.close()
+    stub.stop()
+
+
+def test_a_streamed_body_is_unread_until_it_is_read(client):
+    response = client.get("/books", stream=True)
+    assert is_unread(response)
+    assert len(response.json()["books"]) == 25
+    assert not is_unread(response)
+
+
+def test_stream_books_reads_only_an_unread_body_from_the_socket(client):
+    streamed, read = client.get("/books", stream=True), client.get("/books")
+    assert [book["id"] for book in stream_books(streamed)] == [book["id"] for book in stream_books(read)]
+    assert streamed.streamed and not read.streamed
+
+
+def test_a_body_read_with_the_response_is_not_unread(client):
+    assert not is_unread(client.get("/books/1"))
+
+
+def test_a_response_built_in_memory_is_not_unread():
+    response = requests.Response()
+    response._content = b"{}"
+    assert not is_unread(response)
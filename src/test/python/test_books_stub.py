@@ -0,0 +1,156 @@
+"""Unit tests for the stand-in in books_stub.py: its indexed catalog and its answers to the edge cases; no server needed."""
+import json
+import random
+
+import pytest
+
+from books_stub import (API_PREFIX, EDGE_CASES, ERRORS_TYPE, BooksApi, BooksStub, BookStore, ConformanceMirror,
+                        NullField, check_api_key, fold, run_edge_cases)
+
+
+pytestmark = pytest.mark.offline
+
+VALUES = ("Dune", "DUNE", "Emma", "straße", "STRASSE", None)
+
+# Status of every EDGE_CASES request, in order, as BookController and Spring Boot answer it
+EDGE_STATUSES = [
+    400, 400, 404, 200, 400, 404, 200, 200, 404, 404, 404, 404, 405, 405, 400, 400, 400, 400, 400, 400, 400, 201,
+    400, 201, 201, 400, 409, 404, 400, 200, 400, 404, 200, 200, 500, 500, 500, 500, 500, 200, 404, 400, 200, 201,
+    200, 200,
+]
+
+
+def matches(field_value, value):
+    """``book.getField().equalsIgnoreCase(value)``: a null field is a NullPointerException."""
+    if field_value is None:
+        raise NullField("?")
+    return fold(field_value) == fold(value)
+
+
+def stream_select(books, category=None, title=None, author=None):
+    """``getBooks`` as the controller runs it: three lazy filters over the list, one book at a time."""
+    selected = []
+    for book in books:
+        if all(value is None or matches(book[field], value)
+               for field, value in (("category", category), ("title", title), ("author", author))):
+            selected.append(book)
+    return selected
+
+
+def stream_exists(books, title, author, category):
+    """The ``anyMatch`` of ``createBook``, with Java's short-circuiting ``&&``."""
+    return any(matches(book["title"], title) and matches(book["author"], author)
+               and matches(book["category"], category) for book in books)
+
+
+def outcome(function, *args, **kwargs):
+    try:
+        return function(*args, **kwargs)
+    except NullField:
+        return NullField  # a 500 whichever field it was
+
+
+def random_book(rng: random.Random, book_id: int):
+    return {"id": book_id, "title": rng.choice(VALUES), "author": rng.choice(VALUES),
+            "category": rng.choice(VALUES), "rating": rng.randint(1, 5)}
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_indexed_lookups_match_the_controller_streams(seed):
+    rng = random.Random(seed)
+    books = [random_book(rng, book_id) for book_id in range(1, rng.randint(1, 8))]
+    store = BookStore(books)
+    for _ in range(200):
+        action = rng.random()
+        if action < 0.15:
+            store.add(random_book(rng, len(store) + 1))
+        elif action < 0.25 and len(store):
+            seq = rng.choice(list(store.select()))
+            store.update(seq, {field: rng.choice(VALUES) for field in ("title", "author", "category")})
+        elif action < 0.3 and len(store):
+            store.remove(store.with_id(rng.choice([store.book(seq)["id"] for seq in store.select()])))
+        listing = store.books(store.select())
+        filters = {field: rng.choice(VALUES[:-1]) for field in ("category", "title", "author") if rng.random() < 0.5}
+        found = outcome(store.select, **filters)
+        assert (found if found is NullField else store.books(found)) == outcome(stream_select, listing, **filters)
+        title, author, category = (rng.choice(VALUES[:-1]) for _ in range(3))
+        assert outcome(store.exists, title, author, category) == outcome(stream_exists, listing, title, author, category)
+
+
+def test_select_only_fails_on_a_null_field_that_the_earlier_filters_let_through():
+    store = BookStore([
+        {"id": 1, "title": None, "author": "Someone", "category": "Poetry", "rating": 3},
+        {"id": 2, "title": "Dune", "author": "Frank Herbert", "category": "Fiction", "rating": 5},
+    ])
+    assert store.books(store.select(category="fiction", title="DUNE")) == [store.book(2)]
+    with pytest.raises(NullField):
+        store.select(category="poetry", title="Dune")
+    with pytest.raises(NullField):
+        store.select(title="Dune")
+
+
+def test_exists_stops_at_the_first_match_before_a_null_title():
+    store = BookStore([
+        {"id": 1, "title": "Dune", "author": "Frank Herbert", "category": "Fiction", "rating": 5},
+        {"id": 2, "title": None, "author": "Someone", "category": "Poetry", "rating": 3},
+    ])
+    assert store.exists("dune", "FRANK HERBERT", "fiction") is True
+    with pytest.raises(NullField):
+        store.exists("Dune", "Someone Else", "Fiction")
+
+
+def test_fold_follows_equals_ignore_case():
+    assert fold("The Da Vinci Code") == fold("THE DA VINCI CODE")
+    assert fold("straße") != fold("STRASSE")
+    assert fold("İ") == fold("i")
+
+
+def send_edge_cases(api: BooksApi):
+    for method, path, body in EDGE_CASES:
+        data = None if body is None else (body if isinstance(body, str) else json.dumps(body)).encode()
+        yield api.handle(method, f"{API_PREFIX}{path}", data, None if data is None else "application/json")
+
+
+def test_edge_cases_get_the_controller_statuses():
+    replies = list(send_edge_cases(BooksApi(recommend=check_api_key)))
+    assert [int(reply.status) for reply in replies] == EDGE_STATUSES
+
+
+def test_edge_case_bodies_have_the_handler_shapes():
+    replies = list(send_edge_cases(BooksApi(recommend=check_api_key)))
+    problem, default, detail = replies[2].body, replies[34].body, replies[0].body
+    assert {key: problem[key] for key in ("type", "title", "status", "detail")} == {
+        "type": ERRORS_TYPE, "title": "Not Found", "status": 404, "detail": "Book with id 26 not found"}
+    assert replies[2].content_type == "application/problem+json"
+    assert set(default) == {"timestamp", "status", "error", "path"}
+    assert default["path"] == f"{API_PREFIX}/books/2"
+    assert detail == {"detail": "Invalid ID: Id must be greater than 0"}
+    assert replies[33].body == {"book": {"title": None, "author": None, "category": None, "rating": 7}}
+    assert replies[43].body["book"]["id"] == 26  # size + 1 again, after the deletes
+
+
+@pytest.fixture
+def stub():
+    stub = BooksStub(port=0, api=BooksApi(recommend=check_api_key)).start()
+    yield stub
+    stub.stop()
+
+
+def test_a_seeded_stand_in_conforms_to_itself_over_http(stub):
+    mirror = ConformanceMirror()
+    assert run_edge_cases(stub.base_url, mirror) == len(EDGE_CASES)
+    assert mirror.compared == len(EDGE_CASES)
+    assert mirror.mismatches == []
+
+
+def test_the_mirror_reports_a_diverging_catalog():
+    diverging = BooksStub(port=0, api=BooksApi(recommend=check_api_key, books=[])).start()
+    try:
+        mirror = ConformanceMirror()
+        run_edge_cases(diverging.base_url, mirror)
+    finally:
+        diverging.stop()
+    targets = [mismatch.target for mismatch in mirror.mismatches]
+    assert f"{API_PREFIX}/books/%2B7" in targets
+    assert any("missing from the stand-in" in line or "only in the stand-in" in line
+               for mismatch in mirror.mismatches for line in mismatch.differences)
@@ -0,0 +1,66 @@
+"""Unit tests for the growth-class fit in complexity_benchmark.py; no server needed."""
+import math
+import random
+
+import pytest
+
+from complexity_benchmark import DEFAULT_SIZES, fit_complexity, geometric_sizes
+
+
+pytestmark = pytest.mark.offline
+
+SIZES = list(DEFAULT_SIZES)  # 100 -> 100k, where a books.stream() scan costs a few ms
+SERIES = {
+    "O(1)": lambda n: 0.002,
+    "O(log n)": lambda n: 0.002 + 0.0002 * math.log(n),
+    "O(n)": lambda n: 0.002 + 1e-8 * n,
+    "O(n^2)": lambda n: 0.002 + 1e-12 * n * n,
+}
+
+
+def repeats(latency: float, rng: random.Random, noise: float, count: int = 30):
+    """``count`` timings around ``latency``: log-normal jitter and an occasional slow outlier."""
+    return [latency * rng.lognormvariate(0, noise) * (3 if rng.random() < 0.03 else 1) for _ in range(count)]
+
+
+@pytest.mark.parametrize("complexity", list(SERIES))
+def test_noise_free_series(complexity):
+    fit = fit_complexity(SIZES, [[SERIES[complexity](n)] * 30 for n in SIZES])
+    assert fit.complexity == complexity
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("complexity", list(SERIES))
+def test_noisy_series(complexity, seed):
+    rng = random.Random(seed)
+    fit = fit_complexity(SIZES, [repeats(SERIES[complexity](n), rng, 0.05) for n in SIZES])
+    assert fit.complexity == complexity
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("complexity", list(SERIES))
+def test_noisy_series_over_more_sizes(complexity, seed):
+    rng = random.Random(seed)
+    sizes = geometric_sizes(100, 100_000, 10 ** 0.5)
+    fit = fit_complexity(sizes, [repeats(SERIES[complexity](n), rng, 0.1) for n in sizes])
+    assert fit.complexity == complexity
+
+
+def test_small_linear_growth_is_not_noise():
+    # 0.5 ms (25%) of growth over 100 -> 100k: a scan that a tightened O(1) target has to catch
+    fit = fit_complexity(SIZES, [[0.002 + 5e-9 * n] * 30 for n in SIZES])
+    assert fit.complexity == "O(n)"
+    assert fit.slope == pytest.approx(5e-9)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_flat_series_with_heavy_noise_stays_constant(seed):
+    rng = random.Random(seed)
+    fit = fit_complexity(SIZES, [repeats(0.002, rng, 0.5) for _ in SIZES])
+    assert fit.complexity == "O(1)"
+
+
+def test_exponent_between_the_smallest_and_largest_size():
+    fit = fit_complexity([100, 1000, 10_000], [[1e-6 * n] for n in (100, 1000, 10_000)])
+    assert fit.exponent == pytest.approx(1.0)
+    assert fit.complexity == "O(n)"
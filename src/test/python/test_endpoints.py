@@ -1,16 +1,19 @@
 
-import json
 import re
 from http import HTTPStatus
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, Iterable, List, Optional, Union, Any
 from requests import Response
 import allure
 import pytest
 import requests
 import random
 
+from books_client import DEFAULT_BASE_URL, get_client, is_unread
+from json_stream import stream_books, streaming_enabled, validate_stream
+from response_logging import get_response_log
 
-BASE_URL = "http://localhost:8080/api/v1"
+
+BASE_URL = DEFAULT_BASE_URL
 TIMEOUT = 10
 RANDOM_ID = random.randint(15, 23)
 RANDOM_LARGE_ID = random.randint(60000, 80000)
@@ -23,6 +26,7 @@ INVALID_PARAMS_TITLE = {"title": "BadBookTitle"}
 EXPECTED_DETAIL = "Book(s) with title 'BadBookTitle' not found"
 EXPECTED_DETAIL_MULTIPLE = "Multiple books found"
 EXPECTED_DETAIL_INVALID_ID = "Invalid ID: Id must be greater than 0"
+LATENCY_BUDGET_FILTER = 0.5  # seconds; optional "latency_budget" key, checked by latency_plugin
 
 test_cases = {
     "GET": [
@@ -33,10 +37,10 @@ test_cases = {
         {"story": "Get Books By ID", "endpoint": f"/books/{RANDOM_LARGE_ID}", "params": None, "expected_status": HTTPStatus.NOT_FOUND, "expected_detail": f"Book with id {RANDOM_LARGE_ID} not found", "check_field": None, "type": "Negative Test"},
         {"story": "Get Books By ID", "endpoint": f"/books/{RANDOM_NEGATIVE_ID}", "params": None, "expected_status": HTTPStatus.BAD_REQUEST, "expected_detail": EXPECTED_DETAIL_INVALID_ID, "check_field": None, "type": "Negative Test"},
         # ---------------- Books by Category ----------------
-        {"story": "Get Books By Category", "endpoint": "/books", "params": {"category": "Fantasy"}, "expected_status": HTTPStatus.OK, "expected_detail": None, "check_field": "category", "type": "Positive Test"},
+        {"story": "Get Books By Category", "endpoint": "/books", "params": {"category": "Fantasy"}, "expected_status": HTTPStatus.OK, "expected_detail": None, "check_field": "category", "type": "Positive Test", "latency_budget": LATENCY_BUDGET_FILTER},
         {"story": "Get Books By Category", "endpoint": "/books", "params": {"category": "History"}, "expected_status": HTTPStatus.NOT_FOUND, "expected_detail": "No books found", "check_field": None, "type": "Negative Test"},
         # ---------------- Books by Title ----------------
-        {"story": "Get Books By Title", "endpoint": "/books", "params": MULTIPLE_PARAMS_TITLE, "expected_status": HTTPStatus.OK, "expected_detail": None, "check_field": "title", "type": "Positive Test"},
+        {"story": "Get Books By Title", "endpoint": "/books", "params": MULTIPLE_PARAMS_TITLE, "expected_status": HTTPStatus.OK, "expected_detail": None, "check_field": "title", "type": "Positive Test", "latency_budget": LATENCY_BUDGET_FILTER},
         {"story": "Get Books By Title", "endpoint": "/books", "params": {"title": "Sunflower"}, "expected_status": HTTPStatus.NOT_FOUND, "expected_detail": None, "check_field": None, "type": "Negative Test"},
     ],
     "DELETE": [
@@ -65,7 +69,7 @@ test_cases = {
 }
 
 def print_response(response):
-    print(json.dumps(response.json(), indent=4, sort_keys=True))
+    get_response_log().print_response(response)
 
 
 def _are_all_strings(params: Dict) -> bool:
@@ -99,11 +103,11 @@ def _validate_request_params(params: Optional[Dict]):
         raise ValueError("All keys and values in params must be strings")
 
 
-def _validate_positive_response(data: List[Dict], case: Dict[str, Any]):
+def _validate_positive_response(data: Iterable[Dict], case: Dict[str, Any]):
     """Validate response data for positive test cases.
     
     Args:
-        data: List of books from the response
+        data: Books from the response, a list or a ``stream_books`` iterator
         case: Test case dictionary
     """
     if not case["check_field"] or not case["params"]:
@@ -146,15 +150,18 @@ def _validate_negative_response(response: Response, case: Dict[str, Any]):
         assert response.json().get("detail") == case["expected_detail"], f"Detail mismatch for {case}"
 
 
-def make_request(method: str, endpoint: str, params: Optional[Dict] = None, json_data: Optional[Dict] = None) -> requests.Response:
+def make_request(method: str, endpoint: str, params: Optional[Dict] = None, json_data: Optional[Dict] = None,
+                 stream: bool = False) -> requests.Response:
     """
     Makes an HTTP request with proper handling of params and json payloads.
+    Requests go through the shared, kept-alive BooksClient connection pool.
 
     Args:
         method: HTTP method (GET, POST, etc.)
         endpoint: API endpoint (will be appended to BASE_URL)
         params: Query parameters as a dict, or None
         json_data: JSON payload as a dict, or None
+        stream: Leave the body on the socket for incremental validation (not printed)
 
     Returns:
         requests.Response object
@@ -164,26 +171,16 @@ def make_request(method: str, endpoint: str, params: Optional[Dict] = None, json
     if json_data is not None and not isinstance(json_data, dict):
         raise TypeError(f"json_data must be a dict, got {type(json_data).__name__}")
 
-    url = f"{BASE_URL}{endpoint}"
-    
+    client = get_client(base_url=BASE_URL, timeout=TIMEOUT)
+
     try:
-        request_kwargs = {
-            'method': method,
-            'url': url,
-            'params': params or {},
-            'timeout': TIMEOUT
-        }
-        
-        # Only add json payload for non-GET/DELETE methods
-        if method.upper() not in ('GET', 'DELETE'):
-            request_kwargs['json'] = json_data or {}
-            
-        response = requests.request(**request_kwargs)
-        print_response(response)
+        response = client.request(method, endpoint, params=params, json_data=json_data, stream=stream)
+        if not is_unread(response):
+            print_response(response)
         return response
-        
+
     except Exception as e:
-        print(f"Error making {method} request to {url}: {str(e)}")
+        print(f"Error making {method} request to {client.base_url}{endpoint}: {str(e)}")
         raise
 
 
@@ -205,19 +202,21 @@ def _validate_status_code(response: requests.Response, case: Dict):
 
 def _validate_positive_response_detail(response: requests.Response, case: Dict):
     """Helper to validate error details in negative test cases."""
-    # Validate data for positive responses
-    books_array = response.json().get("books", [])
+    # Validate data for positive responses, one book at a time as the body arrives
     if case:
         value = "category" if "category" in case else "title"
-        for data in books_array:
-            assert data[value] == case[value], f"Book {value} mismatch for {case}"
+        validate_stream(stream_books(response),
+                        lambda data: None if data[value] == case[value] else f"Book {value} mismatch for {case}")
+    elif is_unread(response):
+        # Unfiltered listing streamed from the socket: read it through without holding it
+        validate_stream(stream_books(response), lambda data: None if "id" in data else "Book without id")
 
 def attach_response_body(response: requests.Response):
-    allure.attach(
-            response.text,
-            name="Response Body",
-            attachment_type=allure.attachment_type.JSON
-        )
+    if getattr(response, "streamed", False):
+        allure.attach(f"{response.streamed_items} books validated while streaming", name="Response Body",
+                      attachment_type=allure.attachment_type.TEXT)
+        return
+    get_response_log().attach_response(response, name="Response Body")
 
 # ------------------- GENERIC GET TEST WITH SEVERITY -------------------
 @pytest.mark.get
@@ -230,7 +229,8 @@ def test_generic_get_books_severity(case):
     is_positive_test, step_title = assign_severity(case, "Get Books")
 
     with allure.step(step_title):
-        response = make_request("GET", case["endpoint"], params=case["params"])
+        stream = streaming_enabled() and is_positive_test and bool(case["check_field"])
+        response = make_request("GET", case["endpoint"], params=case["params"], stream=stream)
         _validate_status_code(response, case["expected_status"])
 
         # Validate data for positive responses
@@ -245,17 +245,21 @@ def test_generic_get_books_severity(case):
 
 
 # ------------------- CREATE BOOK -------------------
+NEW_BOOK = {
+    "title": "The Rebound",
+    "author": "Peter Johnson",
+    "category": "Classic",
+    "rating": 5
+}
+
+
 @allure.feature('Create Books')
 @allure.story('POST /books')
 @pytest.mark.create
+@pytest.mark.api_call("POST", "/books", payload=NEW_BOOK, expected_status=HTTPStatus.CREATED)
 def test_positive_create_book_valid_parameters():
     """Test Create Book with new Title"""
-    book = {
-        "title": "The Rebound",
-        "author": "Peter Johnson",
-        "category": "Classic",
-        "rating": 5
-    }
+    book = NEW_BOOK
 
     response = make_request("POST", "/books", json_data=book)
     assert response.status_code == HTTPStatus.CREATED
@@ -308,6 +312,7 @@ for field, rules in invalid_rules.items():
 
 @allure.feature('Create Books')
 @pytest.mark.create
+@pytest.mark.api_call("POST", "/books")
 @pytest.mark.parametrize("book, expected_status, expected_detail", parametrize_data)
 def test_negative_create_book_dynamic(book, expected_status, expected_detail):
     """ Dynamically generated negative tests for creating a book """
@@ -0,0 +1,98 @@
+"""Unit tests for the incremental JSON array reader in json_stream.py; no server needed."""
+import json
+
+import pytest
+
+from json_stream import iter_json_array, validate_stream
+
+
+pytestmark = pytest.mark.offline
+
+LISTING = {
+    "detail": "first key, skipped",
+    "books": [
+        {"id": 1, "title": "Dune", "rating": 5},
+        {"id": 2, "title": "Çà et là — 中文字 😀", "rating": 4.5, "tags": ["a", {"b": None}]},
+        {"id": 3, "title": "", "rating": -1e-3, "nested": {"books": [1, 2]}},
+        12345678901234567890,
+        "plain string",
+        None,
+    ],
+    "after": {"books": "not this one"},
+}
+
+
+def chunked(data: bytes, size: int):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 20])
+def test_elements_match_json_loads_in_any_chunking(size):
+    body = json.dumps(LISTING, ensure_ascii=False).encode()
+    assert list(iter_json_array(chunked(body, size), "books")) == LISTING["books"]
+
+
+@pytest.mark.parametrize("size", [1, 5])
+def test_whitespace_between_tokens(size):
+    body = json.dumps(LISTING, indent=4).encode()
+    assert list(iter_json_array(chunked(body, size), "books")) == LISTING["books"]
+
+
+@pytest.mark.parametrize("size", [1, 2])
+def test_number_split_across_chunks_is_read_whole(size):
+    body = b'{"books": [1234567, 2.5e10, -0.125]}'
+    assert list(iter_json_array(chunked(body, size), "books")) == [1234567, 2.5e10, -0.125]
+
+
+@pytest.mark.parametrize("body, expected", [
+    (b'{}', []),
+    (b'{"books": []}', []),
+    (b'{ "books" : [ ] }', []),
+    (b'{"other": [1, 2]}', []),
+    (b'{"other": {"books": [1]}, "books": [2]}', [2]),
+])
+def test_empty_or_absent_array(body, expected):
+    assert list(iter_json_array(chunked(body, 3), "books")) == expected
+
+
+def test_other_encoding():
+    body = json.dumps({"books": ["Ünïcödé"]}, ensure_ascii=False).encode("utf-16")
+    assert list(iter_json_array(chunked(body, 3), "books", encoding="utf-16")) == ["Ünïcödé"]
+
+
+@pytest.mark.parametrize("body", [
+    b'[1, 2]',
+    b'{"books": [1, 2',
+    b'{"books": [1 2]}',
+    b'{"books": [{"id": 1]}',
+    b'{"books" [1]}',
+])
+def test_malformed_body_raises(body):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(body, 4), "books"))
+
+
+def test_reads_only_the_chunks_it_needs():
+    read = []
+
+    def chunks():
+        for chunk in chunked(json.dumps({"books": list(range(1000))}).encode(), 16):
+            read.append(chunk)
+            yield chunk
+
+    elements = iter_json_array(chunks(), "books")
+    assert [next(elements) for _ in range(3)] == [0, 1, 2]
+    assert len(read) == 2  # '{"books": [0, 1,' and ' 2, 3, 4, 5, 6, '; the other 305 stay unread
+
+
+def test_validate_stream_stops_at_the_first_bad_book():
+    seen = []
+
+    def check(book):
+        seen.append(book["id"])
+        return "no title" if not book["title"] else None
+
+    with pytest.raises(AssertionError, match="Book #3: no title"):
+        validate_stream(iter(LISTING["books"][:3]), check)
+    assert seen == [1, 2, 3]
+    assert validate_stream(iter(LISTING["books"][:2]), check) == 2
@@ -0,0 +1,84 @@
+"""Unit tests for the latency baseline gate in latency_plugin.py; no server needed."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from latency_plugin import DEFAULT_MIN_DELTA_MS, DEFAULT_TOLERANCE, LatencyRecorder, compare_to_baseline
+
+
+pytestmark = pytest.mark.offline
+
+BASE_URL = "http://localhost:8080/api/v1/"
+
+
+class FakeConfig:
+    def __init__(self, baseline: str, **options):
+        self.options = {
+            "latency_repeat": 1, "latency_baseline": baseline, "latency_tolerance": DEFAULT_TOLERANCE,
+            "latency_min_delta_ms": DEFAULT_MIN_DELTA_MS, "latency_update_baseline": False, "trend_store": None,
+            "books_server": "spawn", "openai_stub": None, "cassette": None, **options,
+        }
+
+    def getoption(self, name, default=None):
+        return self.options.get(name, default)
+
+
+def finish(baseline: str, seconds: float, **options) -> LatencyRecorder:
+    recorder = LatencyRecorder(FakeConfig(baseline, **options))
+    recorder.base_url = BASE_URL
+    recorder.by_story["Get Book By ID"] = [seconds] * 10
+    session = SimpleNamespace(exitstatus=pytest.ExitCode.OK)
+    recorder.pytest_sessionfinish(session, session.exitstatus)
+    recorder.exitstatus = session.exitstatus
+    return recorder
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    return str(tmp_path / "latency_baseline.json")
+
+
+def test_a_baseline_gates_sessions_on_the_same_machine_and_server(baseline):
+    finish(baseline, 0.010, latency_update_baseline=True)
+    assert finish(baseline, 0.011).exitstatus == pytest.ExitCode.OK
+    slower = finish(baseline, 0.050)
+    assert slower.exitstatus == pytest.ExitCode.TESTS_FAILED
+    assert slower.regressions[0].startswith("Get Book By ID: median 10.00ms -> 50.00ms")
+
+
+@pytest.mark.parametrize("recorded, session", [
+    ({"books_server": "python"}, {}),
+    ({"openai_stub": "fixed:0"}, {}),
+    ({}, {"books_server": "python"}),
+])
+def test_a_baseline_from_another_server_is_not_gated(baseline, recorded, session):
+    finish(baseline, 0.003, latency_update_baseline=True, **recorded)
+    recorder = finish(baseline, 2.0, **session)
+    assert recorder.exitstatus == pytest.ExitCode.OK
+    assert recorder.regressions == []
+    assert recorder.baseline_elsewhere is not None
+
+
+def test_a_baseline_without_its_origin_is_not_gated(baseline):
+    with open(baseline, "w") as f:
+        json.dump({"Get Book By ID": {"count": 10, "median": 0.001, "p95": 0.001}}, f)
+    recorder = finish(baseline, 2.0)
+    assert recorder.exitstatus == pytest.ExitCode.OK
+    assert recorder.baseline_elsewhere == {}
+
+
+def test_no_baseline_is_reported_and_not_gated(baseline):
+    recorder = finish(baseline, 2.0)
+    assert recorder.baseline_missing
+    assert recorder.exitstatus == pytest.ExitCode.OK
+
+
+def test_the_trend_store_is_opt_in(baseline):
+    assert finish(baseline, 0.01).trend_store is None
+
+
+def test_small_absolute_changes_are_noise():
+    baseline = {"Story": {"median": 0.001, "p95": 0.002}}
+    assert compare_to_baseline({"Story": {"median": 0.003, "p95": 0.004}}, baseline, 0.25, 0.005) == []
+    assert len(compare_to_baseline({"Story": {"median": 0.010, "p95": 0.004}}, baseline, 0.25, 0.005)) == 1
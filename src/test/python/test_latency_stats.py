@@ -0,0 +1,148 @@
+"""Unit tests for the statistics in latency_stats.py; no server needed."""
+import math
+import random
+
+import pytest
+
+from latency_stats import TREND_Z, ks_test, mann_whitney, trend
+
+
+pytestmark = pytest.mark.offline
+
+
+def ecdf_gap(first, second) -> float:
+    """The KS distance by brute force: the largest CDF gap at any sample value."""
+    return max(abs(sum(v <= x for v in first) / len(first) - sum(v <= x for v in second) / len(second))
+               for x in first + second)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_ks_distance_matches_brute_force_with_ties(seed):
+    rng = random.Random(seed)
+    first = [rng.randint(0, 8) for _ in range(rng.randint(1, 30))]
+    second = [rng.randint(2, 10) for _ in range(rng.randint(1, 30))]
+    assert ks_test(first, second)["d"] == pytest.approx(ecdf_gap(first, second))
+    assert ks_test(first, second) == ks_test(second, first)
+
+
+def test_ks_same_sample_is_not_different():
+    values = [0.1, 0.2, 0.2, 0.5]
+    assert ks_test(values, list(reversed(values))) == {"d": 0, "p": 1.0}
+
+
+def test_ks_disjoint_samples_differ():
+    result = ks_test([i / 100 for i in range(100)], [1 + i / 100 for i in range(100)])
+    assert result["d"] == 1
+    assert result["p"] < 1e-10
+
+
+def test_ks_p_value_is_calibrated_under_the_null():
+    rng = random.Random(3)
+    rejected = sum(ks_test([rng.expovariate(1) for _ in range(80)],
+                           [rng.expovariate(1) for _ in range(120)])["p"] < 0.05
+                   for _ in range(400))
+    assert 0.01 < rejected / 400 < 0.1  # about 5%, a little under: the asymptotic p is conservative
+
+
+def test_ks_finds_a_shifted_tail():
+    rng = random.Random(4)
+    recorded = [rng.expovariate(1) for _ in range(500)]
+    replayed = [value * 1.5 for value in (rng.expovariate(1) for _ in range(500))]
+    assert ks_test(recorded, replayed)["p"] < 0.01
+
+
+def test_ks_of_an_empty_sample_is_undefined():
+    assert all(math.isnan(value) for value in ks_test([], [1.0]).values())
+
+
+def test_mann_whitney_of_separated_samples():
+    result = mann_whitney([1, 2, 3], [4, 5, 6])
+    assert result["u"] == 0
+    # Var(U) = 3 * 3 * 7 / 12; U - mn/2 = -4.5, continuity-corrected to -4
+    assert result["z"] == pytest.approx(-4 / math.sqrt(5.25))
+    assert result["p"] == pytest.approx(0.0809, abs=1e-4)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mann_whitney_u_counts_wins_with_half_for_ties(seed):
+    rng = random.Random(seed)
+    first = [rng.randint(0, 6) for _ in range(rng.randint(1, 25))]
+    second = [rng.randint(0, 8) for _ in range(rng.randint(1, 25))]
+    wins = sum((x > y) + 0.5 * (x == y) for x in first for y in second)
+    forward, backward = mann_whitney(first, second), mann_whitney(second, first)
+    assert forward["u"] == pytest.approx(wins)
+    assert forward["u"] + backward["u"] == pytest.approx(len(first) * len(second))
+    assert forward["z"] == pytest.approx(-backward["z"])
+    assert forward["p"] == pytest.approx(backward["p"])
+
+
+def test_mann_whitney_sign_follows_the_larger_sample():
+    rng = random.Random(5)
+    fast = [rng.lognormvariate(0, 0.3) for _ in range(200)]
+    slow = [rng.lognormvariate(0.1, 0.3) for _ in range(200)]
+    result = mann_whitney(slow, fast)
+    assert result["z"] > 0
+    assert result["p"] < 0.01
+
+
+def test_mann_whitney_p_value_is_calibrated_under_the_null():
+    rng = random.Random(6)
+    rejected = sum(mann_whitney([rng.gauss(0, 1) for _ in range(30)],
+                                [rng.gauss(0, 1) for _ in range(40)])["p"] < 0.05
+                   for _ in range(400))
+    assert 0.02 < rejected / 400 < 0.09
+
+
+def test_mann_whitney_of_all_tied_values_is_not_different():
+    assert mann_whitney([1.0, 1.0], [1.0, 1.0, 1.0]) == {"u": 3.0, "z": 0.0, "p": 1.0}
+
+
+def test_mann_whitney_of_an_empty_sample_is_undefined():
+    assert all(math.isnan(value) for value in mann_whitney([1.0], []).values())
+
+
+def test_trend_of_three_rising_points():
+    result = trend([0, 1, 2], [1, 2, 3])
+    assert result["slope"] == 1
+    # S = 3, Var(S) = 3 * 2 * 11 / 18, continuity-corrected
+    assert result["z"] == pytest.approx(2 / math.sqrt(66 / 18))
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+def test_trend_finds_a_steady_drift_in_noise(direction):
+    rng = random.Random(1)
+    times = [i * 0.5 for i in range(200)]
+    values = [10 + direction * 0.01 * t + rng.gauss(0, 0.1) for t in times]
+    result = trend(times, values)
+    assert result["slope"] == pytest.approx(direction * 0.01, abs=0.003)
+    assert direction * result["z"] > TREND_Z
+
+
+def test_trend_ignores_a_few_outliers_in_a_flat_series():
+    rng = random.Random(2)
+    values = [1 + rng.gauss(0, 0.05) for _ in range(300)]
+    for position in (150, 250, 280, 295):  # GC pauses, late in the run where they hurt most
+        values[position] = 50.0
+    result = trend(list(range(300)), values)
+    assert abs(result["z"]) < TREND_Z
+    assert abs(result["slope"]) < 0.001
+
+
+def test_trend_of_a_constant_series_is_flat():
+    assert trend(list(range(50)), [3.0] * 50) == {"slope": 0.0, "z": 0.0}
+
+
+def test_trend_with_too_few_points_is_flat():
+    assert trend([0, 1], [1, 100]) == {"slope": 0.0, "z": 0.0}
+
+
+def test_trend_thins_long_series():
+    times = list(range(100_000))
+    result = trend(times, [2 * t for t in times])
+    assert result["slope"] == 2
+    assert result["z"] > TREND_Z
+
+
+def test_trend_needs_a_value_per_time():
+    with pytest.raises(ValueError):
+        trend([0, 1, 2], [1, 2])
@@ -0,0 +1,158 @@
+"""Unit tests for the model, checker and shrinker in linearizability_checker.py; no server needed."""
+import math
+import random
+
+import pytest
+
+from linearizability_checker import (ANY, AUTHOR, CATEGORY, Book, Operation, apply, check, load_history, minimize,
+                                     save_history)
+
+
+pytestmark = pytest.mark.offline
+
+INITIAL = (Book(1, "Seed book", "Someone", "Fiction", 3),)
+TITLES = ("Title A", "Title B", "title a")  # the last one equals the first, ignoring case
+
+
+def book(book_id: int, title: str, rating: int = 1) -> Book:
+    return Book(book_id, title, AUTHOR, CATEGORY, rating)
+
+
+def operation(kind: str, args: tuple, call: float, ret: float, outcome, worker: int = 0) -> Operation:
+    return Operation(worker, kind, args, call, ret, outcome)
+
+
+def random_args(rng: random.Random, kind: str) -> tuple:
+    title, book_id, rating = rng.choice(TITLES), rng.randint(1, 4), rng.randint(1, 5)
+    if kind == "create":
+        return title, rating
+    if kind == "update":
+        return book_id, title, rating
+    return (title,) if kind in ("list", "delete_title") else (book_id,)
+
+
+def linearizable_history(seed: int, count: int = 12):
+    """A concurrent history that is linearizable by construction: every operation takes effect inside its interval."""
+    rng = random.Random(seed)
+    planned = []
+    for worker in range(count):
+        kind = rng.choice(("create", "create", "get", "list", "update", "delete", "delete_title"))
+        call = rng.uniform(0, 10)
+        ret = call + rng.uniform(0.1, 4)
+        planned.append((rng.uniform(call, ret), worker, kind, random_args(rng, kind), call, ret))
+    state, history = INITIAL, []
+    for _, worker, kind, args, call, ret in sorted(planned):
+        state, outcome = apply(state, kind, args)
+        history.append(operation(kind, args, call, ret, outcome, worker))
+    return sorted(history, key=lambda op: op.call)
+
+
+def test_model_numbers_new_books_size_plus_one_and_reuses_ids_after_a_delete():
+    state, outcome = apply(INITIAL, "create", ("Title A", 4))
+    assert outcome == (201, book(2, "Title A", 4))
+    assert apply(state, "create", ("TITLE A", 5))[1] == (409, None)
+    state, outcome = apply(state, "delete", (1,))
+    assert outcome == (200, None)
+    assert apply(state, "create", ("Title B", 2))[1] == (201, book(2, "Title B", 2))
+
+
+def test_model_update_returns_the_old_book_and_delete_title_counts():
+    state = INITIAL + (book(2, "Title A"), book(3, "title a"))
+    after, outcome = apply(state, "update", (2, "Title B", 5))
+    assert outcome == (200, book(2, "Title A"))
+    assert after[1] == book(2, "Title B", 5)
+    assert apply(state, "list", ("TITLE A",))[1] == (200, state[1:])
+    assert apply(state, "delete_title", ("Title A",)) == (INITIAL, (200, 2))
+    assert apply(state, "get", (9,)) == (state, (404, None))
+
+
+def test_sequential_history_is_linearizable():
+    history = [
+        operation("create", ("Title A", 1), 0, 1, (201, book(2, "Title A"))),
+        operation("get", (2,), 2, 3, (200, ("Title A", AUTHOR, CATEGORY, 1))),
+        operation("delete", (2,), 4, 5, (200, None)),
+        operation("get", (2,), 6, 7, (404, None)),
+    ]
+    assert check(history, INITIAL) is True
+
+
+def test_overlapping_creates_may_take_either_order():
+    history = [
+        operation("create", ("Title A", 1), 0, 5, (201, book(3, "Title A")), worker=0),
+        operation("create", ("Title B", 1), 1, 4, (201, book(2, "Title B")), worker=1),
+    ]
+    assert check(history, INITIAL) is True
+
+
+def test_duplicate_id_from_concurrent_creates_is_not_linearizable():
+    history = [
+        operation("create", ("Title A", 1), 0, 5, (201, book(2, "Title A")), worker=0),
+        operation("create", ("Title B", 1), 1, 4, (201, book(2, "Title B")), worker=1),
+    ]
+    assert check(history, INITIAL) is False
+
+
+def test_real_time_order_is_respected():
+    # The get was sent after the create returned, so it cannot be ordered before it
+    history = [
+        operation("create", ("Title A", 1), 0, 1, (201, book(2, "Title A"))),
+        operation("get", (2,), 2, 3, (404, None), worker=1),
+    ]
+    assert check(history, INITIAL) is False
+    overlapping = [history[0], history[1]._replace(call=0.5)]
+    assert check(overlapping, INITIAL) is True
+
+
+def test_transport_failure_may_or_may_not_take_effect():
+    lost = operation("create", ("Title A", 1), 0, math.inf, None)
+    seen = [lost, operation("get", (2,), 1, 2, (200, ("Title A", AUTHOR, CATEGORY, 1)), worker=1)]
+    not_seen = [lost, operation("get", (2,), 1, 2, (404, None), worker=1)]
+    assert check(seen, INITIAL) is True
+    assert check(not_seen, INITIAL) is True
+
+
+def test_budget_exhaustion_is_undecided():
+    history = linearizable_history(seed=1)
+    assert check(history, INITIAL, max_states=1) is None
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_histories_with_effects_inside_their_intervals_are_linearizable(seed):
+    assert check(linearizable_history(seed), INITIAL) is True
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_a_corrupted_response_is_caught(seed):
+    history = linearizable_history(seed)
+    target = next(i for i, op in enumerate(history) if op.kind == "create")
+    status, value = history[target].outcome
+    wrong = (409, None) if status == 201 else (201, book(99, history[target].args[0], history[target].args[1]))
+    history[target] = history[target]._replace(outcome=wrong)
+    assert check(history, INITIAL) is False
+
+
+def test_minimize_keeps_the_failing_core_and_drops_what_came_after():
+    core = [
+        operation("create", ("Title A", 1), 0, 5, (201, book(2, "Title A")), worker=0),
+        operation("create", ("Title B", 1), 1, 4, (201, book(2, "Title B")), worker=1),
+    ]
+    noise = [operation("get", (1,), 6 + i, 7 + i, (200, ("Seed book", "Someone", "Fiction", 3)), worker=2)
+             for i in range(6)]
+    history = [operation("list", ("Title C",), -2, -1, (404, None), worker=3)] + core + noise
+    shrunk = minimize(history, INITIAL)
+
+    assert check(shrunk, INITIAL) is False
+    checked = [op for op in shrunk if op.outcome not in (None, ANY)]
+    assert len(checked) <= 2
+    assert all(op.call <= 5 for op in shrunk)
+
+
+def test_saved_history_loads_back_equal(tmp_path):
+    history = linearizable_history(seed=3)
+    history[0] = history[0]._replace(ret=math.inf, outcome=None)
+    path = str(tmp_path / "history.json")
+    save_history(path, history, INITIAL)
+    loaded, initial = load_history(path)
+    assert initial == INITIAL
+    assert loaded == sorted(history, key=lambda op: op.call)
+    assert check(loaded, initial) is check(history, INITIAL)
@@ -0,0 +1,66 @@
+"""Unit tests for the request and token counters of openai_stub.py under concurrent requests; no server needed."""
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from openai_stub import OpenAIStub
+
+
+pytestmark = pytest.mark.offline
+
+MODEL = "gpt-4o-mini"
+
+
+@pytest.fixture
+def stub():
+    stub = OpenAIStub(port=0, seed=1, limit_scale=100).start()
+    yield stub
+    stub.stop()
+
+
+def test_concurrent_requests_are_all_counted(stub):
+    def complete(index: int):
+        with requests.Session() as session:
+            usages = []
+            for _ in range(10):
+                response = session.post(f"{stub.base_url}/chat/completions", headers={"Authorization": "Bearer test"},
+                                        json={"model": MODEL, "messages": [{"role": "user", "content": f"{index}"}]})
+                assert response.status_code == 200
+                usages.append(response.json()["usage"])
+            return usages
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        usages = [usage for thread_usages in pool.map(complete, range(16)) for usage in thread_usages]
+
+    stats = requests.get(stub.base_url.replace("/v1", "/stats")).json()[MODEL]
+    assert stats["requests"] == 160
+    assert stats["prompt_tokens"] == sum(usage["prompt_tokens"] for usage in usages)
+    assert stats["completion_tokens"] == sum(usage["completion_tokens"] for usage in usages)
+
+
+class YieldingCounters(dict):
+    """Counters that hand the GIL to another thread between reading a count and writing it back."""
+
+    def __getitem__(self, name):
+        value = self.get(name, 0)
+        time.sleep(0)
+        return value
+
+
+def test_count_loses_no_increments(stub):
+    stub.stats = defaultdict(YieldingCounters)
+
+    def add():
+        for _ in range(500):
+            stub.count(MODEL, requests=1, prompt_tokens=3)
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.stats_snapshot() == {MODEL: {"requests": 4_000, "prompt_tokens": 12_000}}
@@ -0,0 +1,206 @@
+"""Unit tests for the conflict classification and prefetch in parallel_scheduler.py; no server needed."""
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+import pytest
+
+from books_stub import API_PREFIX, BooksApi
+from parallel_scheduler import (ALL_BOOKS, EVERYTHING, EXCLUSIVE, ApiCall, CaseAccess, CatalogModel, api_call_for,
+                                build_plan, classify, conflicts, prefetch)
+from seed_catalog import seed_books
+
+
+pytestmark = pytest.mark.offline
+
+BOOK_4 = seed_books()[3]  # The Catcher in the Rye, J.D. Salinger, Fiction
+NEW_BOOK = {"title": "A Brand New Title", "author": "Some New Author", "category": "Poetry", "rating": 4}
+
+
+def plan_for(*calls: ApiCall):
+    model = CatalogModel()
+    return build_plan([model.access(call) for call in calls])
+
+
+def test_a_read_of_a_book_is_ordered_before_its_delete():
+    assert plan_for(ApiCall("GET", "/books/6", None, None, 200),
+                    ApiCall("DELETE", "/books/6", None, None, 200)) == [set(), {0}]
+
+
+@pytest.mark.parametrize("field", ["title", "author", "category"])
+def test_an_update_by_id_conflicts_with_reads_of_that_book(field):
+    plan = plan_for(ApiCall("GET", "/books", {field: BOOK_4[field].upper()}, None, 200),
+                    ApiCall("PUT", "/books/4", None, {**BOOK_4, "rating": 5}, 200),
+                    ApiCall("GET", "/books", {field: BOOK_4[field]}, None, 200))
+    assert plan == [set(), {0}, {1}]
+
+
+def test_an_update_moves_the_book_to_its_new_title():
+    plan = plan_for(ApiCall("PUT", "/books/4", None, {**BOOK_4, "title": "Renamed Catcher"}, 200),
+                    ApiCall("GET", "/books", {"title": "renamed catcher"}, None, 200),
+                    ApiCall("GET", "/books", {"title": "Moby Dick"}, None, 200))
+    assert plan == [set(), {0}, set()]
+
+
+def test_a_create_conflicts_with_the_listing_and_its_new_id():
+    plan = plan_for(ApiCall("GET", "/books", None, None, 200),
+                    ApiCall("POST", "/books", None, NEW_BOOK, 201),
+                    ApiCall("GET", "/books", None, None, 200),
+                    ApiCall("GET", "/books/26", None, None, 200),
+                    ApiCall("GET", "/books/3", None, None, 200))
+    assert plan == [set(), {0}, {1}, {1}, set()]
+
+
+def test_a_failing_mutation_writes_nothing():
+    model = CatalogModel()
+    rejected = model.access(ApiCall("POST", "/books", None, {**NEW_BOOK, "rating": 9}, 400))
+    assert rejected.writes == frozenset()
+    assert len(model.books) == 25
+    assert not conflicts(rejected, model.access(ApiCall("GET", "/books", None, None, 200)))
+
+
+def test_a_write_the_model_cannot_resolve_is_exclusive():
+    access = CatalogModel().access(ApiCall("DELETE", "/books", {"title": "No Such Book"}, None, None))
+    assert EVERYTHING in access.writes
+    assert conflicts(access, CaseAccess(frozenset(["id:1"]), frozenset()))
+
+
+def test_reads_never_conflict_with_reads():
+    model = CatalogModel()
+    reads = [model.access(ApiCall("GET", endpoint, params, None, 200)) for endpoint, params in
+             [("/books", None), ("/books/1", None), ("/books", {"title": "1984"}), ("/recommendations/2", None)]]
+    assert build_plan(reads) == [set()] * 4
+    assert all(access.writes == frozenset() for access in reads)
+    assert ALL_BOOKS in reads[0].reads
+
+
+def item(module_cases=None, case=None, marker=None):
+    """A collected test as api_call_for sees it."""
+    return SimpleNamespace(
+        callspec=SimpleNamespace(params={"case": case}) if case is not None else None,
+        module=SimpleNamespace(test_cases=module_cases or {}),
+        get_closest_marker=lambda name: marker,
+    )
+
+
+def test_unclassified_items_are_exclusive():
+    case = {"endpoint": "/books/2", "expected_status": 200}
+    marker = SimpleNamespace(args=("DELETE", "/books/2"), kwargs={"expected_status": 200})
+    items = [item({"GET": [case]}, case=case), item(), item(marker=marker)]
+    assert api_call_for(items[1]) is None
+    accesses = classify(items)
+    assert accesses[1] is EXCLUSIVE
+    assert build_plan(accesses) == [set(), {0}, {0, 1}]
+    assert api_call_for(items[2]) == ApiCall("DELETE", "/books/2", None, None, 200)
+
+
+class RecordingClient:
+    """Answers after a short delay and records when each request started and finished."""
+
+    def __init__(self, fail=()):
+        self.events = {}
+        self.fail = set(fail)
+        self.running = self.most_running = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, endpoint, params=None, json_data=None):
+        with self._lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+            started = time.perf_counter()
+        time.sleep(0.02)
+        with self._lock:
+            self.running -= 1
+            self.events[method, endpoint] = (started, time.perf_counter())
+        if endpoint in self.fail:
+            raise ConnectionError(endpoint)
+        return endpoint
+
+
+def test_prefetch_sends_each_request_after_its_dependencies():
+    calls = {0: ApiCall("GET", "/books/6", None, None, 200),
+             1: ApiCall("GET", "/books/7", None, None, 200),
+             2: ApiCall("DELETE", "/books/6", None, None, 200),
+             3: ApiCall("GET", "/books/8", None, None, 200),
+             4: ApiCall("PUT", "/books/6", None, {"rating": 1}, 404)}
+    plan = plan_for(*calls.values())
+    assert plan == [set(), set(), {0}, set(), {2}]
+    client = RecordingClient(fail={"/books/8"})
+    responses = prefetch(client, calls, plan, workers=4)
+
+    for index, waits_for in enumerate(plan):
+        for dependency in waits_for:
+            finished = client.events[calls[dependency].method, calls[dependency].endpoint][1]
+            assert finished <= client.events[calls[index].method, calls[index].endpoint][0]
+    assert client.most_running >= 3
+    assert responses[0] == "/books/6"
+    assert isinstance(responses[3], ConnectionError)
+
+
+def test_prefetch_ignores_dependencies_outside_the_segment():
+    calls = {2: ApiCall("GET", "/books/1", None, None, 200), 3: ApiCall("GET", "/books/2", None, None, 200)}
+    responses = prefetch(RecordingClient(), calls, [set(), set(), {0, 1}, {2}], workers=2)
+    assert responses == {2: "/books/1", 3: "/books/2"}
+
+
+class StandInClient:
+    """BooksClient.request against an in-process BooksApi, with random delays to vary the interleaving."""
+
+    def __init__(self, seed: int):
+        self.api = BooksApi(recommend=lambda prompt: [prompt])
+        self.rng = random.Random(seed)
+
+    def request(self, method, endpoint, params=None, json_data=None):
+        time.sleep(self.rng.random() / 1000)
+        query = f"?{urlencode(params)}" if params else ""
+        body = None if json_data is None else json.dumps(json_data).encode()
+        reply = self.api.handle(method, f"{API_PREFIX}{endpoint}{query}", body,
+                                None if body is None else "application/json")
+        answer = reply.body if not isinstance(reply.body, dict) else {
+            key: value for key, value in reply.body.items() if key != "timestamp"}
+        return int(reply.status), answer
+
+
+def random_call(rng: random.Random) -> ApiCall:
+    titles = [book["title"] for book in seed_books()[:6]] + ["Fresh Title One", "Fresh Title Two"]
+    kind = rng.choice(["get", "get", "list", "filter", "create", "update", "update_title", "delete", "delete_title",
+                       "recommend"])
+    book_id = rng.randint(0, 30)
+    book = {"title": rng.choice(titles), "author": rng.choice(["Leo Tolstoy", "Some New Author"]),
+            "category": rng.choice(["Fiction", "Poetry"]), "rating": rng.randint(0, 5)}
+    if kind == "get":
+        return ApiCall("GET", f"/books/{book_id}", None, None, None)
+    if kind == "list":
+        return ApiCall("GET", "/books", None, None, None)
+    if kind == "filter":
+        field = rng.choice(["title", "author", "category"])
+        return ApiCall("GET", "/books", {field: book[field].lower()}, None, None)
+    if kind == "create":
+        return ApiCall("POST", "/books", None, book, None)
+    if kind == "update":
+        return ApiCall("PUT", f"/books/{book_id}", None, book, None)
+    if kind == "update_title":
+        return ApiCall("PUT", "/books", {"title": rng.choice(titles)}, book, None)
+    if kind == "delete":
+        return ApiCall("DELETE", f"/books/{book_id}", None, None, None)
+    if kind == "delete_title":
+        return ApiCall("DELETE", "/books", {"title": rng.choice(titles)}, None, None)
+    return ApiCall("GET", f"/recommendations/{book_id}", None, None, None)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_prefetched_responses_match_a_serial_run(seed):
+    rng = random.Random(seed)
+    drafts = [random_call(rng) for _ in range(60)]
+    serial = StandInClient(seed)
+    expected = [serial.request(call.method, call.endpoint, call.params, call.payload) for call in drafts]
+    # The suite's tables declare the status each case expects, as a serial run gets it
+    calls = [call._replace(expected_status=status) for call, (status, _) in zip(drafts, expected)]
+    model = CatalogModel()
+    plan = build_plan([model.access(call) for call in calls])
+
+    responses = prefetch(StandInClient(seed + 1), dict(enumerate(calls)), plan, workers=8)
+    assert [responses[index] for index in range(len(calls))] == expected
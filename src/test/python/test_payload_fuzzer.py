@@ -0,0 +1,210 @@
+"""Unit tests for the verdicts, shrinker and PUT targets in payload_fuzzer.py; no server needed."""
+import random
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from payload_fuzzer import (ASTRAL, EITHER, INVALID, MAX_SHRINK_REQUESTS, MISSING, VALID, FuzzCase, Value, _Gate,
+                            _classify_value, baseline_payload, case_from_payload, create_target, field_specs,
+                            generate_case, java_length, make_value, payload_of, shrink, verdict_of)
+
+
+pytestmark = pytest.mark.offline
+
+SPECS = field_specs()
+TITLE, AUTHOR, CATEGORY, RATING = SPECS
+WAIT = 0.05  # seconds a blocked thread is given to (wrongly) get through
+
+
+def holder(gate_context, log: list, name: str) -> threading.Event:
+    """Start a thread that enters ``gate_context``, logs ``name`` and holds it until the returned event is set."""
+    release = threading.Event()
+
+    def hold():
+        with gate_context():
+            log.append(name)
+            release.wait()
+
+    threading.Thread(target=hold, daemon=True).start()
+    return release
+
+
+def test_shared_holders_enter_together():
+    gate = _Gate()
+    log = []
+    releases = [holder(gate.shared, log, f"reader {i}") for i in range(3)]
+    time.sleep(WAIT)
+    assert len(log) == 3
+    for release in releases:
+        release.set()
+
+
+def test_exclusive_waits_for_shared_holders_and_goes_before_new_ones():
+    gate = _Gate()
+    log = []
+    first_reader = holder(gate.shared, log, "first reader")
+    time.sleep(WAIT)
+    writer = holder(gate.exclusive, log, "writer")
+    time.sleep(WAIT)
+    second_reader = holder(gate.shared, log, "second reader")
+    time.sleep(WAIT)
+    assert log == ["first reader"]
+
+    first_reader.set()
+    time.sleep(WAIT)
+    assert log == ["first reader", "writer"]
+    writer.set()
+    time.sleep(WAIT)
+    assert log == ["first reader", "writer", "second reader"]
+    second_reader.set()
+
+
+def case(*values: Value) -> FuzzCase:
+    return FuzzCase(0, OrderedDict(zip(("title", "author", "category", "rating"), values)), {})
+
+
+VALID_VALUE = Value("min", "x" * 10, VALID, None)
+
+
+@pytest.mark.parametrize("values, expected", [
+    ((VALID_VALUE, VALID_VALUE), (VALID, None)),
+    ((VALID_VALUE, Value("boolean", True, EITHER, None)), (EITHER, None)),
+    ((Value("above_max", "b", INVALID, ("B wrong",)), Value("empty", "", INVALID, ("A required", "A wrong"))),
+     (INVALID, ("A required", "A wrong", "B wrong"))),
+    ((Value("above_max", "b", INVALID, ("B wrong",)), Value("boolean", True, EITHER, None)), (INVALID, None)),
+    ((Value("above_max", "b", INVALID, ("B wrong",)), Value("list", [], INVALID, None)), (INVALID, None)),
+])
+def test_verdict_of(values, expected):
+    assert verdict_of(case(*values)) == expected
+
+
+@pytest.mark.parametrize("spec, value, verdict, messages", [
+    (TITLE, MISSING, INVALID, ("Title is required",)),
+    (TITLE, None, INVALID, ("Title is required",)),
+    (TITLE, "", INVALID, ("Title is required", TITLE.message)),
+    (TITLE, "x" * 10, VALID, None),
+    (TITLE, "x" * 51, INVALID, (TITLE.message,)),
+    (TITLE, 7, EITHER, None),
+    (TITLE, True, EITHER, None),
+    (TITLE, ["x" * 10], INVALID, None),
+    (RATING, MISSING, INVALID, (RATING.message,)),
+    (RATING, None, INVALID, None),
+    (RATING, 5, VALID, None),
+    (RATING, 0, INVALID, (RATING.message,)),
+    (RATING, 2 ** 31, INVALID, None),
+    (RATING, "3", EITHER, None),
+    (RATING, 2.5, EITHER, None),
+    (RATING, False, EITHER, None),
+    (RATING, "three", INVALID, None),
+    (RATING, [3], INVALID, None),
+])
+def test_classify_value(spec, value, verdict, messages):
+    classified = _classify_value(spec, value)
+    assert (classified.verdict, classified.messages) == (verdict, messages)
+
+
+def test_astral_strings_are_counted_in_utf16_units():
+    assert java_length("😀") == 2
+    assert java_length("é中") == 2
+    assert _classify_value(TITLE, ASTRAL[0] * 25).verdict == VALID
+    assert _classify_value(TITLE, ASTRAL[0] * 26).verdict == INVALID  # 26 code points, 52 code units
+    assert _classify_value(CATEGORY, "😀😀").verdict == INVALID  # 4 code units, 2 code points
+    assert _classify_value(CATEGORY, "😀😀😀").verdict == VALID
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_generated_astral_values_follow_utf16_bounds(seed):
+    rng = random.Random(seed)
+    for spec in (TITLE, AUTHOR, CATEGORY):
+        fitting, over = make_value(spec, "astral", rng), make_value(spec, "astral_over", rng)
+        assert fitting.verdict == VALID and spec.low <= java_length(fitting.value) <= spec.high
+        assert over.verdict == INVALID and len(over.value) <= spec.high < java_length(over.value)
+
+
+def test_a_rebuilt_case_keeps_its_verdict():
+    for index in range(2000):
+        generated = generate_case(SPECS, index, seed=3)
+        assert verdict_of(case_from_payload(SPECS, payload_of(generated))) == verdict_of(generated), index
+
+
+def author_too_long(payload):
+    author = payload.get("author")
+    return ("POST", "accepted") if isinstance(author, str) and java_length(author) > AUTHOR.high else None
+
+
+def rating_out_of_range(payload):
+    return ("POST", "500") if not 1 <= payload.get("rating", 1) <= 5 else None
+
+
+@pytest.mark.parametrize("reproduce, minimal", [
+    (author_too_long, {"author": "é" * 32}),  # the shortest prefix tried above 25 units
+    (rating_out_of_range, {"rating": 0}),
+])
+def test_shrink_reaches_the_minimal_payload(reproduce, minimal):
+    sent = []
+
+    def counted(payload):
+        sent.append(payload)
+        return reproduce(payload)
+
+    payload = {"title": "ü" * 40, "author": "é" * 300, "category": "Science", "rating": 10 ** 6, "publisher": "X"}
+    smallest, reproduced = shrink(SPECS, payload, reproduce(payload), counted)
+    assert reproduced
+    assert smallest == {**baseline_payload(SPECS), **minimal}
+    assert len(sent) <= MAX_SHRINK_REQUESTS
+
+
+def test_shrink_stops_at_its_request_budget():
+    sent = []
+
+    def always(payload):
+        sent.append(payload)
+        return ("PUT", "500")
+
+    payload = {**{f"extra{i}": "x" * 100 for i in range(200)}, "author": "x" * 1000}
+    smallest, reproduced = shrink(SPECS, payload, ("PUT", "500"), always)
+    assert reproduced
+    assert len(sent) == MAX_SHRINK_REQUESTS
+    # The first request reproduces the original; every other one dropped an extra field
+    assert len(smallest) == len(payload) - (MAX_SHRINK_REQUESTS - 1)
+
+
+def test_a_failure_that_does_not_reproduce_is_returned_as_is():
+    payload = {"rating": 10}
+    assert shrink(SPECS, payload, ("POST", "500"), lambda candidate: None) == (payload, False)
+
+
+class FakeClient:
+    """``POST /books`` answering with the given ids, one per book created."""
+
+    def __init__(self, ids, status=201):
+        self.ids = iter(ids)
+        self.status = status
+        self.titles = []
+
+    def post(self, endpoint, json_data=None):
+        self.titles.append(json_data["title"])
+        book_id = next(self.ids)
+        return SimpleNamespace(status_code=self.status, text="", json=lambda: {"book": {"id": book_id}})
+
+
+def test_create_target_creates_books_until_one_gets_a_free_id():
+    client = FakeClient([26, 27, 28])
+    target_id, titles = create_target(client, SPECS, "Fuzz target 1", {26, 27})
+    assert target_id == 28
+    assert titles == client.titles == ["Fuzz target 1-0", "Fuzz target 1-1", "Fuzz target 1-2"]
+
+
+def test_create_target_gives_up_when_every_id_is_taken():
+    client = FakeClient([26, 26, 26])
+    with pytest.raises(RuntimeError, match="id of its own"):
+        create_target(client, SPECS, "Fuzz target 1", {26})
+    assert len(client.titles) == 2
+
+
+def test_create_target_reports_a_rejected_book():
+    with pytest.raises(RuntimeError, match="Could not create the PUT target book: 400"):
+        create_target(FakeClient([26], status=400), SPECS, "Fuzz target 1", set())
@@ -0,0 +1,305 @@
+"""
+Unit tests for the invalidation in response_cache.py, and a randomized consistency check.
+
+The consistency check sends random reads and writes through a cached client to
+an in-process BooksStub and compares every read with an uncached client, so no
+Books API server is needed.
+"""
+import json
+import random
+import threading
+from types import SimpleNamespace
+from urllib.parse import parse_qsl
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import response_cache
+from books_client import BooksClient
+from books_stub import BooksApi, BooksStub
+from response_cache import ResponseCache
+from seed_catalog import seed_books
+
+
+pytestmark = pytest.mark.offline
+
+TITLES = [book["title"] for book in seed_books()] + ["Alpha Centauri Book", "Beta Centauri Book"]
+AUTHORS = [book["author"] for book in seed_books()] + ["Ann Other"]
+CATEGORIES = ["Fiction", "Fantasy", "Science", "History"]
+DUNE = {"id": 7, "title": "Dune", "author": "Frank Herbert", "category": "Science Fiction", "rating": 5}
+
+
+def make_response(status: int, body) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+    response._content = json.dumps(body).encode()
+    return response
+
+
+def read(cache: ResponseCache, endpoint: str, params=None, body=None, status: int = 200):
+    """A GET through the cache: the stored copy on a hit, else ``body`` as the server's answer."""
+    hit = cache._lookup("GET", endpoint, params, None)
+    if hit is not None:
+        return hit
+    response = make_response(status, body if body is not None else {"books": []})
+    cache._observe("GET", endpoint, params, None, response)
+    return response
+
+
+def write(cache: ResponseCache, method: str, endpoint: str, params=None, payload=None, body=None, status: int = 200):
+    assert cache._lookup(method, endpoint, params, payload) is None
+    cache._observe(method, endpoint, params, payload, make_response(status, body or {}))
+
+
+def cached(cache: ResponseCache, endpoint: str, params=None) -> bool:
+    return cache.contains("GET", endpoint, params)
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(ttl=None)
+
+
+def test_reads_are_keyed_by_sorted_query_and_normalized_path(cache):
+    read(cache, "/books", {"author": "a", "category": "b"})
+    assert cached(cache, "/books", {"category": "b", "author": "a"})
+    read(cache, "/books//7/", body={"book": DUNE})
+    assert cached(cache, "/books/7")
+    assert isinstance(cache._lookup("GET", "/books/7", None, None), requests.Response)
+    assert cache.stats["hits"] == 1
+
+
+def test_put_by_id_drops_the_old_and_new_book_and_keeps_unrelated_entries(cache):
+    read(cache, "/books", {"title": "dune"})
+    read(cache, "/books/7", body={"book": DUNE})
+    read(cache, "/books", {"title": "Children of Dune"})
+    read(cache, "/books", {"author": "Jane Austen"})
+    read(cache, "/books/8")
+    read(cache, "/books")
+    updated = {**DUNE, "title": "Children of Dune"}
+    write(cache, "PUT", "/books/7", payload=updated, body={"OldBook": DUNE, "UpdatedBook": updated})
+
+    for endpoint, params in [("/books", {"title": "dune"}), ("/books/7", None),
+                             ("/books", {"title": "Children of Dune"}), ("/books", None)]:
+        assert not cached(cache, endpoint, params)
+    assert cached(cache, "/books", {"author": "Jane Austen"})
+    assert cached(cache, "/books/8")
+
+
+def test_rejected_write_changes_nothing_and_a_server_error_flushes(cache):
+    read(cache, "/books/7", body={"book": DUNE})
+    read(cache, "/books", {"category": "Fantasy"})
+    write(cache, "PUT", "/books/7", payload={"title": ""}, status=400)
+    write(cache, "POST", "/books", payload=DUNE, status=409)
+    assert len(cache) == 2
+    write(cache, "DELETE", "/books/7", status=500)
+    assert len(cache) == 0
+
+
+def test_delete_of_a_book_never_seen_drops_every_filtered_listing(cache):
+    read(cache, "/books", {"title": "dune"})
+    read(cache, "/books", {"author": "Jane Austen"})
+    read(cache, "/books", {"category": "Fantasy"})
+    read(cache, "/books/3")
+    read(cache, "/books/9")
+    write(cache, "DELETE", "/books/9")
+
+    assert [key for key in cache._entries] == ["GET /books/3?"]
+
+
+def test_delete_of_a_known_book_drops_only_where_it_was_listed(cache):
+    read(cache, "/books", {"category": "science fiction"}, body={"books": [DUNE]})
+    read(cache, "/books", {"author": "Jane Austen"})
+    read(cache, "/books", {"title": "dune"})
+    write(cache, "DELETE", "/books/7")
+
+    assert not cached(cache, "/books", {"category": "science fiction"})
+    assert not cached(cache, "/books", {"title": "dune"})
+    assert cached(cache, "/books", {"author": "Jane Austen"})
+
+
+def test_delete_by_title_drops_the_ids_learned_for_that_title(cache):
+    read(cache, "/books", {"title": "Dune"}, body={"books": [DUNE]})
+    read(cache, "/books/7", body={"book": DUNE})
+    read(cache, "/books/8")
+    read(cache, "/books", {"author": "Frank Herbert"})
+    write(cache, "DELETE", "/books", {"title": "DUNE"})
+
+    assert not cached(cache, "/books/7")
+    assert not cached(cache, "/books", {"author": "Frank Herbert"})
+    assert cached(cache, "/books/8")
+
+
+def test_post_drops_the_listing_and_the_new_books_filters(cache):
+    read(cache, "/books")
+    read(cache, "/books", {"author": "frank herbert"})
+    read(cache, "/books", {"author": "Jane Austen"})
+    read(cache, "/books/26", status=404, body={"detail": "Book with id 26 not found"})
+    write(cache, "POST", "/books", payload=DUNE, body={"book": {**DUNE, "id": 26}}, status=201)
+
+    assert not cached(cache, "/books")
+    assert not cached(cache, "/books", {"author": "frank herbert"})
+    assert not cached(cache, "/books/26")
+    assert cached(cache, "/books", {"author": "Jane Austen"})
+
+
+def test_read_that_overlaps_an_invalidation_is_not_stored(cache):
+    assert cache._lookup("GET", "/books/7", None, None) is None  # miss: the read is in flight
+    cache.invalidate({"id:7"})  # a write answered while the read was in flight
+    cache._observe("GET", "/books/7", None, None, make_response(200, {"book": DUNE}))
+    assert not cached(cache, "/books/7")
+    assert cache.stats["raced"] == 1
+
+    assert cache._lookup("GET", "/books/8", None, None) is None
+    cache.invalidate({"author:*"})  # a wildcard over a field the read does not depend on
+    cache._observe("GET", "/books/8", None, None, make_response(200, {"book": DUNE}))
+    assert cached(cache, "/books/8")
+
+    assert cache._lookup("GET", "/books", {"author": "x"}, None) is None
+    cache.flush()
+    cache._observe("GET", "/books", {"author": "x"}, None, make_response(200, {"books": []}))
+    assert not cached(cache, "/books", {"author": "x"})
+    assert cache.stats["raced"] == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = ResponseCache(ttl=10)
+    read(cache, "/books/1")
+    now[0] += 9.9
+    assert cached(cache, "/books/1")
+    now[0] += 0.2
+    assert not cached(cache, "/books/1")
+    read(cache, "/books/1")
+    assert cache.stats["expired"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ResponseCache(max_bytes=2000, ttl=None, max_entry_bytes=1000)  # three entries
+    for book_id in range(1, 6):
+        read(cache, f"/books/{book_id}")
+        read(cache, "/books/1")  # keep the first one in use
+    assert cached(cache, "/books/1")
+    assert cache.size <= cache.max_bytes
+    assert cache.stats["evicted"] > 0
+    assert not cached(cache, "/books/2")
+
+
+def test_unread_streamed_body_and_errors_are_not_stored(cache):
+    streamed = make_response(200, {"books": []})
+    streamed.raw, streamed._content_consumed = object(), False
+    assert cache._lookup("GET", "/books", None, None) is None
+    cache._observe("GET", "/books", None, None, streamed)
+    read(cache, "/books/1", status=500, body={"error": "boom"})
+    assert len(cache) == 0
+    assert cache.stats["uncacheable"] == 2
+
+
+# --- Randomized consistency against an in-process server ---
+
+@pytest.fixture
+def stub():
+    server = BooksStub(port=0, api=BooksApi(recommend=lambda prompt: [prompt])).start()
+    yield server
+    server.stop()
+
+
+def answer(response: requests.Response):
+    """Status and body of a response, without the per-request timestamp of error bodies."""
+    body = response.json()
+    if isinstance(body, dict):
+        body.pop("timestamp", None)
+    return response.status_code, body
+
+
+def random_book(rng: random.Random) -> dict:
+    return {"title": rng.choice(TITLES), "author": rng.choice(AUTHORS), "category": rng.choice(CATEGORIES),
+            "rating": rng.randint(1, 5)}
+
+
+def random_read(rng: random.Random):
+    kind = rng.choice(["id", "title", "author", "category", "all", "multi", "recommend"])
+    if kind == "id":
+        return f"/books/{rng.randint(0, 27)}", None
+    if kind == "recommend":
+        return f"/recommendations/{rng.randint(1, 27)}", None
+    if kind == "all":
+        return "/books", None
+    if kind == "multi":
+        return "/books", {"author": rng.choice(AUTHORS), "category": rng.choice(CATEGORIES)}
+    value = rng.choice({"title": TITLES, "author": AUTHORS, "category": CATEGORIES}[kind])
+    return "/books", {kind: value.upper() if rng.random() < 0.2 else value}
+
+
+def random_write(rng: random.Random, client: BooksClient):
+    kind = rng.choice(["post", "put_id", "put_title", "delete_id", "delete_title"])
+    if kind == "post":
+        client.post("/books", json_data=random_book(rng))
+    elif kind == "put_id":
+        client.put(f"/books/{rng.randint(1, 27)}", json_data=random_book(rng))
+    elif kind == "put_title":
+        client.put("/books", json_data=random_book(rng), params={"title": rng.choice(TITLES)})
+    elif kind == "delete_id":
+        client.delete(f"/books/{rng.randint(1, 27)}")
+    else:
+        client.delete("/books", params={"title": rng.choice(TITLES)})
+
+
+@pytest.mark.parametrize("steps, max_bytes, ttl", [(3000, 64 * 1024 * 1024, None), (1000, 20_000, 0.01)])
+def test_cached_reads_match_the_server_under_random_writes(stub, steps, max_bytes, ttl):
+    client = BooksClient(base_url=stub.base_url, trust_env=False)
+    reference = BooksClient(base_url=stub.base_url, trust_env=False)
+    cache = ResponseCache(max_bytes=max_bytes, ttl=ttl).attach(client)
+    rng = random.Random(0)
+    mismatches = []
+    try:
+        for step in range(steps):
+            if rng.random() < 0.75:
+                endpoint, params = random_read(rng)
+                seen, fresh = client.get(endpoint, params=params), reference.get(endpoint, params=params)
+                if answer(seen) != answer(fresh):
+                    mismatches.append((step, endpoint, params, getattr(seen, "cached", False)))
+            else:
+                random_write(rng, client)
+    finally:
+        cache.detach()
+        client.close()
+        reference.close()
+    assert not mismatches, f"{len(mismatches)} stale reads, first: {mismatches[:3]}"
+    assert cache.stats["hits"] > 0
+
+
+def test_entries_left_by_concurrent_writers_match_the_server(stub):
+    client = BooksClient(base_url=stub.base_url, pool_size=6, trust_env=False)
+    reference = BooksClient(base_url=stub.base_url, trust_env=False)
+    cache = ResponseCache(ttl=None).attach(client)
+
+    def work(seed: int):
+        rng = random.Random(seed)
+        for _ in range(300):
+            if rng.random() < 0.8:
+                endpoint, params = random_read(rng)
+                client.get(endpoint, params=params)
+            else:
+                random_write(rng, client)
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(6)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stale = []
+        for key, entry in list(cache._entries.items()):
+            path, _, query = key.split(" ", 1)[1].partition("?")
+            if answer(entry.response) != answer(reference.get(path, params=dict(parse_qsl(query)))):
+                stale.append(key)
+    finally:
+        cache.detach()
+        client.close()
+        reference.close()
+    assert len(cache) > 0
+    assert not stale, f"{len(stale)} stale entries: {stale[:5]}"
@@ -0,0 +1,188 @@
+"""Unit tests for the cassette file format and record/replay matching in response_cassette.py; no server needed."""
+import json
+import os
+import re
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import response_cassette
+from books_client import request_key
+from response_cassette import FOOTER, LIVE, REPLAY, Cassette, CassetteMiss, CassettePlayer, fingerprint, parse_rule
+
+
+pytestmark = pytest.mark.offline
+
+
+def make_response(status: int, body, url: str = "http://localhost:8080/api/v1/books") -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "OK" if status == 200 else "Not Found"
+    response.url = url
+    response.headers = CaseInsensitiveDict({"Content-Type": "application/json", "X-Request": "1"})
+    response.elapsed = timedelta(milliseconds=12)
+    response._content = json.dumps(body).encode()
+    return response
+
+
+def digest(method: str, endpoint: str, params=None, occurrence: int = 0) -> bytes:
+    return fingerprint(request_key(method, endpoint, params, None), occurrence)
+
+
+class FakeConfig:
+    def __init__(self, mode: str, path: str, rules=()):
+        self.options = {"cassette": mode, "cassette_name": path, "cassette_rule": list(rules)}
+
+    def getoption(self, name, default=None):
+        return self.options.get(name, default)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "session.cassette")
+
+
+def test_recorded_responses_read_back_after_reopening(path):
+    cassette = Cassette(path, fresh=True)
+    for book_id in range(1, 201):
+        cassette.put(digest("GET", f"/books/{book_id}"), make_response(200, {"book": {"id": book_id}}),
+                     f"GET /books/{book_id}")
+    cassette.put(digest("GET", "/books/999"), make_response(404, {"detail": "not found"}), "GET /books/999")
+    cassette.save()
+    cassette.close()
+
+    reopened = Cassette(path)
+    assert len(reopened) == 201
+    for book_id in (1, 77, 200):
+        response = reopened.get(digest("GET", f"/books/{book_id}"))
+        assert response.json() == {"book": {"id": book_id}}
+        assert response.status_code == 200 and response.reason == "OK"
+        assert response.headers["x-request"] == "1"
+        assert response.elapsed == timedelta(milliseconds=12)
+        assert response.replayed is True
+    assert reopened.get(digest("GET", "/books/999")).status_code == 404
+    assert reopened.get(digest("GET", "/books/1000")) is None
+    assert sorted(key for _, key, _ in reopened.entries())[:2] == ["GET /books/1", "GET /books/10"]
+    reopened.close()
+
+
+def test_record_missing_appends_without_rerecording_hits(path):
+    first = Cassette(path, fresh=True)
+    first.put(digest("GET", "/books"), make_response(200, {"books": ["recorded"]}), "GET /books")
+    first.save()
+    first.close()
+    with open(path, "rb") as f:
+        recorded = f.read()
+
+    second = Cassette(path)
+    assert second.get(digest("GET", "/books")).json() == {"books": ["recorded"]}
+    second.put(digest("GET", "/books"), make_response(200, {"books": ["again"]}), "GET /books")
+    second.put(digest("GET", "/books/3"), make_response(200, {"book": {"id": 3}}), "GET /books/3")
+    second.save()
+    second.close()
+
+    third = Cassette(path)
+    assert len(third) == 2
+    assert third.get(digest("GET", "/books")).json() == {"books": ["recorded"]}
+    assert third.get(digest("GET", "/books/3")).json() == {"book": {"id": 3}}
+    third.close()
+    with open(path, "rb") as f:
+        # The stored records are copied as they were, in front of the new ones
+        index_offset = FOOTER.unpack_from(recorded, len(recorded) - FOOTER.size)[0]
+        assert f.read()[:index_offset] == recorded[:index_offset]
+
+
+def test_an_interrupted_save_keeps_the_previous_cassette(path, monkeypatch):
+    cassette = Cassette(path, fresh=True)
+    cassette.put(digest("GET", "/books"), make_response(200, {"books": []}), "GET /books")
+    cassette.save()
+    cassette.close()
+
+    def interrupted(*args):
+        raise KeyboardInterrupt
+
+    broken = Cassette(path)
+    broken.put(digest("GET", "/books/1"), make_response(200, {"book": {}}), "GET /books/1")
+    monkeypatch.setattr(response_cassette, "FOOTER", SimpleNamespace(size=FOOTER.size, pack=interrupted,
+                                                                      unpack_from=FOOTER.unpack_from))
+    with pytest.raises(KeyboardInterrupt):
+        broken.save()
+    broken.close()
+    monkeypatch.undo()
+
+    assert os.listdir(os.path.dirname(path)) == ["session.cassette"]
+    survivor = Cassette(path)
+    assert len(survivor) == 1
+    assert survivor.get(digest("GET", "/books")).json() == {"books": []}
+    survivor.close()
+
+
+def test_a_file_without_an_index_is_refused(path):
+    with open(path, "wb") as f:
+        f.write(response_cassette.HEADER_MAGIC + b"\0" * 64)
+    with pytest.raises(ValueError, match="has no index"):
+        Cassette(path)
+
+
+def exchange(player: CassettePlayer, method: str, endpoint: str, body=None):
+    """One request through the player: its replayed response, or ``body`` recorded as the live one."""
+    replayed = player._intercept(method, endpoint, None, None)
+    if replayed is not None:
+        return replayed.json()
+    player._record(method, endpoint, None, None, make_response(200, body))
+    return body
+
+
+def test_identical_requests_are_numbered_by_occurrence(path):
+    recorder = CassettePlayer(FakeConfig("record", path))
+    assert exchange(recorder, "GET", "/books/6", {"book": "before"}) == {"book": "before"}
+    exchange(recorder, "DELETE", "/books/6", {"message": "deleted"})
+    exchange(recorder, "GET", "/books/6", {"detail": "after"})
+    recorder.cassette.save()
+    recorder.cassette.close()
+
+    player = CassettePlayer(FakeConfig("replay", path))
+    assert exchange(player, "GET", "/books/6") == {"book": "before"}
+    assert exchange(player, "DELETE", "/books/6") == {"message": "deleted"}
+    assert exchange(player, "GET", "/books/6") == {"detail": "after"}
+    with pytest.raises(CassetteMiss, match="occurrence 2"):
+        exchange(player, "GET", "/books/6")
+    assert player.stats == {"replayed": 3, "missing": 1}
+    player.cassette.close()
+
+
+def test_rules_send_matching_requests_live(path):
+    player = CassettePlayer(FakeConfig("replay", path, ["GET:^/recommendations/=live", "^/books=replay"]))
+    assert player._intercept("GET", "/recommendations/3", None, None) is None
+    assert player.stats == {"live": 1}
+    with pytest.raises(CassetteMiss):
+        player._intercept("GET", "/books", None, None)
+
+
+@pytest.mark.parametrize("text, method, pattern, action", [
+    ("DELETE:^/books=live", "DELETE", "^/books", LIVE),
+    ("get:/books/\\d+=replay", "GET", "/books/\\d+", REPLAY),
+    ("^/recommendations/=live", None, "^/recommendations/", LIVE),
+    ("/books?title=a=b=replay", None, "/books?title=a=b", REPLAY),
+])
+def test_parse_rule(text, method, pattern, action):
+    rule = parse_rule(text)
+    assert (rule.method, rule.pattern.pattern, rule.action) == (method, pattern, action)
+
+
+@pytest.mark.parametrize("text", ["^/books", "^/books=skip", "=live", "GET:(=live"])
+def test_parse_rule_rejects(text):
+    with pytest.raises((ValueError, re.error)):
+        parse_rule(text)
+
+
+def test_first_matching_rule_wins(path):
+    player = CassettePlayer(FakeConfig("record-missing", path, ["DELETE:^/books=live", "^/books=replay",
+                                                                "^/=live"]))
+    assert player.action_for("DELETE", "/books/1") == LIVE
+    assert player.action_for("GET", "/books/1") == REPLAY
+    assert player.action_for("GET", "/recommendations/1") == LIVE
+    player.cassette.close()
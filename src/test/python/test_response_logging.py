@@ -0,0 +1,106 @@
+"""Unit tests for the sampled and truncated body attachments in response_logging.py; no server needed."""
+import json
+import os
+from types import SimpleNamespace
+
+import allure
+import pytest
+import requests
+
+import response_logging
+from response_logging import ResponseLog
+
+
+pytest_plugins = ("pytester",)
+pytestmark = pytest.mark.offline
+
+BODY = {"books": [{"id": i, "title": f"Book number {i}"} for i in range(50)]}
+
+
+def make_response(body=BODY) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(body).encode()
+    return response
+
+
+@pytest.fixture
+def attached(monkeypatch):
+    """The bodies passed to allure.attach, in order."""
+    bodies = []
+    fake = SimpleNamespace(attach=lambda body, name, **kwargs: bodies.append((name, body)),
+                           attachment_type=allure.attachment_type)
+    monkeypatch.setattr(response_logging, "allure", fake)
+    return bodies
+
+
+def test_a_failure_reattaches_a_truncated_body_in_full(attached):
+    log = ResponseLog(max_bytes=100)
+    log.start_test()
+    response = make_response()
+    log.attach_response(response)
+    log.attach_response(response)
+    log.attach_response(response, name="failure", force=True)
+    log.attach_response(response, name="failure", force=True)
+
+    assert [name for name, _ in attached] == ["Response Body", "failure"]
+    assert attached[0][1].startswith(response.content[:100]) and b"[truncated" in attached[0][1]
+    assert attached[1][1] == response.content
+
+
+def test_a_body_attached_in_full_is_not_attached_again(attached):
+    log = ResponseLog(max_bytes=1 << 20)
+    log.start_test()
+    response = make_response()
+    log.attach_response(response)
+    log.attach_response(response, force=True)
+    assert len(attached) == 1
+
+
+def test_sampling_skips_bodies_but_never_failures(attached):
+    log = ResponseLog(sample=0.0)
+    log.start_test()  # the first test is always sampled
+    log.start_test()
+    response = make_response()
+    log.attach_response(response)
+    assert attached == []
+    log.attach_response(response, force=True)
+    assert attached == [("Response Body", response.content)]
+
+
+def test_every_test_starts_with_nothing_attached(attached):
+    log = ResponseLog()
+    response = make_response()
+    for _ in range(2):
+        log.start_test()
+        log.attach_response(response)
+    assert len(attached) == 2
+
+
+def test_failing_test_keeps_its_full_body_in_allure(pytester):
+    pytester.makepyfile(test_truncated=f"""
+        import json
+        import requests
+        from response_logging import get_response_log
+
+        def test_fails():
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps({BODY!r}).encode()
+            log = get_response_log()
+            log.print_response(response)
+            log.attach_response(response)
+            assert False
+    """)
+    results = pytester.path / "allure-results"
+    outcome = pytester.runpytest_subprocess(
+        "-p", "response_logging", f"--alluredir={results}", "--response-max-bytes=100",
+        "--response-output=quiet", "-p", "no:cacheprovider",
+        f"--rootdir={pytester.path}", "-o", f"pythonpath={os.path.dirname(response_logging.__file__)}")
+    outcome.assert_outcomes(failed=1)
+
+    result = next(json.loads(path.read_text()) for path in results.glob("*-result.json"))
+    sources = {attachment["name"]: (results / attachment["source"]).read_bytes()
+               for attachment in result["attachments"]}
+    assert b"[truncated" in sources["Response Body"]
+    assert json.loads(sources["Response Body 1 (failure)"]) == BODY